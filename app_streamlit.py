@@ -9,7 +9,16 @@ import plotly.graph_objects as go
 import plotly.express as px
 import pandas as pd
 import numpy as np
-from simulador_soja import SimuladorSoja, TipoCenario, TipoEstrategia
+import os
+from collections import deque
+from simulador_soja import (
+    ALAVANCA_OPCOES, NOMES_ALAVANCAS, PONTOS_MAPA_PADRAO, SimuladorSoja, TipoCenario, TipoEstrategia,
+    analisar_sensibilidade, calcular_grade_hedge
+)
+from cache_simulador import CacheLRU
+from armazem_resultados import ArmazemResultados
+from instrumentacao import coletar, cronometrado, medir, secoes_mais_lentas
+from superficie_alavancas import SuperficieAlavancas, limites_alavancas
 
 # Configuração da página
 st.set_page_config(
@@ -235,11 +244,53 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-@st.cache_data
 def inicializar_simulador():
-    """Inicializa o simulador com cache"""
+    """Inicializa o simulador da sessão"""
     return SimuladorSoja()
 
+@st.cache_resource
+def obter_cache_resultados():
+    """Cache LRU de resultados e gráficos, compartilhado entre sessões"""
+    return CacheLRU(max_entradas=512, max_bytes=64 * 1024 * 1024)
+
+@st.cache_resource
+def abrir_armazem(caminho, modificado):
+    """Abre um arquivo de resultados via memmap (reaberto quando o arquivo muda)"""
+    return ArmazemResultados(caminho)
+
+@st.cache_resource
+def obter_superficie(limites, estrategias):
+    """Superfície pré-calculada, compartilhada entre sessões
+
+    A chave inclui os limites das alavancas: se mudarem em
+    SimuladorSoja.__init__, uma nova superfície é construída.
+    """
+    return SuperficieAlavancas(limites, estrategias=list(estrategias))
+
+# Linhas iniciais usadas nos gráficos de arquivos grandes (os cenários são i.i.d.)
+AMOSTRA_ARMAZEM = 200_000
+
+# Execuções (reruns) instrumentadas mantidas no painel de performance
+EXECUCOES_PAINEL = 20
+
+# Células do mapa de dominância enviadas ao navegador (x, y): a grade
+# calculada é amostrada até a resolução do gráfico
+RESOLUCAO_MAPA_TELA = (480, 360)
+
+ROTULOS_ALAVANCA = {'premio': 'Prêmio (USD/bu)', 'tela': 'Tela (USD/bu)', 'dolar': 'Dólar (BRL/USD)'}
+
+CORES_ESTRATEGIA = {
+    TipoEstrategia.SEM_TRAVAMENTO: '#6c757d',
+    TipoEstrategia.TRAVAR_DOLAR: '#4ECDC4',
+    TipoEstrategia.TRAVAR_SOJA_B3: '#FFD700',
+    TipoEstrategia.TRAVAR_SOJA_CHICAGO: '#FF6B6B',
+    TipoEstrategia.ESTRATEGIA_COMBINADA: '#9B59B6',
+    TipoEstrategia.PUT_SOJA_CHICAGO: '#FF9F43',
+    TipoEstrategia.COLAR_SOJA_CHICAGO: '#E17055',
+    TipoEstrategia.PUT_DOLAR: '#00B894',
+    TipoEstrategia.CALL_DOLAR: '#0984E3'
+}
+
 def formatar_moeda_brl(valor):
     """Formata valor em reais"""
     return f"R$ {valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
@@ -262,6 +313,7 @@ def obter_cor_variacao(valor):
     else:
         return "result-neutral"
 
+@cronometrado('app.grafico.comparacao')
 def criar_grafico_comparacao(resultados):
     """Cria gráfico de comparação de estratégias"""
     estrategias = []
@@ -315,47 +367,16 @@ def criar_grafico_comparacao(resultados):
     
     return fig
 
-def criar_grafico_sensibilidade(simulador):
+@cronometrado('app.grafico.sensibilidade')
+def criar_grafico_sensibilidade(estado):
     """Cria gráfico de análise de sensibilidade"""
-    # Variações de -20% a +20%
+    # Variações de -20% a +20%, calculadas sem alterar o simulador
     variacoes = np.arange(-20, 21, 5)
+    sensibilidade = analisar_sensibilidade(estado, variacoes, [TipoEstrategia.SEM_TRAVAMENTO])
     
-    # Dados para cada alavanca
-    dados_premio = []
-    dados_tela = []
-    dados_dolar = []
-    
-    # Salvar configuração atual
-    config_atual = {
-        'premio': (simulador.alavancas['premio'].cenario, simulador.alavancas['premio'].variacao_percentual),
-        'tela': (simulador.alavancas['tela'].cenario, simulador.alavancas['tela'].variacao_percentual),
-        'dolar': (simulador.alavancas['dolar'].cenario, simulador.alavancas['dolar'].variacao_percentual)
-    }
-    
-    for var in variacoes:
-        # Teste variação do prêmio
-        simulador.definir_cenario_alavanca('premio', TipoCenario.ALTA if var >= 0 else TipoCenario.BAIXA, abs(var))
-        resultado = simulador.simular_estrategia(TipoEstrategia.SEM_TRAVAMENTO)
-        dados_premio.append(resultado.preco_final_brl)
-        
-        # Restaurar prêmio e testar tela
-        simulador.definir_cenario_alavanca('premio', config_atual['premio'][0], config_atual['premio'][1])
-        simulador.definir_cenario_alavanca('tela', TipoCenario.ALTA if var >= 0 else TipoCenario.BAIXA, abs(var))
-        resultado = simulador.simular_estrategia(TipoEstrategia.SEM_TRAVAMENTO)
-        dados_tela.append(resultado.preco_final_brl)
-        
-        # Restaurar tela e testar dólar
-        simulador.definir_cenario_alavanca('tela', config_atual['tela'][0], config_atual['tela'][1])
-        simulador.definir_cenario_alavanca('dolar', TipoCenario.ALTA if var >= 0 else TipoCenario.BAIXA, abs(var))
-        resultado = simulador.simular_estrategia(TipoEstrategia.SEM_TRAVAMENTO)
-        dados_dolar.append(resultado.preco_final_brl)
-        
-        # Restaurar dólar
-        simulador.definir_cenario_alavanca('dolar', config_atual['dolar'][0], config_atual['dolar'][1])
-    
-    # Restaurar configuração original
-    for nome, (cenario, variacao) in config_atual.items():
-        simulador.definir_cenario_alavanca(nome, cenario, variacao)
+    dados_premio = sensibilidade.curva('premio', TipoEstrategia.SEM_TRAVAMENTO)
+    dados_tela = sensibilidade.curva('tela', TipoEstrategia.SEM_TRAVAMENTO)
+    dados_dolar = sensibilidade.curva('dolar', TipoEstrategia.SEM_TRAVAMENTO)
     
     fig = go.Figure()
     
@@ -406,8 +427,130 @@ def criar_grafico_sensibilidade(simulador):
     
     return fig
 
-def main():
-    """Função principal da aplicação"""
+@cronometrado('app.grafico.mapa_hedge')
+def criar_mapa_hedge(estado, hedge_b3):
+    """Cria mapa de calor do preço da estratégia combinada por razão de hedge"""
+    grade = calcular_grade_hedge(estado, hedge_b3=[hedge_b3])
+    
+    fig = go.Figure(data=go.Heatmap(
+        z=grade.preco_final_brl[:, 0, :],
+        x=grade.hedge_chicago * 100,
+        y=grade.hedge_dolar * 100,
+        colorscale='Viridis',
+        colorbar=dict(title='BRL')
+    ))
+    
+    fig.update_layout(
+        title={
+            'text': f'Estratégia Combinada (B3 travado: {hedge_b3:.0%})',
+            'x': 0.5,
+            'font': {'size': 20, 'color': '#C0C0C0'}
+        },
+        xaxis_title='Hedge Chicago (%)',
+        yaxis_title='Hedge Dólar (%)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font={'color': '#C0C0C0'},
+        xaxis={'color': '#C0C0C0'},
+        yaxis={'color': '#C0C0C0'},
+        height=400
+    )
+    
+    return fig
+
+@cronometrado('app.grafico.opcoes')
+def criar_grafico_opcoes(simulador, alavanca, parametros):
+    """Cria gráfico do preço final das estratégias com opções contra o cenário de uma alavanca"""
+    variacoes = np.linspace(-30, 30, 121)
+    estrategias = [TipoEstrategia.SEM_TRAVAMENTO] + [
+        estrategia for estrategia, nome in ALAVANCA_OPCOES.items() if nome == alavanca
+    ]
+    lote = simulador.simular_lote(
+        cenarios={alavanca: np.sign(variacoes)},
+        variacoes={alavanca: np.abs(variacoes)},
+        estrategias=estrategias,
+        razoes_hedge=parametros
+    )
+    
+    fig = go.Figure()
+    
+    for estrategia, precos in zip(estrategias, lote.preco_final_brl):
+        fig.add_trace(go.Scatter(
+            x=variacoes, y=precos,
+            mode='lines',
+            name=estrategia.value.replace('_', ' ').title(),
+            line=dict(color=CORES_ESTRATEGIA[estrategia], width=3)
+        ))
+    
+    fig.update_layout(
+        title={
+            'text': f'Estratégias com Opções por Cenário de {ROTULOS_ALAVANCA[alavanca].split(" (")[0]}',
+            'x': 0.5,
+            'font': {'size': 20, 'color': '#C0C0C0'}
+        },
+        xaxis_title='Variação (%)',
+        yaxis_title='Preço Final (BRL)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font={'color': '#C0C0C0'},
+        xaxis={'color': '#C0C0C0'},
+        yaxis={'color': '#C0C0C0'},
+        height=400,
+        legend=dict(
+            bgcolor='rgba(30,30,30,0.8)',
+            bordercolor='#C0C0C0',
+            borderwidth=1
+        )
+    )
+    
+    return fig
+
+@cronometrado('app.grafico.mapa_dominancia')
+def criar_mapa_dominancia(mapa):
+    """Cria mapa de calor da estratégia vencedora (grade já reduzida para a tela)"""
+    n = len(mapa.estrategias)
+    escala = []
+    for i, estrategia in enumerate(mapa.estrategias):
+        escala += [[i / n, CORES_ESTRATEGIA[estrategia]], [(i + 1) / n, CORES_ESTRATEGIA[estrategia]]]
+    
+    fig = go.Figure(data=go.Heatmap(
+        z=mapa.vencedora,
+        x=mapa.eixo_x,
+        y=mapa.eixo_y,
+        # float32 basta para exibir centavos e corta pela metade o payload
+        customdata=mapa.margem.astype(np.float32),
+        zmin=-0.5,
+        zmax=n - 0.5,
+        colorscale=escala,
+        colorbar=dict(
+            tickvals=list(range(n)),
+            ticktext=[e.value.replace('_', ' ').title() for e in mapa.estrategias]
+        ),
+        hovertemplate=(ROTULOS_ALAVANCA[mapa.alavanca_x] + ': %{x:.2f}<br>'
+                       + ROTULOS_ALAVANCA[mapa.alavanca_y] + ': %{y:.2f}<br>'
+                       'Margem sobre a 2ª: R$ %{customdata:.2f}<extra></extra>')
+    ))
+    
+    fig.update_layout(
+        title={
+            'text': f'Estratégia Vencedora ({ROTULOS_ALAVANCA[mapa.alavanca_fixa]} no cenário: {mapa.valor_fixo:.2f})',
+            'x': 0.5,
+            'font': {'size': 20, 'color': '#C0C0C0'}
+        },
+        xaxis_title=ROTULOS_ALAVANCA[mapa.alavanca_x],
+        yaxis_title=ROTULOS_ALAVANCA[mapa.alavanca_y],
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font={'color': '#C0C0C0'},
+        xaxis={'color': '#C0C0C0'},
+        yaxis={'color': '#C0C0C0'},
+        height=450
+    )
+    
+    return fig
+
+def renderizar_pagina():
+    """Monta a página: controles, resultados, gráficos e seções auxiliares"""
     
     # Header
     st.markdown("""
@@ -424,100 +567,101 @@ def main():
     simulador = st.session_state.simulador
     
     # Layout em colunas para controles
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-        st.markdown('<div class="lever-section">', unsafe_allow_html=True)
-        st.subheader("💰 Prêmio")
-        
-        premio_valor = st.slider(
-            "Valor Atual (USD)",
-            min_value=-0.50,
-            max_value=2.50,
-            value=1.00,
-            step=0.01,
-            key="premio_valor"
-        )
-        
-        premio_cenario = st.selectbox(
-            "Cenário",
-            ["Alta", "Baixa", "Neutro"],
-            index=0,
-            key="premio_cenario"
-        )
-        
-        premio_variacao = st.slider(
-            "Variação (%)",
-            min_value=0.0,
-            max_value=50.0,
-            value=15.0,
-            step=1.0,
-            key="premio_variacao"
-        )
-        
-        st.markdown('</div>', unsafe_allow_html=True)
-    
-    with col2:
-        st.markdown('<div class="lever-section">', unsafe_allow_html=True)
-        st.subheader("📊 Tela (Preço Base)")
-        
-        tela_valor = st.slider(
-            "Valor Atual (USD/bushel)",
-            min_value=10.00,
-            max_value=25.00,
-            value=15.00,
-            step=0.01,
-            key="tela_valor"
-        )
-        
-        tela_cenario = st.selectbox(
-            "Cenário",
-            ["Alta", "Baixa", "Neutro"],
-            index=0,
-            key="tela_cenario"
-        )
-        
-        tela_variacao = st.slider(
-            "Variação (%)",
-            min_value=0.0,
-            max_value=50.0,
-            value=12.0,
-            step=1.0,
-            key="tela_variacao"
-        )
-        
-        st.markdown('</div>', unsafe_allow_html=True)
-    
-    with col3:
-        st.markdown('<div class="lever-section">', unsafe_allow_html=True)
-        st.subheader("💵 Dólar")
-        
-        dolar_valor = st.slider(
-            "Taxa Atual (BRL/USD)",
-            min_value=4.50,
-            max_value=6.50,
-            value=5.20,
-            step=0.01,
-            key="dolar_valor"
-        )
+    with medir('app.controles'):
+        col1, col2, col3 = st.columns(3)
         
-        dolar_cenario = st.selectbox(
-            "Cenário",
-            ["Alta", "Baixa", "Neutro"],
-            index=0,
-            key="dolar_cenario"
-        )
+        with col1:
+            st.markdown('<div class="lever-section">', unsafe_allow_html=True)
+            st.subheader("💰 Prêmio")
+            
+            premio_valor = st.slider(
+                "Valor Atual (USD)",
+                min_value=-0.50,
+                max_value=2.50,
+                value=1.00,
+                step=0.01,
+                key="premio_valor"
+            )
+            
+            premio_cenario = st.selectbox(
+                "Cenário",
+                ["Alta", "Baixa", "Neutro"],
+                index=0,
+                key="premio_cenario"
+            )
+            
+            premio_variacao = st.slider(
+                "Variação (%)",
+                min_value=0.0,
+                max_value=50.0,
+                value=15.0,
+                step=1.0,
+                key="premio_variacao"
+            )
+            
+            st.markdown('</div>', unsafe_allow_html=True)
         
-        dolar_variacao = st.slider(
-            "Variação (%)",
-            min_value=0.0,
-            max_value=50.0,
-            value=8.0,
-            step=1.0,
-            key="dolar_variacao"
-        )
+        with col2:
+            st.markdown('<div class="lever-section">', unsafe_allow_html=True)
+            st.subheader("📊 Tela (Preço Base)")
+            
+            tela_valor = st.slider(
+                "Valor Atual (USD/bushel)",
+                min_value=10.00,
+                max_value=25.00,
+                value=15.00,
+                step=0.01,
+                key="tela_valor"
+            )
+            
+            tela_cenario = st.selectbox(
+                "Cenário",
+                ["Alta", "Baixa", "Neutro"],
+                index=0,
+                key="tela_cenario"
+            )
+            
+            tela_variacao = st.slider(
+                "Variação (%)",
+                min_value=0.0,
+                max_value=50.0,
+                value=12.0,
+                step=1.0,
+                key="tela_variacao"
+            )
+            
+            st.markdown('</div>', unsafe_allow_html=True)
         
-        st.markdown('</div>', unsafe_allow_html=True)
+        with col3:
+            st.markdown('<div class="lever-section">', unsafe_allow_html=True)
+            st.subheader("💵 Dólar")
+            
+            dolar_valor = st.slider(
+                "Taxa Atual (BRL/USD)",
+                min_value=4.50,
+                max_value=6.50,
+                value=5.20,
+                step=0.01,
+                key="dolar_valor"
+            )
+            
+            dolar_cenario = st.selectbox(
+                "Cenário",
+                ["Alta", "Baixa", "Neutro"],
+                index=0,
+                key="dolar_cenario"
+            )
+            
+            dolar_variacao = st.slider(
+                "Variação (%)",
+                min_value=0.0,
+                max_value=50.0,
+                value=8.0,
+                step=1.0,
+                key="dolar_variacao"
+            )
+            
+            st.markdown('</div>', unsafe_allow_html=True)
     
     # Atualizar simulador com valores da interface
     simulador.definir_valor_alavanca('premio', premio_valor)
@@ -586,28 +730,55 @@ def main():
         TipoEstrategia.TRAVAR_SOJA_CHICAGO
     ]
     
-    resultados = simulador.comparar_estrategias(estrategias)
+    # Resultados e gráficos memoizados pela impressão digital das alavancas
+    cache = obter_cache_resultados()
+    estado = simulador.obter_estado()
+    chave = estado.impressao_digital()
+    
+    usar_superficie = st.toggle(
+        "Usar superfície pré-calculada", key="usar_superficie",
+        help="Lê os resultados de uma tabela das estratégias sobre as faixas das alavancas "
+             "(construída uma vez por processo) em vez de executar o simulador"
+    )
+    
+    with medir('app.simulacao'):
+        if usar_superficie:
+            superficie = obter_superficie(limites_alavancas(simulador), tuple(estrategias))
+            resultados = superficie.resultados(estado)
+        else:
+            resultados = cache.obter(
+                (chave, 'resultados'),
+                lambda: simulador.comparar_estrategias(estrategias)
+            )
+    
+    if usar_superficie:
+        st.caption(
+            f"Superfície de {superficie.pontos}^6 nós ({superficie.nbytes / 1024 ** 2:.1f} MB); "
+            f"erro máximo medido de R$ {superficie.erro_maximo['preco_final_brl']:.1e}"
+        )
     
     # Tabela de resultados
     col1, col2 = st.columns([2, 1])
     
     with col1:
         # Criar DataFrame para tabela
-        dados_tabela = []
-        for resultado in resultados:
-            nome_estrategia = resultado.estrategia.value.replace("_", " ").title()
-            exposicoes = [k.title() for k, v in resultado.exposicao_risco.items() if v]
-            exposicao_str = ", ".join(exposicoes) if exposicoes else "Nenhuma"
+        with medir('app.tabela.dataframe'):
+            dados_tabela = []
+            for resultado in resultados:
+                nome_estrategia = resultado.estrategia.value.replace("_", " ").title()
+                exposicoes = [k.title() for k, v in resultado.exposicao_risco.items() if v]
+                exposicao_str = ", ".join(exposicoes) if exposicoes else "Nenhuma"
+                
+                dados_tabela.append({
+                    "Estratégia": nome_estrategia,
+                    "Preço Final": formatar_moeda_brl(resultado.preco_final_brl),
+                    "Variação": formatar_percentual(resultado.variacao_percentual),
+                    "Exposição": exposicao_str
+                })
             
-            dados_tabela.append({
-                "Estratégia": nome_estrategia,
-                "Preço Final": formatar_moeda_brl(resultado.preco_final_brl),
-                "Variação": formatar_percentual(resultado.variacao_percentual),
-                "Exposição": exposicao_str
-            })
-        
-        df_resultados = pd.DataFrame(dados_tabela)
-        st.dataframe(df_resultados, use_container_width=True)
+            df_resultados = pd.DataFrame(dados_tabela)
+        with medir('app.tabela.serializacao'):
+            st.dataframe(df_resultados, use_container_width=True)
     
     with col2:
         # Melhor e pior estratégia
@@ -629,12 +800,139 @@ def main():
     col1, col2 = st.columns(2)
     
     with col1:
-        fig_comparacao = criar_grafico_comparacao(resultados)
-        st.plotly_chart(fig_comparacao, use_container_width=True)
+        fig_comparacao = cache.obter(
+            (chave, 'grafico_comparacao'),
+            lambda: criar_grafico_comparacao(resultados)
+        )
+        with medir('app.plotly_chart'):
+            st.plotly_chart(fig_comparacao, use_container_width=True)
+    
+    with col2:
+        fig_sensibilidade = cache.obter(
+            (chave, 'grafico_sensibilidade'),
+            lambda: criar_grafico_sensibilidade(simulador.obter_estado())
+        )
+        with medir('app.plotly_chart'):
+            st.plotly_chart(fig_sensibilidade, use_container_width=True)
+    
+    # Estratégia combinada
+    st.markdown("---")
+    st.subheader("⚖️ Estratégia Combinada")
+    
+    col1, col2 = st.columns([1, 2])
+    
+    with col1:
+        hedge_dolar = st.slider("Hedge Dólar (%)", 0, 100, 50, 1, key="hedge_dolar") / 100
+        hedge_b3 = st.slider("Hedge B3 (%)", 0, 100, 0, 1, key="hedge_b3") / 100
+        hedge_chicago = st.slider("Hedge Chicago (%)", 0, 100, 50, 1, key="hedge_chicago") / 100
+        
+        combinada = simulador.simular_estrategia(
+            TipoEstrategia.ESTRATEGIA_COMBINADA, registrar=False,
+            hedge_dolar=hedge_dolar, hedge_b3=hedge_b3, hedge_chicago=hedge_chicago
+        )
+        st.metric(
+            "Preço Final",
+            formatar_moeda_brl(combinada.preco_final_brl),
+            formatar_percentual(combinada.variacao_percentual)
+        )
+    
+    with col2:
+        fig_hedge = cache.obter(
+            (chave, 'mapa_hedge', hedge_b3),
+            lambda: criar_mapa_hedge(simulador.obter_estado(), hedge_b3)
+        )
+        with medir('app.plotly_chart'):
+            st.plotly_chart(fig_hedge, use_container_width=True)
+    
+    # Estratégias com opções
+    st.markdown("---")
+    st.subheader("🛡️ Estratégias com Opções")
+    
+    col1, col2 = st.columns([1, 2])
+    
+    with col1:
+        strike_put = st.slider("Strike da Put (% da tela)", 70, 100, 95, 1, key="strike_put") / 100
+        strike_call = st.slider("Strike da Call do Colar (% da tela)", 100, 130, 110, 1,
+                                key="strike_call") / 100
+        strike_dolar = st.slider("Strike do Dólar (% do atual)", 80, 120, 100, 1, key="strike_dolar") / 100
+        vol_tela = st.slider("Volatilidade da Tela (%)", 5, 60, 20, 1, key="vol_tela") / 100
+        vol_dolar = st.slider("Volatilidade do Dólar (%)", 5, 40, 15, 1, key="vol_dolar") / 100
+        vencimento = st.slider("Vencimento (meses)", 1, 24, 6, 1, key="vencimento_opcoes") / 12
+        parametros_opcoes = {
+            'strike_put': strike_put, 'strike_call': strike_call, 'strike_dolar': strike_dolar,
+            'vol_tela': vol_tela, 'vol_dolar': vol_dolar, 'vencimento': vencimento
+        }
+        
+        for estrategia in ALAVANCA_OPCOES:
+            resultado = simulador.simular_estrategia(estrategia, registrar=False, **parametros_opcoes)
+            st.metric(
+                estrategia.value.replace('_', ' ').title(),
+                formatar_moeda_brl(resultado.preco_final_brl),
+                formatar_percentual(resultado.variacao_percentual)
+            )
     
     with col2:
-        fig_sensibilidade = criar_grafico_sensibilidade(simulador)
-        st.plotly_chart(fig_sensibilidade, use_container_width=True)
+        alavanca_opcoes = st.radio("Alavanca do gráfico", ['tela', 'dolar'], horizontal=True,
+                                   key="alavanca_opcoes", format_func=ROTULOS_ALAVANCA.get)
+        # O gráfico varre o cenário da alavanca escolhida: só o resto do estado entra na chave
+        fig_opcoes = cache.obter(
+            (tuple(estado.valores().values()), 'grafico_opcoes', alavanca_opcoes,
+             tuple(parametros_opcoes.items()),
+             tuple((getattr(estado, f'cenario_{nome}').value, getattr(estado, f'variacao_{nome}'))
+                   for nome in NOMES_ALAVANCAS if nome != alavanca_opcoes)),
+            lambda: criar_grafico_opcoes(simulador, alavanca_opcoes, parametros_opcoes)
+        )
+        with medir('app.plotly_chart'):
+            st.plotly_chart(fig_opcoes, use_container_width=True)
+    
+    # Mapa de dominância
+    st.markdown("---")
+    st.subheader("🗺️ Mapa de Dominância")
+    
+    col1, col2 = st.columns([1, 2])
+    
+    with col1:
+        alavanca_x = st.selectbox("Eixo X", NOMES_ALAVANCAS, index=1, key="mapa_eixo_x",
+                                  format_func=ROTULOS_ALAVANCA.get)
+        opcoes_y = [nome for nome in NOMES_ALAVANCAS if nome != alavanca_x]
+        alavanca_y = st.selectbox("Eixo Y", opcoes_y, index=len(opcoes_y) - 1, key="mapa_eixo_y",
+                                  format_func=ROTULOS_ALAVANCA.get)
+        pontos = st.select_slider("Pontos por eixo", [100, 250, 500, 1000, 2000],
+                                  value=PONTOS_MAPA_PADRAO, key="mapa_pontos")
+        
+        # Só os valores atuais (travados), o cenário da alavanca fixa e os
+        # parâmetros das estratégias mudam o mapa: mexer no cenário dos eixos não recalcula
+        fixa = next(nome for nome in NOMES_ALAVANCAS if nome not in (alavanca_x, alavanca_y))
+        cenario_fixo = getattr(estado, f'cenario_{fixa}')
+        chave_mapa = (
+            'mapa_dominancia', tuple(estado.valores().values()), alavanca_x, alavanca_y,
+            cenario_fixo.value, 0.0 if cenario_fixo == TipoCenario.NEUTRO else getattr(estado, f'variacao_{fixa}'),
+            pontos, hedge_dolar, hedge_b3, hedge_chicago, *parametros_opcoes.values()
+        )
+        mapa = cache.obter(
+            chave_mapa,
+            lambda: simulador.mapa_dominancia(
+                alavanca_x, alavanca_y, pontos,
+                hedge_dolar=hedge_dolar, hedge_b3=hedge_b3, hedge_chicago=hedge_chicago,
+                **parametros_opcoes
+            )
+        )
+        
+        st.markdown("**Área em que cada estratégia vence:**")
+        for estrategia, fracao in sorted(mapa.fracoes().items(), key=lambda item: -item[1]):
+            if fracao > 0:
+                st.write(f"• {estrategia.value.replace('_', ' ').title()}: {fracao:.1%}")
+        st.caption(f"Grade de {pontos} x {pontos} ({mapa.vencedora.size:,} células), exibida em até "
+                   f"{RESOLUCAO_MAPA_TELA[0]} x {RESOLUCAO_MAPA_TELA[1]}; a combinada e as opções usam os "
+                   "parâmetros acima")
+    
+    with col2:
+        fig_dominancia = cache.obter(
+            (chave_mapa, 'grafico', RESOLUCAO_MAPA_TELA),
+            lambda: criar_mapa_dominancia(mapa.reduzir(*RESOLUCAO_MAPA_TELA))
+        )
+        with medir('app.plotly_chart'):
+            st.plotly_chart(fig_dominancia, use_container_width=True)
     
     # Análise detalhada
     st.markdown("---")
@@ -680,6 +978,127 @@ def main():
             st.write(f"Tela no cenário: {formatar_moeda_usd(detalhes['tela_cenario'])}")
         with col3:
             st.write(f"Dólar no cenário: R$ {detalhes['dolar_cenario']:.2f}")
+        
+        # Derivadas exatas no estado atual (sem reavaliar o simulador)
+        st.markdown("**📐 Sensibilidades (R$ por 1% de choque):**")
+        estrategia = resultado_selecionado.estrategia
+        derivadas = simulador.sensibilidades(
+            [estrategia], hedge_dolar=hedge_dolar, hedge_b3=hedge_b3, hedge_chicago=hedge_chicago
+        ).por_choque()
+        
+        col1, col2, col3 = st.columns(3)
+        for coluna, alavanca, rotulo in zip((col1, col2, col3), derivadas.alavancas, ("Prêmio", "Tela", "Dólar")):
+            with coluna:
+                st.write(f"Delta {rotulo}: {formatar_moeda_brl(derivadas.delta_de(estrategia, alavanca))}")
+        st.caption(
+            f"Gama cruzado (por 1% x 1%): Prêmio x Dólar "
+            f"{formatar_moeda_brl(derivadas.gama_de(estrategia, 'premio', 'dolar'))}, Tela x Dólar "
+            f"{formatar_moeda_brl(derivadas.gama_de(estrategia, 'tela', 'dolar'))}; os demais gamas são nulos"
+        )
+    
+    # Resultados de Monte Carlo gravados em disco
+    with st.expander("📂 Resultados Salvos (Monte Carlo)"):
+        caminho = st.text_input("Arquivo de resultados", value="resultados.soja", key="arquivo_resultados")
+        if os.path.exists(caminho):
+            armazem = abrir_armazem(caminho, os.path.getmtime(caminho))
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Cenários", f"{len(armazem):,}")
+            col2.metric("Semente", armazem.cabecalho['semente'])
+            col3.metric("Estratégias", len(armazem.estrategias))
+            
+            if len(armazem) and armazem.estrategias:
+                with medir('app.grafico.armazem'):
+                    amostra = np.asarray(armazem.dados[:AMOSTRA_ARMAZEM])
+                    fig_armazem = go.Figure()
+                    for estrategia in armazem.estrategias:
+                        fig_armazem.add_trace(go.Histogram(
+                            x=amostra[:, armazem.colunas.index(estrategia.value)],
+                            name=estrategia.value.replace("_", " ").title(),
+                            opacity=0.6,
+                            nbinsx=100
+                        ))
+                    fig_armazem.update_layout(
+                        barmode='overlay',
+                        xaxis_title='Preço Final (BRL)',
+                        plot_bgcolor='rgba(0,0,0,0)',
+                        paper_bgcolor='rgba(0,0,0,0)',
+                        font={'color': '#C0C0C0'},
+                        height=400
+                    )
+                with medir('app.plotly_chart'):
+                    st.plotly_chart(fig_armazem, use_container_width=True)
+                st.caption(f"Distribuição dos primeiros {min(len(armazem), AMOSTRA_ARMAZEM):,} cenários")
+        else:
+            st.info("Gere um arquivo com `python3 armazem_resultados.py gerar resultados.soja`")
+    
+    # Informações de depuração do cache
+    with st.expander("🛠️ Debug: Cache de Resultados"):
+        estatisticas = cache.estatisticas()
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Taxa de Acerto", f"{estatisticas['taxa_acerto']:.1%}")
+        col2.metric("Acertos / Falhas", f"{estatisticas['acertos']} / {estatisticas['falhas']}")
+        col3.metric("Entradas", estatisticas['entradas'])
+        col4.metric("Memória", f"{estatisticas['bytes_usados'] / 1024:.0f} KB")
+
+def renderizar_painel_performance(execucoes):
+    """Painel com o detalhamento por execução e as seções mais lentas"""
+    with st.expander("⏱️ Performance"):
+        col1, col2 = st.columns(2)
+        col1.checkbox("Instrumentar execuções", key="instrumentacao_ativa",
+                      help="Mede simulação, DataFrames, gráficos e serialização a cada rerun")
+        col2.checkbox("Capturar perfil (cProfile)", key="instrumentacao_perfil",
+                      help="Mais lento: perfila a execução inteira")
+        
+        if not execucoes:
+            st.caption("Ative a instrumentação: os tempos aparecem a partir da próxima execução")
+            return
+        
+        ultima = execucoes[-1]
+        duracoes = [registro.duracao * 1000 for registro in execucoes]
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Última execução", f"{duracoes[-1]:.1f} ms")
+        col2.metric(f"Média ({len(execucoes)} execuções)", f"{np.mean(duracoes):.1f} ms")
+        col3.metric("Mais lenta", f"{max(duracoes):.1f} ms")
+        
+        st.markdown("**Última execução por seção** (tempo próprio, sem as seções aninhadas)")
+        detalhamento = pd.DataFrame(ultima.detalhamento())
+        st.dataframe(
+            detalhamento.rename(columns={
+                'secao': 'Seção', 'total_ms': 'Total (ms)', 'proprio_ms': 'Próprio (ms)',
+                'chamadas': 'Chamadas', 'fracao': 'Fração'
+            }).style.format({'Total (ms)': '{:.2f}', 'Próprio (ms)': '{:.2f}', 'Fração': '{:.1%}'}),
+            use_container_width=True, hide_index=True
+        )
+        
+        st.markdown(f"**Seções mais lentas nas últimas {len(execucoes)} execuções**")
+        lentas = pd.DataFrame(secoes_mais_lentas(execucoes))
+        st.dataframe(
+            lentas[['secao', 'media_ms', 'maximo_ms', 'execucoes', 'chamadas']].rename(columns={
+                'secao': 'Seção', 'media_ms': 'Média (ms)', 'maximo_ms': 'Máximo (ms)',
+                'execucoes': 'Execuções', 'chamadas': 'Chamadas'
+            }).style.format({'Média (ms)': '{:.2f}', 'Máximo (ms)': '{:.2f}'}),
+            use_container_width=True, hide_index=True
+        )
+        
+        if ultima.contadores:
+            st.caption("Contadores: " + ", ".join(f"{nome} = {valor}" for nome, valor in ultima.contadores.items()))
+        if ultima.perfil:
+            st.markdown("**Perfil da última execução (cProfile, por tempo acumulado)**")
+            st.code(ultima.perfil, language=None)
+
+def main():
+    """Função principal da aplicação"""
+    
+    if st.session_state.get('instrumentacao_ativa', False):
+        with coletar(perfilar=st.session_state.get('instrumentacao_perfil', False)) as registro:
+            renderizar_pagina()
+        if 'execucoes_instrumentadas' not in st.session_state:
+            st.session_state.execucoes_instrumentadas = deque(maxlen=EXECUCOES_PAINEL)
+        st.session_state.execucoes_instrumentadas.append(registro)
+    else:
+        renderizar_pagina()
+    
+    renderizar_painel_performance(st.session_state.get('execucoes_instrumentadas'))
     
     # Footer
     st.markdown("---")
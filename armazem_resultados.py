@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Armazenamento binário de resultados do Simulador de Soja
+Arquivo com cabeçalho JSON de tamanho fixo (configuração das alavancas,
+semente e estratégias) seguido de uma matriz float64 contígua, lida via
+numpy.memmap sem cópia e com suporte a acréscimo de novos blocos
+"""
+
+import argparse
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from simulador_soja import SimuladorSoja, TipoEstrategia
+from monte_carlo_soja import ALAVANCAS, AMOSTRAGENS, MonteCarloSoja
+
+# Identificador e versão do formato (8 bytes no início do arquivo)
+MAGICO = b'SOJARES1'
+
+# Tamanho reservado ao cabeçalho; os dados começam alinhados a uma página
+TAMANHO_CABECALHO = 4096
+
+DTYPE = np.dtype('<f8')
+
+class ArmazemResultados:
+    """Arquivo de resultados: cabeçalho JSON + matriz (linhas, colunas) float64
+
+    `dados` é um numpy.memmap somente leitura: fatias e colunas não copiam
+    nem leem o arquivo inteiro. `acrescentar` grava novas linhas no fim e
+    atualiza a contagem no cabeçalho.
+    """
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self.cabecalho = self._ler_cabecalho(caminho)
+        self.colunas: List[str] = self.cabecalho['colunas']
+        self._mapear()
+
+    @staticmethod
+    def _ler_cabecalho(caminho: str) -> Dict:
+        with open(caminho, 'rb') as f:
+            bruto = f.read(TAMANHO_CABECALHO)
+        if len(bruto) < TAMANHO_CABECALHO or not bruto.startswith(MAGICO):
+            raise ValueError(f"{caminho} não é um arquivo de resultados do simulador")
+        return json.loads(bruto[len(MAGICO):].decode('utf-8'))
+
+    @staticmethod
+    def _gravar_cabecalho(arquivo, cabecalho: Dict):
+        texto = json.dumps(cabecalho, ensure_ascii=False).encode('utf-8')
+        espaco = TAMANHO_CABECALHO - len(MAGICO)
+        if len(texto) > espaco:
+            raise ValueError(f"Cabeçalho excede {espaco} bytes")
+        arquivo.seek(0)
+        arquivo.write(MAGICO + texto.ljust(espaco))
+
+    @classmethod
+    def criar(cls, caminho: str, colunas: List[str],
+              estrategias: Optional[List[TipoEstrategia]] = None,
+              alavancas: Optional[Dict] = None,
+              semente: Optional[str] = None,
+              metadados: Optional[Dict] = None) -> 'ArmazemResultados':
+        """Cria um arquivo vazio com o esquema e a configuração informados"""
+        cabecalho = {
+            'versao': 1,
+            'dtype': DTYPE.str,
+            'colunas': list(colunas),
+            'n_linhas': 0,
+            'estrategias': [e.value for e in (estrategias or [])],
+            'alavancas': alavancas or {},
+            'semente': semente,
+            'metadados': metadados or {}
+        }
+        with open(caminho, 'wb') as f:
+            cls._gravar_cabecalho(f, cabecalho)
+        return cls(caminho)
+
+    def _mapear(self):
+        """(Re)cria o memmap sobre as linhas gravadas"""
+        forma = (self.cabecalho['n_linhas'], len(self.colunas))
+        if forma[0] == 0:
+            self.dados = np.empty(forma, dtype=DTYPE)
+        else:
+            self.dados = np.memmap(self.caminho, dtype=DTYPE, mode='r',
+                                   offset=TAMANHO_CABECALHO, shape=forma)
+
+    def __len__(self) -> int:
+        return self.cabecalho['n_linhas']
+
+    @property
+    def estrategias(self) -> List[TipoEstrategia]:
+        return [TipoEstrategia(valor) for valor in self.cabecalho['estrategias']]
+
+    def coluna(self, nome: str) -> np.ndarray:
+        """Visão (sem cópia) de uma coluna"""
+        return self.dados[:, self.colunas.index(nome)]
+
+    def acrescentar(self, linhas: np.ndarray):
+        """Grava linhas no fim do arquivo e atualiza o cabeçalho
+
+        Os dados são gravados antes da contagem: uma interrupção no meio
+        deixa o arquivo com as linhas anteriores intactas.
+        """
+        linhas = np.ascontiguousarray(linhas, dtype=DTYPE)
+        if linhas.ndim != 2 or linhas.shape[1] != len(self.colunas):
+            raise ValueError(f"Esperado array (n, {len(self.colunas)}), recebido {linhas.shape}")
+
+        self.dados = None
+        with open(self.caminho, 'r+b') as f:
+            f.seek(TAMANHO_CABECALHO + len(self) * len(self.colunas) * DTYPE.itemsize)
+            f.write(linhas.tobytes())
+            f.truncate()
+            self.cabecalho['n_linhas'] += len(linhas)
+            self._gravar_cabecalho(f, self.cabecalho)
+        self._mapear()
+
+    def truncar(self, n_linhas: int):
+        """Descarta as linhas a partir de `n_linhas`
+
+        A contagem é gravada antes de encurtar o arquivo, pelo mesmo motivo
+        de `acrescentar`: o cabeçalho nunca aponta para linhas inexistentes.
+        """
+        if not 0 <= n_linhas <= len(self):
+            raise ValueError(f"n_linhas deve estar entre 0 e {len(self)}, recebido {n_linhas}")
+
+        self.dados = None
+        with open(self.caminho, 'r+b') as f:
+            self.cabecalho['n_linhas'] = n_linhas
+            self._gravar_cabecalho(f, self.cabecalho)
+            f.truncate(TAMANHO_CABECALHO + n_linhas * len(self.colunas) * DTYPE.itemsize)
+        self._mapear()
+
+def configuracao_motor(motor: MonteCarloSoja) -> Dict:
+    """Parâmetros do motor de Monte Carlo gravados no cabeçalho
+
+    A amostragem só é gravada quando não é a pseudoaleatória, para que
+    arquivos anteriores a ela continuem aceitando `anexar`.
+    """
+    configuracao = {
+        'valores_iniciais': dict(zip(ALAVANCAS, motor.valores_iniciais.tolist())),
+        'volatilidades': dict(zip(ALAVANCAS, motor.volatilidades.tolist())),
+        'derivas': dict(zip(ALAVANCAS, motor.derivas.tolist())),
+        'correlacao': motor.correlacao.tolist(),
+        'horizonte_anos': motor.horizonte_anos,
+        'tamanho_bloco': motor.tamanho_bloco
+    }
+    if motor.amostragem != 'pseudo':
+        configuracao['amostragem'] = motor.amostragem
+    return configuracao
+
+def salvar_monte_carlo(caminho: str, motor: MonteCarloSoja, n_cenarios: int,
+                       estrategias: Optional[List[TipoEstrategia]] = None,
+                       anexar: bool = False) -> ArmazemResultados:
+    """Grava cenários e preços de uma execução de Monte Carlo bloco a bloco
+
+    Cada linha tem os valores sorteados das alavancas e o preço em BRL de
+    cada estratégia. Com `anexar=True` a execução continua a partir dos
+    blocos já gravados, então acrescentar N cenários equivale a ter gerado
+    o total de uma vez. Um último bloco incompleto é descartado e gerado de
+    novo com o tamanho cheio (na amostragem antitética seus cenários mudam).
+    """
+    if anexar and os.path.exists(caminho):
+        armazem = ArmazemResultados(caminho)
+        if armazem.cabecalho['semente'] != str(motor.semente):
+            raise ValueError("A semente do motor difere da gravada no arquivo")
+        if armazem.cabecalho['alavancas'] != configuracao_motor(motor):
+            raise ValueError("A configuração do motor difere da gravada no arquivo")
+        parcial = len(armazem) % motor.tamanho_bloco
+        if parcial:
+            armazem.truncar(len(armazem) - parcial)
+            n_cenarios += parcial
+        estrategias = armazem.estrategias
+    else:
+        if estrategias is None:
+            estrategias = list(TipoEstrategia)
+        armazem = ArmazemResultados.criar(
+            caminho,
+            colunas=list(ALAVANCAS) + [e.value for e in estrategias],
+            estrategias=estrategias,
+            alavancas=configuracao_motor(motor),
+            # A entropia da SeedSequence pode passar de 64 bits
+            semente=str(motor.semente)
+        )
+
+    primeiro_bloco = len(armazem) // motor.tamanho_bloco
+    linhas = np.empty((min(motor.tamanho_bloco, n_cenarios), len(armazem.colunas)))
+    for indice, _, n in motor.blocos(n_cenarios):
+        cenarios = motor.gerar_cenarios(primeiro_bloco + indice, n)
+        trecho = linhas[:n]
+        for i, nome in enumerate(ALAVANCAS):
+            trecho[:, i] = cenarios[nome]
+        motor.precificar_cenarios(cenarios, estrategias, trecho[:, len(ALAVANCAS):].T)
+        armazem.acrescentar(trecho)
+    return armazem
+
+def resumir(armazem: ArmazemResultados, inicio: int = 0, fim: Optional[int] = None,
+            tamanho_bloco: int = 1_000_000) -> Dict[str, Dict[str, float]]:
+    """Média, mínimo e máximo de cada coluna em uma fatia, lida em blocos"""
+    fim = len(armazem) if fim is None else min(fim, len(armazem))
+    n = max(fim - inicio, 0)
+    somas = np.zeros(len(armazem.colunas))
+    minimos = np.full(len(armazem.colunas), np.inf)
+    maximos = np.full(len(armazem.colunas), -np.inf)
+    for i in range(inicio, fim, tamanho_bloco):
+        bloco = armazem.dados[i:min(i + tamanho_bloco, fim)]
+        somas += bloco.sum(axis=0)
+        np.minimum(minimos, bloco.min(axis=0), out=minimos)
+        np.maximum(maximos, bloco.max(axis=0), out=maximos)
+    return {
+        nome: {'media': float(somas[j] / n) if n else float('nan'),
+               'minimo': float(minimos[j]), 'maximo': float(maximos[j])}
+        for j, nome in enumerate(armazem.colunas)
+    }
+
+def main(argumentos=None):
+    """Ponto de entrada de linha de comando"""
+    parser = argparse.ArgumentParser(description="Arquivos binários de resultados do simulador")
+    comandos = parser.add_subparsers(dest='comando', required=True)
+
+    gerar = comandos.add_parser('gerar', help="grava uma execução de Monte Carlo")
+    gerar.add_argument('arquivo')
+    gerar.add_argument('-n', '--cenarios', type=int, default=10_000_000)
+    gerar.add_argument('--semente', type=int, default=2024)
+    gerar.add_argument('--amostragem', choices=AMOSTRAGENS, default='pseudo',
+                       help="forma de sortear os choques (padrão: %(default)s)")
+    gerar.add_argument('--premio', type=float, default=1.00, help="valor atual do prêmio (USD)")
+    gerar.add_argument('--tela', type=float, help="valor atual da tela (USD)")
+    gerar.add_argument('--dolar', type=float, help="valor atual do dólar (BRL)")
+    gerar.add_argument('--anexar', action='store_true',
+                       help="continua a execução já gravada no arquivo")
+
+    info = comandos.add_parser('info', help="exibe o cabeçalho e o resumo de uma fatia")
+    info.add_argument('arquivo')
+    info.add_argument('--inicio', type=int, default=0)
+    info.add_argument('--fim', type=int)
+
+    args = parser.parse_args(argumentos)
+
+    if args.comando == 'gerar':
+        simulador = SimuladorSoja()
+        for nome in ALAVANCAS:
+            if getattr(args, nome) is not None:
+                simulador.definir_valor_alavanca(nome, getattr(args, nome))
+        motor = MonteCarloSoja(simulador, semente=args.semente, amostragem=args.amostragem)
+        inicio = time.perf_counter()
+        armazem = salvar_monte_carlo(args.arquivo, motor, args.cenarios, anexar=args.anexar)
+        print(f"{len(armazem):,} linhas gravadas em {args.arquivo} "
+              f"({time.perf_counter() - inicio:.2f}s)")
+        return
+
+    inicio = time.perf_counter()
+    armazem = ArmazemResultados(args.arquivo)
+    print(f"Aberto em {(time.perf_counter() - inicio) * 1000:.1f} ms")
+    print(f"Linhas: {len(armazem):,}  Colunas: {', '.join(armazem.colunas)}")
+    print(f"Semente: {armazem.cabecalho['semente']}")
+    print(f"Configuração: {json.dumps(armazem.cabecalho['alavancas'], ensure_ascii=False)}\n")
+    print(f"{'Coluna':<24} {'Média':>12} {'Mínimo':>12} {'Máximo':>12}")
+    for nome, valores in resumir(armazem, args.inicio, args.fim).items():
+        print(f"{nome:<24} {valores['media']:>12.4f} {valores['minimo']:>12.4f} {valores['maximo']:>12.4f}")
+
+if __name__ == "__main__":
+    main()
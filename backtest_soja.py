@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Backtest histórico das estratégias do Simulador de Soja
+Reproduz séries diárias de Tela (CBOT), Prêmio (porto) e Dólar (PTAX):
+cada estratégia trava na data de decisão e liquida na entrega, para todos
+os pares (decisão, entrega) de uma vez, sem laço por dia
+"""
+
+import argparse
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from simulador_soja import TipoEstrategia, precificar_estrategia, validar_razoes_hedge
+
+# Horizontes padrão (em pregões): todos de 1 a ~1 ano
+HORIZONTE_MAXIMO_PADRAO = 252
+
+# Pregões por ano: converte o horizonte no vencimento das opções
+PREGOES_POR_ANO = 252
+
+PERCENTIS_BACKTEST = (5.0, 25.0, 50.0, 75.0, 95.0)
+
+@dataclass
+class SeriesHistoricas:
+    """Séries diárias alinhadas por data"""
+    datas: np.ndarray
+    tela: np.ndarray
+    premio: np.ndarray
+    dolar: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.datas)
+
+def carregar_series(caminho: str) -> SeriesHistoricas:
+    """Lê um CSV com colunas data, tela, premio e dolar
+
+    As linhas são ordenadas por data; lacunas (feriados de um só mercado)
+    repetem o último valor conhecido e o período inicial incompleto é
+    descartado.
+    """
+    tabela = pd.read_csv(caminho, parse_dates=['data'])
+    faltando = {'data', 'tela', 'premio', 'dolar'} - set(tabela.columns)
+    if faltando:
+        raise ValueError(f"Colunas ausentes no CSV: {', '.join(sorted(faltando))}")
+    tabela = tabela.sort_values('data').set_index('data')[['tela', 'premio', 'dolar']]
+    tabela = tabela.ffill().dropna()
+    return SeriesHistoricas(
+        datas=tabela.index.to_numpy(dtype='datetime64[D]'),
+        tela=tabela['tela'].to_numpy(dtype=np.float64),
+        premio=tabela['premio'].to_numpy(dtype=np.float64),
+        dolar=tabela['dolar'].to_numpy(dtype=np.float64)
+    )
+
+def gerar_series_sinteticas(anos: int = 20, semente: int = 0,
+                            inicio: str = '2005-01-03') -> SeriesHistoricas:
+    """Séries diárias (dias úteis) por passeio aleatório log-normal, para testes"""
+    rng = np.random.default_rng(semente)
+    datas = np.busday_offset(np.datetime64(inicio, 'D'), np.arange(anos * 252), roll='forward')
+    n = len(datas)
+    volatilidades = np.array([0.25, 0.30, 0.15]) / np.sqrt(252)
+    passos = rng.standard_normal((n, 3)) * volatilidades - volatilidades ** 2 / 2
+    niveis = np.array([14.50, 0.80, 5.20]) * np.exp(np.cumsum(passos, axis=0))
+    return SeriesHistoricas(datas=datas, tela=niveis[:, 0], premio=niveis[:, 1], dolar=niveis[:, 2])
+
+def indices_janelas(n_dias: int, horizontes) -> Dict[str, np.ndarray]:
+    """Índices de todos os pares (decisão, entrega = decisão + horizonte)
+
+    Os pares ficam agrupados por horizonte e, dentro de cada grupo, em ordem
+    de decisão. Retorna também `inicios` (início de cada grupo) para
+    agregações por horizonte.
+    """
+    horizontes = np.unique(np.asarray(horizontes, dtype=np.int64))
+    horizontes = horizontes[(horizontes > 0) & (horizontes < n_dias)]
+    contagens = n_dias - horizontes
+    inicios = np.concatenate(([0], np.cumsum(contagens)[:-1]))
+    total = int(contagens.sum())
+
+    grupo = np.repeat(np.arange(len(horizontes)), contagens)
+    decisao = np.arange(total) - inicios[grupo]
+    return {
+        'decisao': decisao,
+        'entrega': decisao + horizontes[grupo],
+        'grupo': grupo,
+        'horizontes': horizontes,
+        'inicios': inicios
+    }
+
+@dataclass
+class ResultadoBacktest:
+    """Preços realizados por estratégia para cada par (decisão, entrega)
+
+    `preco_final_brl` tem forma (estratégias, pares); os pares estão
+    agrupados por horizonte (ver `indices_janelas`).
+    """
+    estrategias: List[TipoEstrategia]
+    datas_decisao: np.ndarray
+    datas_entrega: np.ndarray
+    horizontes: np.ndarray
+    inicios: np.ndarray
+    preco_final_brl: np.ndarray
+
+    def _linha(self, estrategia: TipoEstrategia) -> int:
+        return self.estrategias.index(estrategia)
+
+    def contra_sem_travamento(self) -> np.ndarray:
+        """Diferença para o preço sem travamento na mesma janela, (estratégias, pares)"""
+        referencia = self.preco_final_brl[self._linha(TipoEstrategia.SEM_TRAVAMENTO)]
+        return self.preco_final_brl - referencia
+
+    def distribuicao(self, estrategia: TipoEstrategia, horizonte: int) -> np.ndarray:
+        """Preços realizados de uma estratégia em um horizonte (visão)"""
+        g = int(np.searchsorted(self.horizontes, horizonte))
+        if g >= len(self.horizontes) or self.horizontes[g] != horizonte:
+            raise ValueError(f"Horizonte {horizonte} não avaliado")
+        fim = self.inicios[g + 1] if g + 1 < len(self.inicios) else self.preco_final_brl.shape[1]
+        return self.preco_final_brl[self._linha(estrategia), self.inicios[g]:fim]
+
+    def resumo(self, percentis=PERCENTIS_BACKTEST) -> Dict[TipoEstrategia, Dict[str, np.ndarray]]:
+        """Estatísticas por estratégia e horizonte (um valor por horizonte)
+
+        Inclui a média e os percentis do preço realizado, a média da
+        diferença para o sem travamento e a fração das janelas em que a
+        estratégia superou o sem travamento.
+        """
+        diferencas = self.contra_sem_travamento()
+        contagens = np.diff(np.append(self.inicios, self.preco_final_brl.shape[1]))
+        fins = self.inicios + contagens
+        resumo = {}
+        for i, estrategia in enumerate(self.estrategias):
+            precos = self.preco_final_brl[i]
+            resumo[estrategia] = {
+                'horizonte': self.horizontes,
+                'media': np.add.reduceat(precos, self.inicios) / contagens,
+                'diferenca_media': np.add.reduceat(diferencas[i], self.inicios) / contagens,
+                'frequencia_melhor': np.add.reduceat((diferencas[i] > 0).astype(np.float64),
+                                                     self.inicios) / contagens
+            }
+            # Percentis por horizonte: um laço por grupo, não por janela
+            valores = np.array([
+                np.percentile(precos[inicio:fim], percentis)
+                for inicio, fim in zip(self.inicios, fins)
+            ]).reshape(len(self.horizontes), len(percentis))
+            for j, p in enumerate(percentis):
+                resumo[estrategia][f'p{p:g}'] = valores[:, j]
+        return resumo
+
+def executar_backtest(series: SeriesHistoricas, horizontes=None,
+                      estrategias: Optional[List[TipoEstrategia]] = None,
+                      razoes_hedge: Optional[Dict[str, float]] = None) -> ResultadoBacktest:
+    """Avalia as estratégias em todas as janelas de uma vez
+
+    Os valores na decisão fazem o papel de "atuais" e os da entrega, de
+    "cenário", na mesma fórmula de `precificar_estrategia`. `horizontes`
+    são contados em pregões (padrão: 1 a 252). As opções vencem na entrega
+    de cada janela: o `vencimento` é o horizonte em anos, no lugar do
+    informado em `razoes_hedge`. SEM_TRAVAMENTO é sempre incluída, por ser
+    a referência das comparações.
+    """
+    if estrategias is None:
+        estrategias = list(TipoEstrategia)
+    if TipoEstrategia.SEM_TRAVAMENTO not in estrategias:
+        estrategias = [TipoEstrategia.SEM_TRAVAMENTO] + list(estrategias)
+    if horizontes is None:
+        horizontes = np.arange(1, HORIZONTE_MAXIMO_PADRAO + 1)
+    razoes_hedge = validar_razoes_hedge(razoes_hedge or {})
+
+    janelas = indices_janelas(len(series), horizontes)
+    decisao, entrega = janelas['decisao'], janelas['entrega']
+    atuais = (series.premio[decisao], series.tela[decisao], series.dolar[decisao])
+    finais = (series.premio[entrega], series.tela[entrega], series.dolar[entrega])
+    razoes_hedge['vencimento'] = janelas['horizontes'][janelas['grupo']] / PREGOES_POR_ANO
+
+    precos = np.empty((len(estrategias), len(decisao)))
+    for i, estrategia in enumerate(estrategias):
+        precos[i] = precificar_estrategia(estrategia, *finais, *atuais, **razoes_hedge)[1]
+
+    return ResultadoBacktest(
+        estrategias=list(estrategias),
+        datas_decisao=series.datas[decisao],
+        datas_entrega=series.datas[entrega],
+        horizontes=janelas['horizontes'],
+        inicios=janelas['inicios'],
+        preco_final_brl=precos
+    )
+
+def main(argumentos=None):
+    """Executa o backtest sobre um CSV (ou séries sintéticas) e resume"""
+    parser = argparse.ArgumentParser(description="Backtest histórico das estratégias")
+    parser.add_argument('csv', nargs='?', help="CSV com colunas data, tela, premio, dolar")
+    parser.add_argument('--horizonte-maximo', type=int, default=HORIZONTE_MAXIMO_PADRAO,
+                        help="maior horizonte em pregões (padrão: %(default)s)")
+    parser.add_argument('--anos-sinteticos', type=int, default=20,
+                        help="anos de séries sintéticas quando não há CSV")
+    args = parser.parse_args(argumentos)
+
+    series = carregar_series(args.csv) if args.csv else gerar_series_sinteticas(args.anos_sinteticos)
+    inicio = time.perf_counter()
+    resultado = executar_backtest(series, np.arange(1, args.horizonte_maximo + 1))
+    duracao = time.perf_counter() - inicio
+
+    print(f"Séries: {len(series):,} dias ({series.datas[0]} a {series.datas[-1]})")
+    print(f"Janelas: {resultado.preco_final_brl.shape[1]:,} pares em {duracao:.2f}s\n")
+
+    resumo = resultado.resumo()
+    horizontes_exibidos = [h for h in (21, 63, 126, 252) if h in resultado.horizontes]
+    for estrategia, estatisticas in resumo.items():
+        print(f"{estrategia.value}:")
+        for h in horizontes_exibidos:
+            g = int(np.searchsorted(resultado.horizontes, h))
+            print(f"  {h:>3} pregões: média R$ {estatisticas['media'][g]:.2f}  "
+                  f"P5 R$ {estatisticas['p5'][g]:.2f}  P95 R$ {estatisticas['p95'][g]:.2f}  "
+                  f"vs. sem travamento {estatisticas['diferenca_media'][g]:+.2f} "
+                  f"({estatisticas['frequencia_melhor'][g]:.0%} melhor)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Benchmark de convergência das técnicas de Monte Carlo
+Para cada técnica (pseudoaleatória, antitética, Sobol embaralhado e
+variável de controle) mede, com réplicas independentes, a meia-largura do
+intervalo de confiança da média e do CVaR de uma estratégia, dobrando o
+número de sorteios até atingir o alvo. O resultado é quantos sorteios cada
+técnica precisa para a precisão pedida, comparado à amostragem simples
+"""
+
+import argparse
+import json
+import time
+from statistics import NormalDist
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from monte_carlo_soja import MonteCarloSoja
+from simulador_soja import SimuladorSoja, TipoCenario, TipoEstrategia
+
+# Parâmetros do MonteCarloSoja de cada técnica
+TECNICAS = {
+    'pseudo': {'amostragem': 'pseudo'},
+    'antitetica': {'amostragem': 'antitetica'},
+    'controle': {'amostragem': 'pseudo', 'variavel_controle': True},
+    'sobol': {'amostragem': 'sobol'},
+    'sobol+controle': {'amostragem': 'sobol', 'variavel_controle': True}
+}
+
+METRICAS = ('media', 'cvar')
+
+# Réplicas independentes (sementes distintas) por ponto da curva
+REPLICAS_PADRAO = 16
+
+# Meias-larguras alvo do intervalo de 95% (BRL)
+ALVOS_PADRAO = {'media': 0.002, 'cvar': 0.01}
+
+# Sorteios por réplica: potências de 2 (mantêm o equilíbrio das redes de Sobol)
+SORTEIOS_INICIAIS = 1 << 8
+SORTEIOS_MAXIMOS = 1 << 22
+
+def quantil_t(probabilidade: float, graus_liberdade: int) -> float:
+    """Quantil da t de Student pela expansão de Cornish-Fisher (erro < 1e-3 para gl >= 5)"""
+    z = NormalDist().inv_cdf(probabilidade)
+    nu = graus_liberdade
+    return (z + (z ** 3 + z) / (4 * nu) + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * nu ** 2)
+            + (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / (384 * nu ** 3))
+
+def estimar(simulador: SimuladorSoja, tecnica: str, n: int,
+            estrategia: TipoEstrategia = TipoEstrategia.ESTRATEGIA_COMBINADA,
+            replicas: int = REPLICAS_PADRAO, nivel_confianca: float = 0.95,
+            semente: int = 0) -> Dict[str, Dict[str, float]]:
+    """Estimativa combinada das réplicas e meia-largura do IC de 95% por métrica
+
+    Cada réplica roda `n` sorteios com sua própria semente (e, no Sobol, seu
+    próprio embaralhamento); a meia-largura vale para a média das réplicas,
+    isto é, para `replicas * n` sorteios no total.
+    """
+    estimativas = {metrica: np.empty(replicas) for metrica in METRICAS}
+    for r in range(replicas):
+        motor = MonteCarloSoja(simulador, semente=semente + r, tamanho_bloco=min(n, 1 << 18),
+                               **TECNICAS[tecnica])
+        metricas = motor.simular(n, [estrategia], nivel_confianca, percentis=())[estrategia]
+        for metrica in METRICAS:
+            estimativas[metrica][r] = getattr(metricas, metrica)
+
+    t = quantil_t(0.975, replicas - 1)
+    return {
+        metrica: {
+            'estimativa': float(valores.mean()),
+            'meia_largura': float(t * valores.std(ddof=1) / np.sqrt(replicas))
+        }
+        for metrica, valores in estimativas.items()
+    }
+
+def _sorteios_para_alvo(curva: List[Dict], metrica: str, alvo: float) -> Tuple[float, str]:
+    """Sorteios totais em que a curva cruza o alvo e como foram obtidos
+
+    'medido': interpolação log-log entre os pontos vizinhos ao alvo;
+    'limite': o primeiro ponto já atinge o alvo (limite superior);
+    'extrapolado': nenhum ponto atinge, então o último é estendido pela taxa
+    1/sqrt(N) do teorema central do limite (pessimista para o Sobol).
+    """
+    anterior = None
+    for ponto in curva:
+        meia_largura = ponto[metrica]['meia_largura']
+        if meia_largura <= alvo:
+            if anterior is None:
+                return float(ponto['sorteios']), 'limite'
+            x0, x1 = np.log(anterior['sorteios']), np.log(ponto['sorteios'])
+            y0, y1 = np.log(anterior[metrica]['meia_largura']), np.log(max(meia_largura, 1e-300))
+            return float(np.exp(x0 + (np.log(alvo) - y0) * (x1 - x0) / (y1 - y0))), 'medido'
+        anterior = ponto
+    return float(anterior['sorteios'] * (anterior[metrica]['meia_largura'] / alvo) ** 2), 'extrapolado'
+
+def convergencia(simulador: SimuladorSoja, tecnicas=tuple(TECNICAS),
+                 alvos: Optional[Dict[str, float]] = None,
+                 estrategia: TipoEstrategia = TipoEstrategia.ESTRATEGIA_COMBINADA,
+                 replicas: int = REPLICAS_PADRAO,
+                 sorteios_iniciais: int = SORTEIOS_INICIAIS,
+                 sorteios_maximos: int = SORTEIOS_MAXIMOS,
+                 semente: int = 0, progresso=None) -> Dict:
+    """Curvas de meia-largura por técnica e sorteios necessários para cada alvo
+
+    Dobra os sorteios por réplica até todas as métricas atingirem o alvo ou
+    chegar a `sorteios_maximos`; `sorteios` conta o total das réplicas e
+    `razao` compara com a técnica 'pseudo' (quando incluída).
+    """
+    alvos = {**ALVOS_PADRAO, **(alvos or {})}
+    resultados = {}
+    for tecnica in tecnicas:
+        curva = []
+        n = sorteios_iniciais
+        inicio = time.perf_counter()
+        while n <= sorteios_maximos:
+            ponto = {'sorteios_replica': n, 'sorteios': n * replicas,
+                     **estimar(simulador, tecnica, n, estrategia, replicas, semente=semente)}
+            curva.append(ponto)
+            if progresso:
+                progresso(tecnica, ponto)
+            if all(ponto[metrica]['meia_largura'] <= alvos[metrica] for metrica in METRICAS):
+                break
+            n *= 2
+        cruzamentos = {metrica: _sorteios_para_alvo(curva, metrica, alvos[metrica]) for metrica in METRICAS}
+        resultados[tecnica] = {
+            'curva': curva,
+            'segundos': time.perf_counter() - inicio,
+            'necessarios': {metrica: sorteios for metrica, (sorteios, _) in cruzamentos.items()},
+            'obtencao': {metrica: obtencao for metrica, (_, obtencao) in cruzamentos.items()}
+        }
+
+    if 'pseudo' in resultados:
+        base = resultados['pseudo']['necessarios']
+        for resultado in resultados.values():
+            resultado['razao'] = {metrica: base[metrica] / resultado['necessarios'][metrica]
+                                  for metrica in METRICAS}
+    return {'estrategia': estrategia.value, 'replicas': replicas, 'alvos': alvos, 'tecnicas': resultados}
+
+# Prefixo de cada forma de obtenção na tabela
+PREFIXOS = {'medido': '', 'limite': '<= ', 'extrapolado': '~'}
+
+def main(argumentos=None):
+    """Ponto de entrada de linha de comando"""
+    parser = argparse.ArgumentParser(description="Convergência das técnicas de Monte Carlo")
+    parser.add_argument('-t', '--tecnicas', default=','.join(TECNICAS),
+                        help="técnicas separadas por vírgula (padrão: todas)")
+    parser.add_argument('-e', '--estrategia', default=TipoEstrategia.ESTRATEGIA_COMBINADA.value,
+                        choices=[e.value for e in TipoEstrategia])
+    parser.add_argument('--alvo-media', type=float, default=ALVOS_PADRAO['media'],
+                        help="meia-largura do IC de 95%% da média, em BRL (padrão: %(default)s)")
+    parser.add_argument('--alvo-cvar', type=float, default=ALVOS_PADRAO['cvar'],
+                        help="meia-largura do IC de 95%% do CVaR, em BRL (padrão: %(default)s)")
+    parser.add_argument('-r', '--replicas', type=int, default=REPLICAS_PADRAO)
+    parser.add_argument('--maximo', type=int, default=SORTEIOS_MAXIMOS, help="sorteios máximos por réplica")
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('-o', '--saida', help="grava as curvas em JSON")
+    args = parser.parse_args(argumentos)
+
+    tecnicas = [nome.strip() for nome in args.tecnicas.split(',') if nome.strip()]
+    desconhecidas = set(tecnicas) - set(TECNICAS)
+    if desconhecidas:
+        parser.error(f"técnicas desconhecidas: {', '.join(sorted(desconhecidas))}")
+
+    simulador = SimuladorSoja()
+    simulador.definir_valor_alavanca('premio', 1.00)
+    simulador.definir_cenario_alavanca('tela', TipoCenario.BAIXA, 10.0)
+
+    def progresso(tecnica, ponto):
+        print(f"  {tecnica:<15} {ponto['sorteios']:>12,} sorteios: "
+              + "  ".join(f"{m} ±{ponto[m]['meia_largura']:.4f}" for m in METRICAS), flush=True)
+
+    resultado = convergencia(simulador, tecnicas, {'media': args.alvo_media, 'cvar': args.alvo_cvar},
+                             TipoEstrategia(args.estrategia), args.replicas,
+                             sorteios_maximos=args.maximo, semente=args.semente, progresso=progresso)
+
+    print(f"\nSorteios para IC de 95% com meia-largura de R$ {args.alvo_media} (média) "
+          f"e R$ {args.alvo_cvar} (CVaR), {resultado['estrategia']}:")
+    print(f"{'Técnica':<15} {'Média':>14} {'x pseudo':>9} {'CVaR':>14} {'x pseudo':>9} {'Tempo':>8}")
+    for tecnica, dados in resultado['tecnicas'].items():
+        linha = f"{tecnica:<15}"
+        for metrica in METRICAS:
+            sorteios = PREFIXOS[dados['obtencao'][metrica]] + format(round(dados['necessarios'][metrica]), ',')
+            razao = dados.get('razao', {}).get(metrica)
+            linha += f" {sorteios:>14} {(f'{razao:.1f}x' if razao else '-'):>9}"
+        print(linha + f" {dados['segundos']:>7.1f}s")
+    print("<= : atingido já no primeiro ponto; ~ : extrapolado pela taxa 1/sqrt(N)")
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultado, arquivo, indent=2)
+        print(f"\nCurvas gravadas em {args.saida}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark de memória e tempo de construção do ResultadoSimulacao
+Compara a representação compacta atual com o dataclass anterior
+(dois dicionários montados a cada simulação)
+"""
+
+import gc
+import timeit
+import tracemalloc
+from dataclasses import dataclass
+from typing import Dict
+
+from simulador_soja import (
+    MASCARA_ESTRATEGIA, ResultadoSimulacao, TipoEstrategia
+)
+
+@dataclass
+class ResultadoSimulacaoDataclass:
+    """Representação anterior do resultado, mantida para comparação"""
+    estrategia: TipoEstrategia
+    preco_final_brl: float
+    preco_final_usd: float
+    variacao_percentual: float
+    exposicao_risco: Dict[str, bool]
+    detalhes_calculo: Dict[str, float]
+
+ESTRATEGIA = TipoEstrategia.TRAVAR_DOLAR
+VALORES = (1.15, 16.8, 5.72, 17.95, 102.674, 5.2)
+
+def valores_resultado(i: float) -> tuple:
+    """Valores de um resultado (distintos por i para não compartilhar floats)"""
+    premio, tela, dolar, usd, brl, travado = VALORES
+    return (usd * travado + i, usd + i, i * 0.5,
+            premio + i, tela + i, dolar + i, usd + i, brl + i, travado)
+
+def construir_dataclass(brl, usd, variacao, premio, tela, dolar, base_usd, base_brl, travado):
+    """Constrói um resultado como o simulador fazia antes"""
+    return ResultadoSimulacaoDataclass(
+        estrategia=ESTRATEGIA,
+        preco_final_brl=brl,
+        preco_final_usd=usd,
+        variacao_percentual=variacao,
+        exposicao_risco={'premio': True, 'tela': True, 'dolar': False},
+        detalhes_calculo={
+            'premio_cenario': premio,
+            'tela_cenario': tela,
+            'dolar_cenario': dolar,
+            'preco_usd_base': base_usd,
+            'preco_brl_base': base_brl,
+            'dolar_travado': travado
+        }
+    )
+
+def construir_compacto(brl, usd, variacao, premio, tela, dolar, base_usd, base_brl, travado):
+    """Constrói um resultado como o simulador faz agora"""
+    return ResultadoSimulacao(
+        ESTRATEGIA, brl, usd, variacao,
+        MASCARA_ESTRATEGIA[ESTRATEGIA],
+        (premio, tela, dolar, base_usd, base_brl, travado)
+    )
+
+def medir_memoria(construtor, n: int) -> float:
+    """Bytes alocados por resultado mantido em memória
+
+    Os valores intermediários são descartados depois da construção, como no
+    simulador: conta-se apenas o que cada resultado mantém vivo.
+    """
+    gc.collect()
+    tracemalloc.start()
+    inicio = tracemalloc.get_traced_memory()[0]
+    valores = [valores_resultado(float(i)) for i in range(n)]
+    resultados = [construtor(*v) for v in valores]
+    del valores
+    usado = tracemalloc.get_traced_memory()[0] - inicio
+    tracemalloc.stop()
+    # Desconta a lista que guarda os resultados
+    usado -= 8 * len(resultados)
+    return usado / n
+
+# Expressões de construção medidas isoladamente, com os valores já calculados
+CONSTRUCAO_DATACLASS = (
+    "ResultadoSimulacaoDataclass(estrategia=ESTRATEGIA, preco_final_brl=brl, "
+    "preco_final_usd=usd, variacao_percentual=variacao, "
+    "exposicao_risco={'premio': True, 'tela': True, 'dolar': False}, "
+    "detalhes_calculo={'premio_cenario': premio, 'tela_cenario': tela, "
+    "'dolar_cenario': dolar, 'preco_usd_base': base_usd, "
+    "'preco_brl_base': base_brl, 'dolar_travado': travado})"
+)
+CONSTRUCAO_COMPACTO = (
+    "ResultadoSimulacao(ESTRATEGIA, brl, usd, variacao, mascara, "
+    "(premio, tela, dolar, base_usd, base_brl, travado))"
+)
+
+def medir_construcao(expressao: str, n: int) -> float:
+    """Tempo médio de construção em microssegundos"""
+    nomes = ('brl', 'usd', 'variacao', 'premio', 'tela', 'dolar', 'base_usd', 'base_brl', 'travado')
+    contexto = dict(globals(), mascara=MASCARA_ESTRATEGIA[ESTRATEGIA],
+                    **dict(zip(nomes, valores_resultado(1.0))))
+    tempo = min(timeit.repeat(expressao, globals=contexto, number=n, repeat=7))
+    return tempo / n * 1e6
+
+def main():
+    """Executa o benchmark e imprime a comparação"""
+    n = 100_000
+    linhas = []
+    for nome, construtor, expressao in (
+            ("dataclass anterior", construir_dataclass, CONSTRUCAO_DATACLASS),
+            ("compacto (slots)", construir_compacto, CONSTRUCAO_COMPACTO)):
+        linhas.append((nome, medir_memoria(construtor, n), medir_construcao(expressao, n)))
+
+    print(f"{'Representação':<20} {'Bytes/resultado':>16} {'Construção (µs)':>16}")
+    for nome, memoria, tempo in linhas:
+        print(f"{nome:<20} {memoria:>16.0f} {tempo:>16.3f}")
+
+    (_, memoria_antes, tempo_antes), (_, memoria_depois, tempo_depois) = linhas
+    print(f"\nRedução de memória: {memoria_antes / memoria_depois:.1f}x")
+    print(f"Redução do tempo de construção: {tempo_antes / tempo_depois:.1f}x")
+
+if __name__ == "__main__":
+    main()
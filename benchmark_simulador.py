@@ -0,0 +1,489 @@
+#!/usr/bin/env python3
+"""
+Suíte de benchmarks do Simulador de Soja
+Mede o núcleo escalar, os motores vetorizados e estocásticos e o caminho de
+renderização da interface Streamlit em vários tamanhos de entrada. Grava
+os tempos em JSON com nomes estáveis e compara duas execuções, apontando
+regressões acima de um limite
+"""
+
+import argparse
+import atexit
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from fnmatch import fnmatch
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from simulador_soja import (SimuladorSoja, TipoCenario, TipoEstrategia, analisar_sensibilidade,
+                            calcular_grade_hedge, calcular_lote, sensibilidades)
+
+VERSAO_FORMATO = 1
+
+# Tempo mínimo de cada repetição: chamadas rápidas são agrupadas até atingi-lo
+TEMPO_MINIMO_REPETICAO = 0.05
+REPETICOES_PADRAO = 5
+
+# Aumento (fração) acima do qual a comparação aponta regressão
+LIMITE_REGRESSAO = 0.10
+
+ESTRATEGIAS = list(TipoEstrategia)
+
+@dataclass
+class Benchmark:
+    """Um benchmark parametrizado por tamanho de entrada
+
+    `preparar(tamanho)` monta os dados fora da medição e devolve a função
+    (sem argumentos) cujo tempo é medido.
+    """
+    nome: str
+    parametro: str
+    tamanhos: Tuple[int, ...]
+    preparar: Callable[[int], Callable[[], object]]
+    grupo: str = 'nucleo'
+
+    def nome_completo(self, tamanho: int) -> str:
+        return f"{self.nome}[{self.parametro}={tamanho}]"
+
+def _simulador_configurado() -> SimuladorSoja:
+    simulador = SimuladorSoja(capacidade_historico=100_000)
+    simulador.definir_valor_alavanca('premio', 1.10)
+    simulador.definir_valor_alavanca('tela', 15.50)
+    simulador.definir_valor_alavanca('dolar', 5.30)
+    simulador.definir_cenario_alavanca('tela', TipoCenario.BAIXA, 8.0)
+    simulador.definir_cenario_alavanca('dolar', TipoCenario.ALTA, 5.0)
+    return simulador
+
+# Núcleo escalar: o tamanho é o número de chamadas, com as alavancas
+# mudando a cada uma (o cache de cenários é invalidado)
+
+def _simular_estrategia(n: int):
+    simulador = _simulador_configurado()
+    telas = [15.0 + (i % 100) * 0.01 for i in range(n)]
+
+    def executar():
+        for i, tela in enumerate(telas):
+            simulador.definir_valor_alavanca('tela', tela)
+            simulador.simular_estrategia(ESTRATEGIAS[i % len(ESTRATEGIAS)])
+    return executar
+
+def _comparar_estrategias(n: int):
+    simulador = _simulador_configurado()
+    telas = [15.0 + (i % 100) * 0.01 for i in range(n)]
+
+    def executar():
+        for tela in telas:
+            simulador.definir_valor_alavanca('tela', tela)
+            simulador.comparar_estrategias(ESTRATEGIAS)
+    return executar
+
+def _obter_resumo_alavancas(n: int):
+    simulador = _simulador_configurado()
+
+    def executar():
+        for _ in range(n):
+            simulador.obter_resumo_alavancas()
+    return executar
+
+def _arquivo_temporario() -> str:
+    descritor, caminho = tempfile.mkstemp(suffix='.json', prefix='benchmark_')
+    os.close(descritor)
+    atexit.register(os.remove, caminho)
+    return caminho
+
+def _exportar_configuracao(n: int):
+    simulador = _simulador_configurado()
+    caminho = _arquivo_temporario()
+
+    def executar():
+        for _ in range(n):
+            simulador.exportar_configuracao(caminho)
+    return executar
+
+def _importar_configuracao(n: int):
+    simulador = _simulador_configurado()
+    caminho = _arquivo_temporario()
+    simulador.exportar_configuracao(caminho)
+
+    def executar():
+        for _ in range(n):
+            simulador.importar_configuracao(caminho)
+    return executar
+
+# Motores vetorizados e estocásticos
+
+def _calcular_lote(n: int):
+    rng = np.random.default_rng(0)
+    valores = {'premio': rng.uniform(0, 2, n), 'tela': rng.uniform(12, 18, n),
+               'dolar': rng.uniform(4.8, 5.8, n)}
+    sinais = {nome: rng.integers(-1, 2, n) for nome in valores}
+    variacoes = {nome: rng.uniform(0, 20, n) for nome in valores}
+    return lambda: calcular_lote(valores, sinais, variacoes, ESTRATEGIAS)
+
+def _sensibilidades(n: int):
+    rng = np.random.default_rng(0)
+    valores = {'premio': rng.uniform(0, 2, n), 'tela': rng.uniform(12, 18, n),
+               'dolar': rng.uniform(4.8, 5.8, n)}
+    sinais = {nome: rng.integers(-1, 2, n) for nome in valores}
+    variacoes = {nome: rng.uniform(0, 20, n) for nome in valores}
+    return lambda: sensibilidades(valores, sinais, variacoes, ESTRATEGIAS)
+
+def _analisar_sensibilidade(n: int):
+    estado = _simulador_configurado().obter_estado()
+    variacoes = np.linspace(-20, 20, n)
+    return lambda: analisar_sensibilidade(estado, variacoes)
+
+def _calcular_grade_hedge(n: int):
+    estado = _simulador_configurado().obter_estado()
+    eixo = np.linspace(0, 1, n)
+    return lambda: calcular_grade_hedge(estado, eixo, eixo, eixo)
+
+def _mapa_dominancia(n: int):
+    simulador = _simulador_configurado()
+    return lambda: simulador.mapa_dominancia('tela', 'dolar', pontos=n)
+
+def _equilibrio(direcao):
+    def preparar(n: int):
+        from carteira_soja import carteira_exemplo
+        carteira = carteira_exemplo(n)
+        estado = _simulador_configurado().obter_estado()
+        return lambda: carteira.pontos_equilibrio(estado, direcao)
+    return preparar
+
+def _opcoes_grade(n: int):
+    # n strikes x n vencimentos x 100 cenários de tela numa só chamada
+    valores = {'premio': 1.0, 'tela': 15.0, 'dolar': 5.2}
+    sinais = {'premio': 0, 'tela': -1, 'dolar': 0}
+    variacoes = {'premio': 0.0, 'tela': np.linspace(0, 30, 100)[None, None, :], 'dolar': 0.0}
+    parametros = {'strike_put': np.linspace(0.8, 1.0, n)[:, None, None],
+                  'strike_dolar': np.linspace(0.9, 1.1, n)[:, None, None],
+                  'vencimento': np.linspace(1 / 12, 2, n)[None, :, None]}
+    estrategias = [TipoEstrategia.PUT_SOJA_CHICAGO, TipoEstrategia.COLAR_SOJA_CHICAGO,
+                   TipoEstrategia.PUT_DOLAR, TipoEstrategia.CALL_DOLAR]
+    return lambda: calcular_lote(valores, sinais, variacoes, estrategias, parametros)
+
+def _monte_carlo(n: int):
+    from monte_carlo_soja import MonteCarloSoja
+    motor = MonteCarloSoja(_simulador_configurado(), semente=2024)
+    return lambda: motor.gerar_precos(n)
+
+def _monte_carlo_sobol(n: int):
+    from monte_carlo_soja import MonteCarloSoja
+    motor = MonteCarloSoja(_simulador_configurado(), semente=2024, amostragem='sobol')
+    return lambda: motor.gerar_precos(n)
+
+def _monte_carlo_simular(n: int):
+    from monte_carlo_soja import MonteCarloSoja
+    motor = MonteCarloSoja(_simulador_configurado(), semente=2024)
+    return lambda: motor.simular(n)
+
+def _otimizador_hedge(n: int):
+    from monte_carlo_soja import MonteCarloSoja
+    from otimizador_hedge import OtimizadorHedge
+    motor = MonteCarloSoja(_simulador_configurado(), semente=2024)
+    return lambda: OtimizadorHedge(motor, n_cenarios=n).minimizar_variancia()
+
+def _carteira(n: int):
+    from carteira_soja import carteira_exemplo
+    carteira = carteira_exemplo(n)
+    estado = _simulador_configurado().obter_estado()
+    return lambda: carteira.avaliar(estado)
+
+def _backtest(n: int):
+    from backtest_soja import executar_backtest, gerar_series_sinteticas
+    series = gerar_series_sinteticas(anos=5)
+    horizontes = np.arange(1, n + 1)
+    return lambda: executar_backtest(series, horizontes)
+
+def _construir_superficie(n: int):
+    from superficie_alavancas import SuperficieAlavancas
+    return lambda: SuperficieAlavancas(pontos=n)
+
+def _superficie_resultados(n: int):
+    from superficie_alavancas import SuperficieAlavancas
+    superficie = SuperficieAlavancas()
+    simulador = _simulador_configurado()
+    estados = []
+    for i in range(n):
+        simulador.definir_valor_alavanca('tela', 15.0 + (i % 100) * 0.01)
+        estados.append(simulador.obter_estado())
+
+    def executar():
+        for estado in estados:
+            superficie.resultados(estado)
+    return executar
+
+def _superficie_avaliar(n: int):
+    from superficie_alavancas import SuperficieAlavancas
+    superficie = SuperficieAlavancas()
+    rng = np.random.default_rng(0)
+    valores = {'premio': rng.uniform(0, 2, n), 'tela': rng.uniform(12, 18, n),
+               'dolar': rng.uniform(4.8, 5.8, n)}
+    sinais = {nome: rng.integers(-1, 2, n) for nome in valores}
+    variacoes = {nome: rng.uniform(0, 20, n) for nome in valores}
+    return lambda: superficie.avaliar(valores, sinais, variacoes)
+
+# Caminho de renderização da interface (importa streamlit e plotly)
+
+def _importar_app():
+    import streamlit.config
+    import streamlit.logger
+    # Fora do `streamlit run` cada chamada avisa da falta de ScriptRunContext
+    streamlit.config.set_option('global.showWarningOnDirectExecution', False)
+    streamlit.logger.set_log_level('error')
+    import app_streamlit
+    return app_streamlit
+
+def _criar_grafico_comparacao(n: int):
+    app = _importar_app()
+    simulador = _simulador_configurado()
+    resultados = []
+    for i in range(n):
+        simulador.definir_valor_alavanca('tela', 15.0 + (i % 100) * 0.01)
+        resultados.append(simulador.simular_estrategia(ESTRATEGIAS[i % len(ESTRATEGIAS)], registrar=False))
+    return lambda: app.criar_grafico_comparacao(resultados)
+
+def _criar_grafico_sensibilidade(n: int):
+    app = _importar_app()
+    simulador = _simulador_configurado()
+    estados = []
+    for i in range(n):
+        simulador.definir_valor_alavanca('tela', 15.0 + i * 0.01)
+        estados.append(simulador.obter_estado())
+
+    def executar():
+        for estado in estados:
+            app.criar_grafico_sensibilidade(estado)
+    return executar
+
+def _execucao_app(n: int):
+    _importar_app()
+    from streamlit.testing.v1 import AppTest
+    caminho = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app_streamlit.py')
+    teste = AppTest.from_file(caminho, default_timeout=120)
+    # A primeira execução importa as dependências e preenche os caches
+    teste.run()
+
+    def executar():
+        for _ in range(n):
+            teste.run()
+    return executar
+
+BENCHMARKS = [
+    Benchmark('simulador.simular_estrategia', 'chamadas', (1, 100, 10_000), _simular_estrategia),
+    Benchmark('simulador.comparar_estrategias', 'chamadas', (1, 100, 1_000), _comparar_estrategias),
+    Benchmark('simulador.obter_resumo_alavancas', 'chamadas', (1, 100, 10_000), _obter_resumo_alavancas),
+    Benchmark('simulador.exportar_configuracao', 'chamadas', (1, 100), _exportar_configuracao),
+    Benchmark('simulador.importar_configuracao', 'chamadas', (1, 100), _importar_configuracao),
+    Benchmark('lote.calcular_lote', 'linhas', (1_000, 100_000, 1_000_000), _calcular_lote, 'motores'),
+    Benchmark('lote.sensibilidades', 'linhas', (1_000, 100_000, 1_000_000), _sensibilidades, 'motores'),
+    Benchmark('lote.analisar_sensibilidade', 'variacoes', (9, 101, 1_001), _analisar_sensibilidade,
+              'motores'),
+    Benchmark('lote.calcular_grade_hedge', 'pontos_eixo', (11, 51, 101), _calcular_grade_hedge, 'motores'),
+    Benchmark('lote.mapa_dominancia', 'pontos_eixo', (100, 1_000), _mapa_dominancia, 'motores'),
+    Benchmark('equilibrio.analitico', 'lotes', (1_000, 100_000), _equilibrio('dolar'), 'motores'),
+    Benchmark('equilibrio.intervalo', 'lotes', (1_000, 10_000), _equilibrio({'tela': 1.0, 'dolar': 1.0}),
+              'motores'),
+    Benchmark('opcoes.grade', 'pontos_eixo', (10, 50, 100), _opcoes_grade, 'motores'),
+    Benchmark('monte_carlo.gerar_precos', 'cenarios', (10_000, 100_000, 1_000_000), _monte_carlo,
+              'motores'),
+    Benchmark('monte_carlo.simular', 'cenarios', (100_000, 1_000_000), _monte_carlo_simular, 'motores'),
+    Benchmark('monte_carlo.sobol', 'cenarios', (10_000, 100_000, 1_000_000), _monte_carlo_sobol,
+              'motores'),
+    Benchmark('otimizador.minimizar_variancia', 'cenarios', (10_000, 100_000), _otimizador_hedge,
+              'motores'),
+    Benchmark('carteira.avaliar', 'lotes', (1_000, 10_000, 100_000), _carteira, 'motores'),
+    Benchmark('backtest.executar_backtest', 'horizontes', (21, 63, 252), _backtest, 'motores'),
+    Benchmark('superficie.construir', 'pontos', (3, 5, 7), _construir_superficie, 'motores'),
+    Benchmark('superficie.resultados', 'chamadas', (1, 100, 1_000), _superficie_resultados, 'motores'),
+    Benchmark('superficie.avaliar', 'linhas', (1_000, 100_000), _superficie_avaliar, 'motores'),
+    Benchmark('app.criar_grafico_comparacao', 'resultados', (5, 50, 500), _criar_grafico_comparacao, 'app'),
+    Benchmark('app.criar_grafico_sensibilidade', 'estados', (1, 10), _criar_grafico_sensibilidade, 'app'),
+    Benchmark('app.execucao', 'reexecucoes', (1,), _execucao_app, 'app')
+]
+
+def medir(funcao: Callable[[], object], repeticoes: int = REPETICOES_PADRAO,
+          tempo_minimo: float = TEMPO_MINIMO_REPETICAO) -> Dict:
+    """Tempo por chamada: mínimo, mediana, média e desvio entre repetições
+
+    Após uma chamada de aquecimento, o número de chamadas por repetição
+    dobra até a repetição durar ao menos `tempo_minimo`.
+    """
+    funcao()
+    numero = 1
+    while True:
+        inicio = time.perf_counter()
+        for _ in range(numero):
+            funcao()
+        duracao = time.perf_counter() - inicio
+        if duracao >= tempo_minimo:
+            break
+        numero *= 2
+
+    tempos = [duracao / numero]
+    for _ in range(repeticoes - 1):
+        inicio = time.perf_counter()
+        for _ in range(numero):
+            funcao()
+        tempos.append((time.perf_counter() - inicio) / numero)
+    return {
+        'minimo_s': min(tempos),
+        'mediana_s': statistics.median(tempos),
+        'media_s': statistics.fmean(tempos),
+        'desvio_s': statistics.stdev(tempos) if len(tempos) > 1 else 0.0,
+        'repeticoes': repeticoes,
+        'chamadas_por_repeticao': numero
+    }
+
+def selecionar(filtros: Optional[Sequence[str]] = None, grupos: Optional[Sequence[str]] = None,
+               rapido: bool = False) -> List[Tuple[Benchmark, int]]:
+    """Pares (benchmark, tamanho) cujo nome completo casa com algum filtro
+
+    Os filtros usam curingas de shell (`lote.*`, `*[linhas=1000]`). Com
+    `rapido`, só o menor tamanho de cada benchmark.
+    """
+    selecionados = []
+    for benchmark in BENCHMARKS:
+        if grupos and benchmark.grupo not in grupos:
+            continue
+        tamanhos = benchmark.tamanhos[:1] if rapido else benchmark.tamanhos
+        for tamanho in tamanhos:
+            nome = benchmark.nome_completo(tamanho)
+            if not filtros or any(fnmatch(nome, filtro) or fnmatch(benchmark.nome, filtro)
+                                  for filtro in filtros):
+                selecionados.append((benchmark, tamanho))
+    return selecionados
+
+def _commit_atual() -> Optional[str]:
+    try:
+        processo = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                  text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    except OSError:
+        return None
+    return processo.stdout.strip() or None
+
+def executar_benchmarks(selecionados: List[Tuple[Benchmark, int]],
+                        repeticoes: int = REPETICOES_PADRAO,
+                        tempo_minimo: float = TEMPO_MINIMO_REPETICAO,
+                        progresso: Optional[Callable[[str, Dict], None]] = None) -> Dict:
+    """Executa os benchmarks e monta o documento JSON da execução"""
+    resultados = {}
+    for benchmark, tamanho in selecionados:
+        medicao = medir(benchmark.preparar(tamanho), repeticoes, tempo_minimo)
+        medicao.update({'grupo': benchmark.grupo, 'parametro': benchmark.parametro, 'tamanho': tamanho})
+        nome = benchmark.nome_completo(tamanho)
+        resultados[nome] = medicao
+        if progresso is not None:
+            progresso(nome, medicao)
+    return {
+        'versao': VERSAO_FORMATO,
+        'data': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': _commit_atual(),
+        'ambiente': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'plataforma': platform.platform(),
+            'processadores': os.cpu_count()
+        },
+        'resultados': resultados
+    }
+
+def comparar_execucoes(base: Dict, nova: Dict, limite: float = LIMITE_REGRESSAO,
+                       metrica: str = 'mediana_s') -> List[Dict]:
+    """Compara os benchmarks presentes nas duas execuções
+
+    `situacao` é 'regressao' se o tempo subiu mais que `limite` (fração),
+    'melhora' se caiu mais que isso e 'estavel' caso contrário.
+    """
+    comparacoes = []
+    for nome in sorted(set(base['resultados']) & set(nova['resultados'])):
+        antes = base['resultados'][nome][metrica]
+        depois = nova['resultados'][nome][metrica]
+        razao = depois / antes if antes > 0 else float('inf')
+        if razao > 1 + limite:
+            situacao = 'regressao'
+        elif razao < 1 / (1 + limite):
+            situacao = 'melhora'
+        else:
+            situacao = 'estavel'
+        comparacoes.append({'nome': nome, 'antes_s': antes, 'depois_s': depois,
+                            'razao': razao, 'situacao': situacao})
+    return comparacoes
+
+def formatar_tempo(segundos: float) -> str:
+    for unidade, escala in (('s', 1.0), ('ms', 1e-3), ('µs', 1e-6)):
+        if segundos >= escala:
+            return f"{segundos / escala:.3g} {unidade}"
+    return f"{segundos / 1e-9:.3g} ns"
+
+def _imprimir_medicao(nome: str, medicao: Dict):
+    print(f"{nome:<55} {formatar_tempo(medicao['mediana_s']):>10} "
+          f"(mín {formatar_tempo(medicao['minimo_s'])}, ±{formatar_tempo(medicao['desvio_s'])})")
+
+def main(argumentos=None) -> int:
+    """Ponto de entrada; retorna o código de saída (1 se houver regressão)"""
+    parser = argparse.ArgumentParser(description="Benchmarks do simulador de soja")
+    comandos = parser.add_subparsers(dest='comando', required=True)
+
+    executar = comandos.add_parser('executar', help="executa os benchmarks e grava o JSON")
+    executar.add_argument('-o', '--saida', help="arquivo JSON de resultados")
+    executar.add_argument('-k', '--filtro', action='append',
+                          help="curinga sobre o nome (pode repetir), ex.: 'lote.*'")
+    executar.add_argument('-g', '--grupo', action='append', choices=('nucleo', 'motores', 'app'))
+    executar.add_argument('-r', '--repeticoes', type=int, default=REPETICOES_PADRAO)
+    executar.add_argument('--tempo-minimo', type=float, default=TEMPO_MINIMO_REPETICAO,
+                          help="duração mínima de cada repetição (s)")
+    executar.add_argument('--rapido', action='store_true', help="só o menor tamanho de cada benchmark")
+    executar.add_argument('--listar', action='store_true', help="lista os nomes sem executar")
+
+    comparar = comandos.add_parser('comparar', help="compara duas execuções")
+    comparar.add_argument('base')
+    comparar.add_argument('nova')
+    comparar.add_argument('--limite', type=float, default=LIMITE_REGRESSAO * 100,
+                          help="aumento percentual tratado como regressão (padrão: %(default)s)")
+    comparar.add_argument('--metrica', choices=('mediana_s', 'minimo_s', 'media_s'), default='mediana_s')
+
+    args = parser.parse_args(argumentos)
+
+    if args.comando == 'executar':
+        selecionados = selecionar(args.filtro, args.grupo, args.rapido)
+        if args.listar:
+            for benchmark, tamanho in selecionados:
+                print(benchmark.nome_completo(tamanho))
+            return 0
+        documento = executar_benchmarks(selecionados, args.repeticoes, args.tempo_minimo,
+                                        _imprimir_medicao)
+        if args.saida:
+            with open(args.saida, 'w') as f:
+                json.dump(documento, f, indent=2, ensure_ascii=False)
+            print(f"\n{len(documento['resultados'])} resultados gravados em {args.saida}")
+        return 0
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.nova) as f:
+        nova = json.load(f)
+    comparacoes = comparar_execucoes(base, nova, args.limite / 100, args.metrica)
+    marcas = {'regressao': 'REGRESSÃO', 'melhora': 'melhora', 'estavel': ''}
+    print(f"{'Benchmark':<55} {'Antes':>10} {'Depois':>10} {'Razão':>7}")
+    for c in comparacoes:
+        print(f"{c['nome']:<55} {formatar_tempo(c['antes_s']):>10} {formatar_tempo(c['depois_s']):>10} "
+              f"{c['razao']:>6.2f}x {marcas[c['situacao']]}")
+    ausentes = set(base['resultados']) ^ set(nova['resultados'])
+    if ausentes:
+        print(f"\n{len(ausentes)} benchmarks presentes em só uma das execuções (ignorados)")
+    regressoes = [c for c in comparacoes if c['situacao'] == 'regressao']
+    print(f"\n{len(regressoes)} regressões acima de {args.limite:g}%")
+    return 1 if regressoes else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
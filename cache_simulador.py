@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Cache LRU com limite de memória para resultados do Simulador de Soja
+Usado pela interface Streamlit para memoizar resultados e gráficos por
+impressão digital das alavancas
+"""
+
+import sys
+import threading
+import types
+from collections import OrderedDict
+from enum import Enum
+from itertools import islice
+from typing import Any, Callable, Dict, Hashable, Optional, Set
+
+# Profundidade e itens por contêiner percorridos ao estimar tamanhos
+PROFUNDIDADE_ESTIMATIVA = 4
+AMOSTRA_ESTIMATIVA = 64
+
+# Objetos referenciados por valores em cache, mas que não pertencem a eles
+COMPARTILHADOS = (type, Enum, types.ModuleType, types.FunctionType, types.BuiltinFunctionType)
+
+def estimar_tamanho(valor: Any, profundidade: int = PROFUNDIDADE_ESTIMATIVA,
+                    vistos: Optional[Set[int]] = None) -> int:
+    """Estima os bytes ocupados por um valor sem serializá-lo
+
+    Arrays usam `nbytes` e DataFrames/Series `memory_usage(deep=False)`;
+    listas, tuplas, dicionários e atributos de objetos (figuras Plotly,
+    dataclasses) são percorridos até `profundidade` níveis, somando os
+    `AMOSTRA_ESTIMATIVA` primeiros itens e extrapolando para o restante.
+    Os demais objetos contam apenas `sys.getsizeof`; classes, membros de
+    Enum, módulos e funções são compartilhados e não contam.
+    """
+    if vistos is None:
+        vistos = set()
+    if id(valor) in vistos or isinstance(valor, COMPARTILHADOS):
+        return 0
+    vistos.add(id(valor))
+
+    nbytes = getattr(valor, 'nbytes', None)
+    if isinstance(nbytes, int):
+        return nbytes
+    memoria = getattr(valor, 'memory_usage', None)
+    if callable(memoria):
+        try:
+            total = memoria(deep=False)
+            return int(total.sum() if hasattr(total, 'sum') else total)
+        except TypeError:
+            pass
+
+    tamanho = sys.getsizeof(valor)
+    if profundidade == 0 or isinstance(valor, (str, bytes, int, float)):
+        return tamanho
+    if isinstance(valor, dict):
+        itens = valor.values()
+    elif isinstance(valor, (list, tuple, set, frozenset)):
+        itens = valor
+    elif hasattr(valor, '__dict__'):
+        itens = vars(valor).values()
+    elif hasattr(valor, '__slots__'):
+        itens = [getattr(valor, nome) for nome in valor.__slots__ if hasattr(valor, nome)]
+    else:
+        return tamanho
+
+    amostra = [estimar_tamanho(item, profundidade - 1, vistos) for item in islice(itens, AMOSTRA_ESTIMATIVA)]
+    if amostra:
+        tamanho += sum(amostra) * len(itens) // len(amostra)
+    return tamanho
+
+class CacheLRU:
+    """Cache LRU limitado por número de entradas e por memória estimada
+
+    Seguro para uso por várias sessões (threads) ao mesmo tempo. Valores
+    maiores que o limite de memória não são guardados.
+    """
+
+    def __init__(self, max_entradas: int = 256, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self._entradas: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._trava = threading.Lock()
+        self.bytes_usados = 0
+        self.acertos = 0
+        self.falhas = 0
+        self.remocoes = 0
+
+    def obter(self, chave: Hashable, calcular: Callable[[], Any]) -> Any:
+        """Retorna o valor da chave, calculando e guardando em caso de falha"""
+        with self._trava:
+            if chave in self._entradas:
+                self._entradas.move_to_end(chave)
+                self.acertos += 1
+                return self._entradas[chave][0]
+            self.falhas += 1
+
+        # O cálculo fica fora da trava para não bloquear outras sessões
+        valor = calcular()
+        tamanho = estimar_tamanho(valor)
+        if tamanho > self.max_bytes:
+            return valor
+
+        with self._trava:
+            if chave in self._entradas:
+                self.bytes_usados -= self._entradas[chave][1]
+            self._entradas[chave] = (valor, tamanho)
+            self._entradas.move_to_end(chave)
+            self.bytes_usados += tamanho
+            while (len(self._entradas) > self.max_entradas
+                   or self.bytes_usados > self.max_bytes):
+                _, (_, tamanho_removido) = self._entradas.popitem(last=False)
+                self.bytes_usados -= tamanho_removido
+                self.remocoes += 1
+        return valor
+
+    def limpar(self):
+        """Remove todas as entradas (os contadores são mantidos)"""
+        with self._trava:
+            self._entradas.clear()
+            self.bytes_usados = 0
+
+    def __len__(self) -> int:
+        return len(self._entradas)
+
+    def estatisticas(self) -> Dict[str, float]:
+        """Contadores e taxa de acerto do cache"""
+        consultas = self.acertos + self.falhas
+        return {
+            'entradas': len(self._entradas),
+            'bytes_usados': self.bytes_usados,
+            'acertos': self.acertos,
+            'falhas': self.falhas,
+            'remocoes': self.remocoes,
+            'taxa_acerto': self.acertos / consultas if consultas else 0.0
+        }
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+Carteira de lotes físicos para o Simulador de Estratégia para Soja
+Guarda dezenas de milhares de lotes em colunas numpy e avalia a carteira
+inteira sob o cenário atual e sob cada estratégia em uma única passada
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from pontos_equilibrio import ResultadoEquilibrio, calcular_equilibrios
+from simulador_soja import (
+    BIT_EXPOSICAO, NOMES_ALAVANCAS, EstadoAlavancas, ResultadoDerivadas, SimuladorSoja, TipoCenario,
+    TipoEstrategia, calcular_lote, fator_cenario, sensibilidades
+)
+
+# Massa de um bushel de soja (kg)
+KG_POR_BUSHEL = 27.2155
+
+# Massa de cada unidade de volume aceita (kg)
+KG_POR_UNIDADE = {
+    'bushel': KG_POR_BUSHEL,
+    'saca': 60.0,
+    'tonelada': 1000.0
+}
+
+UNIDADES = tuple(KG_POR_UNIDADE)
+
+# Bushels por unidade, indexado pelo código da unidade
+BUSHELS_POR_UNIDADE = np.array([KG_POR_UNIDADE[u] / KG_POR_BUSHEL for u in UNIDADES])
+
+def converter_volume(volume, de: str, para: str):
+    """Converte volumes entre bushel, saca e tonelada"""
+    return volume * (KG_POR_UNIDADE[de] / KG_POR_UNIDADE[para])
+
+def codificar_meses(meses) -> np.ndarray:
+    """Converte meses de entrega (AAAAMM ou 'AAAA-MM') para inteiros AAAAMM"""
+    meses = np.atleast_1d(np.asarray(meses))
+    if meses.dtype.kind in 'UO':
+        meses = np.char.replace(meses.astype(str), '-', '')
+    meses = meses.astype(np.int32)
+    mes = meses % 100
+    if np.any((mes < 1) | (mes > 12)):
+        raise ValueError("Mês de entrega deve estar no formato AAAAMM ou 'AAAA-MM'")
+    return meses
+
+def mascara_travamento(premio=False, tela=False, dolar=False) -> np.ndarray:
+    """Máscara de alavancas travadas (mesmos bits de BIT_EXPOSICAO)"""
+    return (np.asarray(premio, dtype=np.uint8) * BIT_EXPOSICAO['premio']
+            | np.asarray(tela, dtype=np.uint8) * BIT_EXPOSICAO['tela']
+            | np.asarray(dolar, dtype=np.uint8) * BIT_EXPOSICAO['dolar'])
+
+@dataclass
+class ResultadoCarteira:
+    """Valor da carteira por lote em BRL
+
+    `valor_brl` tem forma (estratégias, lotes) e aplica cada estratégia a
+    todos os lotes; `valor_situacao_brl` respeita o travamento de cada lote.
+    """
+    estrategias: List[TipoEstrategia]
+    valor_atual_brl: np.ndarray
+    valor_situacao_brl: np.ndarray
+    valor_brl: np.ndarray
+    meses: np.ndarray
+    codigos_contraparte: np.ndarray
+    contrapartes: List[str]
+
+    def total(self) -> Dict[str, float]:
+        """Valor total da carteira na situação atual e por estratégia"""
+        totais = {'atual': float(self.valor_atual_brl.sum()),
+                  'situacao': float(self.valor_situacao_brl.sum())}
+        for estrategia, soma in zip(self.estrategias, self.valor_brl.sum(axis=1)):
+            totais[estrategia.value] = float(soma)
+        return totais
+
+    def agrupar(self, por: str = 'mes') -> Tuple[list, Dict[str, np.ndarray]]:
+        """Soma os valores por 'mes' ou 'contraparte' com bincount
+
+        Retorna (rótulos, colunas); cada coluna tem um valor por rótulo, e as
+        estratégias ficam na coluna de mesmo nome.
+        """
+        if por == 'mes':
+            rotulos, codigos = np.unique(self.meses, return_inverse=True)
+            rotulos = rotulos.tolist()
+        elif por == 'contraparte':
+            codigos = self.codigos_contraparte
+            rotulos = list(self.contrapartes)
+        else:
+            raise ValueError(f"Agrupamento desconhecido: {por}")
+
+        n_grupos = len(rotulos)
+        colunas = {
+            'atual': np.bincount(codigos, weights=self.valor_atual_brl, minlength=n_grupos),
+            'situacao': np.bincount(codigos, weights=self.valor_situacao_brl, minlength=n_grupos)
+        }
+        # Todas as estratégias em um único bincount, deslocando os códigos
+        deslocados = (codigos + n_grupos * np.arange(len(self.estrategias))[:, None]).ravel()
+        somas = np.bincount(deslocados, weights=self.valor_brl.ravel(),
+                            minlength=n_grupos * len(self.estrategias))
+        for estrategia, soma in zip(self.estrategias, somas.reshape(len(self.estrategias), n_grupos)):
+            colunas[estrategia.value] = soma
+        return rotulos, colunas
+
+def _coluna(nome: str, descricao: str) -> property:
+    """Propriedade com a visão da coluna restrita aos lotes incluídos"""
+    return property(lambda self: self._colunas[nome][:self._n], doc=descricao)
+
+class CarteiraSoja:
+    """Lotes físicos de soja armazenados em colunas
+
+    Cada lote tem volume e unidade, mês de entrega, contraparte, prêmio
+    contratado (NaN usa o prêmio de mercado) e máscara de alavancas travadas.
+    O volume em bushels é calculado na inclusão, já que os preços do
+    simulador são por bushel.
+    """
+
+    def __init__(self, capacidade: int = 1024):
+        self._n = 0
+        self._contrapartes: Dict[str, int] = {}
+        self._colunas = {
+            'volume': np.empty(capacidade),
+            'unidade': np.empty(capacidade, dtype=np.int8),
+            'volume_bushels': np.empty(capacidade),
+            'mes_entrega': np.empty(capacidade, dtype=np.int32),
+            'contraparte': np.empty(capacidade, dtype=np.int32),
+            'premio_contratado': np.empty(capacidade),
+            'travado': np.empty(capacidade, dtype=np.uint8)
+        }
+
+    volume = _coluna('volume', "Volume na unidade original do lote")
+    unidade = _coluna('unidade', "Código da unidade (índice em UNIDADES)")
+    volume_bushels = _coluna('volume_bushels', "Volume convertido para bushels")
+    mes_entrega = _coluna('mes_entrega', "Mês de entrega (AAAAMM)")
+    contraparte = _coluna('contraparte', "Código da contraparte (índice em contrapartes)")
+    premio_contratado = _coluna('premio_contratado', "Prêmio contratado (NaN usa o de mercado)")
+    travado = _coluna('travado', "Máscara de alavancas travadas")
+
+    def __len__(self) -> int:
+        return self._n
+
+    @property
+    def contrapartes(self) -> List[str]:
+        """Nomes das contrapartes, na ordem dos códigos"""
+        return list(self._contrapartes)
+
+    def _codificar_contrapartes(self, contrapartes) -> np.ndarray:
+        """Código inteiro de cada contraparte, registrando as novas"""
+        nomes, inversos = np.unique(np.atleast_1d(np.asarray(contrapartes, dtype=str)),
+                                    return_inverse=True)
+        codigos = np.array([self._contrapartes.setdefault(str(nome), len(self._contrapartes))
+                            for nome in nomes], dtype=np.int32)
+        return codigos[inversos]
+
+    def _reservar(self, n_novos: int):
+        """Dobra a capacidade das colunas quando necessário"""
+        capacidade = len(self._colunas['volume'])
+        if self._n + n_novos <= capacidade:
+            return
+        nova = max(2 * capacidade, self._n + n_novos)
+        for nome, coluna in self._colunas.items():
+            maior = np.empty(nova, dtype=coluna.dtype)
+            maior[:self._n] = coluna[:self._n]
+            self._colunas[nome] = maior
+
+    def adicionar_lotes(self, volume, unidade, mes_entrega, contraparte,
+                        premio_contratado=np.nan, travado=0) -> np.ndarray:
+        """Inclui lotes (escalares ou arrays, combinados por broadcasting)
+
+        `unidade` é 'bushel', 'saca' ou 'tonelada'; `travado` é a máscara de
+        alavancas travadas (ver `mascara_travamento`). Retorna os índices dos
+        novos lotes.
+        """
+        volume = np.atleast_1d(np.asarray(volume, dtype=np.float64))
+        if np.any(volume < 0):
+            raise ValueError("Volume não pode ser negativo")
+
+        nomes_unidade, inversos = np.unique(np.atleast_1d(np.asarray(unidade, dtype=str)),
+                                            return_inverse=True)
+        desconhecidas = set(nomes_unidade.tolist()) - set(UNIDADES)
+        if desconhecidas:
+            raise ValueError(f"Unidade desconhecida: {', '.join(sorted(desconhecidas))}")
+        codigos_unidade = np.array([UNIDADES.index(u) for u in nomes_unidade], dtype=np.int8)[inversos]
+
+        colunas = np.broadcast_arrays(
+            volume, codigos_unidade, codificar_meses(mes_entrega),
+            self._codificar_contrapartes(contraparte),
+            np.atleast_1d(np.asarray(premio_contratado, dtype=np.float64)),
+            np.atleast_1d(np.asarray(travado, dtype=np.uint8))
+        )
+        n_novos = len(colunas[0])
+        self._reservar(n_novos)
+
+        fatia = slice(self._n, self._n + n_novos)
+        nomes = ('volume', 'unidade', 'mes_entrega', 'contraparte', 'premio_contratado', 'travado')
+        for nome, valores in zip(nomes, colunas):
+            self._colunas[nome][fatia] = valores
+        self._colunas['volume_bushels'][fatia] = colunas[0] * BUSHELS_POR_UNIDADE[colunas[1]]
+        self._n += n_novos
+        return np.arange(fatia.start, fatia.stop)
+
+    def volume_total(self, unidade: str = 'saca') -> float:
+        """Volume total da carteira na unidade pedida"""
+        return converter_volume(float(self.volume_bushels.sum()), 'bushel', unidade)
+
+    def _entradas(self, estado: EstadoAlavancas) -> Tuple[Dict, Dict, Dict, np.ndarray]:
+        """Valores, sinais e variações por lote, mais a máscara efetiva de travamento
+
+        O prêmio contratado conta como prêmio travado (`mascara_travamento`):
+        o lote usa o contratado e o cenário do prêmio não o move, em nenhuma
+        avaliação. Sem contrato nem trava, vale o prêmio de mercado.
+        """
+        contratado = ~np.isnan(self.premio_contratado)
+        travado = self.travado | mascara_travamento(premio=contratado)
+        premio_fixo = (travado & BIT_EXPOSICAO['premio']) != 0
+
+        valores = estado.valores()
+        valores['premio'] = np.where(contratado, self.premio_contratado, valores['premio'])
+        sinais = estado.sinais()
+        sinais['premio'] = np.where(premio_fixo, 0, sinais['premio'])
+        return valores, sinais, estado.variacoes(), travado
+
+    def avaliar(self, estado: EstadoAlavancas,
+                estrategias: Optional[List[TipoEstrategia]] = None,
+                razoes_hedge: Optional[Dict[str, np.ndarray]] = None) -> ResultadoCarteira:
+        """Avalia todos os lotes sob o cenário das alavancas em uma passada
+
+        O prêmio de cada lote é o contratado, ou o de mercado quando NaN. A
+        situação atual aplica o cenário apenas às alavancas não travadas do
+        lote; cada estratégia é aplicada a todos os lotes via `calcular_lote`,
+        sem choque no prêmio dos lotes em que ele já está fixo (ver `_entradas`).
+        """
+        if estrategias is None:
+            estrategias = list(TipoEstrategia)
+
+        valores, sinais, variacoes, travado = self._entradas(estado)
+        premio = valores['premio']
+
+        # Situação atual: cenário só nas alavancas não travadas do lote
+        finais = {}
+        for nome in NOMES_ALAVANCAS:
+            fator = fator_cenario(sinais[nome], variacoes[nome])
+            livre = (travado & BIT_EXPOSICAO[nome]) == 0
+            finais[nome] = valores[nome] * np.where(livre, fator, 1.0)
+        preco_situacao = (finais['tela'] + finais['premio']) * finais['dolar']
+        preco_atual = (valores['tela'] + premio) * valores['dolar']
+
+        lote = calcular_lote(valores, sinais, variacoes, estrategias, razoes_hedge)
+        bushels = self.volume_bushels
+
+        return ResultadoCarteira(
+            estrategias=list(estrategias),
+            valor_atual_brl=preco_atual * bushels,
+            valor_situacao_brl=preco_situacao * bushels,
+            valor_brl=lote.preco_final_brl * bushels,
+            meses=self.mes_entrega,
+            codigos_contraparte=self.contraparte,
+            contrapartes=self.contrapartes
+        )
+
+    def sensibilidades(self, estado: EstadoAlavancas,
+                       estrategias: Optional[List[TipoEstrategia]] = None,
+                       razoes_hedge: Optional[Dict[str, np.ndarray]] = None) -> ResultadoDerivadas:
+        """Deltas e gamas analíticos de cada lote (BRL por unidade da alavanca)
+
+        Já multiplicados pelo volume em bushels de cada lote, com o prêmio
+        contratado como em `avaliar`; `delta.sum(axis=-1)` dá o delta da
+        carteira inteira sob cada estratégia. Onde o prêmio está fixo, as
+        derivadas em relação a ele são nulas.
+        """
+        valores, sinais, variacoes, travado = self._entradas(estado)
+        derivadas = sensibilidades(valores, sinais, variacoes, estrategias, razoes_hedge)
+        premio_livre = (travado & BIT_EXPOSICAO['premio']) == 0
+        indice = derivadas.alavancas.index('premio')
+        derivadas.delta[:, indice] *= premio_livre
+        derivadas.gama[:, indice] *= premio_livre
+        derivadas.gama[:, :, indice] *= premio_livre
+        derivadas.delta *= self.volume_bushels
+        derivadas.gama *= self.volume_bushels
+        return derivadas
+
+    def pontos_equilibrio(self, estado: EstadoAlavancas, alavanca='dolar',
+                          estrategias: Optional[List[TipoEstrategia]] = None,
+                          razoes_hedge: Optional[Dict[str, np.ndarray]] = None,
+                          faixa: Optional[Tuple[float, float]] = None) -> ResultadoEquilibrio:
+        """Pontos de equilíbrio entre as estratégias para cada lote
+
+        O volume não altera o ponto (é um fator comum), mas o prêmio
+        contratado muda o preço travado de cada lote; ver
+        `calcular_equilibrios`.
+        """
+        valores, sinais, variacoes, _ = self._entradas(estado)
+        return calcular_equilibrios(valores, sinais, variacoes, alavanca, estrategias, razoes_hedge, faixa)
+
+def carteira_exemplo(n_lotes: int = 50_000, semente: int = 0) -> CarteiraSoja:
+    """Carteira sintética para demonstrações e benchmarks"""
+    rng = np.random.default_rng(semente)
+    carteira = CarteiraSoja(n_lotes)
+    meses = np.array([202601, 202603, 202605, 202607, 202609, 202611])
+    contrapartes = np.array(['Cargill', 'Bunge', 'ADM', 'Louis Dreyfus', 'COFCO', 'Amaggi'])
+    toneladas = rng.uniform(10, 300, n_lotes).round()
+    em_sacas = rng.random(n_lotes) < 0.5
+    carteira.adicionar_lotes(
+        volume=np.where(em_sacas, converter_volume(toneladas, 'tonelada', 'saca'), toneladas),
+        unidade=np.where(em_sacas, 'saca', 'tonelada'),
+        mes_entrega=meses[rng.integers(0, len(meses), n_lotes)],
+        contraparte=contrapartes[rng.integers(0, len(contrapartes), n_lotes)],
+        premio_contratado=np.where(rng.random(n_lotes) < 0.5, rng.uniform(0.5, 1.5, n_lotes), np.nan),
+        travado=rng.integers(0, 8, n_lotes)
+    )
+    return carteira
+
+def main():
+    """Demonstração da avaliação de uma carteira de 50 mil lotes"""
+    simulador = SimuladorSoja()
+    simulador.definir_valor_alavanca('premio', 1.00)
+    simulador.definir_cenario_alavanca('tela', TipoCenario.BAIXA, 10.0)
+    simulador.definir_cenario_alavanca('dolar', TipoCenario.ALTA, 5.0)
+
+    carteira = carteira_exemplo()
+    estado = simulador.obter_estado()
+
+    inicio = time.perf_counter()
+    resultado = carteira.avaliar(estado)
+    duracao = time.perf_counter() - inicio
+
+    print(f"Carteira: {len(carteira):,} lotes, {carteira.volume_total('tonelada'):,.0f} t")
+    print(f"Avaliação completa em {duracao * 1000:.1f} ms\n")
+    for nome, valor in resultado.total().items():
+        print(f"  {nome:<22} R$ {valor:>18,.2f}")
+
+    rotulos, colunas = resultado.agrupar('mes')
+    print(f"\n{'Mês':<8} {'Atual':>18} {'Situação':>18}")
+    for i, mes in enumerate(rotulos):
+        print(f"{mes:<8} {colunas['atual'][i]:>18,.2f} {colunas['situacao'][i]:>18,.2f}")
+
+    deltas = carteira.sensibilidades(estado).por_choque().delta.sum(axis=-1)
+    print("\nDelta da carteira (R$ por 1% de choque)")
+    print(f"{'Estratégia':<22} " + " ".join(f"{nome:>14}" for nome in NOMES_ALAVANCAS))
+    for estrategia, linha in zip(TipoEstrategia, deltas):
+        print(f"{estrategia.value:<22} " + " ".join(f"{valor:>14,.0f}" for valor in linha))
+
+if __name__ == "__main__":
+    main()
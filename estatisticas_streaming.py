@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Estatísticas em fluxo para o Monte Carlo do Simulador de Soja
+Acumuladores de memória constante e combináveis entre blocos e processos:
+momentos (Welford/Chan, com covariância opcional contra uma variável de
+controle) e um t-digest para quantis e médias de cauda, além das
+meias-larguras de intervalo de confiança usadas na parada antecipada
+"""
+
+from statistics import NormalDist
+from typing import Optional
+
+import numpy as np
+
+# Compressão do t-digest: no máximo ~compressao/2 centroides, com centroides
+# unitários nas pontas da distribuição
+COMPRESSAO_PADRAO = 500
+
+# Valores guardados antes de cada fusão com os centroides: fusões frequentes
+# de blocos pequenos deslocam os centroides centrais
+TAMANHO_BUFFER = 65_536
+
+class MomentosStreaming:
+    """Média e soma dos quadrados dos desvios de várias linhas de valores
+
+    Cada bloco é resumido e combinado pela fórmula de Chan et al. (a
+    generalização de Welford para blocos). Com `controle=True`, a última
+    linha é a variável de controle e também são acumulados os comomentos de
+    cada linha com ela.
+    """
+
+    def __init__(self, linhas: int, controle: bool = False):
+        self.n = 0
+        self.controle = controle
+        self.medias = np.zeros(linhas)
+        self.m2 = np.zeros(linhas)
+        self.comomentos = np.zeros(linhas) if controle else None
+
+    def _incorporar(self, n: int, medias: np.ndarray, m2: np.ndarray,
+                    comomentos: Optional[np.ndarray]):
+        combinado = self.n + n
+        delta = medias - self.medias
+        fator = self.n * n / combinado
+        self.medias += delta * n / combinado
+        self.m2 += m2 + delta ** 2 * fator
+        if self.controle:
+            self.comomentos += comomentos + delta * delta[-1] * fator
+        self.n = combinado
+
+    def adicionar(self, valores: np.ndarray):
+        """Acumula um bloco, forma (linhas, n)"""
+        if valores.shape[1] == 0:
+            return
+        medias = valores.mean(axis=1)
+        desvios = valores - medias[:, None]
+        comomentos = desvios @ desvios[-1] if self.controle else None
+        self._incorporar(valores.shape[1], medias, np.einsum('ij,ij->i', desvios, desvios), comomentos)
+
+    def combinar(self, outro: 'MomentosStreaming'):
+        """Incorpora os momentos de outro acumulador (outro bloco ou processo)"""
+        if outro.n:
+            self._incorporar(outro.n, outro.medias, outro.m2, outro.comomentos)
+
+    def variancias(self) -> np.ndarray:
+        """Variância amostral de cada linha"""
+        return self.m2 / max(self.n - 1, 1)
+
+    def coeficientes_controle(self) -> np.ndarray:
+        """Beta de cada linha na regressão sobre a variável de controle"""
+        return self.comomentos / max(self.m2[-1], np.finfo(float).tiny)
+
+    def medias_controladas(self, valor_esperado: float) -> np.ndarray:
+        """Médias corrigidas pelo desvio da média do controle em relação ao esperado"""
+        return self.medias - self.coeficientes_controle() * (self.medias[-1] - valor_esperado)
+
+    def variancias_residuais(self) -> np.ndarray:
+        """Variância que sobra após a regressão sobre o controle"""
+        residuos = self.m2 - self.coeficientes_controle() * self.comomentos
+        return np.maximum(residuos, 0.0) / max(self.n - 2, 1)
+
+class DigestoQuantis:
+    """t-digest (variante com fusão) para quantis e médias de cauda
+
+    Guarda centroides (média, peso) ordenados cujo tamanho é limitado pela
+    função de escala k1 = compressao / (2 pi) * asin(2q - 1): os centroides
+    são pequenos nas caudas (onde ficam VaR e CVaR) e maiores no centro. Cada
+    bloco é ordenado e fundido aos centroides de uma vez, sem laço em Python;
+    blocos menores que TAMANHO_BUFFER esperam num buffer de tamanho limitado.
+    """
+
+    def __init__(self, compressao: int = COMPRESSAO_PADRAO):
+        self.compressao = compressao
+        self.medias = np.empty(0)
+        self.pesos = np.empty(0)
+        self.minimo = np.inf
+        self.maximo = -np.inf
+        self._buffer = []
+        self._n_buffer = 0
+        self._n_centroides = 0
+
+    @property
+    def n(self) -> int:
+        return self._n_centroides + self._n_buffer
+
+    def _fundir(self, medias: np.ndarray, pesos: np.ndarray):
+        # As duas sequências já estão ordenadas: a ordenação estável as intercala
+        # em tempo linear
+        medias = np.concatenate([self.medias, medias])
+        pesos = np.concatenate([self.pesos, pesos])
+        ordem = np.argsort(medias, kind='stable')
+        medias, pesos = medias[ordem], pesos[ordem]
+
+        acumulado = np.cumsum(pesos)
+        total = acumulado[-1]
+        q_esquerda = np.clip((acumulado - pesos) / total, 0.0, 1.0)
+        k = np.floor(self.compressao / (2 * np.pi) * np.arcsin(2 * q_esquerda - 1))
+        inicios = np.flatnonzero(np.concatenate([[True], k[1:] != k[:-1]]))
+        self.pesos = np.add.reduceat(pesos, inicios)
+        self.medias = np.add.reduceat(pesos * medias, inicios) / self.pesos
+        self._n_centroides = int(round(total))
+
+    def _esvaziar_buffer(self):
+        if self._buffer:
+            ordenados = np.sort(np.concatenate(self._buffer))
+            self._buffer = []
+            self._n_buffer = 0
+            self._fundir(ordenados, np.ones(len(ordenados)))
+
+    def adicionar(self, valores: np.ndarray):
+        """Acumula um bloco de valores (1-D)"""
+        if len(valores) == 0:
+            return
+        self.minimo = min(self.minimo, float(valores.min()))
+        self.maximo = max(self.maximo, float(valores.max()))
+        self._buffer.append(np.array(valores, dtype=np.float64))
+        self._n_buffer += len(valores)
+        if self._n_buffer >= TAMANHO_BUFFER:
+            self._esvaziar_buffer()
+
+    def combinar(self, outro: 'DigestoQuantis'):
+        """Incorpora os centroides de outro digesto (outro bloco ou processo)"""
+        if outro.n:
+            outro._esvaziar_buffer()
+            self._esvaziar_buffer()
+            self.minimo = min(self.minimo, outro.minimo)
+            self.maximo = max(self.maximo, outro.maximo)
+            self._fundir(outro.medias, outro.pesos)
+
+    def _posicoes(self):
+        """Quantil linear por partes: centro de cada centroide e os extremos"""
+        self._esvaziar_buffer()
+        centros = np.cumsum(self.pesos) - self.pesos / 2
+        return (np.concatenate([[0.0], centros, [self.n]]),
+                np.concatenate([[self.minimo], self.medias, [self.maximo]]))
+
+    def quantil(self, q):
+        """Quantil q (escalar ou array) por interpolação entre centroides"""
+        if not self.n:
+            raise ValueError("Digesto vazio")
+        posicoes, valores = self._posicoes()
+        return np.interp(np.asarray(q) * self.n, posicoes, valores)
+
+    def media_cauda(self, q: float) -> float:
+        """Média dos valores abaixo do quantil q (cauda inferior)
+
+        Centroides inteiros abaixo do alvo entram com sua soma; o que cruza o
+        alvo entra com a fração necessária, valorada pela média do quantil
+        interpolado nesse trecho.
+        """
+        alvo = q * self.n
+        if alvo <= 0:
+            return float(self.quantil(q))
+        self._esvaziar_buffer()
+        acumulado = np.cumsum(self.pesos)
+        indice = int(np.searchsorted(acumulado, alvo, side='left'))
+        anterior = acumulado[indice - 1] if indice > 0 else 0.0
+        soma = float(self.pesos[:indice] @ self.medias[:indice])
+        restante = alvo - anterior
+        if restante > 0:
+            extremos = self.quantil(np.array([anterior, alvo]) / self.n)
+            soma += restante * float(extremos.mean())
+        return soma / alvo
+
+    def densidade(self, q: float, confianca: float = 0.95) -> float:
+        """Densidade no quantil q por diferença dos quantis vizinhos
+
+        Largura de banda de Hall e Sheather (1988), a usual para o erro
+        padrão de quantis amostrais.
+        """
+        normal = NormalDist()
+        z = normal.inv_cdf(q)
+        banda = (self.n ** (-1 / 3) * normal.inv_cdf(0.5 + confianca / 2) ** (2 / 3)
+                 * (1.5 * normal.pdf(z) ** 2 / (2 * z * z + 1)) ** (1 / 3))
+        inferior, superior = max(q - banda, 0.0), min(q + banda, 1.0)
+        diferenca = float(np.diff(self.quantil(np.array([inferior, superior])))[0])
+        return (superior - inferior) / diferenca if diferenca > 0 else np.inf
+
+    def nbytes(self) -> int:
+        return self.medias.nbytes + self.pesos.nbytes + 8 * self._n_buffer
+
+def valor_critico(confianca: float) -> float:
+    """z bilateral do intervalo de confiança"""
+    return NormalDist().inv_cdf(0.5 + confianca / 2)
+
+def meia_largura_media(variancia, n: int, confianca: float = 0.95):
+    """Meia-largura do intervalo da média pelo teorema central do limite"""
+    return valor_critico(confianca) * np.sqrt(np.asarray(variancia) / max(n, 1))
+
+def meia_largura_quantil(digesto: DigestoQuantis, q: float, confianca: float = 0.95) -> float:
+    """Meia-largura do intervalo do quantil q: z * sqrt(q (1 - q) / n) / f(x_q)"""
+    densidade = digesto.densidade(q, confianca)
+    if not np.isfinite(densidade):
+        return 0.0
+    return valor_critico(confianca) * np.sqrt(q * (1 - q) / max(digesto.n, 1)) / densidade
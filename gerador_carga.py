@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Gerador de carga para o serviço HTTP do Simulador de Soja
+Abre conexões keep-alive concorrentes em localhost, dispara simulações com
+alavancas sorteadas e compara as latências medidas no cliente com as
+métricas do servidor (GET /metricas)
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from simulador_soja import TipoCenario
+from servidor_api import ServidorSimulacao
+
+# Faixas sorteadas para as alavancas (dentro dos limites do simulador)
+FAIXAS_ALAVANCAS = {
+    'premio': (0.0, 2.0),
+    'tela': (11.0, 20.0),
+    'dolar': (4.6, 6.2)
+}
+
+class ClienteHTTP:
+    """Conexão HTTP/1.1 keep-alive mínima para corpos JSON"""
+
+    def __init__(self, host: str, porta: int):
+        self.host = host
+        self.porta = porta
+        self._leitor: Optional[asyncio.StreamReader] = None
+        self._escritor: Optional[asyncio.StreamWriter] = None
+
+    async def conectar(self):
+        self._leitor, self._escritor = await asyncio.open_connection(self.host, self.porta)
+
+    async def fechar(self):
+        if self._escritor is not None:
+            self._escritor.close()
+            await self._escritor.wait_closed()
+
+    async def requisitar(self, metodo: str, caminho: str, dados=None) -> Tuple[int, Dict]:
+        """Envia uma requisição e retorna (status, JSON da resposta)"""
+        corpo = b'' if dados is None else json.dumps(dados).encode('utf-8')
+        self._escritor.write(
+            f"{metodo} {caminho} HTTP/1.1\r\nHost: {self.host}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(corpo)}\r\n\r\n"
+            .encode('latin1') + corpo
+        )
+        await self._escritor.drain()
+
+        status = int((await self._leitor.readline()).split()[1])
+        tamanho = 0
+        while True:
+            linha = await self._leitor.readline()
+            if linha in (b'\r\n', b'\n', b''):
+                break
+            nome, _, valor = linha.decode('latin1').partition(':')
+            if nome.strip().lower() == 'content-length':
+                tamanho = int(valor)
+        return status, json.loads(await self._leitor.readexactly(tamanho))
+
+def gerar_requisicoes(n: int, semente: int = 0) -> List[Dict]:
+    """Configurações de alavancas sorteadas, uma por requisição"""
+    rng = np.random.default_rng(semente)
+    cenarios = [c.value for c in TipoCenario]
+    colunas = {}
+    for nome, (minimo, maximo) in FAIXAS_ALAVANCAS.items():
+        colunas[nome] = np.round(rng.uniform(minimo, maximo, n), 4).tolist()
+        colunas[f'cenario_{nome}'] = rng.choice(cenarios, n).tolist()
+        colunas[f'variacao_{nome}'] = np.round(rng.uniform(0, 20, n), 2).tolist()
+    colunas['hedge_dolar'] = np.round(rng.uniform(0, 1, n), 2).tolist()
+    colunas['hedge_chicago'] = np.round(rng.uniform(0, 1, n), 2).tolist()
+    return [{nome: valores[i] for nome, valores in colunas.items()} for i in range(n)]
+
+async def executar_carga(host: str, porta: int, requisicoes: List[Dict],
+                         concorrencia: int) -> Dict:
+    """Distribui as requisições entre `concorrencia` conexões simultâneas"""
+    latencias = np.empty(len(requisicoes))
+    falhas = 0
+    proxima = 0
+
+    async def trabalhador():
+        nonlocal falhas, proxima
+        cliente = ClienteHTTP(host, porta)
+        await cliente.conectar()
+        try:
+            while proxima < len(requisicoes):
+                i = proxima
+                proxima += 1
+                inicio = time.perf_counter()
+                status, _ = await cliente.requisitar('POST', '/simular', requisicoes[i])
+                latencias[i] = time.perf_counter() - inicio
+                falhas += status != 200
+        finally:
+            await cliente.fechar()
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabalhador() for _ in range(min(concorrencia, len(requisicoes)))))
+    duracao = time.perf_counter() - inicio
+
+    p50, p99 = np.percentile(latencias * 1000, [50, 99])
+    return {
+        'requisicoes': len(requisicoes),
+        'falhas': falhas,
+        'duracao_s': duracao,
+        'vazao_rps': len(requisicoes) / duracao,
+        'latencia_p50_ms': float(p50),
+        'latencia_p99_ms': float(p99)
+    }
+
+async def consultar_metricas(host: str, porta: int) -> Dict:
+    cliente = ClienteHTTP(host, porta)
+    await cliente.conectar()
+    try:
+        return (await cliente.requisitar('GET', '/metricas'))[1]
+    finally:
+        await cliente.fechar()
+
+async def rodar(args) -> Tuple[Dict, Dict]:
+    """Executa a carga; sem --porta, sobe o servidor no mesmo processo"""
+    servidor = None
+    porta = args.porta
+    if porta is None:
+        servidor = ServidorSimulacao(janela_ms=args.janela_ms)
+        await servidor.iniciar(args.host, 0)
+        porta = servidor.porta
+    try:
+        requisicoes = gerar_requisicoes(args.requisicoes, args.semente)
+        cliente = await executar_carga(args.host, porta, requisicoes, args.concorrencia)
+        return cliente, await consultar_metricas(args.host, porta)
+    finally:
+        if servidor is not None:
+            await servidor.fechar()
+
+def main(argumentos=None):
+    """Ponto de entrada de linha de comando"""
+    parser = argparse.ArgumentParser(description="Gerador de carga para o servidor do simulador")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int,
+                        help="porta de um servidor já em execução (padrão: sobe um local)")
+    parser.add_argument('-n', '--requisicoes', type=int, default=20_000)
+    parser.add_argument('-c', '--concorrencia', type=int, default=256)
+    parser.add_argument('--janela-ms', type=float, default=2.0,
+                        help="janela de agrupamento do servidor local")
+    parser.add_argument('--semente', type=int, default=0)
+    args = parser.parse_args(argumentos)
+
+    cliente, servidor = asyncio.run(rodar(args))
+    print(f"Cliente: {cliente['requisicoes']:,} requisições ({cliente['falhas']} falhas) "
+          f"em {cliente['duracao_s']:.2f}s -> {cliente['vazao_rps']:,.0f} req/s")
+    print(f"  latência p50 {cliente['latencia_p50_ms']:.2f} ms, p99 {cliente['latencia_p99_ms']:.2f} ms")
+    print(f"Servidor: {servidor['lotes']:,} lotes (médio {servidor.get('lote_medio', 0):.1f}, "
+          f"máximo {servidor.get('lote_maximo', 0)})")
+    print(f"  latência p50 {servidor.get('latencia_p50_ms', 0):.2f} ms, "
+          f"p99 {servidor.get('latencia_p99_ms', 0):.2f} ms, "
+          f"vazão recente {servidor.get('vazao_recente_rps', 0):,.0f} req/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Instrumentação leve dos caminhos quentes do Simulador de Soja
+Cronômetros (gerenciadores de contexto e decorador) e contadores que só
+registram quando há uma coleta ativa na thread atual; sem coleta, cada
+ponto instrumentado custa uma consulta a um atributo thread-local.
+Opcionalmente, a coleta captura um perfil do cProfile
+"""
+
+import functools
+import io
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterable, List, Optional
+
+# Linhas do relatório do cProfile guardadas em cada execução perfilada
+LINHAS_PERFIL = 30
+
+# Seção fictícia com o tempo da execução fora de qualquer seção medida
+NAO_INSTRUMENTADO = '(não instrumentado)'
+
+class _EstadoThread(threading.local):
+    # Padrão na classe: a leitura sem coleta não passa por AttributeError
+    registro = None
+
+_local = _EstadoThread()
+_NULO = nullcontext()
+
+class _Cronometro:
+    """Mede uma seção; o tempo dos filhos é descontado do tempo próprio do pai"""
+
+    __slots__ = ('registro', 'secao', 'inicio')
+
+    def __init__(self, registro: 'RegistroExecucao', secao: str):
+        self.registro = registro
+        self.secao = secao
+
+    def __enter__(self):
+        self.registro._pilha.append(0.0)
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *excecao):
+        duracao = time.perf_counter() - self.inicio
+        pilha = self.registro._pilha
+        filhos = pilha.pop()
+        if pilha:
+            pilha[-1] += duracao
+        entrada = self.registro.secoes.get(self.secao)
+        if entrada is None:
+            entrada = self.registro.secoes[self.secao] = [0.0, 0.0, 0]
+        entrada[0] += duracao
+        entrada[1] += duracao - filhos
+        entrada[2] += 1
+        return False
+
+class RegistroExecucao:
+    """Tempos e contadores de uma execução (por exemplo, um rerun do Streamlit)
+
+    `secoes` mapeia o nome da seção em [tempo total, tempo próprio,
+    chamadas], em segundos; o tempo próprio exclui as seções aninhadas.
+    """
+
+    def __init__(self):
+        self.secoes: Dict[str, List] = {}
+        self.contadores: Dict[str, int] = {}
+        self.inicio = time.time()
+        self.duracao = 0.0
+        self.perfil: Optional[str] = None
+        self._pilha: List[float] = []
+
+    def medir(self, secao: str) -> _Cronometro:
+        return _Cronometro(self, secao)
+
+    def contar(self, nome: str, quantidade: int = 1):
+        self.contadores[nome] = self.contadores.get(nome, 0) + quantidade
+
+    def detalhamento(self) -> List[Dict]:
+        """Seções da execução, da maior para a menor em tempo próprio
+
+        Inclui a linha NAO_INSTRUMENTADO com o restante da duração total.
+        """
+        linhas = [
+            {'secao': secao, 'total_ms': total * 1000, 'proprio_ms': proprio * 1000,
+             'chamadas': chamadas, 'fracao': proprio / self.duracao if self.duracao else 0.0}
+            for secao, (total, proprio, chamadas) in self.secoes.items()
+        ]
+        restante = max(self.duracao - sum(proprio for _, proprio, _ in self.secoes.values()), 0.0)
+        linhas.append({'secao': NAO_INSTRUMENTADO, 'total_ms': restante * 1000,
+                       'proprio_ms': restante * 1000, 'chamadas': 1,
+                       'fracao': restante / self.duracao if self.duracao else 0.0})
+        return sorted(linhas, key=lambda linha: linha['proprio_ms'], reverse=True)
+
+def registro_atual() -> Optional[RegistroExecucao]:
+    """Registro da coleta ativa na thread atual, ou None"""
+    return _local.registro
+
+def medir(secao: str):
+    """Cronômetro de uma seção: `with medir('app.tabela'): ...`"""
+    registro = _local.registro
+    if registro is None:
+        return _NULO
+    return _Cronometro(registro, secao)
+
+def contar(nome: str, quantidade: int = 1):
+    """Incrementa um contador da coleta ativa (sem coleta, não faz nada)"""
+    registro = _local.registro
+    if registro is not None:
+        registro.contadores[nome] = registro.contadores.get(nome, 0) + quantidade
+
+def cronometrado(secao: str):
+    """Decorador que mede cada chamada da função como `secao`"""
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            registro = _local.registro
+            if registro is None:
+                return funcao(*args, **kwargs)
+            with _Cronometro(registro, secao):
+                return funcao(*args, **kwargs)
+        return envolvida
+    return decorador
+
+@contextmanager
+def coletar(perfilar: bool = False):
+    """Ativa a coleta na thread atual e entrega o RegistroExecucao
+
+    Com `perfilar=True` o bloco roda sob o cProfile e o relatório (ordenado
+    por tempo acumulado) fica em `registro.perfil`.
+    """
+    anterior = _local.registro
+    registro = RegistroExecucao()
+    _local.registro = registro
+    perfil = None
+    if perfilar:
+        import cProfile
+        perfil = cProfile.Profile()
+        try:
+            perfil.enable()
+        except ValueError:
+            # Outro perfilador já está ativo nesta thread
+            perfil = None
+    inicio = time.perf_counter()
+    try:
+        yield registro
+    finally:
+        registro.duracao = time.perf_counter() - inicio
+        if perfil is not None:
+            perfil.disable()
+            import pstats
+            texto = io.StringIO()
+            pstats.Stats(perfil, stream=texto).sort_stats('cumulative').print_stats(LINHAS_PERFIL)
+            registro.perfil = texto.getvalue()
+        _local.registro = anterior
+
+def secoes_mais_lentas(registros: Iterable[RegistroExecucao], limite: int = 10) -> List[Dict]:
+    """Seções com maior tempo próprio somado sobre várias execuções
+
+    Para cada seção: em quantas execuções apareceu, chamadas, média e
+    máximo por execução (tempo próprio, em ms).
+    """
+    agregado: Dict[str, Dict] = {}
+    for registro in registros:
+        for secao, (_, proprio, chamadas) in registro.secoes.items():
+            linha = agregado.setdefault(secao, {'secao': secao, 'execucoes': 0, 'chamadas': 0,
+                                                'soma_ms': 0.0, 'maximo_ms': 0.0})
+            linha['execucoes'] += 1
+            linha['chamadas'] += chamadas
+            linha['soma_ms'] += proprio * 1000
+            linha['maximo_ms'] = max(linha['maximo_ms'], proprio * 1000)
+    for linha in agregado.values():
+        linha['media_ms'] = linha['soma_ms'] / linha['execucoes']
+    return sorted(agregado.values(), key=lambda linha: linha['soma_ms'], reverse=True)[:limite]
@@ -7,6 +7,8 @@ import os
 import sys
 from typing import List, Optional
 from simulador_soja import SimuladorSoja, TipoCenario, TipoEstrategia, ResultadoSimulacao
+from monte_carlo_soja import MonteCarloSoja
+from armazem_resultados import ArmazemResultados, resumir, salvar_monte_carlo
 
 class InterfaceSimulador:
     """Interface de linha de comando para o simulador"""
@@ -36,6 +38,7 @@ class InterfaceSimulador:
         print("5. Exibir Resumo Atual")
         print("6. Salvar/Carregar Configuração")
         print("7. Exemplos Pré-definidos")
+        print("8. Resultados Salvos (Monte Carlo)")
         print("0. Sair")
         print()
     
@@ -284,6 +287,48 @@ class InterfaceSimulador:
         if opcao in ["1", "2"]:
             input("\nPressione Enter para continuar...")
     
+    def resultados_salvos(self):
+        """Menu para gravar e consultar execuções de Monte Carlo em disco"""
+        self.limpar_tela()
+        self.exibir_cabecalho()
+        print("RESULTADOS SALVOS (MONTE CARLO)")
+        print("-" * 31)
+        
+        print("1. Gerar execução com as alavancas atuais")
+        print("2. Abrir arquivo de resultados")
+        print("3. Voltar ao menu principal")
+        
+        opcao = self.obter_opcao("Escolha uma opção: ", ["1", "2", "3"])
+        
+        if opcao == "1":
+            arquivo = input("Arquivo de saída (ex.: resultados.soja): ").strip()
+            n_cenarios = int(self.obter_numero("Número de cenários: ", 1))
+            if arquivo:
+                try:
+                    motor = MonteCarloSoja(self.simulador, semente=2024)
+                    armazem = salvar_monte_carlo(arquivo, motor, n_cenarios)
+                    print(f"✓ {len(armazem):,} cenários gravados em {arquivo}")
+                except Exception as e:
+                    print(f"✗ Erro ao gravar: {e}")
+        
+        elif opcao == "2":
+            arquivo = input("Arquivo de resultados: ").strip()
+            if arquivo and os.path.exists(arquivo):
+                try:
+                    armazem = ArmazemResultados(arquivo)
+                    print(f"\nCenários: {len(armazem):,}  Semente: {armazem.cabecalho['semente']}")
+                    print(f"{'Coluna':<24} {'Média':>12} {'Mínimo':>12} {'Máximo':>12}")
+                    for nome, valores in resumir(armazem).items():
+                        print(f"{nome:<24} {valores['media']:>12.4f} "
+                              f"{valores['minimo']:>12.4f} {valores['maximo']:>12.4f}")
+                except Exception as e:
+                    print(f"✗ Erro ao abrir: {e}")
+            else:
+                print("✗ Arquivo não encontrado")
+        
+        if opcao in ["1", "2"]:
+            input("\nPressione Enter para continuar...")
+    
     def exemplos_predefinidos(self):
         """Menu com exemplos pré-definidos"""
         self.limpar_tela()
@@ -341,7 +386,7 @@ class InterfaceSimulador:
             self.exibir_menu_principal()
             
             opcao = self.obter_opcao("Escolha uma opção: ", 
-                                   ["0", "1", "2", "3", "4", "5", "6", "7"])
+                                   ["0", "1", "2", "3", "4", "5", "6", "7", "8"])
             
             if opcao == "0":
                 self.executando = False
@@ -367,6 +412,9 @@ class InterfaceSimulador:
                 
             elif opcao == "7":
                 self.exemplos_predefinidos()
+                
+            elif opcao == "8":
+                self.resultados_salvos()
 
 def main():
     """Função principal"""
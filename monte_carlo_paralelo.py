@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Execução multiprocesso do Monte Carlo do Simulador de Soja
+Os blocos de cenários são distribuídos entre processos que escrevem os
+preços diretamente em um array de memória compartilhada ou, para as
+métricas de risco, devolvem acumuladores de memória constante que são
+combinados no processo principal
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from simulador_soja import SimuladorSoja, TipoEstrategia
+from monte_carlo_soja import PERCENTIS_PADRAO, AcumuladorRisco, MetricasRisco, MonteCarloSoja
+
+# Duração alvo de cada tarefa enviada a um processo (segundos)
+DURACAO_TAREFA_ALVO = 0.25
+
+# Abaixo desse tempo estimado não compensa abrir processos (segundos)
+TEMPO_MINIMO_PARALELO = 0.5
+
+def contar_nucleos_fisicos() -> int:
+    """Conta os núcleos físicos (sem hyperthreading) quando possível"""
+    try:
+        with open('/proc/cpuinfo', encoding='utf-8') as f:
+            nucleos = set()
+            processador_fisico = None
+            for linha in f:
+                if linha.startswith('physical id'):
+                    processador_fisico = linha.split(':')[1].strip()
+                elif linha.startswith('core id'):
+                    nucleos.add((processador_fisico, linha.split(':')[1].strip()))
+        if nucleos:
+            return len(nucleos)
+    except OSError:
+        pass
+    return os.cpu_count() or 1
+
+@dataclass
+class ConfiguracaoParalela:
+    """Parâmetros de execução escolhidos pelo autoajuste"""
+    n_processos: int
+    blocos_por_tarefa: int
+    segundos_por_bloco: float
+
+class ResultadoParalelo:
+    """Preços em memória compartilhada, forma (estratégias, n_cenarios)
+
+    `precos` é uma visão do segmento compartilhado; chame `liberar()` (ou use
+    como gerenciador de contexto) quando não precisar mais dele.
+    """
+
+    def __init__(self, memoria: shared_memory.SharedMemory, forma: Tuple[int, int],
+                 estrategias: List[TipoEstrategia], configuracao: ConfiguracaoParalela):
+        self._memoria = memoria
+        self.precos = np.ndarray(forma, dtype=np.float64, buffer=memoria.buf)
+        self.estrategias = estrategias
+        self.configuracao = configuracao
+
+    def liberar(self):
+        """Desanexa e remove o segmento de memória compartilhada"""
+        if self._memoria is not None:
+            self.precos = None
+            self._memoria.close()
+            self._memoria.unlink()
+            self._memoria = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.liberar()
+
+# Estado de cada processo trabalhador, definido uma única vez na inicialização
+_trabalhador = {}
+
+def _inicializar_trabalhador(nome_memoria: str, forma: Tuple[int, int],
+                             motor: MonteCarloSoja, estrategias: List[TipoEstrategia]):
+    """Anexa o processo ao segmento compartilhado"""
+    memoria = shared_memory.SharedMemory(name=nome_memoria)
+    _trabalhador['memoria'] = memoria
+    _trabalhador['precos'] = np.ndarray(forma, dtype=np.float64, buffer=memoria.buf)
+    _trabalhador['motor'] = motor
+    _trabalhador['estrategias'] = estrategias
+
+def _executar_tarefa(blocos: List[Tuple[int, int, int]]) -> int:
+    """Precifica uma lista de blocos escrevendo no array compartilhado"""
+    precos = _trabalhador['precos']
+    motor = _trabalhador['motor']
+    estrategias = _trabalhador['estrategias']
+    for indice, inicio, n in blocos:
+        motor.precificar_bloco(indice, n, estrategias, precos[:, inicio:inicio + n])
+    return len(blocos)
+
+def _inicializar_acumulacao(motor: MonteCarloSoja, estrategias: List[TipoEstrategia]):
+    """Guarda o motor no processo (as métricas dispensam memória compartilhada)"""
+    _trabalhador['motor'] = motor
+    _trabalhador['estrategias'] = estrategias
+
+def _acumular_blocos(motor: MonteCarloSoja, estrategias: List[TipoEstrategia],
+                     blocos: List[Tuple[int, int, int]]) -> AcumuladorRisco:
+    """Acumula uma lista de blocos em um acumulador novo"""
+    acumulador = motor.novo_acumulador(estrategias)
+    for indice, _, n in blocos:
+        motor.acumular_bloco(indice, n, estrategias, acumulador)
+    return acumulador
+
+def _acumular_tarefa(blocos: List[Tuple[int, int, int]]) -> AcumuladorRisco:
+    """Acumula uma lista de blocos e devolve o acumulador (poucos KB)"""
+    return _acumular_blocos(_trabalhador['motor'], _trabalhador['estrategias'], blocos)
+
+def autoajustar(motor: MonteCarloSoja, n_cenarios: int,
+                estrategias: Optional[List[TipoEstrategia]] = None) -> ConfiguracaoParalela:
+    """Escolhe número de processos e blocos por tarefa
+
+    Mede o tempo de um bloco, usa no máximo um processo por núcleo físico e
+    agrupa blocos em tarefas de ~DURACAO_TAREFA_ALVO segundos, mantendo ao
+    menos quatro tarefas por processo para balancear a carga. O tamanho do
+    bloco não é alterado porque define os fluxos aleatórios.
+    """
+    if estrategias is None:
+        estrategias = list(TipoEstrategia)
+
+    n_blocos = len(motor.blocos(n_cenarios))
+    n_amostra = min(motor.tamanho_bloco, n_cenarios)
+    inicio = time.perf_counter()
+    motor.precificar_bloco(0, n_amostra, estrategias)
+    segundos_por_bloco = (time.perf_counter() - inicio) * motor.tamanho_bloco / n_amostra
+
+    if segundos_por_bloco * n_blocos < TEMPO_MINIMO_PARALELO:
+        return ConfiguracaoParalela(1, n_blocos, segundos_por_bloco)
+
+    n_processos = max(1, min(contar_nucleos_fisicos(), n_blocos))
+    blocos_por_tarefa = max(1, int(DURACAO_TAREFA_ALVO / max(segundos_por_bloco, 1e-9)))
+    blocos_por_tarefa = max(1, min(blocos_por_tarefa, n_blocos // (4 * n_processos)))
+    return ConfiguracaoParalela(n_processos, blocos_por_tarefa, segundos_por_bloco)
+
+def simular_paralelo(motor: MonteCarloSoja, n_cenarios: int,
+                     estrategias: Optional[List[TipoEstrategia]] = None,
+                     n_processos: Optional[int] = None,
+                     blocos_por_tarefa: Optional[int] = None) -> ResultadoParalelo:
+    """Gera os preços de todos os cenários em vários processos
+
+    O resultado é idêntico bit a bit a `motor.gerar_precos(n_cenarios)`:
+    cada bloco usa o mesmo filho da SeedSequence raiz, independentemente de
+    qual processo o executa. Parâmetros omitidos vêm de `autoajustar`.
+    """
+    if estrategias is None:
+        estrategias = list(TipoEstrategia)
+
+    if n_processos is None or blocos_por_tarefa is None:
+        configuracao = autoajustar(motor, n_cenarios, estrategias)
+        if n_processos is not None:
+            configuracao.n_processos = n_processos
+        if blocos_por_tarefa is not None:
+            configuracao.blocos_por_tarefa = blocos_por_tarefa
+    else:
+        configuracao = ConfiguracaoParalela(n_processos, blocos_por_tarefa, float('nan'))
+
+    forma = (len(estrategias), n_cenarios)
+    memoria = shared_memory.SharedMemory(create=True, size=max(8 * forma[0] * forma[1], 1))
+    resultado = ResultadoParalelo(memoria, forma, estrategias, configuracao)
+
+    blocos = motor.blocos(n_cenarios)
+    passo = configuracao.blocos_por_tarefa
+    tarefas = [blocos[i:i + passo] for i in range(0, len(blocos), passo)]
+
+    try:
+        if configuracao.n_processos == 1:
+            for indice, inicio, n in blocos:
+                motor.precificar_bloco(indice, n, estrategias, resultado.precos[:, inicio:inicio + n])
+        else:
+            with ProcessPoolExecutor(
+                max_workers=configuracao.n_processos,
+                initializer=_inicializar_trabalhador,
+                initargs=(memoria.name, forma, motor, estrategias)
+            ) as executor:
+                for _ in executor.map(_executar_tarefa, tarefas):
+                    pass
+    except BaseException:
+        resultado.liberar()
+        raise
+
+    return resultado
+
+def simular_metricas_paralelo(motor: MonteCarloSoja, n_cenarios: int,
+                              estrategias: Optional[List[TipoEstrategia]] = None,
+                              nivel_confianca: float = 0.95,
+                              percentis=PERCENTIS_PADRAO,
+                              precisao_media: Optional[float] = None,
+                              precisao_var: Optional[float] = None,
+                              confianca_intervalo: float = 0.95,
+                              n_processos: Optional[int] = None,
+                              blocos_por_tarefa: Optional[int] = None) -> Dict[TipoEstrategia, MetricasRisco]:
+    """Equivalente multiprocesso de `motor.simular`, com memória constante
+
+    Cada tarefa devolve um AcumuladorRisco dos seus blocos; o processo
+    principal os combina na ordem das tarefas e, com precisões pedidas,
+    cancela as restantes assim que elas são atingidas. Com um processo as
+    tarefas rodam no processo principal pelo mesmo caminho, então, para o
+    mesmo `blocos_por_tarefa`, o resultado não depende do número de
+    processos. Os momentos coincidem com os de `motor.simular`; os quantis
+    diferem só pela ordem de fusão do t-digest. Parâmetros omitidos vêm de
+    `autoajustar`.
+    """
+    if estrategias is None:
+        estrategias = list(TipoEstrategia)
+
+    if n_processos is None or blocos_por_tarefa is None:
+        configuracao = autoajustar(motor, n_cenarios, estrategias)
+        n_processos = n_processos or configuracao.n_processos
+        blocos_por_tarefa = blocos_por_tarefa or configuracao.blocos_por_tarefa
+
+    blocos = motor.blocos(n_cenarios)
+    tarefas = [blocos[i:i + blocos_por_tarefa] for i in range(0, len(blocos), blocos_por_tarefa)]
+    acumulador = motor.novo_acumulador(estrategias)
+
+    def combinar(parciais) -> None:
+        for parcial in parciais:
+            acumulador.combinar(parcial)
+            if motor.precisao_atingida(acumulador, precisao_media, precisao_var,
+                                       nivel_confianca, confianca_intervalo):
+                return
+
+    if n_processos == 1:
+        # Gerador: cada tarefa só é acumulada se a precisão ainda não foi atingida
+        combinar(_acumular_blocos(motor, estrategias, tarefa) for tarefa in tarefas)
+    else:
+        executor = ProcessPoolExecutor(max_workers=n_processos, initializer=_inicializar_acumulacao,
+                                       initargs=(motor, estrategias))
+        try:
+            combinar(executor.map(_acumular_tarefa, tarefas))
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+    return motor.metricas(acumulador, estrategias, nivel_confianca, percentis, confianca_intervalo)
+
+def benchmark_escalabilidade(motor: MonteCarloSoja, n_cenarios: int,
+                             max_processos: Optional[int] = None) -> List[dict]:
+    """Mede o speedup de 1 até o número de núcleos físicos
+
+    Também confere se cada execução é idêntica bit a bit à serial.
+    """
+    max_processos = max_processos or contar_nucleos_fisicos()
+    # Mesma granularidade para todas as contagens de processos
+    blocos_por_tarefa = max(1, len(motor.blocos(n_cenarios)) // (4 * max_processos))
+
+    inicio = time.perf_counter()
+    referencia = motor.gerar_precos(n_cenarios)
+    tempo_serial = time.perf_counter() - inicio
+
+    medicoes = []
+    for n_processos in range(1, max_processos + 1):
+        inicio = time.perf_counter()
+        with simular_paralelo(motor, n_cenarios, n_processos=n_processos,
+                              blocos_por_tarefa=blocos_por_tarefa) as resultado:
+            duracao = time.perf_counter() - inicio
+            identico = np.array_equal(resultado.precos, referencia)
+        medicoes.append({
+            'processos': n_processos,
+            'segundos': duracao,
+            'speedup': tempo_serial / duracao,
+            'eficiencia': tempo_serial / duracao / n_processos,
+            'identico_serial': identico
+        })
+    return medicoes
+
+def main():
+    """Executa o benchmark de escalabilidade"""
+    simulador = SimuladorSoja()
+    simulador.definir_valor_alavanca('premio', 1.00)
+
+    motor = MonteCarloSoja(simulador, semente=2024)
+    n_cenarios = 4_000_000
+
+    print(f"Núcleos físicos: {contar_nucleos_fisicos()}")
+    print(f"Cenários: {n_cenarios:,}\n")
+    print(f"{'Processos':>9} {'Tempo (s)':>10} {'Speedup':>8} {'Eficiência':>10} {'Idêntico':>9}")
+    for m in benchmark_escalabilidade(motor, n_cenarios):
+        print(f"{m['processos']:>9} {m['segundos']:>10.2f} {m['speedup']:>8.2f} "
+              f"{m['eficiencia']:>10.0%} {str(m['identico_serial']):>9}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+Motor de Monte Carlo para o Simulador de Estratégia para Soja
+Sorteia valores terminais correlacionados para Prêmio (choques aritméticos),
+Tela e Dólar (GBM) e mede o risco de cada estratégia sobre os cenários sorteados. Além da
+amostragem pseudoaleatória, oferece variáveis antitéticas, Sobol
+embaralhado (quasi-Monte Carlo) e variável de controle para a média
+"""
+
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from simulador_soja import SimuladorSoja, TipoEstrategia, precificar_estrategia
+from sequencias_sobol import SequenciaSobol, normal_inversa
+from estatisticas_streaming import (COMPRESSAO_PADRAO, DigestoQuantis, MomentosStreaming,
+                                    meia_largura_media, meia_largura_quantil)
+
+# Ordem das alavancas nas matrizes de volatilidade e correlação
+ALAVANCAS = ('premio', 'tela', 'dolar')
+
+# Parâmetros padrão (anualizados, ilustrativos). A do prêmio é absoluta, em
+# USD/bu por raiz de ano: o prêmio pode ser zero ou negativo, então não tem
+# volatilidade relativa; as de tela e dólar são as do GBM
+VOLATILIDADES_PADRAO = {
+    'premio': 0.30,
+    'tela': 0.25,
+    'dolar': 0.15
+}
+
+CORRELACAO_PADRAO = (
+    (1.00, 0.20, -0.10),
+    (0.20, 1.00, -0.30),
+    (-0.10, -0.30, 1.00)
+)
+
+PERCENTIS_PADRAO = (1.0, 5.0, 25.0, 50.0, 75.0, 95.0, 99.0)
+
+# Formas de sortear os choques normais de cada bloco
+AMOSTRAGENS = ('pseudo', 'antitetica', 'sobol')
+
+# Cenários mínimos antes de a parada antecipada confiar nas meias-larguras
+CENARIOS_MINIMOS_PARADA = 10_000
+
+@dataclass
+class MetricasRisco:
+    """Métricas de risco de uma estratégia sobre os cenários sorteados
+
+    `var` e `cvar` são perdas em BRL em relação ao preço atual no nível de
+    confiança pedido (valores positivos indicam perda). Com variável de
+    controle, `media` já vem corrigida e `coeficiente_controle` é o beta
+    estimado da regressão sobre (tela + prêmio) * dólar. As meias-larguras
+    são as dos intervalos de confiança da média e do VaR (BRL).
+    """
+    estrategia: TipoEstrategia
+    n_cenarios: int
+    media: float
+    desvio_padrao: float
+    nivel_confianca: float
+    var: float
+    cvar: float
+    percentis: Dict[float, float] = field(default_factory=dict)
+    coeficiente_controle: Optional[float] = None
+    meia_largura_media: Optional[float] = None
+    meia_largura_var: Optional[float] = None
+
+class AcumuladorRisco:
+    """Estado combinável de uma simulação: momentos e um t-digest por estratégia
+
+    Com variável de controle, a última linha dos momentos é o controle. Dois
+    acumuladores da mesma configuração (blocos ou processos diferentes) são
+    unidos com `combinar`.
+    """
+
+    def __init__(self, n_estrategias: int, controle: bool = False,
+                 compressao: int = COMPRESSAO_PADRAO):
+        self.momentos = MomentosStreaming(n_estrategias + controle, controle)
+        self.digestos = [DigestoQuantis(compressao) for _ in range(n_estrategias)]
+
+    @property
+    def n(self) -> int:
+        return self.momentos.n
+
+    def adicionar(self, valores: np.ndarray):
+        """Acumula um bloco, forma (estratégias [+ controle], n)"""
+        self.momentos.adicionar(valores)
+        for linha, digesto in zip(valores, self.digestos):
+            digesto.adicionar(linha)
+
+    def combinar(self, outro: 'AcumuladorRisco'):
+        self.momentos.combinar(outro.momentos)
+        for digesto, outro_digesto in zip(self.digestos, outro.digestos):
+            digesto.combinar(outro_digesto)
+
+class MonteCarloSoja:
+    """Simulação de Monte Carlo das três alavancas com choques correlacionados
+
+    Tela e dólar seguem GBM; o prêmio recebe choques normais aditivos, já que
+    pode ser zero ou negativo e um caminho multiplicativo ficaria preso ao
+    sinal inicial (e sem volatilidade alguma a partir de zero).
+    """
+
+    def __init__(self,
+                 simulador: SimuladorSoja,
+                 volatilidades: Optional[Dict[str, float]] = None,
+                 correlacao=None,
+                 horizonte_anos: float = 0.5,
+                 derivas: Optional[Dict[str, float]] = None,
+                 semente: Optional[int] = None,
+                 tamanho_bloco: int = 262_144,
+                 compressao: int = COMPRESSAO_PADRAO,
+                 amostragem: str = 'pseudo',
+                 variavel_controle: bool = False):
+        """Configura o motor a partir dos valores atuais do simulador
+
+        Os valores iniciais são copiados do simulador no momento da criação;
+        `derivas` são as taxas de drift anuais (zero por padrão; a do prêmio
+        em USD/bu por ano, como sua volatilidade) e
+        `compressao` controla o tamanho do t-digest dos quantis.
+
+        `amostragem` escolhe os choques de cada bloco: 'pseudo' (gerador do
+        numpy), 'antitetica' (metade sorteada e a outra metade espelhada) ou
+        'sobol' (Sobol embaralhado pela semente, com normal inversa). Com
+        `variavel_controle`, `simular` corrige a média de cada estratégia
+        pelo desvio da média amostral de (tela + prêmio) * dólar em relação
+        ao seu valor esperado exato.
+        """
+        if amostragem not in AMOSTRAGENS:
+            raise ValueError(f"Amostragem deve ser uma de: {', '.join(AMOSTRAGENS)}")
+        volatilidades = {**VOLATILIDADES_PADRAO, **(volatilidades or {})}
+        derivas = derivas or {}
+
+        self.valores_iniciais = np.array(
+            [simulador.alavancas[nome].valor_atual for nome in ALAVANCAS]
+        )
+        self.volatilidades = np.array([volatilidades[nome] for nome in ALAVANCAS], dtype=np.float64)
+        self.derivas = np.array([derivas.get(nome, 0.0) for nome in ALAVANCAS], dtype=np.float64)
+        self.horizonte_anos = horizonte_anos
+
+        self.correlacao = np.array(CORRELACAO_PADRAO if correlacao is None else correlacao,
+                                   dtype=np.float64)
+        if self.correlacao.shape != (3, 3) or not np.allclose(self.correlacao, self.correlacao.T):
+            raise ValueError("A correlação deve ser uma matriz 3x3 simétrica")
+        try:
+            self.cholesky = np.linalg.cholesky(self.correlacao)
+        except np.linalg.LinAlgError:
+            raise ValueError("A matriz de correlação deve ser positiva definida")
+
+        # Sem semente explícita sorteia uma, para que a instância seja reprodutível
+        self.semente = np.random.SeedSequence(semente).entropy
+        self.tamanho_bloco = tamanho_bloco
+        self.compressao = compressao
+        self.amostragem = amostragem
+        self.variavel_controle = variavel_controle
+        self._sobol = SequenciaSobol(len(ALAVANCAS), self.semente) if amostragem == 'sobol' else None
+
+        valores = self.valores_iniciais
+        self.preco_atual_brl = (valores[1] + valores[0]) * valores[2]
+
+    def _gerador_bloco(self, indice_bloco: int) -> np.random.Generator:
+        """Gerador independente de um bloco (filho da SeedSequence raiz)"""
+        return np.random.default_rng(
+            np.random.SeedSequence(self.semente, spawn_key=(indice_bloco,))
+        )
+
+    def blocos(self, n_cenarios: int) -> List[Tuple[int, int, int]]:
+        """Divide n_cenarios em blocos (indice, inicio, tamanho)"""
+        return [
+            (indice, inicio, min(self.tamanho_bloco, n_cenarios - inicio))
+            for indice, inicio in enumerate(range(0, n_cenarios, self.tamanho_bloco))
+        ]
+
+    def _normais_bloco(self, indice_bloco: int, n: int) -> np.ndarray:
+        """Choques normais padrão independentes de um bloco, forma (n, 3)"""
+        if self.amostragem == 'sobol':
+            # Trecho da sequência única: os blocos juntos formam seus primeiros pontos
+            return normal_inversa(self._sobol.uniformes(indice_bloco * self.tamanho_bloco, n))
+        gerador = self._gerador_bloco(indice_bloco)
+        if self.amostragem == 'antitetica':
+            metade = gerador.standard_normal(((n + 1) // 2, 3))
+            return np.concatenate([metade, -metade])[:n]
+        return gerador.standard_normal((n, 3))
+
+    def gerar_cenarios(self, indice_bloco: int, n: int) -> Dict[str, np.ndarray]:
+        """Sorteia os valores terminais das alavancas de um bloco"""
+        normais = self._normais_bloco(indice_bloco, n) @ self.cholesky.T
+
+        t = self.horizonte_anos
+        normais *= self.volatilidades * np.sqrt(t)
+        # Prêmio (coluna 0): choque aritmético, válido para qualquer sinal
+        normais[:, 0] += self.valores_iniciais[0] + self.derivas[0] * t
+        # Tela e dólar: GBM
+        lognormais = normais[:, 1:]
+        lognormais += (self.derivas[1:] - 0.5 * self.volatilidades[1:] ** 2) * t
+        np.exp(lognormais, out=lognormais)
+        lognormais *= self.valores_iniciais[1:]
+
+        return {nome: normais[:, i] for i, nome in enumerate(ALAVANCAS)}
+
+    def valor_esperado_controle(self) -> float:
+        """E[(tela + prêmio) * dólar] no horizonte, exato sob a dinâmica do motor
+
+        Entre dois GBM, E[X_i X_j] = X_i(0) X_j(0) exp((mu_i + mu_j + rho_ij sigma_i sigma_j) t);
+        com o prêmio aritmético P, E[P D] = D(0) exp(mu_d t) (P(0) + (mu_p + rho_pd sigma_p sigma_d) t).
+        """
+        premio, tela, dolar = self.valores_iniciais
+        t = self.horizonte_anos
+        mu, sigma, rho = self.derivas, self.volatilidades, self.correlacao
+        return float(tela * dolar * np.exp((mu[1] + mu[2] + rho[1, 2] * sigma[1] * sigma[2]) * t)
+                     + dolar * np.exp(mu[2] * t) * (premio + (mu[0] + rho[0, 2] * sigma[0] * sigma[2]) * t))
+
+    def precificar_bloco(self, indice_bloco: int, n: int,
+                         estrategias: List[TipoEstrategia], saida: np.ndarray = None) -> np.ndarray:
+        """Preço final em BRL de cada estratégia para um bloco, forma (estratégias, n)"""
+        return self.precificar_cenarios(self.gerar_cenarios(indice_bloco, n), estrategias, saida)
+
+    def precificar_cenarios(self, cenarios: Dict[str, np.ndarray],
+                            estrategias: List[TipoEstrategia], saida: np.ndarray = None) -> np.ndarray:
+        """Preço final em BRL de cada estratégia para cenários já sorteados
+
+        As opções vencem no horizonte da simulação.
+        """
+        if saida is None:
+            saida = np.empty((len(estrategias), len(cenarios['premio'])))
+        premio, tela, dolar = self.valores_iniciais
+        for i, estrategia in enumerate(estrategias):
+            saida[i] = precificar_estrategia(
+                estrategia,
+                cenarios['premio'], cenarios['tela'], cenarios['dolar'],
+                premio, tela, dolar, vencimento=self.horizonte_anos
+            )[1]
+        return saida
+
+    def gerar_precos(self, n_cenarios: int,
+                     estrategias: Optional[List[TipoEstrategia]] = None) -> np.ndarray:
+        """Preço final em BRL de todos os cenários, forma (estratégias, n_cenarios)
+
+        Execução serial de referência: guarda todos os sorteios na memória.
+        """
+        if estrategias is None:
+            estrategias = list(TipoEstrategia)
+        precos = np.empty((len(estrategias), n_cenarios))
+        for indice, inicio, n in self.blocos(n_cenarios):
+            self.precificar_bloco(indice, n, estrategias, precos[:, inicio:inicio + n])
+        return precos
+
+    def novo_acumulador(self, estrategias: List[TipoEstrategia]) -> AcumuladorRisco:
+        """Acumulador vazio para as estratégias (e o controle, quando pedido)"""
+        return AcumuladorRisco(len(estrategias), self.variavel_controle, self.compressao)
+
+    def acumular_bloco(self, indice_bloco: int, n: int, estrategias: List[TipoEstrategia],
+                       acumulador: AcumuladorRisco, saida: np.ndarray = None):
+        """Sorteia, precifica e acumula um bloco"""
+        if saida is None:
+            saida = np.empty((len(estrategias) + self.variavel_controle, n))
+        cenarios = self.gerar_cenarios(indice_bloco, n)
+        self.precificar_cenarios(cenarios, estrategias, saida[:len(estrategias)])
+        if self.variavel_controle:
+            np.multiply(cenarios['tela'] + cenarios['premio'], cenarios['dolar'], out=saida[-1])
+        acumulador.adicionar(saida)
+
+    def _medias_variancias(self, acumulador: AcumuladorRisco) -> Tuple[np.ndarray, np.ndarray]:
+        """Médias (corrigidas pelo controle) e variâncias do estimador por estratégia"""
+        momentos = acumulador.momentos
+        n_estrategias = len(acumulador.digestos)
+        if self.variavel_controle:
+            return (momentos.medias_controladas(self.valor_esperado_controle())[:n_estrategias],
+                    momentos.variancias_residuais()[:n_estrategias])
+        return momentos.medias[:n_estrategias], momentos.variancias()[:n_estrategias]
+
+    def meias_larguras(self, acumulador: AcumuladorRisco, nivel_confianca: float = 0.95,
+                       confianca_intervalo: float = 0.95) -> Tuple[np.ndarray, np.ndarray]:
+        """Meias-larguras dos intervalos da média e do VaR de cada estratégia
+
+        Pelo teorema central do limite, com a variância residual quando há
+        controle; no Sobol o erro real é menor, então ficam conservadoras.
+        """
+        _, variancias = self._medias_variancias(acumulador)
+        media = meia_largura_media(variancias, acumulador.n, confianca_intervalo)
+        var = np.array([meia_largura_quantil(digesto, 1 - nivel_confianca, confianca_intervalo)
+                        for digesto in acumulador.digestos])
+        return media, var
+
+    def precisao_atingida(self, acumulador: AcumuladorRisco, precisao_media: Optional[float],
+                          precisao_var: Optional[float], nivel_confianca: float = 0.95,
+                          confianca_intervalo: float = 0.95) -> bool:
+        """Se todas as estratégias atingiram as meias-larguras pedidas"""
+        if (precisao_media is None and precisao_var is None) or acumulador.n < CENARIOS_MINIMOS_PARADA:
+            return False
+        media, var = self.meias_larguras(acumulador, nivel_confianca, confianca_intervalo)
+        return ((precisao_media is None or bool(np.all(media <= precisao_media)))
+                and (precisao_var is None or bool(np.all(var <= precisao_var))))
+
+    def metricas(self, acumulador: AcumuladorRisco, estrategias: List[TipoEstrategia],
+                 nivel_confianca: float = 0.95, percentis=PERCENTIS_PADRAO,
+                 confianca_intervalo: float = 0.95) -> Dict[TipoEstrategia, MetricasRisco]:
+        """Métricas de risco por estratégia a partir de um acumulador"""
+        medias, variancias = self._medias_variancias(acumulador)
+        meias_media, meias_var = self.meias_larguras(acumulador, nivel_confianca, confianca_intervalo)
+        desvios = np.sqrt(acumulador.momentos.variancias())
+        coeficientes = acumulador.momentos.coeficientes_controle() if self.variavel_controle else None
+        cauda = 1 - nivel_confianca
+        metricas = {}
+        for i, estrategia in enumerate(estrategias):
+            digesto = acumulador.digestos[i]
+            metricas[estrategia] = MetricasRisco(
+                estrategia=estrategia,
+                n_cenarios=acumulador.n,
+                media=float(medias[i]),
+                desvio_padrao=float(desvios[i]),
+                nivel_confianca=nivel_confianca,
+                var=float(self.preco_atual_brl - digesto.quantil(cauda)),
+                cvar=float(self.preco_atual_brl - digesto.media_cauda(cauda)),
+                percentis={p: float(digesto.quantil(p / 100)) for p in percentis},
+                coeficiente_controle=float(coeficientes[i]) if coeficientes is not None else None,
+                meia_largura_media=float(meias_media[i]),
+                meia_largura_var=float(meias_var[i])
+            )
+        return metricas
+
+    def simular(self, n_cenarios: int,
+                estrategias: Optional[List[TipoEstrategia]] = None,
+                nivel_confianca: float = 0.95,
+                percentis=PERCENTIS_PADRAO,
+                precisao_media: Optional[float] = None,
+                precisao_var: Optional[float] = None,
+                confianca_intervalo: float = 0.95) -> Dict[TipoEstrategia, MetricasRisco]:
+        """Executa a simulação em blocos e retorna as métricas por estratégia
+
+        A memória usada não depende de n_cenarios: cada bloco é sorteado,
+        precificado e acumulado (momentos e t-digest) antes do próximo. Com
+        variável de controle, as covariâncias com (tela + prêmio) * dólar
+        são acumuladas da mesma forma e corrigem a média; VaR, CVaR e
+        percentis vêm do t-digest sem correção.
+
+        Com `precisao_media` e/ou `precisao_var` (meias-larguras em BRL no
+        nível `confianca_intervalo`), `n_cenarios` passa a ser o máximo: a
+        execução para no primeiro bloco em que todas as estratégias atingem
+        as precisões, e `n_cenarios` das métricas traz os sorteios usados.
+        """
+        if estrategias is None:
+            estrategias = list(TipoEstrategia)
+
+        acumulador = self.novo_acumulador(estrategias)
+        saida = np.empty((len(estrategias) + self.variavel_controle, min(self.tamanho_bloco, n_cenarios)))
+        for indice, _, n in self.blocos(n_cenarios):
+            self.acumular_bloco(indice, n, estrategias, acumulador, saida[:, :n])
+            if self.precisao_atingida(acumulador, precisao_media, precisao_var,
+                                      nivel_confianca, confianca_intervalo):
+                break
+        return self.metricas(acumulador, estrategias, nivel_confianca, percentis, confianca_intervalo)
+
+def main():
+    """Demonstração do motor de Monte Carlo"""
+    simulador = SimuladorSoja()
+    simulador.definir_valor_alavanca('premio', 1.00)
+    simulador.definir_valor_alavanca('tela', 15.00)
+    simulador.definir_valor_alavanca('dolar', 5.20)
+
+    motor = MonteCarloSoja(simulador, semente=2024)
+    n_cenarios = 10_000_000
+
+    inicio = time.perf_counter()
+    metricas = motor.simular(n_cenarios)
+    duracao = time.perf_counter() - inicio
+
+    print(f"Monte Carlo: {n_cenarios:,} cenários em {duracao:.2f}s")
+    print(f"Preço atual: BRL {motor.preco_atual_brl:.2f}\n")
+    for estrategia, m in metricas.items():
+        print(f"{estrategia.value}:")
+        print(f"  Média: BRL {m.media:.2f}  Desvio: {m.desvio_padrao:.2f}")
+        print(f"  VaR {m.nivel_confianca:.0%}: BRL {m.var:.2f}  CVaR: BRL {m.cvar:.2f}")
+        print("  Percentis: " + ", ".join(f"P{p:g}={v:.2f}" for p, v in m.percentis.items()))
+
+    inicio = time.perf_counter()
+    metricas = motor.simular(n_cenarios, precisao_media=0.01, precisao_var=0.02)
+    duracao = time.perf_counter() - inicio
+    usados = max(m.n_cenarios for m in metricas.values())
+    print(f"\nCom parada antecipada (IC de 95%: média ±0,01, VaR ±0,02): "
+          f"{usados:,} cenários em {duracao:.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Otimizador de razões de hedge da Estratégia Combinada
+Encontra as frações de dólar, B3 e Chicago a travar que minimizam a
+variância ou o CVaR do preço final sobre cenários de Monte Carlo
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from simulador_soja import SimuladorSoja, TipoEstrategia, precificar_estrategia
+from monte_carlo_soja import MonteCarloSoja
+
+# Pontos por eixo da grade inicial no plano (hedge_dolar, hedge_chicago)
+PONTOS_GRADE_VARIANCIA = 101
+PONTOS_GRADE_CVAR = 11
+
+# Cenários usados na grade inicial do CVaR, antes do refinamento com todos
+CENARIOS_BUSCA_GROSSA = 20_000
+
+# Passo final do refinamento
+PASSO_MINIMO_VARIANCIA = 1e-6
+PASSO_MINIMO_CVAR = 1e-3
+
+@dataclass
+class ResultadoOtimizacao:
+    """Razões de hedge ótimas e as métricas do preço final em BRL
+
+    `cvar` é a perda média na cauda em relação ao preço atual, como em
+    `MetricasRisco`.
+    """
+    objetivo: str
+    hedge_dolar: float
+    hedge_b3: float
+    hedge_chicago: float
+    media: float
+    desvio_padrao: float
+    nivel_confianca: float
+    cvar: float
+    preco_minimo: Optional[float]
+    segundos: float
+
+    def razoes(self) -> Dict[str, float]:
+        """Razões no formato aceito por `simular_estrategia`"""
+        return {
+            'hedge_dolar': self.hedge_dolar,
+            'hedge_b3': self.hedge_b3,
+            'hedge_chicago': self.hedge_chicago
+        }
+
+def coeficientes(hedge_dolar, hedge_b3, hedge_chicago) -> np.ndarray:
+    """Pesos do preço combinado sobre a base de cenários, forma (..., 4)
+
+    Com a = preço USD atual, b = preço USD no cenário, d0 = dólar atual e
+    dc = dólar no cenário, o preço combinado em BRL é exatamente
+
+        c0 * a*d0 + c1 * a*dc + c2 * b*d0 + c3 * b*dc
+
+    e cada peso é linear em cada razão isoladamente.
+    """
+    hd, hb, hc = np.broadcast_arrays(*(np.asarray(h, dtype=np.float64)
+                                       for h in (hedge_dolar, hedge_b3, hedge_chicago)))
+    livre = 1 - hb
+    return np.stack([
+        hb + livre * hc * hd,
+        livre * hc * (1 - hd),
+        livre * (1 - hc) * hd,
+        livre * (1 - hc) * (1 - hd)
+    ], axis=-1)
+
+class OtimizadorHedge:
+    """Otimização das razões de hedge sobre cenários sorteados uma única vez
+
+    Os cenários viram uma matriz base (4, n_cenarios); qualquer combinação de
+    razões é avaliada por um produto com essa matriz, sem novos sorteios.
+    """
+
+    def __init__(self, motor: MonteCarloSoja, n_cenarios: int = 100_000):
+        premio, tela, dolar = motor.valores_iniciais
+        preco_usd_atual = tela + premio
+        self.preco_atual_brl = float(motor.preco_atual_brl)
+
+        self.base = np.empty((4, n_cenarios))
+        for indice, inicio, n in motor.blocos(n_cenarios):
+            cenarios = motor.gerar_cenarios(indice, n)
+            preco_usd = cenarios['tela'] + cenarios['premio']
+            trecho = self.base[:, inicio:inicio + n]
+            trecho[0] = preco_usd_atual * dolar
+            trecho[1] = preco_usd_atual * cenarios['dolar']
+            trecho[2] = preco_usd * dolar
+            trecho[3] = preco_usd * cenarios['dolar']
+
+        self.n_cenarios = n_cenarios
+        self.medias = self.base.mean(axis=1)
+        self.covariancia = np.cov(self.base)
+
+    def precos(self, hedge_dolar, hedge_b3, hedge_chicago) -> np.ndarray:
+        """Preço em BRL por cenário, forma (..., n_cenarios)"""
+        return coeficientes(hedge_dolar, hedge_b3, hedge_chicago) @ self.base
+
+    def media(self, hedge_dolar, hedge_b3, hedge_chicago) -> np.ndarray:
+        """Preço médio em BRL (forma das razões após broadcast)"""
+        return coeficientes(hedge_dolar, hedge_b3, hedge_chicago) @ self.medias
+
+    def variancia(self, hedge_dolar, hedge_b3, hedge_chicago) -> np.ndarray:
+        """Variância do preço em BRL pela forma quadrática c' Σ c"""
+        c = coeficientes(hedge_dolar, hedge_b3, hedge_chicago)
+        return np.einsum('...i,ij,...j->...', c, self.covariancia, c)
+
+    def cvar(self, hedge_dolar, hedge_b3, hedge_chicago,
+             nivel_confianca: float = 0.95, n_cenarios: Optional[int] = None) -> np.ndarray:
+        """CVaR do preço em BRL (perda média na cauda em relação ao preço atual)
+
+        Usa os primeiros `n_cenarios` cenários quando informado.
+        """
+        c = coeficientes(hedge_dolar, hedge_b3, hedge_chicago)
+        forma = c.shape[:-1]
+        base = self.base if n_cenarios is None else self.base[:, :n_cenarios]
+        precos = c.reshape(-1, 4) @ base
+        n_cauda = max(1, int(np.ceil((1 - nivel_confianca) * base.shape[1])))
+        cauda = np.partition(precos, n_cauda - 1, axis=1)[:, :n_cauda]
+        return (self.preco_atual_brl - cauda.mean(axis=1)).reshape(forma)
+
+    def _verificar_preco_minimo(self, preco_minimo: Optional[float]):
+        """Garante que alguma combinação atinge o preço médio mínimo
+
+        A média é multilinear nas razões, então o máximo está em um vértice.
+        """
+        if preco_minimo is None:
+            return
+        vertices = np.array(np.meshgrid([0.0, 1.0], [0.0, 1.0], [0.0, 1.0], indexing='ij')).reshape(3, -1)
+        melhor = float(self.media(*vertices).max())
+        if melhor < preco_minimo:
+            raise ValueError(
+                f"Preço médio mínimo inatingível: máximo possível é R$ {melhor:.2f}"
+            )
+
+    def _resultado(self, objetivo: str, h: np.ndarray, nivel_confianca: float,
+                   preco_minimo: Optional[float], inicio: float) -> ResultadoOtimizacao:
+        """Monta o resultado com as métricas das razões escolhidas"""
+        h = np.clip(h, 0.0, 1.0)
+        return ResultadoOtimizacao(
+            objetivo=objetivo,
+            hedge_dolar=float(h[0]),
+            hedge_b3=float(h[1]),
+            hedge_chicago=float(h[2]),
+            media=float(self.media(*h)),
+            desvio_padrao=float(np.sqrt(max(self.variancia(*h), 0.0))),
+            nivel_confianca=nivel_confianca,
+            cvar=float(self.cvar(*h, nivel_confianca=nivel_confianca)),
+            preco_minimo=preco_minimo,
+            segundos=time.perf_counter() - inicio
+        )
+
+    def _fracao_exposta(self, media_exposta: np.ndarray, risco_exposto: np.ndarray,
+                        quadratico: bool, preco_minimo: Optional[float]) -> Tuple[np.ndarray, np.ndarray]:
+        """Melhor fração não travada na B3 (1 - hedge_b3) em forma fechada
+
+        O preço é hedge_b3 * A + t * Y, com t = 1 - hedge_b3, A o preço atual e
+        Y o preço sem B3 para o par (hedge_dolar, hedge_chicago). A variância
+        vale t² Var(Y), o CVaR t * CVaR(Y) e a média A + t (E[Y] - A): o ótimo
+        está sempre em uma ponta do intervalo de t que respeita o preço mínimo.
+        Retorna (t, risco); pares inviáveis têm risco infinito.
+        """
+        baixo = np.zeros_like(media_exposta)
+        alto = np.ones_like(media_exposta)
+        viavel = np.ones(media_exposta.shape, dtype=bool)
+        if preco_minimo is not None:
+            inclinacao = media_exposta - self.preco_atual_brl
+            folga = preco_minimo - self.preco_atual_brl
+            with np.errstate(divide='ignore', invalid='ignore'):
+                limite = folga / inclinacao
+            baixo = np.where(inclinacao > 0, np.maximum(baixo, limite), baixo)
+            alto = np.where(inclinacao < 0, np.minimum(alto, limite), alto)
+            viavel = (baixo <= alto) & ((inclinacao != 0) | (folga <= 0))
+
+        if quadratico:
+            t = baixo
+            risco = t * t * risco_exposto
+        else:
+            t = np.where(risco_exposto >= 0, baixo, alto)
+            risco = t * risco_exposto
+        return t, np.where(viavel, risco, np.inf)
+
+    def _buscar(self, avaliar, pontos: int, passo_minimo: float) -> np.ndarray:
+        """Busca no plano (hedge_dolar, hedge_chicago) com hedge_b3 ótimo
+
+        Grade regular seguida de refinamento em grades 3x3 cada vez menores.
+        `avaliar(hd, hc, grossa)` retorna (hedge_b3, risco) em lote.
+        """
+        eixo = np.linspace(0.0, 1.0, pontos)
+        grade = np.array(np.meshgrid(eixo, eixo, indexing='ij')).reshape(2, -1)
+        hedge_b3, risco = avaliar(grade[0], grade[1], True)
+        if not np.isfinite(risco).any():
+            raise ValueError("Nenhuma combinação de hedge atende ao preço médio mínimo")
+        ponto = grade[:, int(np.argmin(risco))]
+        hedge_b3, risco = avaliar(ponto[:1], ponto[1:], False)
+        melhor = (float(risco[0]), float(hedge_b3[0]))
+
+        deslocamentos = np.array(np.meshgrid([-1, 0, 1], [-1, 0, 1], indexing='ij')).reshape(2, -1)
+        passo = 1.0 / (pontos - 1) / 2
+        while passo >= passo_minimo:
+            candidatos = np.clip(ponto[:, None] + passo * deslocamentos, 0.0, 1.0)
+            hedge_b3, risco = avaliar(candidatos[0], candidatos[1], False)
+            indice = int(np.argmin(risco))
+            if risco[indice] < melhor[0]:
+                ponto = candidatos[:, indice]
+                melhor = (float(risco[indice]), float(hedge_b3[indice]))
+            else:
+                passo /= 2
+        if melhor[1] >= 1.0:
+            # Tudo travado na B3: as outras razões não afetam o preço
+            return np.array([0.0, 1.0, 0.0])
+        return np.array([ponto[0], melhor[1], ponto[1]])
+
+    def minimizar_variancia(self, preco_minimo: Optional[float] = None,
+                            nivel_confianca: float = 0.95) -> ResultadoOtimizacao:
+        """Razões de variância mínima com preço médio de ao menos `preco_minimo`
+
+        A razão da B3 sai em forma fechada (ver `_fracao_exposta`) e a
+        variância de cada par (dólar, Chicago) vem da forma quadrática
+        c' Σ c, sem percorrer os cenários.
+        """
+        inicio = time.perf_counter()
+        self._verificar_preco_minimo(preco_minimo)
+
+        def avaliar(hedge_dolar, hedge_chicago, grossa):
+            media = self.media(hedge_dolar, 0.0, hedge_chicago)
+            variancia = np.maximum(self.variancia(hedge_dolar, 0.0, hedge_chicago), 0.0)
+            t, risco = self._fracao_exposta(media, variancia, True, preco_minimo)
+            return 1 - t, risco
+
+        h = self._buscar(avaliar, PONTOS_GRADE_VARIANCIA, PASSO_MINIMO_VARIANCIA)
+        return self._resultado('variancia', h, nivel_confianca, preco_minimo, inicio)
+
+    def minimizar_cvar(self, nivel_confianca: float = 0.95,
+                       preco_minimo: Optional[float] = None) -> ResultadoOtimizacao:
+        """Razões de CVaR mínimo com preço médio de ao menos `preco_minimo`
+
+        O CVaR de cada par (dólar, Chicago) sai de um produto matricial e
+        uma partição por candidato; a grade inicial usa só parte dos
+        cenários e o refinamento usa todos.
+        """
+        inicio = time.perf_counter()
+        self._verificar_preco_minimo(preco_minimo)
+        n_grossa = min(CENARIOS_BUSCA_GROSSA, self.n_cenarios)
+
+        def avaliar(hedge_dolar, hedge_chicago, grossa):
+            media = self.media(hedge_dolar, 0.0, hedge_chicago)
+            cvar = self.cvar(hedge_dolar, 0.0, hedge_chicago, nivel_confianca,
+                             n_grossa if grossa else None)
+            t, risco = self._fracao_exposta(media, cvar, False, preco_minimo)
+            return 1 - t, risco
+
+        h = self._buscar(avaliar, PONTOS_GRADE_CVAR, PASSO_MINIMO_CVAR)
+        return self._resultado('cvar', h, nivel_confianca, preco_minimo, inicio)
+
+    def otimizar(self, objetivo: str = 'variancia', nivel_confianca: float = 0.95,
+                 preco_minimo: Optional[float] = None) -> ResultadoOtimizacao:
+        """Minimiza 'variancia' ou 'cvar'"""
+        if objetivo == 'variancia':
+            return self.minimizar_variancia(preco_minimo, nivel_confianca)
+        if objetivo == 'cvar':
+            return self.minimizar_cvar(nivel_confianca, preco_minimo)
+        raise ValueError(f"Objetivo desconhecido: {objetivo}")
+
+def conferir_base(otimizador: OtimizadorHedge, motor: MonteCarloSoja,
+                  hedge_dolar: float, hedge_b3: float, hedge_chicago: float) -> float:
+    """Maior diferença entre a base de cenários e `precificar_estrategia`
+
+    Usa o primeiro bloco de cenários do motor.
+    """
+    n = min(motor.tamanho_bloco, otimizador.n_cenarios)
+    cenarios = motor.gerar_cenarios(0, n)
+    premio, tela, dolar = motor.valores_iniciais
+    _, referencia, _ = precificar_estrategia(
+        TipoEstrategia.ESTRATEGIA_COMBINADA,
+        cenarios['premio'], cenarios['tela'], cenarios['dolar'],
+        premio, tela, dolar,
+        hedge_dolar=hedge_dolar, hedge_b3=hedge_b3, hedge_chicago=hedge_chicago
+    )
+    precos = otimizador.precos(hedge_dolar, hedge_b3, hedge_chicago)[:n]
+    return float(np.max(np.abs(precos - referencia)))
+
+def main():
+    """Demonstração do otimizador de hedge"""
+    simulador = SimuladorSoja()
+    simulador.definir_valor_alavanca('premio', 1.00)
+    simulador.definir_valor_alavanca('tela', 15.00)
+    simulador.definir_valor_alavanca('dolar', 5.20)
+
+    # Com deriva positiva travar tudo na B3 deixa de atender ao preço mínimo
+    motor = MonteCarloSoja(simulador, semente=2024, derivas={'tela': 0.12, 'dolar': 0.04})
+    inicio = time.perf_counter()
+    otimizador = OtimizadorHedge(motor, 100_000)
+    print(f"Cenários: {otimizador.n_cenarios:,} (sorteados em {time.perf_counter() - inicio:.2f}s)")
+    print(f"Preço atual: BRL {otimizador.preco_atual_brl:.2f}\n")
+
+    preco_minimo = otimizador.preco_atual_brl * 1.02
+    for objetivo in ('variancia', 'cvar'):
+        for minimo in (None, preco_minimo):
+            r = otimizador.otimizar(objetivo, preco_minimo=minimo)
+            restricao = "sem restrição" if minimo is None else f"média >= {minimo:.2f}"
+            print(f"{objetivo} ({restricao}) em {r.segundos * 1000:.0f} ms:")
+            print(f"  Dólar {r.hedge_dolar:.1%}  B3 {r.hedge_b3:.1%}  Chicago {r.hedge_chicago:.1%}")
+            print(f"  Média: BRL {r.media:.2f}  Desvio: {r.desvio_padrao:.2f}  "
+                  f"CVaR {r.nivel_confianca:.0%}: BRL {r.cvar:.2f}")
+
+if __name__ == "__main__":
+    main()
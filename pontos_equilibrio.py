@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+Pontos de equilíbrio entre estratégias do Simulador de Soja
+Para cada par de estratégias, o valor de mercado de uma alavanca em que as
+duas dão o mesmo preço final em BRL. Como o preço de toda estratégia é afim
+em cada alavanca isolada, o ponto sai em forma fechada dos preços e das
+derivadas exatas; para choques conjuntos de várias alavancas (onde o preço
+deixa de ser linear) usa uma busca por intervalos vetorizada. Tudo é
+calculado em lote, para milhares de estados (ou lotes de uma carteira) de
+uma vez
+"""
+
+import argparse
+import time
+from dataclasses import dataclass
+from itertools import combinations
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from simulador_soja import (
+    ALAVANCA_OPCOES, NOMES_ALAVANCAS, PARAMETROS_OPCOES_PADRAO, TipoEstrategia, calcular_lote, fator_cenario,
+    precificar_estrategia, sensibilidades, termos_opcoes, validar_razoes_hedge
+)
+
+# Faixa (em % sobre o cenário) varrida nos choques conjuntos
+CHOQUE_MAXIMO = 50.0
+
+# Pontos da varredura que localiza as trocas de sinal nos choques conjuntos
+PONTOS_VARREDURA = 65
+
+# Alavancas que só têm sentido positivas: equilíbrios <= 0 (preço nulo) são
+# descartados
+ALAVANCAS_POSITIVAS = ('tela', 'dolar')
+
+# Critério de parada da busca por intervalos (largura relativa do intervalo)
+TOLERANCIA = 1e-12
+ITERACOES_MAXIMAS = 100
+
+def pares_estrategias(estrategias: List[TipoEstrategia]) -> List[Tuple[TipoEstrategia, TipoEstrategia]]:
+    """Todos os pares (a, b) sem repetição, na ordem de `estrategias`"""
+    return list(combinations(estrategias, 2))
+
+@dataclass
+class ResultadoEquilibrio:
+    """Pontos de equilíbrio de cada par de estratégias
+
+    Para uma alavanca, `valores` (forma (pares, *forma_lote)) é o valor de
+    mercado dela em que o par empata e `referencia` o valor no cenário de
+    cada estado; para um choque conjunto, `valores` é o choque em % (a
+    partir do cenário) e `referencia` é zero. `inclinacao` é a derivada de
+    preco(a) - preco(b) no ponto: positiva quando `a` vence acima dele.
+    NaN marca pares sem equilíbrio (na faixa, quando houver) e
+    `coincidentes` os que empatam em qualquer valor.
+    """
+    alavanca: Union[str, Dict[str, float]]
+    pares: List[Tuple[TipoEstrategia, TipoEstrategia]]
+    valores: np.ndarray
+    referencia: np.ndarray
+    inclinacao: np.ndarray
+    coincidentes: np.ndarray
+    metodo: str
+
+    def _indice(self, a: TipoEstrategia, b: TipoEstrategia) -> Tuple[int, float]:
+        if (a, b) in self.pares:
+            return self.pares.index((a, b)), 1.0
+        return self.pares.index((b, a)), -1.0
+
+    def valor(self, a: TipoEstrategia, b: TipoEstrategia) -> np.ndarray:
+        """Ponto de equilíbrio de um par (em qualquer ordem)"""
+        return self.valores[self._indice(a, b)[0]]
+
+    def vencedora_acima(self, a: TipoEstrategia, b: TipoEstrategia) -> np.ndarray:
+        """True onde `a` supera `b` acima do ponto de equilíbrio"""
+        indice, sinal = self._indice(a, b)
+        return sinal * self.inclinacao[indice] > 0
+
+    def distancia_percentual(self) -> np.ndarray:
+        """Distância de cada equilíbrio ao cenário, em % (o próprio choque no conjunto)"""
+        if isinstance(self.alavanca, str):
+            return (self.valores / self.referencia - 1) * 100
+        return self.valores
+
+    def linhas(self, indice=()) -> List[Dict]:
+        """Linhas de relatório de um estado (índice no lote), do mais próximo ao mais distante"""
+        distancias = self.distancia_percentual()
+        linhas = []
+        for p, (a, b) in enumerate(self.pares):
+            valor = float(self.valores[p][indice])
+            if self.coincidentes[p][indice] or np.isnan(valor):
+                continue
+            acima, abaixo = (a, b) if self.inclinacao[p][indice] > 0 else (b, a)
+            linhas.append({
+                'par': (a, b),
+                'valor': valor,
+                'distancia_percentual': float(distancias[p][indice]),
+                'vence_acima': acima,
+                'vence_abaixo': abaixo
+            })
+        return sorted(linhas, key=lambda linha: abs(linha['distancia_percentual']))
+
+def resolver_intervalo(funcao: Callable[[np.ndarray], np.ndarray], inferior, superior,
+                       tolerancia: float = TOLERANCIA,
+                       iteracoes: int = ITERACOES_MAXIMAS) -> Tuple[np.ndarray, np.ndarray]:
+    """Raízes de `funcao` em [inferior, superior], elemento a elemento (Illinois)
+
+    Falsa posição com a correção de Illinois: converge superlinearmente sem
+    sair do intervalo. `funcao` recebe um array com a forma das fronteiras e
+    devolve outro de mesma forma; elementos sem troca de sinal nas
+    fronteiras ficam NaN. Retorna (raízes, inclinação secante final).
+    """
+    a = np.array(inferior, dtype=np.float64)
+    b = np.array(superior, dtype=np.float64)
+    fa = funcao(a)
+    fb = funcao(b)
+    valido = np.isfinite(a) & np.isfinite(b) & (np.sign(fa) * np.sign(fb) <= 0)
+
+    for _ in range(iteracoes):
+        ativo = valido & (fb != 0) & (np.abs(b - a) > tolerancia * (1 + np.abs(b)))
+        if not ativo.any():
+            break
+        denominador = np.where(ativo, fb - fa, 1.0)
+        c = np.where(ativo, b - fb * (b - a) / np.where(denominador == 0, 1.0, denominador), b)
+        fc = np.where(ativo, funcao(c), fb)
+        troca = ativo & (np.sign(fc) * np.sign(fb) < 0)
+        mantem = ativo & ~troca
+        # Troca de sinal: o antigo b vira a fronteira oposta; senão, Illinois
+        # divide fa por 2 para não ficar preso a uma fronteira
+        a, fa = np.where(troca, b, a), np.where(troca, fb, np.where(mantem, fa / 2, fa))
+        b, fb = np.where(ativo, c, b), fc
+
+    raizes = np.where(valido, np.where(fa == 0, a, b), np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        inclinacao = np.where(valido, (fb - fa) / (b - a), np.nan)
+    return raizes, inclinacao
+
+def _preparar(valores, sinais, variacoes):
+    atuais = {nome: np.asarray(valores[nome], dtype=np.float64) for nome in NOMES_ALAVANCAS}
+    fatores = {nome: fator_cenario(np.asarray(sinais[nome], dtype=np.float64),
+                                   np.asarray(variacoes[nome], dtype=np.float64))
+               for nome in NOMES_ALAVANCAS}
+    forma = np.broadcast_shapes(*(np.shape(atuais[n]) for n in NOMES_ALAVANCAS),
+                                *(np.shape(fatores[n]) for n in NOMES_ALAVANCAS))
+    return atuais, fatores, forma
+
+def _diferencas(precos: np.ndarray, indices: List[Tuple[int, int]]) -> np.ndarray:
+    """preco(a) - preco(b) de cada par, forma (pares, ...)"""
+    return np.stack([precos[i] - precos[j] for i, j in indices])
+
+def _quebras(alavanca, estrategias, atuais, razoes_hedge) -> List[np.ndarray]:
+    """Strikes (valores da alavanca) em que o preço de alguma estratégia muda de inclinação"""
+    razoes_hedge = validar_razoes_hedge(razoes_hedge or {})
+    parametros = {nome: razoes_hedge[nome] for nome in PARAMETROS_OPCOES_PADRAO}
+    quebras = []
+    for estrategia in estrategias:
+        if ALAVANCA_OPCOES.get(estrategia) == alavanca:
+            strikes, _ = termos_opcoes(estrategia, atuais['tela'], atuais['dolar'], **parametros)
+            quebras.extend(np.asarray(strike, dtype=np.float64) for strike in strikes)
+    return quebras
+
+def _trechos(quebras: List[np.ndarray]):
+    """(início, fim, ponto interno) de cada trecho entre strikes ordenados"""
+    ordenadas = np.sort(np.stack(np.broadcast_arrays(*quebras)), axis=0)
+    infinito = np.full((1,) + ordenadas.shape[1:], np.inf)
+    inicios = np.concatenate([-infinito, ordenadas])
+    fins = np.concatenate([ordenadas, infinito])
+    for inicio, fim in zip(inicios, fins):
+        # Strikes são positivos: metade do primeiro e dobro do último ficam dentro
+        interno = np.where(np.isinf(inicio), fim / 2, np.where(np.isinf(fim), 2 * inicio, (inicio + fim) / 2))
+        yield inicio, fim, interno
+
+def _equilibrio_trecho(valores, sinais, variacoes, alavanca, estrategias, razoes_hedge, indices, ponto):
+    """Reta de cada par num trecho afim: (raiz, inclinação, paralelas, coincidentes)"""
+    lote = calcular_lote(valores, sinais, variacoes, estrategias, razoes_hedge)
+    derivadas = sensibilidades(valores, sinais, variacoes, estrategias, razoes_hedge)
+    delta = derivadas.delta[:, NOMES_ALAVANCAS.index(alavanca)]
+
+    diferenca = _diferencas(lote.preco_final_brl, indices)
+    inclinacao = _diferencas(delta, indices)
+    escala = np.maximum(np.abs(delta).max(axis=0), 1.0)
+
+    # Preço afim na alavanca (gama próprio nulo): a reta cruza zero em
+    # x0 - diferença / inclinação, ou nunca, quando as inclinações são iguais
+    paralelas = np.abs(inclinacao) <= 1e-12 * escala
+    nivel = np.maximum(np.abs(lote.preco_final_brl).max(axis=0), 1.0)
+    coincidentes = paralelas & (np.abs(diferenca) <= 1e-9 * nivel)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        raizes = np.where(paralelas, np.nan, ponto - diferenca / np.where(paralelas, 1.0, inclinacao))
+    return raizes, inclinacao, coincidentes
+
+def _equilibrio_analitico(valores, sinais, variacoes, alavanca, estrategias, razoes_hedge, indices):
+    atuais, fatores, forma = _preparar(valores, sinais, variacoes)
+    referencia = np.broadcast_to(atuais[alavanca] * fatores[alavanca], forma)
+    quebras = _quebras(alavanca, estrategias, atuais, razoes_hedge)
+    if not quebras:
+        pontos, inclinacao, coincidentes = _equilibrio_trecho(
+            valores, sinais, variacoes, alavanca, estrategias, razoes_hedge, indices, referencia)
+        return pontos, referencia, inclinacao, coincidentes
+
+    # Com opções na alavanca, o preço é afim por partes entre os strikes: cada
+    # trecho é resolvido em forma fechada num ponto interno e só vale a raiz
+    # dentro do próprio trecho; fica a mais próxima do cenário
+    pontos = inclinacao = None
+    coincidentes = True
+    sinais_trecho = {**sinais, alavanca: 1}
+    for inicio, fim, interno in _trechos(quebras):
+        variacoes_trecho = {**variacoes, alavanca: (interno / atuais[alavanca] - 1) * 100}
+        raizes, inclinacoes, iguais = _equilibrio_trecho(
+            valores, sinais_trecho, variacoes_trecho, alavanca, estrategias, razoes_hedge, indices, interno)
+        raizes = np.where((raizes >= inicio) & (raizes <= fim), raizes, np.nan)
+        if pontos is None:
+            pontos = np.full(raizes.shape, np.nan)
+            inclinacao = np.full(raizes.shape, np.nan)
+        # Sem equilíbrio, a inclinação é a do trecho que contém o cenário
+        contem = (referencia >= inicio) & (referencia < fim)
+        mais_proxima = ~np.isnan(raizes) & ~(np.abs(raizes - referencia) >= np.abs(pontos - referencia))
+        inclinacao = np.where(mais_proxima | (np.isnan(pontos) & contem), inclinacoes, inclinacao)
+        pontos = np.where(mais_proxima, raizes, pontos)
+        coincidentes = coincidentes & iguais
+    return pontos, referencia, inclinacao, coincidentes
+
+def _equilibrio_choque(valores, sinais, variacoes, direcao, estrategias, razoes_hedge, indices, choque_maximo):
+    atuais, fatores, forma = _preparar(valores, sinais, variacoes)
+    razoes_hedge = validar_razoes_hedge(razoes_hedge or {})
+    pesos = {nome: float(direcao.get(nome, 0.0)) for nome in NOMES_ALAVANCAS}
+
+    def preco(estrategia: TipoEstrategia, choque) -> np.ndarray:
+        cenarios = {nome: atuais[nome] * fatores[nome] * (1 + pesos[nome] * choque / 100)
+                    for nome in NOMES_ALAVANCAS}
+        _, preco_brl, _ = precificar_estrategia(
+            estrategia,
+            cenarios['premio'], cenarios['tela'], cenarios['dolar'],
+            atuais['premio'], atuais['tela'], atuais['dolar'],
+            **razoes_hedge
+        )
+        return np.broadcast_to(preco_brl, np.shape(choque) if np.ndim(choque) else forma)
+
+    def diferencas(choque: np.ndarray) -> np.ndarray:
+        # Cada par no seu próprio choque: só as duas estratégias dele são precificadas
+        return np.stack([preco(estrategias[i], choque[p]) - preco(estrategias[j], choque[p])
+                         for p, (i, j) in enumerate(indices)])
+
+    # Varredura ponto a ponto (memória de poucos arrays por par): guarda a
+    # troca de sinal mais próxima do cenário (choque zero) de cada lado dele
+    grade = np.linspace(-choque_maximo, choque_maximo, PONTOS_VARREDURA)
+    forma_pares = (len(indices),) + forma
+    intervalos = {lado: (np.full(forma_pares, np.nan), np.full(forma_pares, np.nan)) for lado in (-1, 1)}
+    coincidentes = np.ones(forma_pares, dtype=bool)
+    anterior = None
+    for k, choque in enumerate(grade):
+        precos = [preco(estrategia, choque) for estrategia in estrategias]
+        atual = _diferencas(precos, indices)
+        nivel = np.maximum(np.max(np.abs(precos), axis=0), 1.0)
+        coincidentes &= np.abs(atual) <= 1e-9 * nivel
+        if anterior is not None:
+            troca = np.sign(anterior) * np.sign(atual) <= 0
+            inferior, superior = intervalos[-1 if grade[k - 1] + choque < 0 else 1]
+            # Abaixo do cenário vale a última troca; acima, a primeira
+            if grade[k - 1] + choque >= 0:
+                troca &= np.isnan(inferior)
+            inferior[troca] = grade[k - 1]
+            superior[troca] = choque
+        anterior = atual
+
+    raizes = {}
+    for lado, (inferior, superior) in intervalos.items():
+        inferior[coincidentes] = np.nan
+        raizes[lado] = resolver_intervalo(diferencas, inferior, superior)
+    (abaixo, inclinacao_abaixo), (acima, inclinacao_acima) = raizes[-1], raizes[1]
+    usar_acima = ~np.isnan(acima) & ~(np.abs(acima) >= np.abs(abaixo))
+    pontos = np.where(usar_acima, acima, abaixo)
+    inclinacao = np.where(usar_acima, inclinacao_acima, inclinacao_abaixo)
+    return pontos, np.zeros(forma), inclinacao, coincidentes
+
+def calcular_equilibrios(valores: Dict[str, np.ndarray], sinais: Dict[str, np.ndarray],
+                         variacoes: Dict[str, np.ndarray],
+                         alavanca: Union[str, Dict[str, float]] = 'dolar',
+                         estrategias: Optional[List[TipoEstrategia]] = None,
+                         razoes_hedge: Optional[Dict[str, np.ndarray]] = None,
+                         faixa: Optional[Tuple[float, float]] = None,
+                         choque_maximo: float = CHOQUE_MAXIMO) -> ResultadoEquilibrio:
+    """Pontos de equilíbrio de todos os pares de estratégias, em lote
+
+    Mesmas entradas de `calcular_lote` (combinadas por broadcasting). Com o
+    nome de uma alavanca, o resultado é exato e em forma fechada: o valor de
+    mercado dela em que cada par empata, com as demais no cenário. Com um
+    dicionário de pesos (por exemplo {'tela': 1, 'dolar': -1}), busca o
+    choque conjunto t (em %) que leva cada alavanca a cenário * (1 + peso * t
+    / 100); o preço é então quadrático em t, e a busca devolve o equilíbrio
+    mais próximo do cenário dentro de ±choque_maximo. Equilíbrios de tela ou
+    dólar <= 0 (onde os preços se anulam) e, com `faixa`, fora de [mínimo,
+    máximo] ficam NaN.
+    """
+    if estrategias is None:
+        estrategias = list(TipoEstrategia)
+    pares = pares_estrategias(estrategias)
+    indices = list(combinations(range(len(estrategias)), 2))
+
+    if isinstance(alavanca, str):
+        if alavanca not in NOMES_ALAVANCAS:
+            raise ValueError(f"Alavanca deve ser uma de: {', '.join(NOMES_ALAVANCAS)}")
+        pontos, referencia, inclinacao, coincidentes = _equilibrio_analitico(
+            valores, sinais, variacoes, alavanca, estrategias, razoes_hedge, indices)
+        metodo = 'analitico'
+        if alavanca in ALAVANCAS_POSITIVAS:
+            pontos = np.where(pontos > 1e-9 * np.abs(referencia), pontos, np.nan)
+    else:
+        desconhecidas = set(alavanca) - set(NOMES_ALAVANCAS)
+        if desconhecidas or not any(alavanca.values()):
+            raise ValueError(f"Direção do choque deve ter pesos em: {', '.join(NOMES_ALAVANCAS)}")
+        pontos, referencia, inclinacao, coincidentes = _equilibrio_choque(
+            valores, sinais, variacoes, alavanca, estrategias, razoes_hedge, indices, choque_maximo)
+        metodo = 'intervalo'
+
+    if faixa is not None:
+        pontos = np.where((pontos >= faixa[0]) & (pontos <= faixa[1]), pontos, np.nan)
+
+    return ResultadoEquilibrio(
+        alavanca=alavanca,
+        pares=pares,
+        valores=pontos,
+        referencia=referencia,
+        inclinacao=inclinacao,
+        coincidentes=coincidentes,
+        metodo=metodo
+    )
+
+def main(argumentos=None):
+    """Relatório de pontos de equilíbrio de um estado e de uma carteira de exemplo"""
+    from carteira_soja import carteira_exemplo
+    from simulador_soja import SimuladorSoja, TipoCenario
+
+    parser = argparse.ArgumentParser(description="Pontos de equilíbrio entre estratégias")
+    parser.add_argument('-a', '--alavanca', default='dolar', choices=NOMES_ALAVANCAS)
+    parser.add_argument('-n', '--lotes', type=int, default=50_000, help="lotes da carteira de exemplo")
+    args = parser.parse_args(argumentos)
+
+    simulador = SimuladorSoja()
+    simulador.definir_valor_alavanca('premio', 1.00)
+    simulador.definir_cenario_alavanca('tela', TipoCenario.BAIXA, 10.0)
+    simulador.definir_cenario_alavanca('dolar', TipoCenario.ALTA, 5.0)
+    estado = simulador.obter_estado()
+
+    resultado = calcular_equilibrios(estado.valores(), estado.sinais(), estado.variacoes(), args.alavanca)
+    print(f"Equilíbrios em {args.alavanca} (cenário: {float(resultado.referencia):.4f})")
+    print(f"{'Par':<46} {'Valor':>10} {'Distância':>10}  Vence acima")
+    for linha in resultado.linhas():
+        a, b = linha['par']
+        print(f"{a.value + ' x ' + b.value:<46} {linha['valor']:>10.4f} "
+              f"{linha['distancia_percentual']:>+9.2f}%  {linha['vence_acima'].value}")
+
+    carteira = carteira_exemplo(args.lotes)
+    for direcao in (args.alavanca, {'tela': 1.0, 'dolar': 1.0}):
+        inicio = time.perf_counter()
+        resultado = carteira.pontos_equilibrio(estado, direcao)
+        duracao = time.perf_counter() - inicio
+        print(f"\nCarteira de {len(carteira):,} lotes, {direcao} ({resultado.metodo}): {duracao * 1000:.1f} ms")
+        distancias = resultado.distancia_percentual()
+        for p, (a, b) in enumerate(resultado.pares):
+            validos = distancias[p][~np.isnan(distancias[p])]
+            if len(validos):
+                p5, p50, p95 = np.percentile(validos, (5, 50, 95))
+                print(f"  {a.value + ' x ' + b.value:<46} P5 {p5:+8.2f}%  P50 {p50:+8.2f}%  P95 {p95:+8.2f}%")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Processamento em fluxo de arquivos de cenários do Simulador de Soja
+Lê arquivos CSV/JSONL com milhões de linhas (uma configuração de alavancas
+por linha) em blocos, avalia todas as estratégias e grava os resultados
+incrementalmente em CSV, JSONL ou NPY com memória constante
+"""
+
+import argparse
+import math
+import os
+import sys
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from simulador_soja import (
+    NOMES_ALAVANCAS, PARAMETROS_ESTRATEGIA_PADRAO, SimuladorSoja, TipoCenario, TipoEstrategia,
+    calcular_lote, codificar_cenarios
+)
+
+# Linhas lidas e avaliadas por vez
+TAMANHO_BLOCO_PADRAO = 100_000
+
+# Métricas gravadas por estratégia
+METRICAS = ('brl', 'usd', 'variacao')
+
+FORMATOS = ('csv', 'jsonl', 'npy')
+
+# Formato dos números nas saídas de texto (o NPY guarda float64 exato)
+FORMATO_NUMERO = '%.10g'
+
+# Linhas formatadas por vez nas saídas de texto (limita o texto em memória)
+LINHAS_POR_ESCRITA = 10_000
+
+# Linhas inválidas citadas na mensagem de erro
+LINHAS_INVALIDAS_CITADAS = 5
+
+@dataclass
+class ResultadoProcessamento:
+    """Resumo de uma execução do processador"""
+    linhas: int
+    segundos: float
+    memoria_pico_mb: float
+
+    @property
+    def linhas_por_segundo(self) -> float:
+        return self.linhas / self.segundos if self.segundos > 0 else float('inf')
+
+def colunas_saida(estrategias: List[TipoEstrategia]) -> List[str]:
+    """Nomes das colunas de resultado (estratégia_métrica)"""
+    return [f'{estrategia.value}_{metrica}' for estrategia in estrategias for metrica in METRICAS]
+
+def formato_do_arquivo(caminho: str) -> str:
+    """Formato deduzido da extensão do arquivo"""
+    extensao = os.path.splitext(caminho)[1].lower().lstrip('.')
+    formato = 'jsonl' if extensao in ('jsonl', 'ndjson') else extensao
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato não suportado: .{extensao} (use {', '.join(FORMATOS)})")
+    return formato
+
+def ler_blocos(caminho: str, tamanho_bloco: int = TAMANHO_BLOCO_PADRAO) -> Iterator[pd.DataFrame]:
+    """Lê o arquivo de cenários em blocos de linhas (CSV ou JSONL)"""
+    formato = formato_do_arquivo(caminho)
+    if formato == 'csv':
+        leitor = pd.read_csv(caminho, chunksize=tamanho_bloco)
+    elif formato == 'jsonl':
+        leitor = pd.read_json(caminho, lines=True, chunksize=tamanho_bloco)
+    else:
+        raise ValueError("A entrada deve ser CSV ou JSONL")
+    with leitor:
+        yield from leitor
+
+def validar_linhas(bloco: pd.DataFrame, padrao: SimuladorSoja,
+                   valores: Dict[str, np.ndarray], variacoes: Dict[str, np.ndarray]):
+    """Confere as faixas por linha, como `simular.py` e o servidor HTTP
+
+    Valores fora dos limites das alavancas de `padrao` (ou não finitos) e
+    variações negativas levantam ValueError com as primeiras linhas
+    inválidas, numeradas a partir de 1 no arquivo.
+    """
+    problemas = []
+    for nome in NOMES_ALAVANCAS:
+        alavanca = padrao.alavancas[nome]
+        fora = ~((valores[nome] >= alavanca.valor_minimo) & (valores[nome] <= alavanca.valor_maximo))
+        problemas.append((fora, f"{nome} deve estar entre {alavanca.valor_minimo} e {alavanca.valor_maximo}"))
+        negativa = ~(np.isfinite(variacoes[nome]) & (variacoes[nome] >= 0))
+        problemas.append((negativa, f"variacao_{nome} não pode ser negativa"))
+
+    invalidas = np.zeros(len(bloco), dtype=bool)
+    for mascara, _ in problemas:
+        invalidas |= mascara
+    if not invalidas.any():
+        return
+    linhas = bloco.index.to_numpy() + 1
+    citadas = []
+    for posicao in np.flatnonzero(invalidas)[:LINHAS_INVALIDAS_CITADAS]:
+        motivos = '; '.join(mensagem for mascara, mensagem in problemas if mascara[posicao])
+        citadas.append(f"linha {linhas[posicao]}: {motivos}")
+    restantes = int(invalidas.sum()) - len(citadas)
+    raise ValueError("Linhas inválidas (" + ", ".join(citadas)
+                     + (f" e mais {restantes}" if restantes else "") + ")")
+
+def avaliar_bloco(bloco: pd.DataFrame, padrao: SimuladorSoja,
+                  estrategias: List[TipoEstrategia]) -> np.ndarray:
+    """Avalia as linhas de um bloco, forma (linhas, estratégias x métricas)
+
+    Colunas ausentes usam o estado de `padrao`; valores e variações são
+    conferidos por `validar_linhas`. As colunas hedge_dolar,
+    hedge_b3 e hedge_chicago, quando presentes, valem para a combinada, e as
+    de PARAMETROS_OPCOES_PADRAO (strikes, volatilidades, vencimento e
+    juros), para as estratégias com opções.
+    """
+    estado = padrao.obter_estado()
+    n = len(bloco)
+
+    def coluna(nome, padrao_coluna):
+        if nome in bloco:
+            return bloco[nome].to_numpy()
+        return np.full(n, padrao_coluna)
+
+    valores, sinais, variacoes = {}, {}, {}
+    for nome in NOMES_ALAVANCAS:
+        valores[nome] = coluna(nome, getattr(estado, nome)).astype(np.float64)
+        cenarios = coluna(f'cenario_{nome}', getattr(estado, f'cenario_{nome}').value)
+        sinais[nome] = codificar_cenarios(cenarios)
+        variacoes[nome] = coluna(f'variacao_{nome}', getattr(estado, f'variacao_{nome}')).astype(np.float64)
+    validar_linhas(bloco, padrao, valores, variacoes)
+    razoes_hedge = {nome: bloco[nome].to_numpy(dtype=np.float64)
+                    for nome in PARAMETROS_ESTRATEGIA_PADRAO if nome in bloco}
+
+    lote = calcular_lote(valores, sinais, variacoes, estrategias, razoes_hedge)
+    # (estratégias, métricas, linhas) -> (linhas, estratégias x métricas)
+    metricas = np.stack([lote.preco_final_brl, lote.preco_final_usd, lote.variacao_percentual], axis=1)
+    return metricas.reshape(len(estrategias) * len(METRICAS), n).T
+
+class EscritorNPY:
+    """Grava um .npy estruturado linha a linha
+
+    O cabeçalho tem tamanho fixo, com espaço para qualquer número de linhas,
+    e é reescrito com a contagem final ao fechar.
+    """
+
+    MAGICO = b'\x93NUMPY\x01\x00'
+
+    def __init__(self, caminho: str, colunas: List[str]):
+        self.dtype = np.dtype([(nome, '<f8') for nome in colunas])
+        self.linhas = 0
+        # Reserva espaço para a maior contagem possível, alinhado a 64 bytes
+        maior = len(self.MAGICO) + 2 + len(self._dicionario(10 ** 19)) + 1
+        self._tamanho_cabecalho = -(-maior // 64) * 64
+        self._arquivo = open(caminho, 'wb')
+        self._arquivo.write(self._cabecalho(0))
+
+    def _dicionario(self, linhas: int) -> str:
+        return repr({'descr': self.dtype.descr, 'fortran_order': False, 'shape': (linhas,)})
+
+    def _cabecalho(self, linhas: int) -> bytes:
+        """Cabeçalho NPY v1.0 de tamanho fixo para a contagem de linhas"""
+        texto = self._dicionario(linhas).ljust(self._tamanho_cabecalho - len(self.MAGICO) - 3) + '\n'
+        return self.MAGICO + len(texto).to_bytes(2, 'little') + texto.encode('latin1')
+
+    def escrever(self, dados: np.ndarray):
+        """Acrescenta linhas (array float64 de forma (n, colunas))"""
+        self._arquivo.write(np.ascontiguousarray(dados, dtype='<f8').tobytes())
+        self.linhas += len(dados)
+
+    def fechar(self):
+        """Reescreve o cabeçalho com a contagem final e fecha o arquivo"""
+        self._arquivo.seek(0)
+        self._arquivo.write(self._cabecalho(self.linhas))
+        self._arquivo.close()
+
+class EscritorTexto:
+    """Grava blocos em CSV (com cabeçalho) ou JSONL
+
+    Cada bloco é formatado com um único `%` sobre um modelo de linha
+    repetido, bem mais rápido que formatar linha a linha ou via pandas. No
+    JSONL, resultados não finitos (NaN, infinito) são gravados como null.
+    """
+
+    def __init__(self, caminho: str, colunas: List[str], formato: str):
+        self.colunas = colunas
+        self.formato = formato
+        self.linhas = 0
+        if formato == 'csv':
+            self._modelo = ','.join([FORMATO_NUMERO] * len(colunas)) + '\n'
+        else:
+            self._modelo = '{' + ','.join(f'"{nome}":{FORMATO_NUMERO}' for nome in colunas) + '}\n'
+            # Mesmo modelo com os números já formatados (trechos com não finitos)
+            self._modelo_texto = '{' + ','.join(f'"{nome}":%s' for nome in colunas) + '}\n'
+        self._arquivo = open(caminho, 'w', encoding='utf-8', newline='')
+        if formato == 'csv':
+            self._arquivo.write(','.join(colunas) + '\n')
+
+    def escrever(self, dados: np.ndarray):
+        """Acrescenta as linhas de um bloco"""
+        for inicio in range(0, len(dados), LINHAS_POR_ESCRITA):
+            trecho = dados[inicio:inicio + LINHAS_POR_ESCRITA]
+            numeros = trecho.ravel().tolist()
+            if self.formato == 'jsonl' and not np.isfinite(trecho).all():
+                textos = tuple(FORMATO_NUMERO % x if math.isfinite(x) else 'null' for x in numeros)
+                self._arquivo.write((self._modelo_texto * len(trecho)) % textos)
+            else:
+                self._arquivo.write((self._modelo * len(trecho)) % tuple(numeros))
+        self.linhas += len(dados)
+
+    def fechar(self):
+        """Fecha o arquivo"""
+        self._arquivo.close()
+
+def abrir_escritor(caminho: str, colunas: List[str]):
+    """Escritor incremental adequado à extensão do arquivo de saída"""
+    formato = formato_do_arquivo(caminho)
+    if formato == 'npy':
+        return EscritorNPY(caminho, colunas)
+    return EscritorTexto(caminho, colunas, formato)
+
+def memoria_pico_mb() -> float:
+    """Pico de memória residente do processo (MB); NaN onde não há `resource` (Windows)"""
+    try:
+        import resource
+    except ImportError:
+        return float('nan')
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB, macOS em bytes
+    return pico / (1024 * 1024) if sys.platform == 'darwin' else pico / 1024
+
+def processar_arquivo(entrada: str, saida: str,
+                      estrategias: Optional[List[TipoEstrategia]] = None,
+                      padrao: Optional[SimuladorSoja] = None,
+                      tamanho_bloco: int = TAMANHO_BLOCO_PADRAO,
+                      progresso=None) -> ResultadoProcessamento:
+    """Avalia todas as linhas de `entrada` e grava os resultados em `saida`
+
+    Só um bloco fica em memória por vez. `progresso(linhas, segundos)` é
+    chamado após cada bloco, quando informado.
+    """
+    if estrategias is None:
+        estrategias = list(TipoEstrategia)
+    if padrao is None:
+        padrao = SimuladorSoja()
+
+    inicio = time.perf_counter()
+    escritor = abrir_escritor(saida, colunas_saida(estrategias))
+    try:
+        for bloco in ler_blocos(entrada, tamanho_bloco):
+            escritor.escrever(avaliar_bloco(bloco, padrao, estrategias))
+            if progresso is not None:
+                progresso(escritor.linhas, time.perf_counter() - inicio)
+    finally:
+        escritor.fechar()
+
+    return ResultadoProcessamento(
+        linhas=escritor.linhas,
+        segundos=time.perf_counter() - inicio,
+        memoria_pico_mb=memoria_pico_mb()
+    )
+
+def gerar_arquivo_exemplo(caminho: str, n_linhas: int, semente: int = 0,
+                          tamanho_bloco: int = TAMANHO_BLOCO_PADRAO):
+    """Gera um arquivo de cenários aleatórios (CSV ou JSONL) em blocos"""
+    rng = np.random.default_rng(semente)
+    formato = formato_do_arquivo(caminho)
+    cenarios = np.array([c.value for c in TipoCenario])
+    with open(caminho, 'w', encoding='utf-8', newline='') as f:
+        for inicio in range(0, n_linhas, tamanho_bloco):
+            n = min(tamanho_bloco, n_linhas - inicio)
+            tabela = pd.DataFrame({
+                'premio': rng.uniform(0.5, 1.5, n).round(4),
+                'tela': rng.uniform(12.0, 18.0, n).round(4),
+                'dolar': rng.uniform(4.8, 6.0, n).round(4),
+                'cenario_premio': cenarios[rng.integers(0, 3, n)],
+                'variacao_premio': rng.uniform(0, 30, n).round(2),
+                'cenario_tela': cenarios[rng.integers(0, 3, n)],
+                'variacao_tela': rng.uniform(0, 30, n).round(2),
+                'cenario_dolar': cenarios[rng.integers(0, 3, n)],
+                'variacao_dolar': rng.uniform(0, 20, n).round(2)
+            })
+            if formato == 'csv':
+                tabela.to_csv(f, header=inicio == 0, index=False)
+            else:
+                f.write(tabela.to_json(orient='records', lines=True))
+
+def main(argumentos=None):
+    """Ponto de entrada de linha de comando"""
+    parser = argparse.ArgumentParser(
+        description="Avalia arquivos de cenários (CSV/JSONL) contra todas as estratégias"
+    )
+    parser.add_argument('entrada', help="arquivo de cenários (.csv ou .jsonl)")
+    parser.add_argument('saida', help="arquivo de resultados (.csv, .jsonl ou .npy)")
+    parser.add_argument('--tamanho-bloco', type=int, default=TAMANHO_BLOCO_PADRAO,
+                        help="linhas avaliadas por vez (padrão: %(default)s)")
+    parser.add_argument('--estrategias', nargs='+', choices=[e.value for e in TipoEstrategia],
+                        help="estratégias avaliadas (padrão: todas)")
+    parser.add_argument('--gerar-exemplo', type=int, metavar='N',
+                        help="gera antes um arquivo de entrada com N linhas aleatórias")
+    args = parser.parse_args(argumentos)
+
+    if args.gerar_exemplo:
+        gerar_arquivo_exemplo(args.entrada, args.gerar_exemplo, tamanho_bloco=args.tamanho_bloco)
+
+    estrategias = None
+    if args.estrategias:
+        estrategias = [TipoEstrategia(valor) for valor in args.estrategias]
+
+    def progresso(linhas, segundos):
+        print(f"\r  {linhas:,} linhas ({linhas / segundos:,.0f} linhas/s)", end='', file=sys.stderr)
+
+    try:
+        resultado = processar_arquivo(args.entrada, args.saida, estrategias,
+                                      tamanho_bloco=args.tamanho_bloco, progresso=progresso)
+    except ValueError as erro:
+        print(f"\nprocessador_cenarios: {erro}", file=sys.stderr)
+        sys.exit(1)
+    print(file=sys.stderr)
+    print(f"Linhas processadas: {resultado.linhas:,}")
+    print(f"Tempo: {resultado.segundos:.2f}s")
+    print(f"Vazão: {resultado.linhas_por_segundo:,.0f} linhas/s")
+    print(f"Pico de memória: {resultado.memoria_pico_mb:.0f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+"""
+Serviço HTTP/JSON do Simulador de Soja (asyncio, só biblioteca padrão)
+Cada requisição traz a configuração completa das alavancas, sem estado
+compartilhado entre clientes; requisições que chegam em uma janela de
+poucos milissegundos são agrupadas e avaliadas em uma única chamada
+vetorizada de `calcular_lote`
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from simulador_soja import (NOMES_ALAVANCAS, PARAMETROS_ESTRATEGIA_PADRAO, SINAL_CENARIO,
+                            EstadoAlavancas, SimuladorSoja, TipoCenario, TipoEstrategia, calcular_lote,
+                            validar_razoes_hedge)
+
+# Janela de agrupamento e tamanho máximo de um lote
+JANELA_LOTE_MS = 2.0
+MAXIMO_LOTE = 4096
+
+# Maior corpo de requisição aceito (bytes)
+TAMANHO_MAXIMO_CORPO = 64 * 1024
+
+# Limites dos cabeçalhos de uma requisição (quantidade de linhas e bytes)
+MAXIMO_CABECALHOS = 100
+TAMANHO_MAXIMO_CABECALHOS = 16 * 1024
+
+# Latências guardadas para os percentis e janela da vazão recente (s)
+CAPACIDADE_METRICAS = 100_000
+JANELA_VAZAO = 10.0
+
+ESTRATEGIAS = list(TipoEstrategia)
+
+# Colunas de uma requisição normalizada: (valor, sinal, variação) por
+# alavanca, seguidas das razões de hedge da combinada e dos parâmetros das
+# opções
+COLUNAS_ENTRADA = tuple(
+    coluna for nome in NOMES_ALAVANCAS
+    for coluna in (nome, f'cenario_{nome}', f'variacao_{nome}')
+) + tuple(PARAMETROS_ESTRATEGIA_PADRAO)
+
+CHAVES_ACEITAS = frozenset(COLUNAS_ENTRADA) | {'estrategias'}
+
+MENSAGENS_STATUS = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    413: 'Payload Too Large',
+    431: 'Request Header Fields Too Large',
+    500: 'Internal Server Error'
+}
+
+class ErroRequisicao(Exception):
+    """Erro a ser devolvido ao cliente com o status HTTP indicado"""
+
+    def __init__(self, status: int, mensagem: str):
+        super().__init__(mensagem)
+        self.status = status
+
+def _numero(dados: Dict, chave: str, padrao: float) -> float:
+    valor = dados.get(chave, padrao)
+    if isinstance(valor, bool) or not isinstance(valor, (int, float)) or not math.isfinite(valor):
+        raise ValueError(f"{chave} deve ser um número")
+    return float(valor)
+
+def interpretar_requisicao(dados, padrao: EstadoAlavancas,
+                           limites: Dict[str, Tuple[float, float]]) -> Tuple[Tuple[float, ...], List[int]]:
+    """Valida o JSON de uma simulação e o converte em uma linha de entrada
+
+    Aceita as chaves de `COLUNAS_ENTRADA` (as ausentes vêm de `padrao` e de
+    PARAMETROS_ESTRATEGIA_PADRAO) e `estrategias`, lista de valores de
+    TipoEstrategia.
+    Retorna a linha na ordem de COLUNAS_ENTRADA e os índices das estratégias.
+    """
+    if not isinstance(dados, dict):
+        raise ValueError("O corpo deve ser um objeto JSON")
+    desconhecidas = set(dados) - CHAVES_ACEITAS
+    if desconhecidas:
+        raise ValueError(f"Chaves desconhecidas: {', '.join(sorted(desconhecidas))}")
+
+    linha = []
+    for nome in NOMES_ALAVANCAS:
+        valor = _numero(dados, nome, getattr(padrao, nome))
+        minimo, maximo = limites[nome]
+        if not minimo <= valor <= maximo:
+            raise ValueError(f"{nome} deve estar entre {minimo} e {maximo}")
+        try:
+            cenario = TipoCenario(dados.get(f'cenario_{nome}', getattr(padrao, f'cenario_{nome}').value))
+        except ValueError:
+            raise ValueError(f"cenario_{nome} deve ser um de: "
+                             f"{', '.join(c.value for c in TipoCenario)}") from None
+        variacao = _numero(dados, f'variacao_{nome}', getattr(padrao, f'variacao_{nome}'))
+        if variacao < 0:
+            raise ValueError(f"variacao_{nome} não pode ser negativa")
+        linha.extend((valor, SINAL_CENARIO[cenario], variacao))
+
+    razoes = validar_razoes_hedge({
+        chave: _numero(dados, chave, PARAMETROS_ESTRATEGIA_PADRAO[chave])
+        for chave in PARAMETROS_ESTRATEGIA_PADRAO if chave in dados
+    })
+    linha.extend(razoes[chave] for chave in PARAMETROS_ESTRATEGIA_PADRAO)
+
+    nomes = dados.get('estrategias')
+    if nomes is None:
+        return tuple(linha), list(range(len(ESTRATEGIAS)))
+    if not isinstance(nomes, list) or not nomes:
+        raise ValueError("estrategias deve ser uma lista não vazia")
+    try:
+        indices = [ESTRATEGIAS.index(TipoEstrategia(nome)) for nome in nomes]
+    except ValueError:
+        raise ValueError(f"Estratégias válidas: {', '.join(e.value for e in ESTRATEGIAS)}") from None
+    return tuple(linha), indices
+
+def avaliar_entradas(entradas: np.ndarray) -> np.ndarray:
+    """Avalia um lote de linhas (n, len(COLUNAS_ENTRADA))
+
+    Retorna array (n, estratégias, 3) com preço BRL, preço USD e variação
+    percentual, na ordem de ESTRATEGIAS.
+    """
+    colunas = dict(zip(COLUNAS_ENTRADA, entradas.T))
+    lote = calcular_lote(
+        {nome: colunas[nome] for nome in NOMES_ALAVANCAS},
+        {nome: colunas[f'cenario_{nome}'] for nome in NOMES_ALAVANCAS},
+        {nome: colunas[f'variacao_{nome}'] for nome in NOMES_ALAVANCAS},
+        ESTRATEGIAS,
+        {nome: colunas[nome] for nome in PARAMETROS_ESTRATEGIA_PADRAO}
+    )
+    # (métricas, estratégias, n) -> (n, estratégias, métricas)
+    return np.stack([lote.preco_final_brl, lote.preco_final_usd, lote.variacao_percentual]).transpose(2, 1, 0)
+
+class MetricasServidor:
+    """Latências, vazão e tamanhos de lote das simulações atendidas
+
+    Guarda as últimas CAPACIDADE_METRICAS latências (percentis sobre essa
+    janela) e contadores acumulados desde o início.
+    """
+
+    def __init__(self, capacidade: int = CAPACIDADE_METRICAS):
+        self.inicio = time.monotonic()
+        self.instantes = deque(maxlen=capacidade)
+        self.latencias = deque(maxlen=capacidade)
+        self.tamanhos_lote = deque(maxlen=capacidade)
+        self.requisicoes = 0
+        self.erros = 0
+        self.lotes = 0
+
+    def registrar_requisicao(self, latencia: float):
+        self.instantes.append(time.monotonic())
+        self.latencias.append(latencia)
+        self.requisicoes += 1
+
+    def registrar_lote(self, tamanho: int):
+        self.tamanhos_lote.append(tamanho)
+        self.lotes += 1
+
+    def resumo(self) -> Dict:
+        agora = time.monotonic()
+        decorrido = agora - self.inicio
+        resumo = {
+            'requisicoes': self.requisicoes,
+            'erros': self.erros,
+            'lotes': self.lotes,
+            'tempo_ativo_s': decorrido,
+            'vazao_media_rps': self.requisicoes / decorrido if decorrido > 0 else 0.0
+        }
+        if self.latencias:
+            latencias_ms = np.fromiter(self.latencias, dtype=np.float64) * 1000
+            instantes = np.fromiter(self.instantes, dtype=np.float64)
+            janela = min(JANELA_VAZAO, decorrido)
+            p50, p99 = np.percentile(latencias_ms, [50, 99])
+            resumo.update({
+                'latencia_p50_ms': float(p50),
+                'latencia_p99_ms': float(p99),
+                'latencia_maxima_ms': float(latencias_ms.max()),
+                'vazao_recente_rps': int(np.count_nonzero(instantes >= agora - janela)) / janela
+                                     if janela > 0 else 0.0,
+                'lote_medio': float(np.mean(self.tamanhos_lote)),
+                'lote_maximo': int(max(self.tamanhos_lote))
+            })
+        return resumo
+
+class AgrupadorSimulacoes:
+    """Fila que agrupa requisições próximas em uma avaliação vetorizada
+
+    Ao chegar a primeira requisição de um lote, aguarda `janela_ms` para
+    que as conexões concorrentes enfileirem as suas, e avalia todas (até
+    `maximo_lote`) de uma vez. A avaliação roda no executor padrão, fora
+    do laço de eventos: o prêmio das opções leva o lote a cerca de 1 ms com
+    uma linha e 5 ms com MAXIMO_LOTE linhas, tempo em que as conexões
+    continuam sendo aceitas e enfileiradas para o próximo lote.
+    """
+
+    def __init__(self, metricas: MetricasServidor, janela_ms: float = JANELA_LOTE_MS,
+                 maximo_lote: int = MAXIMO_LOTE):
+        self.metricas = metricas
+        self.janela = janela_ms / 1000
+        self.maximo_lote = maximo_lote
+        self._fila: Optional[asyncio.Queue] = None
+        self._tarefa: Optional[asyncio.Task] = None
+
+    def iniciar(self):
+        self._fila = asyncio.Queue()
+        self._tarefa = asyncio.get_running_loop().create_task(self._executar())
+
+    async def fechar(self):
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            try:
+                await self._tarefa
+            except asyncio.CancelledError:
+                pass
+            self._tarefa = None
+
+    async def avaliar(self, linha: Tuple[float, ...]) -> np.ndarray:
+        """Enfileira uma linha e aguarda seu resultado (estratégias, 3)"""
+        futuro = asyncio.get_running_loop().create_future()
+        self._fila.put_nowait((linha, futuro))
+        return await futuro
+
+    async def _executar(self):
+        while True:
+            lote = [await self._fila.get()]
+            if self._fila.qsize() + 1 < self.maximo_lote:
+                await asyncio.sleep(self.janela)
+            while len(lote) < self.maximo_lote and not self._fila.empty():
+                lote.append(self._fila.get_nowait())
+
+            # Clientes que desconectaram durante a espera não entram no lote
+            lote = [(linha, futuro) for linha, futuro in lote if not futuro.done()]
+            if not lote:
+                continue
+            try:
+                resultados = await asyncio.get_running_loop().run_in_executor(
+                    None, avaliar_entradas, np.array([linha for linha, _ in lote])
+                )
+            except Exception as erro:
+                for _, futuro in lote:
+                    if not futuro.done():
+                        futuro.set_exception(erro)
+                continue
+            self.metricas.registrar_lote(len(lote))
+            for (_, futuro), resultado in zip(lote, resultados):
+                if not futuro.done():
+                    futuro.set_result(resultado)
+
+class ServidorSimulacao:
+    """Servidor HTTP/1.1 mínimo com as rotas do simulador
+
+    POST /simular  corpo JSON com as alavancas (ver `interpretar_requisicao`)
+    GET  /metricas latência p50/p99, vazão e tamanhos de lote
+    GET  /saude    verificação simples de disponibilidade
+    """
+
+    def __init__(self, padrao: Optional[EstadoAlavancas] = None,
+                 janela_ms: float = JANELA_LOTE_MS, maximo_lote: int = MAXIMO_LOTE):
+        simulador = SimuladorSoja()
+        # Somente leitura após a construção: estado padrão e limites das alavancas
+        self.padrao = padrao or simulador.obter_estado()
+        self.limites = {nome: (alavanca.valor_minimo, alavanca.valor_maximo)
+                        for nome, alavanca in simulador.alavancas.items()}
+        self.metricas = MetricasServidor()
+        self.agrupador = AgrupadorSimulacoes(self.metricas, janela_ms, maximo_lote)
+        self._servidor: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def porta(self) -> int:
+        return self._servidor.sockets[0].getsockname()[1]
+
+    async def iniciar(self, host: str = '127.0.0.1', porta: int = 8765):
+        """Abre o socket (porta 0 escolhe uma livre) e inicia o agrupador"""
+        self.agrupador.iniciar()
+        self._servidor = await asyncio.start_server(self._atender, host, porta)
+
+    async def fechar(self):
+        if self._servidor is not None:
+            self._servidor.close()
+            await self._servidor.wait_closed()
+        await self.agrupador.fechar()
+
+    async def simular(self, dados) -> Dict:
+        """Avalia uma requisição já decodificada"""
+        try:
+            linha, indices = interpretar_requisicao(dados, self.padrao, self.limites)
+        except ValueError as erro:
+            raise ErroRequisicao(400, str(erro)) from None
+        resultado = (await self.agrupador.avaliar(linha)).tolist()
+        return {
+            'resultados': {
+                ESTRATEGIAS[i].value: dict(zip(('preco_final_brl', 'preco_final_usd',
+                                                'variacao_percentual'), resultado[i]))
+                for i in indices
+            }
+        }
+
+    async def _rotear(self, metodo: str, caminho: str, corpo: bytes) -> Dict:
+        rota = caminho.split('?', 1)[0]
+        if rota == '/simular':
+            if metodo != 'POST':
+                raise ErroRequisicao(405, "Use POST")
+            try:
+                dados = json.loads(corpo)
+            except ValueError:
+                raise ErroRequisicao(400, "JSON inválido") from None
+            return await self.simular(dados)
+        if rota in ('/metricas', '/saude'):
+            if metodo != 'GET':
+                raise ErroRequisicao(405, "Use GET")
+            return self.metricas.resumo() if rota == '/metricas' else {'status': 'ok'}
+        raise ErroRequisicao(404, f"Rota desconhecida: {rota}")
+
+    async def _atender(self, leitor: asyncio.StreamReader, escritor: asyncio.StreamWriter):
+        """Atende uma conexão, com keep-alive"""
+        try:
+            while True:
+                try:
+                    linha = await leitor.readline()
+                    metodo, caminho, versao = linha.decode('latin1').split()
+                except ValueError:
+                    # Conexão encerrada, linha malformada ou maior que o limite do leitor
+                    break
+                cabecalhos = {}
+                linhas, total, excedido = 0, 0, False
+                while True:
+                    try:
+                        linha = await leitor.readline()
+                    except ValueError:
+                        excedido = True
+                        break
+                    if linha in (b'\r\n', b'\n', b''):
+                        break
+                    linhas += 1
+                    total += len(linha)
+                    if linhas > MAXIMO_CABECALHOS or total > TAMANHO_MAXIMO_CABECALHOS:
+                        excedido = True
+                        break
+                    nome, _, valor = linha.decode('latin1').partition(':')
+                    cabecalhos[nome.strip().lower()] = valor.strip()
+
+                inicio = time.perf_counter()
+                manter = (versao == 'HTTP/1.1' and
+                          cabecalhos.get('connection', '').lower() != 'close')
+                try:
+                    if excedido:
+                        # O restante dos cabeçalhos não é lido: a conexão é encerrada
+                        manter = False
+                        raise ErroRequisicao(431, f"Cabeçalhos acima de {MAXIMO_CABECALHOS} linhas "
+                                                  f"ou {TAMANHO_MAXIMO_CABECALHOS} bytes")
+                    try:
+                        tamanho = int(cabecalhos.get('content-length', 0))
+                    except ValueError:
+                        tamanho = -1
+                    if tamanho < 0:
+                        manter = False
+                        raise ErroRequisicao(400, "Content-Length inválido")
+                    if tamanho > TAMANHO_MAXIMO_CORPO:
+                        manter = False
+                        raise ErroRequisicao(413, f"Corpo maior que {TAMANHO_MAXIMO_CORPO} bytes")
+                    corpo = await leitor.readexactly(tamanho) if tamanho > 0 else b''
+                    status, resposta = 200, await self._rotear(metodo, caminho, corpo)
+                except ErroRequisicao as erro:
+                    status, resposta = erro.status, {'erro': str(erro)}
+                except asyncio.IncompleteReadError:
+                    break
+                except Exception as erro:
+                    status, resposta = 500, {'erro': str(erro)}
+
+                try:
+                    bruta = montar_resposta(status, resposta, manter)
+                except ValueError:
+                    status = 500
+                    bruta = montar_resposta(status, {'erro': "Resultado não finito (NaN ou infinito)"}, manter)
+
+                if status != 200:
+                    self.metricas.erros += 1
+                elif caminho.startswith('/simular'):
+                    self.metricas.registrar_requisicao(time.perf_counter() - inicio)
+                escritor.write(bruta)
+                await escritor.drain()
+                if not manter:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            escritor.close()
+
+def montar_resposta(status: int, dados: Dict, manter_conexao: bool = True) -> bytes:
+    """Resposta HTTP/1.1 completa com corpo JSON
+
+    Levanta ValueError se `dados` tiver NaN ou infinito, que não são JSON válido.
+    """
+    corpo = json.dumps(dados, ensure_ascii=False, allow_nan=False).encode('utf-8')
+    cabecalho = (f"HTTP/1.1 {status} {MENSAGENS_STATUS.get(status, '')}\r\n"
+                 f"Content-Type: application/json; charset=utf-8\r\n"
+                 f"Content-Length: {len(corpo)}\r\n"
+                 f"Connection: {'keep-alive' if manter_conexao else 'close'}\r\n\r\n")
+    return cabecalho.encode('latin1') + corpo
+
+async def servir(host: str, porta: int, janela_ms: float, maximo_lote: int):
+    servidor = ServidorSimulacao(janela_ms=janela_ms, maximo_lote=maximo_lote)
+    await servidor.iniciar(host, porta)
+    print(f"Servindo em http://{host}:{servidor.porta} "
+          f"(janela {janela_ms:g} ms, lote máximo {maximo_lote})")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await servidor.fechar()
+
+def main(argumentos=None):
+    """Ponto de entrada de linha de comando"""
+    parser = argparse.ArgumentParser(description="Serviço HTTP/JSON do simulador de soja")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=8765)
+    parser.add_argument('--janela-ms', type=float, default=JANELA_LOTE_MS,
+                        help="espera para agrupar requisições (padrão: %(default)s)")
+    parser.add_argument('--maximo-lote', type=int, default=MAXIMO_LOTE,
+                        help="requisições por avaliação vetorizada (padrão: %(default)s)")
+    args = parser.parse_args(argumentos)
+    try:
+        asyncio.run(servir(args.host, args.porta, args.janela_ms, args.maximo_lote))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
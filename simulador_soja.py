@@ -4,11 +4,24 @@ Simulador de Estratégia para Soja
 Desenvolvido para análise de cenários com três alavancas: Prêmio, Tela e Dólar
 """
 
+from __future__ import annotations
+
 import json
-from dataclasses import dataclass
-from typing import Dict, List, Tuple, Optional
+import math
+import struct
+from array import array
+from dataclasses import dataclass, replace
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Tuple, Optional, Union
 from enum import Enum
 
+from instrumentacao import contar, cronometrado
+
+# numpy é importado dentro das funções que trabalham com arrays: o caminho
+# escalar (SimuladorSoja, precificar_estrategia com floats) não o usa, e a
+# linha de comando inicia sem executar a importação dele
+if TYPE_CHECKING:
+    import numpy as np
+
 class TipoCenario(Enum):
     """Tipos de cenário para cada alavanca"""
     ALTA = "alta"
@@ -22,6 +35,36 @@ class TipoEstrategia(Enum):
     TRAVAR_SOJA_B3 = "travar_soja_b3"
     TRAVAR_SOJA_CHICAGO = "travar_soja_chicago"
     ESTRATEGIA_COMBINADA = "estrategia_combinada"
+    PUT_SOJA_CHICAGO = "put_soja_chicago"
+    COLAR_SOJA_CHICAGO = "colar_soja_chicago"
+    PUT_DOLAR = "put_dolar"
+    CALL_DOLAR = "call_dolar"
+
+# Sinal aplicado à variação percentual em cada cenário
+SINAL_CENARIO = {
+    TipoCenario.ALTA: 1,
+    TipoCenario.BAIXA: -1,
+    TipoCenario.NEUTRO: 0
+}
+
+# Código numérico de cada estratégia (ordem de declaração do enum)
+CODIGO_ESTRATEGIA = {estrategia: codigo for codigo, estrategia in enumerate(TipoEstrategia)}
+ESTRATEGIA_POR_CODIGO = list(TipoEstrategia)
+
+# Bit de cada alavanca na máscara de exposição a risco
+BIT_EXPOSICAO = {
+    'premio': 1,
+    'tela': 2,
+    'dolar': 4
+}
+
+def mascara_exposicao(exposicao_risco: Dict[str, bool]) -> int:
+    """Converte o dicionário de exposição em máscara de bits"""
+    return sum(bit for nome, bit in BIT_EXPOSICAO.items() if exposicao_risco.get(nome))
+
+def exposicao_da_mascara(mascara: int) -> Dict[str, bool]:
+    """Converte a máscara de bits de exposição em dicionário"""
+    return {nome: bool(mascara & bit) for nome, bit in BIT_EXPOSICAO.items()}
 
 @dataclass
 class Alavanca:
@@ -34,21 +77,1078 @@ class Alavanca:
     cenario: TipoCenario = TipoCenario.NEUTRO
     variacao_percentual: float = 0.0
 
-@dataclass
+# Chaves de detalhes_calculo comuns a todas as estratégias, na ordem do array
+CHAVES_DETALHES = ('premio_cenario', 'tela_cenario', 'dolar_cenario', 'preco_usd_base', 'preco_brl_base')
+
+# Chaves adicionais de detalhes_calculo por estratégia
+CHAVES_DETALHES_ESTRATEGIA = {
+    TipoEstrategia.TRAVAR_DOLAR: ('dolar_travado',),
+    TipoEstrategia.TRAVAR_SOJA_B3: ('preco_travado_brl',),
+    TipoEstrategia.TRAVAR_SOJA_CHICAGO: ('preco_travado_usd',),
+    TipoEstrategia.ESTRATEGIA_COMBINADA: ('hedge_dolar', 'hedge_b3', 'hedge_chicago'),
+    TipoEstrategia.PUT_SOJA_CHICAGO: ('strike_put', 'custo_opcoes_usd'),
+    TipoEstrategia.COLAR_SOJA_CHICAGO: ('strike_put', 'strike_call', 'custo_opcoes_usd'),
+    TipoEstrategia.PUT_DOLAR: ('strike_dolar', 'custo_opcoes_brl'),
+    TipoEstrategia.CALL_DOLAR: ('strike_dolar', 'custo_opcoes_brl')
+}
+
+# Razões de hedge padrão da estratégia combinada (fração travada, de 0 a 1)
+RAZOES_HEDGE_PADRAO = {
+    'hedge_dolar': 0.5,
+    'hedge_b3': 0.0,
+    'hedge_chicago': 0.5
+}
+
+# Parâmetros padrão das estratégias com opções: strikes como fração do valor
+# atual da alavanca (tela ou dólar), volatilidades anuais, vencimento em anos
+# e juros contínuos ao ano
+PARAMETROS_OPCOES_PADRAO = {
+    'strike_put': 0.95,
+    'strike_call': 1.10,
+    'strike_dolar': 1.00,
+    'vol_tela': 0.20,
+    'vol_dolar': 0.15,
+    'vencimento': 0.5,
+    'juros_usd': 0.045,
+    'juros_brl': 0.14
+}
+
+# Todos os parâmetros das estratégias (razões de hedge e opções), com os padrões
+PARAMETROS_ESTRATEGIA_PADRAO = {**RAZOES_HEDGE_PADRAO, **PARAMETROS_OPCOES_PADRAO}
+
+# Faixa válida (inclusive) de cada razão de hedge e parâmetro de opção
+FAIXAS_PARAMETROS = {
+    **{nome: (0.0, 1.0) for nome in RAZOES_HEDGE_PADRAO},
+    'strike_put': (0.01, 100.0),
+    'strike_call': (0.01, 100.0),
+    'strike_dolar': (0.01, 100.0),
+    'vol_tela': (0.001, 5.0),
+    'vol_dolar': (0.001, 5.0),
+    'vencimento': (0.001, 30.0),
+    'juros_usd': (-0.5, 1.0),
+    'juros_brl': (-0.5, 1.0)
+}
+
+def validar_razoes_hedge(razoes: Dict[str, float]) -> Dict[str, float]:
+    """Completa as razões de hedge e os parâmetros das opções com os padrões e valida as faixas
+    
+    As razões ficam em [0, 1]; os parâmetros das opções, nas FAIXAS_PARAMETROS.
+    """
+    desconhecidas = set(razoes) - set(FAIXAS_PARAMETROS)
+    if desconhecidas:
+        raise ValueError(f"Razões de hedge desconhecidas: {', '.join(sorted(desconhecidas))}")
+    
+    # Os padrões já estão nas faixas: só os valores informados são conferidos
+    for nome, razao in razoes.items():
+        minimo, maximo = FAIXAS_PARAMETROS[nome]
+        # Escalares são conferidos sem numpy (caminho da linha de comando)
+        if isinstance(razao, (int, float)):
+            fora = not minimo <= razao <= maximo
+        else:
+            import numpy as np
+            fora = np.any((np.asarray(razao) < minimo) | (np.asarray(razao) > maximo))
+        if fora:
+            raise ValueError(f"{nome} deve estar entre {minimo:g} e {maximo:g}")
+    return {**PARAMETROS_ESTRATEGIA_PADRAO, **razoes}
+
+def mascara_combinada(hedge_dolar: float, hedge_b3: float, hedge_chicago: float) -> int:
+    """Máscara de exposição da estratégia combinada
+    
+    Segue as estratégias puras: B3 e Chicago protegem prêmio e tela; só o
+    travamento de dólar protege o câmbio.
+    """
+    mascara = 0
+    if hedge_b3 < 1 and hedge_chicago < 1:
+        mascara |= BIT_EXPOSICAO['premio'] | BIT_EXPOSICAO['tela']
+    if hedge_dolar < 1:
+        mascara |= BIT_EXPOSICAO['dolar']
+    return mascara
+
+# Detalhes compactados como float64 contíguos, por número de valores
+_FORMATO_DETALHES = {n: struct.Struct(f'<{n}d') for n in range(len(CHAVES_DETALHES), len(CHAVES_DETALHES) + 4)}
+
+# Máscara de exposição a risco de cada estratégia
+MASCARA_ESTRATEGIA = {
+    TipoEstrategia.SEM_TRAVAMENTO: BIT_EXPOSICAO['premio'] | BIT_EXPOSICAO['tela'] | BIT_EXPOSICAO['dolar'],
+    TipoEstrategia.TRAVAR_DOLAR: BIT_EXPOSICAO['premio'] | BIT_EXPOSICAO['tela'],
+    TipoEstrategia.TRAVAR_SOJA_B3: BIT_EXPOSICAO['dolar'],
+    TipoEstrategia.TRAVAR_SOJA_CHICAGO: BIT_EXPOSICAO['dolar'],
+    TipoEstrategia.ESTRATEGIA_COMBINADA: BIT_EXPOSICAO['premio'] | BIT_EXPOSICAO['tela'] | BIT_EXPOSICAO['dolar'],
+    TipoEstrategia.PUT_SOJA_CHICAGO: BIT_EXPOSICAO['premio'] | BIT_EXPOSICAO['dolar'],
+    TipoEstrategia.COLAR_SOJA_CHICAGO: BIT_EXPOSICAO['premio'] | BIT_EXPOSICAO['dolar'],
+    TipoEstrategia.PUT_DOLAR: BIT_EXPOSICAO['premio'] | BIT_EXPOSICAO['tela'],
+    TipoEstrategia.CALL_DOLAR: BIT_EXPOSICAO['premio'] | BIT_EXPOSICAO['tela'] | BIT_EXPOSICAO['dolar']
+}
+
+# Estratégias com opções e a alavanca de que dependem os payoffs: o payoff é
+# avaliado no valor de cenário (o vencimento) e o prêmio, calculado com os
+# valores atuais, é capitalizado até lá
+ALAVANCA_OPCOES = {
+    TipoEstrategia.PUT_SOJA_CHICAGO: 'tela',
+    TipoEstrategia.COLAR_SOJA_CHICAGO: 'tela',
+    TipoEstrategia.PUT_DOLAR: 'dolar',
+    TipoEstrategia.CALL_DOLAR: 'dolar'
+}
+
+# Estratégias de travamento (lineares): casos da estratégia combinada
+ESTRATEGIAS_TRAVAMENTO = tuple(
+    estrategia for estrategia in TipoEstrategia if estrategia not in ALAVANCA_OPCOES
+)
+
 class ResultadoSimulacao:
-    """Resultado de uma simulação"""
+    """Resultado de uma simulação
+    
+    Representação compacta: a exposição fica em uma máscara de bits e os
+    detalhes do cálculo em um array fixo de float64 compactado em bytes
+    (CHAVES_DETALHES seguidas das chaves da estratégia). `exposicao_risco` e
+    `detalhes_calculo` montam os dicionários apenas quando acessados.
+    
+    Os dicionários da versão anterior continuam aceitos, pela posição ou
+    pelos nomes `exposicao_risco` e `detalhes_calculo`, e são convertidos
+    na construção; os detalhes devem ter exatamente as chaves da estratégia.
+    """
+    __slots__ = ('estrategia', 'preco_final_brl', 'preco_final_usd',
+                 'variacao_percentual', 'exposicao', 'detalhes')
+    
+    def __init__(self, estrategia: TipoEstrategia, preco_final_brl: float,
+                 preco_final_usd: float, variacao_percentual: float,
+                 exposicao: Union[int, Dict[str, bool], None] = None,
+                 detalhes: Union[Tuple[float, ...], Dict[str, float], None] = None, *,
+                 exposicao_risco: Optional[Dict[str, bool]] = None,
+                 detalhes_calculo: Optional[Dict[str, float]] = None):
+        if exposicao.__class__ is not int or detalhes.__class__ is not tuple:
+            exposicao, detalhes = self._converter_anteriores(
+                estrategia, exposicao if exposicao_risco is None else exposicao_risco,
+                detalhes if detalhes_calculo is None else detalhes_calculo)
+        self.estrategia = estrategia
+        self.preco_final_brl = preco_final_brl
+        self.preco_final_usd = preco_final_usd
+        self.variacao_percentual = variacao_percentual
+        self.exposicao = exposicao
+        self.detalhes = _FORMATO_DETALHES[len(detalhes)].pack(*detalhes)
+    
+    @staticmethod
+    def _converter_anteriores(estrategia: TipoEstrategia, exposicao, detalhes) -> Tuple[int, Tuple[float, ...]]:
+        """Máscara e valores compactados a partir dos dicionários (ou sequências)"""
+        if exposicao is None or detalhes is None:
+            raise TypeError("ResultadoSimulacao requer a exposição e os detalhes do cálculo")
+        if isinstance(exposicao, dict):
+            exposicao = mascara_exposicao(exposicao)
+        if isinstance(detalhes, dict):
+            chaves = CHAVES_DETALHES + CHAVES_DETALHES_ESTRATEGIA.get(estrategia, ())
+            if set(detalhes) != set(chaves):
+                raise ValueError(f"detalhes_calculo de {estrategia.value} deve ter as chaves: "
+                                 f"{', '.join(chaves)}")
+            detalhes = [detalhes[chave] for chave in chaves]
+        return int(exposicao), tuple(detalhes)
+    
+    @property
+    def exposicao_risco(self) -> Dict[str, bool]:
+        """Exposição a risco por alavanca"""
+        return exposicao_da_mascara(self.exposicao)
+    
+    @property
+    def detalhes_calculo(self) -> Dict[str, float]:
+        """Valores intermediários do cálculo"""
+        chaves = CHAVES_DETALHES + CHAVES_DETALHES_ESTRATEGIA.get(self.estrategia, ())
+        return dict(zip(chaves, _FORMATO_DETALHES[len(chaves)].unpack(self.detalhes)))
+    
+    def __eq__(self, outro):
+        if not isinstance(outro, ResultadoSimulacao):
+            return NotImplemented
+        return all(getattr(self, campo) == getattr(outro, campo) for campo in self.__slots__)
+    
+    def __repr__(self):
+        return (f"ResultadoSimulacao(estrategia={self.estrategia}, "
+                f"preco_final_brl={self.preco_final_brl!r}, "
+                f"preco_final_usd={self.preco_final_usd!r}, "
+                f"variacao_percentual={self.variacao_percentual!r}, "
+                f"exposicao_risco={self.exposicao_risco!r}, "
+                f"detalhes_calculo={self.detalhes_calculo!r})")
+
+@dataclass
+class ResultadoLote:
+    """Resultado colunar de uma simulação em lote
+
+    Cada array tem forma (len(estrategias), *forma_lote): a primeira
+    dimensão segue a ordem de `estrategias`.
+    """
+    estrategias: List[TipoEstrategia]
+    preco_final_brl: np.ndarray
+    preco_final_usd: np.ndarray
+    variacao_percentual: np.ndarray
+
+    def da_estrategia(self, estrategia: TipoEstrategia) -> Dict[str, np.ndarray]:
+        """Retorna as colunas de uma estratégia"""
+        indice = self.estrategias.index(estrategia)
+        return {
+            'preco_final_brl': self.preco_final_brl[indice],
+            'preco_final_usd': self.preco_final_usd[indice],
+            'variacao_percentual': self.variacao_percentual[indice]
+        }
+
+class RegistroHistorico(NamedTuple):
+    """Entrada do histórico de simulações"""
     estrategia: TipoEstrategia
     preco_final_brl: float
     preco_final_usd: float
     variacao_percentual: float
     exposicao_risco: Dict[str, bool]
-    detalhes_calculo: Dict[str, float]
+
+class HistoricoSimulacoes:
+    """Histórico de simulações em buffer circular de capacidade fixa
+
+    Guarda uma coluna tipada por campo (float64 para os preços, int8 para o
+    código da estratégia e uint8 para a máscara de exposição); quando cheio,
+    sobrescreve as entradas mais antigas. Opcionalmente cada registro também
+    é anexado a um arquivo binário, lido de volta com `ler_arquivo`; o
+    arquivo é fechado por `fechar`, ao sair de um bloco `with` ou quando o
+    histórico é coletado.
+    """
+    
+    # Registro do arquivo: três float64, código da estratégia e máscara
+    FORMATO_REGISTRO = struct.Struct('<dddbB')
+    DTYPE_REGISTRO = [
+        ('preco_final_brl', '<f8'),
+        ('preco_final_usd', '<f8'),
+        ('variacao_percentual', '<f8'),
+        ('estrategia', 'i1'),
+        ('exposicao', 'u1')
+    ]
+    
+    def __init__(self, capacidade: int = 1000, arquivo: Optional[str] = None):
+        if capacidade <= 0:
+            raise ValueError("A capacidade do histórico deve ser positiva")
+        self.capacidade = capacidade
+        self.preco_final_brl = array('d', bytes(8 * capacidade))
+        self.preco_final_usd = array('d', bytes(8 * capacidade))
+        self.variacao_percentual = array('d', bytes(8 * capacidade))
+        self.estrategia = array('b', bytes(capacidade))
+        self.exposicao = array('B', bytes(capacidade))
+        self.total_registrado = 0
+        self.arquivo = arquivo
+        self._arquivo = open(arquivo, 'ab') if arquivo else None
+    
+    def registrar(self, estrategia: TipoEstrategia, preco_final_brl: float,
+                  preco_final_usd: float, variacao_percentual: float, exposicao: int):
+        """Registra uma simulação, sobrescrevendo a mais antiga se cheio"""
+        posicao = self.total_registrado % self.capacidade
+        codigo = CODIGO_ESTRATEGIA[estrategia]
+        self.preco_final_brl[posicao] = preco_final_brl
+        self.preco_final_usd[posicao] = preco_final_usd
+        self.variacao_percentual[posicao] = variacao_percentual
+        self.estrategia[posicao] = codigo
+        self.exposicao[posicao] = exposicao
+        self.total_registrado += 1
+        
+        if self._arquivo is not None:
+            self._arquivo.write(self.FORMATO_REGISTRO.pack(
+                preco_final_brl, preco_final_usd, variacao_percentual, codigo, exposicao
+            ))
+    
+    def __len__(self) -> int:
+        return min(self.total_registrado, self.capacidade)
+    
+    def _posicao(self, indice: int) -> int:
+        """Posição no buffer do i-ésimo registro em ordem cronológica"""
+        tamanho = len(self)
+        if indice < 0:
+            indice += tamanho
+        if not 0 <= indice < tamanho:
+            raise IndexError("índice fora do histórico")
+        return (self.total_registrado - tamanho + indice) % self.capacidade
+    
+    def __getitem__(self, indice: int) -> RegistroHistorico:
+        posicao = self._posicao(indice)
+        return RegistroHistorico(
+            estrategia=ESTRATEGIA_POR_CODIGO[self.estrategia[posicao]],
+            preco_final_brl=self.preco_final_brl[posicao],
+            preco_final_usd=self.preco_final_usd[posicao],
+            variacao_percentual=self.variacao_percentual[posicao],
+            exposicao_risco=exposicao_da_mascara(self.exposicao[posicao])
+        )
+    
+    def __iter__(self):
+        for indice in range(len(self)):
+            yield self[indice]
+    
+    def colunas(self) -> Dict[str, np.ndarray]:
+        """Cópia das colunas em ordem cronológica"""
+        import numpy as np
+        inicio = self._posicao(0) if len(self) else 0
+        colunas = {}
+        for nome in ('preco_final_brl', 'preco_final_usd', 'variacao_percentual',
+                     'estrategia', 'exposicao'):
+            coluna = np.frombuffer(getattr(self, nome), dtype=getattr(self, nome).typecode)
+            colunas[nome] = np.roll(coluna, -inicio)[:len(self)]
+        return colunas
+    
+    def limpar(self):
+        """Descarta os registros em memória (o arquivo não é alterado)"""
+        self.total_registrado = 0
+    
+    def descarregar(self):
+        """Grava no disco os registros pendentes do arquivo"""
+        if self._arquivo is not None:
+            self._arquivo.flush()
+    
+    def fechar(self):
+        """Fecha o arquivo de registros, se houver
+        
+        Pode ser chamado mais de uma vez; registros seguintes ficam apenas
+        em memória.
+        """
+        # getattr: o __init__ pode ter falhado antes de abrir o arquivo
+        arquivo = getattr(self, '_arquivo', None)
+        if arquivo is not None:
+            self._arquivo = None
+            arquivo.close()
+    
+    def __enter__(self) -> 'HistoricoSimulacoes':
+        return self
+    
+    def __exit__(self, *excecao):
+        self.fechar()
+    
+    def __del__(self):
+        self.fechar()
+    
+    @classmethod
+    def ler_arquivo(cls, arquivo: str) -> np.ndarray:
+        """Lê um arquivo de registros como array estruturado"""
+        import numpy as np
+        return np.fromfile(arquivo, dtype=np.dtype(cls.DTYPE_REGISTRO))
+
+def fator_cenario(sinal, variacao_percentual):
+    """Fator multiplicativo de um cenário (1 + sinal * variação / 100)
+
+    Aceita escalares ou arrays; para ALTA/BAIXA/NEUTRO reproduz exatamente
+    as contas de `SimuladorSoja.calcular_valor_cenario`.
+    """
+    return 1 + sinal * (variacao_percentual / 100)
+
+def _parte_positiva(valor):
+    """max(valor, 0) para escalares e arrays"""
+    return (valor + abs(valor)) / 2
+
+def _funcoes_elementares(*valores):
+    """`math` quando todos os valores são escalares, numpy caso contrário
+    
+    Os dois módulos têm sqrt, log e exp com os mesmos nomes; o caminho
+    escalar (linha de comando, SimuladorSoja) não paga a importação do numpy
+    nem a sobrecarga de uma ufunc por operação.
+    """
+    for valor in valores:
+        if not isinstance(valor, (int, float)):
+            import numpy as np
+            return np
+    return math
+
+def normal_acumulada(x):
+    """Função de distribuição da normal padrão, escalar ou array
+    
+    Escalares usam `math.erfc`. Arrays usam a aproximação racional de Hart
+    (1968) na forma de West (2005): erro absoluto da ordem de 1e-16 e
+    relativo abaixo de 1e-8 nas caudas, sem depender do scipy.
+    """
+    if isinstance(x, (int, float)):
+        return 0.5 * math.erfc(-x / math.sqrt(2))
+    import numpy as np
+    x = np.asarray(x, dtype=np.float64)
+    absoluto = np.abs(x)
+    
+    numerador = 3.52624965998911e-02 * absoluto + 0.700383064443688
+    for coeficiente in (6.37396220353165, 33.912866078383, 112.079291497871,
+                        221.213596169931, 220.206867912376):
+        numerador = numerador * absoluto + coeficiente
+    denominador = 8.83883476483184e-02 * absoluto + 1.75566716318264
+    for coeficiente in (16.064177579207, 86.7807322029461, 296.564248779674,
+                        637.333633378831, 793.826512519948, 440.413735824752):
+        denominador = denominador * absoluto + coeficiente
+    
+    # Além de 10 / sqrt(2), fração contínua
+    fracao = absoluto + 0.65
+    for termo in (4, 3, 2, 1):
+        fracao = absoluto + termo / fracao
+    
+    gaussiana = np.exp(-absoluto * absoluto / 2)
+    cauda = np.where(absoluto < 7.07106781186547, gaussiana * numerador / denominador,
+                     gaussiana / fracao / 2.506628274631)
+    cauda = np.where(absoluto > 37, 0.0, cauda)
+    return np.where(x > 0, 1 - cauda, cauda)[()]
+
+def black76(futuro, strike, volatilidade, vencimento, juros, tipo: str = 'call'):
+    """Prêmio (valor presente) de uma opção europeia sobre futuro, pelo Black-76
+    
+    Escalares ou arrays combinados por broadcasting; `tipo` é 'call' ou 'put'.
+    """
+    if tipo not in ('call', 'put'):
+        raise ValueError("O tipo da opção deve ser 'call' ou 'put'")
+    funcoes = _funcoes_elementares(futuro, strike, volatilidade, vencimento, juros)
+    desvio = volatilidade * funcoes.sqrt(vencimento)
+    d1 = (funcoes.log(futuro / strike) + desvio * desvio / 2) / desvio
+    d2 = d1 - desvio
+    desconto = funcoes.exp(-juros * vencimento)
+    if tipo == 'call':
+        return desconto * (futuro * normal_acumulada(d1) - strike * normal_acumulada(d2))
+    return desconto * (strike * normal_acumulada(-d2) - futuro * normal_acumulada(-d1))
+
+def garman_kohlhagen(spot, strike, volatilidade, vencimento, juros_domestico, juros_estrangeiro,
+                     tipo: str = 'call'):
+    """Prêmio de uma opção de câmbio pelo Garman-Kohlhagen (moeda doméstica por unidade estrangeira)
+    
+    Equivale ao Black-76 sobre o câmbio a termo spot * exp((rd - rf) T),
+    descontado pelos juros domésticos.
+    """
+    funcoes = _funcoes_elementares(spot, vencimento, juros_domestico, juros_estrangeiro)
+    termo = spot * funcoes.exp((juros_domestico - juros_estrangeiro) * vencimento)
+    return black76(termo, strike, volatilidade, vencimento, juros_domestico, tipo)
+
+def termos_opcoes(estrategia: TipoEstrategia, tela_atual, dolar_atual,
+                  strike_put=PARAMETROS_OPCOES_PADRAO['strike_put'],
+                  strike_call=PARAMETROS_OPCOES_PADRAO['strike_call'],
+                  strike_dolar=PARAMETROS_OPCOES_PADRAO['strike_dolar'],
+                  vol_tela=PARAMETROS_OPCOES_PADRAO['vol_tela'],
+                  vol_dolar=PARAMETROS_OPCOES_PADRAO['vol_dolar'],
+                  vencimento=PARAMETROS_OPCOES_PADRAO['vencimento'],
+                  juros_usd=PARAMETROS_OPCOES_PADRAO['juros_usd'],
+                  juros_brl=PARAMETROS_OPCOES_PADRAO['juros_brl']):
+    """Strikes e custo no vencimento das opções de uma estratégia
+    
+    Retorna (strikes, custo): os strikes em valores da alavanca de
+    ALAVANCA_OPCOES (put e, no colar, call vendida) e o prêmio líquido
+    capitalizado até o vencimento, em USD por bushel nas opções sobre a tela
+    (Black-76 sobre o futuro de Chicago) e em BRL por USD de nocional nas de
+    dólar (Garman-Kohlhagen).
+    """
+    if ALAVANCA_OPCOES[estrategia] == 'tela':
+        strikes = (strike_put * tela_atual,)
+        custo = black76(tela_atual, strikes[0], vol_tela, vencimento, juros_usd, 'put')
+        if estrategia == TipoEstrategia.COLAR_SOJA_CHICAGO:
+            strikes += (strike_call * tela_atual,)
+            custo = custo - black76(tela_atual, strikes[1], vol_tela, vencimento, juros_usd, 'call')
+        juros = juros_usd
+    else:
+        strikes = (strike_dolar * dolar_atual,)
+        tipo = 'put' if estrategia == TipoEstrategia.PUT_DOLAR else 'call'
+        custo = garman_kohlhagen(dolar_atual, strikes[0], vol_dolar, vencimento, juros_brl, juros_usd, tipo)
+        juros = juros_brl
+    return strikes, custo * _funcoes_elementares(custo, juros, vencimento).exp(juros * vencimento)
+
+def precificar_estrategia(estrategia: TipoEstrategia,
+                          premio_cenario, tela_cenario, dolar_cenario,
+                          premio_atual, tela_atual, dolar_atual,
+                          hedge_dolar=RAZOES_HEDGE_PADRAO['hedge_dolar'],
+                          hedge_b3=RAZOES_HEDGE_PADRAO['hedge_b3'],
+                          hedge_chicago=RAZOES_HEDGE_PADRAO['hedge_chicago'],
+                          termos=None, **parametros_opcoes):
+    """Aplica a fórmula de preço de uma estratégia
+
+    É a única implementação da fórmula: o caminho escalar passa floats e o
+    caminho em lote passa arrays NumPy (com broadcasting), obtendo os mesmos
+    números (nas estratégias com opções, a menos do arredondamento da
+    distribuição normal). As razões de hedge só afetam a ESTRATEGIA_COMBINADA e os
+    `parametros_opcoes` (ver PARAMETROS_OPCOES_PADRAO) só as estratégias com
+    opções; todos também podem ser arrays, o que avalia uma grade de strikes
+    x vencimentos x cenários numa chamada. `termos` aceita o resultado de
+    `termos_opcoes` já calculado para esses parâmetros. Retorna
+    (preco_final_usd, preco_final_brl, variacao_percentual).
+    """
+    preco_usd_base = tela_cenario + premio_cenario
+    preco_brl_base = preco_usd_base * dolar_cenario
+    
+    # Valores atuais (sem cenário) para comparação
+    preco_atual_usd = tela_atual + premio_atual
+    preco_atual_brl = preco_atual_usd * dolar_atual
+    
+    preco_final_usd = preco_usd_base
+    preco_final_brl = preco_brl_base
+    
+    if estrategia == TipoEstrategia.TRAVAR_DOLAR:
+        # Trava o dólar no valor atual
+        preco_final_brl = preco_usd_base * dolar_atual
+        
+    elif estrategia == TipoEstrategia.TRAVAR_SOJA_B3:
+        # Trava o preço em reais
+        preco_final_brl = preco_atual_brl
+        preco_final_usd = preco_final_brl / dolar_cenario
+        
+    elif estrategia == TipoEstrategia.TRAVAR_SOJA_CHICAGO:
+        # Trava o preço em dólares
+        preco_final_usd = preco_atual_usd
+        preco_final_brl = preco_final_usd * dolar_cenario
+        
+    elif estrategia == TipoEstrategia.ESTRATEGIA_COMBINADA:
+        # Travamentos parciais: a fração hedge_b3 fica travada em reais; no
+        # restante, hedge_chicago do preço em dólares e hedge_dolar do câmbio
+        preco_usd_mercado = hedge_chicago * preco_atual_usd + (1 - hedge_chicago) * preco_usd_base
+        dolar_efetivo = hedge_dolar * dolar_atual + (1 - hedge_dolar) * dolar_cenario
+        preco_final_brl = hedge_b3 * preco_atual_brl + (1 - hedge_b3) * preco_usd_mercado * dolar_efetivo
+        preco_final_usd = hedge_b3 * (preco_atual_brl / dolar_cenario) + (1 - hedge_b3) * preco_usd_mercado
+        
+    elif estrategia in (TipoEstrategia.PUT_SOJA_CHICAGO, TipoEstrategia.COLAR_SOJA_CHICAGO):
+        # Put comprada dá um piso à tela (no colar, a call vendida dá um teto
+        # e financia parte da put); o prêmio líquido sai do preço em dólares
+        strikes, custo = termos or termos_opcoes(estrategia, tela_atual, dolar_atual, **parametros_opcoes)
+        preco_final_usd = preco_usd_base + _parte_positiva(strikes[0] - tela_cenario) - custo
+        if estrategia == TipoEstrategia.COLAR_SOJA_CHICAGO:
+            preco_final_usd = preco_final_usd - _parte_positiva(tela_cenario - strikes[1])
+        preco_final_brl = preco_final_usd * dolar_cenario
+        
+    elif estrategia in (TipoEstrategia.PUT_DOLAR, TipoEstrategia.CALL_DOLAR):
+        # Opção sobre o nocional fixo do preço atual em dólares
+        strikes, custo = termos or termos_opcoes(estrategia, tela_atual, dolar_atual, **parametros_opcoes)
+        if estrategia == TipoEstrategia.PUT_DOLAR:
+            payoff = _parte_positiva(strikes[0] - dolar_cenario)
+        else:
+            payoff = _parte_positiva(dolar_cenario - strikes[0])
+        preco_final_brl = preco_brl_base + preco_atual_usd * (payoff - custo)
+        preco_final_usd = preco_final_brl / dolar_cenario
+    
+    # Calcula variação percentual em relação ao preço atual
+    variacao_percentual = ((preco_final_brl - preco_atual_brl) / preco_atual_brl) * 100
+    
+    return preco_final_usd, preco_final_brl, variacao_percentual
+
+def detalhes_estrategia(estrategia: TipoEstrategia,
+                        premio_cenario: float, tela_cenario: float, dolar_cenario: float,
+                        premio_atual: float, tela_atual: float, dolar_atual: float,
+                        razoes: Dict[str, float], termos=None) -> Tuple[float, ...]:
+    """Valores de detalhes_calculo, na ordem de CHAVES_DETALHES e das chaves da estratégia"""
+    preco_usd_base = tela_cenario + premio_cenario
+    detalhes = (premio_cenario, tela_cenario, dolar_cenario,
+                preco_usd_base, preco_usd_base * dolar_cenario)
+    
+    if estrategia == TipoEstrategia.TRAVAR_DOLAR:
+        detalhes += (dolar_atual,)
+    elif estrategia == TipoEstrategia.TRAVAR_SOJA_B3:
+        detalhes += ((tela_atual + premio_atual) * dolar_atual,)
+    elif estrategia == TipoEstrategia.TRAVAR_SOJA_CHICAGO:
+        detalhes += (tela_atual + premio_atual,)
+    elif estrategia == TipoEstrategia.ESTRATEGIA_COMBINADA:
+        detalhes += (razoes['hedge_dolar'], razoes['hedge_b3'], razoes['hedge_chicago'])
+    elif estrategia in ALAVANCA_OPCOES:
+        strikes, custo = termos or termos_opcoes(estrategia, tela_atual, dolar_atual,
+                                                 **{nome: razoes[nome] for nome in PARAMETROS_OPCOES_PADRAO})
+        if estrategia in (TipoEstrategia.PUT_DOLAR, TipoEstrategia.CALL_DOLAR):
+            custo = custo * (tela_atual + premio_atual)
+        detalhes += strikes + (custo,)
+    return detalhes
+
+def codificar_cenarios(cenarios) -> np.ndarray:
+    """Converte cenários (TipoCenario, texto ou sinais -1/0/1) em array de sinais
+
+    Textos fora de TipoCenario e números diferentes de -1, 0 e 1 levantam
+    ValueError, em vez de virarem neutro ou um choque multiplicado.
+    """
+    import numpy as np
+    if isinstance(cenarios, TipoCenario):
+        return np.asarray(SINAL_CENARIO[cenarios], dtype=np.int8)
+    if isinstance(cenarios, str):
+        return np.asarray(SINAL_CENARIO[TipoCenario(cenarios)], dtype=np.int8)
+    
+    cenarios = np.asarray(cenarios)
+    if cenarios.dtype.kind in 'iuf':
+        invalidos = ~np.isin(cenarios, (-1, 0, 1))
+        if invalidos.any():
+            raise ValueError(f"Sinais de cenário devem ser -1, 0 ou 1, recebido {cenarios[invalidos][0]}")
+        return cenarios.astype(np.int8)
+    
+    # Arrays de texto ou de TipoCenario
+    sinais = np.zeros(cenarios.shape, dtype=np.int8)
+    reconhecidos = np.zeros(cenarios.shape, dtype=bool)
+    for cenario, sinal in SINAL_CENARIO.items():
+        mascara = (cenarios == cenario.value) | (cenarios == cenario)
+        sinais[mascara] = sinal
+        reconhecidos |= mascara
+    if not reconhecidos.all():
+        desconhecidos = sorted({str(c) for c in cenarios[~reconhecidos]})
+        raise ValueError(f"Cenários desconhecidos: {', '.join(desconhecidos)}")
+    return sinais
+
+@cronometrado('simulador.calcular_lote')
+def calcular_lote(valores: Dict[str, np.ndarray], sinais: Dict[str, np.ndarray],
+                  variacoes: Dict[str, np.ndarray],
+                  estrategias: List[TipoEstrategia],
+                  razoes_hedge: Optional[Dict[str, np.ndarray]] = None) -> ResultadoLote:
+    """Avalia todas as estratégias sobre arrays de alavancas em uma passada
+
+    `valores`, `sinais` e `variacoes` são indexados pelo nome da alavanca
+    ('premio', 'tela', 'dolar') e combinados por broadcasting, assim como as
+    `razoes_hedge` da estratégia combinada e os parâmetros das opções
+    (strikes, volatilidades, vencimento e juros), que podem formar grades.
+    """
+    import numpy as np
+    razoes_hedge = validar_razoes_hedge(razoes_hedge or {})
+    atuais = {nome: np.asarray(valores[nome], dtype=np.float64) for nome in valores}
+    cenarios = {
+        nome: atuais[nome] * fator_cenario(np.asarray(sinais[nome], dtype=np.float64),
+                                           np.asarray(variacoes[nome], dtype=np.float64))
+        for nome in atuais
+    }
+    forma = np.broadcast_shapes(*(v.shape for v in cenarios.values()),
+                                *(np.shape(r) for r in razoes_hedge.values()))
+    
+    preco_final_brl = np.empty((len(estrategias),) + forma)
+    preco_final_usd = np.empty((len(estrategias),) + forma)
+    variacao_percentual = np.empty((len(estrategias),) + forma)
+    
+    for i, estrategia in enumerate(estrategias):
+        preco_usd, preco_brl, variacao = precificar_estrategia(
+            estrategia,
+            cenarios['premio'], cenarios['tela'], cenarios['dolar'],
+            atuais['premio'], atuais['tela'], atuais['dolar'],
+            **razoes_hedge
+        )
+        preco_final_usd[i] = preco_usd
+        preco_final_brl[i] = preco_brl
+        variacao_percentual[i] = variacao
+    
+    return ResultadoLote(
+        estrategias=list(estrategias),
+        preco_final_brl=preco_final_brl,
+        preco_final_usd=preco_final_usd,
+        variacao_percentual=variacao_percentual
+    )
+
+# Ordem padrão das alavancas nas APIs vetorizadas
+NOMES_ALAVANCAS = ('premio', 'tela', 'dolar')
+
+@dataclass(frozen=True)
+class EstadoAlavancas:
+    """Fotografia imutável (e hashable) do estado das três alavancas"""
+    premio: float
+    tela: float
+    dolar: float
+    cenario_premio: TipoCenario = TipoCenario.NEUTRO
+    variacao_premio: float = 0.0
+    cenario_tela: TipoCenario = TipoCenario.NEUTRO
+    variacao_tela: float = 0.0
+    cenario_dolar: TipoCenario = TipoCenario.NEUTRO
+    variacao_dolar: float = 0.0
+    
+    def valores(self) -> Dict[str, float]:
+        """Valores atuais por alavanca"""
+        return {nome: getattr(self, nome) for nome in NOMES_ALAVANCAS}
+    
+    def sinais(self) -> Dict[str, int]:
+        """Sinal do cenário por alavanca"""
+        return {nome: SINAL_CENARIO[getattr(self, f'cenario_{nome}')] for nome in NOMES_ALAVANCAS}
+    
+    def variacoes(self) -> Dict[str, float]:
+        """Variação percentual por alavanca"""
+        return {nome: getattr(self, f'variacao_{nome}') for nome in NOMES_ALAVANCAS}
+    
+    def impressao_digital(self) -> Tuple:
+        """Chave canônica das nove entradas (valor, cenário, variação x 3)
+        
+        Estados equivalentes geram a mesma chave: a variação de um cenário
+        NEUTRO é ignorada e os números são normalizados para float.
+        """
+        chave = []
+        for nome in NOMES_ALAVANCAS:
+            cenario = getattr(self, f'cenario_{nome}')
+            variacao = 0.0 if cenario == TipoCenario.NEUTRO else float(getattr(self, f'variacao_{nome}'))
+            chave.extend((float(getattr(self, nome)) + 0.0, cenario.value, variacao + 0.0))
+        return tuple(chave)
+
+@dataclass
+class ResultadoSensibilidade:
+    """Curvas de sensibilidade uma-alavanca-por-vez
+    
+    `preco_final_brl` tem forma (alavancas, estratégias, variações): a curva
+    [a, e] é o preço da estratégia e quando só a alavanca a recebe o choque
+    percentual da grade, com as demais no cenário atual.
+    """
+    alavancas: Tuple[str, ...]
+    estrategias: List[TipoEstrategia]
+    variacoes: np.ndarray
+    preco_final_brl: np.ndarray
+    
+    def curva(self, alavanca: str, estrategia: TipoEstrategia) -> np.ndarray:
+        """Curva de preço de uma alavanca para uma estratégia"""
+        return self.preco_final_brl[self.alavancas.index(alavanca), self.estrategias.index(estrategia)]
+    
+    def ranking_tornado(self, estrategia: TipoEstrategia) -> List[Tuple[str, float, float, float]]:
+        """Alavancas ordenadas pelo impacto no preço (gráfico tornado)
+        
+        Retorna tuplas (alavanca, preço mínimo, preço máximo, amplitude),
+        da maior para a menor amplitude.
+        """
+        curvas = self.preco_final_brl[:, self.estrategias.index(estrategia)]
+        minimos = curvas.min(axis=1)
+        maximos = curvas.max(axis=1)
+        ranking = [
+            (alavanca, float(minimos[i]), float(maximos[i]), float(maximos[i] - minimos[i]))
+            for i, alavanca in enumerate(self.alavancas)
+        ]
+        return sorted(ranking, key=lambda item: item[3], reverse=True)
+
+@cronometrado('simulador.analisar_sensibilidade')
+def analisar_sensibilidade(estado: EstadoAlavancas,
+                           variacoes=None,
+                           estrategias: Optional[List[TipoEstrategia]] = None) -> ResultadoSensibilidade:
+    """Calcula as curvas de sensibilidade de todas as alavancas em uma passada
+    
+    Cada ponto v da grade (em %, com sinal) coloca a alavanca em ALTA com
+    |v| se v >= 0 ou em BAIXA com |v| caso contrário, mantendo as demais no
+    cenário de `estado`. Não depende de nenhum simulador e não tem efeitos
+    colaterais; os números são os mesmos do caminho escalar.
+    """
+    import numpy as np
+    if variacoes is None:
+        variacoes = np.arange(-20, 21, 5)
+    if estrategias is None:
+        estrategias = list(TipoEstrategia)
+    variacoes = np.asarray(variacoes, dtype=np.float64)
+    
+    sinais_estado = estado.sinais()
+    variacoes_estado = estado.variacoes()
+    sinais_choque = np.where(variacoes >= 0, 1, -1)
+    
+    # Linha i da grade (alavancas x variações) aplica o choque na alavanca i
+    sinais = {}
+    variacoes_lote = {}
+    for i, nome in enumerate(NOMES_ALAVANCAS):
+        chocada = (np.arange(len(NOMES_ALAVANCAS)) == i)[:, None]
+        sinais[nome] = np.where(chocada, sinais_choque, sinais_estado[nome])
+        variacoes_lote[nome] = np.where(chocada, np.abs(variacoes), variacoes_estado[nome])
+    
+    lote = calcular_lote(estado.valores(), sinais, variacoes_lote, estrategias)
+    
+    return ResultadoSensibilidade(
+        alavancas=NOMES_ALAVANCAS,
+        estrategias=list(estrategias),
+        variacoes=variacoes,
+        preco_final_brl=lote.preco_final_brl.transpose(1, 0, 2)
+    )
+
+@dataclass
+class ResultadoGradeHedge:
+    """Preços da estratégia combinada sobre uma grade de razões de hedge
+    
+    Os arrays de preço têm forma (len(hedge_dolar), len(hedge_b3),
+    len(hedge_chicago)).
+    """
+    hedge_dolar: np.ndarray
+    hedge_b3: np.ndarray
+    hedge_chicago: np.ndarray
+    preco_final_brl: np.ndarray
+    preco_final_usd: np.ndarray
+    variacao_percentual: np.ndarray
+    
+    def melhor(self) -> Dict[str, float]:
+        """Combinação de razões com o maior preço final em BRL"""
+        import numpy as np
+        i, j, k = np.unravel_index(np.argmax(self.preco_final_brl), self.preco_final_brl.shape)
+        return {
+            'hedge_dolar': float(self.hedge_dolar[i]),
+            'hedge_b3': float(self.hedge_b3[j]),
+            'hedge_chicago': float(self.hedge_chicago[k]),
+            'preco_final_brl': float(self.preco_final_brl[i, j, k])
+        }
+
+@cronometrado('simulador.calcular_grade_hedge')
+def calcular_grade_hedge(estado: EstadoAlavancas,
+                         hedge_dolar=None, hedge_b3=None, hedge_chicago=None) -> ResultadoGradeHedge:
+    """Avalia a estratégia combinada em todas as combinações de razões
+    
+    Cada eixo é um array de razões entre 0 e 1 (padrão: 101 pontos); a
+    grade completa (101³ pontos por padrão) é calculada em uma passada.
+    """
+    import numpy as np
+    eixos = [
+        np.linspace(0.0, 1.0, 101) if eixo is None else np.asarray(eixo, dtype=np.float64).ravel()
+        for eixo in (hedge_dolar, hedge_b3, hedge_chicago)
+    ]
+    lote = calcular_lote(
+        estado.valores(), estado.sinais(), estado.variacoes(),
+        [TipoEstrategia.ESTRATEGIA_COMBINADA],
+        {
+            'hedge_dolar': eixos[0][:, None, None],
+            'hedge_b3': eixos[1][None, :, None],
+            'hedge_chicago': eixos[2][None, None, :]
+        }
+    )
+    return ResultadoGradeHedge(
+        hedge_dolar=eixos[0],
+        hedge_b3=eixos[1],
+        hedge_chicago=eixos[2],
+        preco_final_brl=lote.preco_final_brl[0],
+        preco_final_usd=lote.preco_final_usd[0],
+        variacao_percentual=lote.variacao_percentual[0]
+    )
+
+# Razões de hedge equivalentes a cada estratégia pura: todas são casos da
+# combinada (hedge_dolar, hedge_b3, hedge_chicago)
+RAZOES_EQUIVALENTES = {
+    TipoEstrategia.SEM_TRAVAMENTO: (0.0, 0.0, 0.0),
+    TipoEstrategia.TRAVAR_DOLAR: (1.0, 0.0, 0.0),
+    TipoEstrategia.TRAVAR_SOJA_B3: (0.0, 1.0, 0.0),
+    TipoEstrategia.TRAVAR_SOJA_CHICAGO: (0.0, 0.0, 1.0)
+}
+
+@dataclass
+class ResultadoDerivadas:
+    """Derivadas analíticas do preço final em BRL
+    
+    As derivadas são em relação ao valor de cada alavanca no cenário (o
+    preço de mercado), com os valores travados (os atuais) fixos. `delta`
+    tem forma (estratégias, alavancas, *forma_lote) e `gama` (estratégias,
+    alavancas, alavancas, *forma_lote), com as alavancas em NOMES_ALAVANCAS.
+    `escala` (alavancas, *forma_lote) é o valor atual / 100: multiplicada
+    pelas derivadas dá a sensibilidade a um choque de 1 ponto percentual.
+    """
+    estrategias: List[TipoEstrategia]
+    alavancas: Tuple[str, ...]
+    delta: np.ndarray
+    gama: np.ndarray
+    escala: np.ndarray
+    
+    def delta_de(self, estrategia: TipoEstrategia, alavanca: str) -> np.ndarray:
+        """dP/dx de uma estratégia em relação a uma alavanca"""
+        return self.delta[self.estrategias.index(estrategia), self.alavancas.index(alavanca)]
+    
+    def gama_de(self, estrategia: TipoEstrategia, alavanca: str, outra: Optional[str] = None) -> np.ndarray:
+        """d²P/dx dy de uma estratégia (dx² quando `outra` é omitida)"""
+        return self.gama[self.estrategias.index(estrategia), self.alavancas.index(alavanca),
+                         self.alavancas.index(outra or alavanca)]
+    
+    def por_choque(self) -> 'ResultadoDerivadas':
+        """Derivadas em relação ao choque percentual de cada alavanca (BRL por 1%)"""
+        import numpy as np
+        escala = self.escala
+        return ResultadoDerivadas(
+            estrategias=self.estrategias,
+            alavancas=self.alavancas,
+            delta=self.delta * escala,
+            gama=self.gama * escala[:, None] * escala[None, :],
+            escala=np.ones_like(escala)
+        )
+
+@cronometrado('simulador.sensibilidades')
+def sensibilidades(valores: Dict[str, np.ndarray], sinais: Dict[str, np.ndarray],
+                   variacoes: Dict[str, np.ndarray],
+                   estrategias: Optional[List[TipoEstrategia]] = None,
+                   razoes_hedge: Optional[Dict[str, np.ndarray]] = None) -> ResultadoDerivadas:
+    """Deltas e gamas (inclusive cruzados) exatos de cada estratégia, em lote
+    
+    Mesmas entradas de `calcular_lote`, combinadas por broadcasting. Com
+    U = tela + prêmio e D = dólar (no cenário; U0 e D0 atuais), toda
+    estratégia é P = hb·U0·D0 + (1 - hb)·Um·De, onde Um = hc·U0 + (1 - hc)·U
+    e De = hd·D0 + (1 - hd)·D. Daí dP/dprêmio = dP/dtela = (1 - hb)(1 - hc)·De,
+    dP/ddólar = (1 - hb)(1 - hd)·Um e o único gama não nulo é o cruzado
+    d²P/dU dD = (1 - hb)(1 - hc)(1 - hd).
+    
+    As estratégias com opções são afins por partes na alavanca das opções
+    (o payoff é avaliado no vencimento): as derivadas são as do trecho à
+    direita do ponto, com a inclinação do payoff (0 ou ±1) no lugar das
+    razões de hedge, e os gamas próprios são nulos fora dos strikes.
+    """
+    import numpy as np
+    if estrategias is None:
+        estrategias = list(TipoEstrategia)
+    razoes_hedge = validar_razoes_hedge(razoes_hedge or {})
+    atuais = {nome: np.asarray(valores[nome], dtype=np.float64) for nome in NOMES_ALAVANCAS}
+    cenarios = {
+        nome: atuais[nome] * fator_cenario(np.asarray(sinais[nome], dtype=np.float64),
+                                           np.asarray(variacoes[nome], dtype=np.float64))
+        for nome in NOMES_ALAVANCAS
+    }
+    forma = np.broadcast_shapes(*(v.shape for v in cenarios.values()),
+                                *(np.shape(r) for r in razoes_hedge.values()))
+    
+    preco_atual_usd = atuais['tela'] + atuais['premio']
+    preco_usd_base = cenarios['tela'] + cenarios['premio']
+    
+    delta = np.zeros((len(estrategias), len(NOMES_ALAVANCAS)) + forma)
+    gama = np.zeros((len(estrategias), len(NOMES_ALAVANCAS), len(NOMES_ALAVANCAS)) + forma)
+    parametros_opcoes = {nome: razoes_hedge[nome] for nome in PARAMETROS_OPCOES_PADRAO}
+    for i, estrategia in enumerate(estrategias):
+        if estrategia in ALAVANCA_OPCOES:
+            strikes, _ = termos_opcoes(estrategia, atuais['tela'], atuais['dolar'], **parametros_opcoes)
+            if ALAVANCA_OPCOES[estrategia] == 'tela':
+                # BRL = (prêmio + tela + put - call - custo) * dólar
+                inclinacao = 1.0 - (cenarios['tela'] < strikes[0])
+                if estrategia == TipoEstrategia.COLAR_SOJA_CHICAGO:
+                    inclinacao = inclinacao - (cenarios['tela'] >= strikes[1])
+                preco_usd, _, _ = precificar_estrategia(
+                    estrategia,
+                    cenarios['premio'], cenarios['tela'], cenarios['dolar'],
+                    atuais['premio'], atuais['tela'], atuais['dolar'],
+                    **razoes_hedge
+                )
+                delta[i, 0] = cenarios['dolar']
+                delta[i, 1] = inclinacao * cenarios['dolar']
+                delta[i, 2] = preco_usd
+                gama[i, 0, 2] = gama[i, 2, 0] = 1.0
+                gama[i, 1, 2] = gama[i, 2, 1] = inclinacao
+            else:
+                # BRL = (prêmio + tela) * dólar + nocional * (payoff - custo)
+                if estrategia == TipoEstrategia.PUT_DOLAR:
+                    inclinacao = -1.0 * (cenarios['dolar'] < strikes[0])
+                else:
+                    inclinacao = 1.0 * (cenarios['dolar'] >= strikes[0])
+                delta[i, 0] = delta[i, 1] = cenarios['dolar']
+                delta[i, 2] = preco_usd_base + preco_atual_usd * inclinacao
+                gama[i, 0, 2] = gama[i, 2, 0] = gama[i, 1, 2] = gama[i, 2, 1] = 1.0
+            continue
+        
+        if estrategia == TipoEstrategia.ESTRATEGIA_COMBINADA:
+            hedge_dolar = razoes_hedge['hedge_dolar']
+            hedge_b3 = razoes_hedge['hedge_b3']
+            hedge_chicago = razoes_hedge['hedge_chicago']
+        else:
+            hedge_dolar, hedge_b3, hedge_chicago = RAZOES_EQUIVALENTES[estrategia]
+        
+        livre_usd = (1 - hedge_b3) * (1 - hedge_chicago)
+        livre_dolar = (1 - hedge_b3) * (1 - hedge_dolar)
+        preco_usd_mercado = hedge_chicago * preco_atual_usd + (1 - hedge_chicago) * preco_usd_base
+        dolar_efetivo = hedge_dolar * atuais['dolar'] + (1 - hedge_dolar) * cenarios['dolar']
+        
+        delta[i, 0] = delta[i, 1] = livre_usd * dolar_efetivo
+        delta[i, 2] = livre_dolar * preco_usd_mercado
+        cruzado = livre_usd * (1 - hedge_dolar)
+        gama[i, 0, 2] = gama[i, 2, 0] = gama[i, 1, 2] = gama[i, 2, 1] = cruzado
+    
+    return ResultadoDerivadas(
+        estrategias=list(estrategias),
+        alavancas=NOMES_ALAVANCAS,
+        delta=delta,
+        gama=gama,
+        escala=np.stack([np.broadcast_to(atuais[nome] / 100, forma) for nome in NOMES_ALAVANCAS])
+    )
+
+# Resolução padrão de cada eixo do mapa de dominância
+PONTOS_MAPA_PADRAO = 1000
+
+@dataclass
+class ResultadoMapaDominancia:
+    """Estratégia vencedora em cada célula de uma grade de duas alavancas
+    
+    `eixo_x` e `eixo_y` são valores de mercado (no cenário) das alavancas
+    `alavanca_x` e `alavanca_y`; a terceira fica em `valor_fixo`. `vencedora`
+    (forma (len(eixo_y), len(eixo_x)), como o z de um heatmap) guarda o
+    índice em `estrategias` da de maior preço final em BRL e `margem` a
+    diferença para a segunda colocada, em BRL (zero em empates, que ficam
+    com a primeira na ordem de `estrategias`).
+    """
+    alavanca_x: str
+    alavanca_y: str
+    eixo_x: np.ndarray
+    eixo_y: np.ndarray
+    alavanca_fixa: str
+    valor_fixo: float
+    estrategias: List[TipoEstrategia]
+    vencedora: np.ndarray
+    margem: np.ndarray
+    
+    def estrategia_em(self, x: float, y: float) -> Tuple[TipoEstrategia, float]:
+        """Vencedora e margem na célula mais próxima de (x, y)"""
+        import numpy as np
+        i = int(np.abs(self.eixo_y - y).argmin())
+        j = int(np.abs(self.eixo_x - x).argmin())
+        return self.estrategias[self.vencedora[i, j]], float(self.margem[i, j])
+    
+    def fracoes(self) -> Dict[TipoEstrategia, float]:
+        """Fração das células em que cada estratégia vence"""
+        import numpy as np
+        contagens = np.bincount(self.vencedora.ravel(), minlength=len(self.estrategias))
+        return {estrategia: float(contagens[i] / self.vencedora.size)
+                for i, estrategia in enumerate(self.estrategias)}
+    
+    def reduzir(self, max_x: int, max_y: int) -> 'ResultadoMapaDominancia':
+        """Amostra a grade em no máximo max_x x max_y células (para exibição)
+        
+        Pega linhas e colunas igualmente espaçadas, incluindo as bordas, em
+        vez de agregar: cada célula exibida mantém os valores exatos do
+        ponto que representa.
+        """
+        import numpy as np
+        def amostrar(tamanho, maximo):
+            return np.unique(np.linspace(0, tamanho - 1, min(maximo, tamanho)).round().astype(np.intp))
+        
+        colunas = amostrar(len(self.eixo_x), max_x)
+        linhas = amostrar(len(self.eixo_y), max_y)
+        return replace(
+            self,
+            eixo_x=self.eixo_x[colunas],
+            eixo_y=self.eixo_y[linhas],
+            vencedora=self.vencedora[np.ix_(linhas, colunas)],
+            margem=self.margem[np.ix_(linhas, colunas)]
+        )
+
+@cronometrado('simulador.mapa_dominancia')
+def calcular_mapa_dominancia(estado: EstadoAlavancas, alavanca_x: str, eixo_x,
+                             alavanca_y: str, eixo_y,
+                             estrategias: Optional[List[TipoEstrategia]] = None,
+                             razoes_hedge: Optional[Dict[str, float]] = None) -> ResultadoMapaDominancia:
+    """Compara as estratégias em todas as combinações de duas alavancas
+    
+    Os eixos são valores de mercado das alavancas x e y; os valores travados
+    são os atuais de `estado` e a terceira alavanca fica no seu valor de
+    cenário. Cada estratégia é precificada sobre a grade inteira por
+    broadcasting, mantendo só a melhor e a segunda melhor até ali: a memória
+    é de poucos arrays do tamanho da grade, qualquer que seja o número de
+    estratégias.
+    """
+    import numpy as np
+    if alavanca_x == alavanca_y or {alavanca_x, alavanca_y} - set(NOMES_ALAVANCAS):
+        raise ValueError(f"Escolha duas alavancas distintas entre: {', '.join(NOMES_ALAVANCAS)}")
+    if estrategias is None:
+        estrategias = list(TipoEstrategia)
+    razoes_hedge = validar_razoes_hedge(razoes_hedge or {})
+    
+    atuais = estado.valores()
+    sinais = estado.sinais()
+    variacoes = estado.variacoes()
+    alavanca_fixa = next(nome for nome in NOMES_ALAVANCAS if nome not in (alavanca_x, alavanca_y))
+    eixo_x = np.asarray(eixo_x, dtype=np.float64).ravel()
+    eixo_y = np.asarray(eixo_y, dtype=np.float64).ravel()
+    cenarios = {
+        alavanca_x: eixo_x[None, :],
+        alavanca_y: eixo_y[:, None],
+        alavanca_fixa: atuais[alavanca_fixa] * fator_cenario(sinais[alavanca_fixa], variacoes[alavanca_fixa])
+    }
+    
+    forma = (len(eixo_y), len(eixo_x))
+    melhor = np.full(forma, -np.inf)
+    segunda = np.full(forma, -np.inf)
+    vencedora = np.zeros(forma, dtype=np.int8)
+    for i, estrategia in enumerate(estrategias):
+        _, preco_brl, _ = precificar_estrategia(
+            estrategia,
+            cenarios['premio'], cenarios['tela'], cenarios['dolar'],
+            atuais['premio'], atuais['tela'], atuais['dolar'],
+            **razoes_hedge
+        )
+        preco_brl = np.broadcast_to(preco_brl, forma)
+        supera = preco_brl > melhor
+        np.copyto(segunda, np.where(supera, melhor, np.maximum(segunda, preco_brl)))
+        np.copyto(melhor, preco_brl, where=supera)
+        vencedora[supera] = i
+    
+    return ResultadoMapaDominancia(
+        alavanca_x=alavanca_x,
+        alavanca_y=alavanca_y,
+        eixo_x=eixo_x,
+        eixo_y=eixo_y,
+        alavanca_fixa=alavanca_fixa,
+        valor_fixo=float(cenarios[alavanca_fixa]),
+        estrategias=list(estrategias),
+        vencedora=vencedora,
+        margem=melhor - segunda if len(estrategias) > 1 else np.full(forma, np.inf)
+    )
 
 class SimuladorSoja:
     """Simulador principal para estratégias de soja"""
     
-    def __init__(self):
-        """Inicializa o simulador com valores padrão"""
+    def __init__(self, capacidade_historico: int = 1000, arquivo_historico: Optional[str] = None):
+        """Inicializa o simulador com valores padrão
+        
+        O histórico guarda as últimas `capacidade_historico` simulações; com
+        `arquivo_historico` todas também são anexadas a esse arquivo binário.
+        """
         self.alavancas = {
             'premio': Alavanca(
                 nome="Prêmio",
@@ -74,7 +1174,53 @@ class SimuladorSoja:
         }
         
         self.preco_referencia_brl = 0.0
-        self.historico_simulacoes = []
+        self.historico_simulacoes = HistoricoSimulacoes(capacidade_historico, arquivo_historico)
+        
+        # Cache dos valores no cenário e do preço base; None indica que as
+        # alavancas mudaram desde o último cálculo
+        self._cache_cenarios: Optional[Dict[str, float]] = None
+        self._cache_preco_base: Optional[Tuple[float, float]] = None
+        self.acertos_cache = 0
+        self.falhas_cache = 0
+    
+    def _invalidar_cache(self):
+        """Descarta os valores calculados após mudança em alguma alavanca"""
+        self._cache_cenarios = None
+        self._cache_preco_base = None
+    
+    def fechar(self):
+        """Fecha o arquivo do histórico (veja HistoricoSimulacoes.fechar)"""
+        self.historico_simulacoes.fechar()
+    
+    def __enter__(self) -> 'SimuladorSoja':
+        return self
+    
+    def __exit__(self, *excecao):
+        self.fechar()
+    
+    def estatisticas_cache(self) -> Dict[str, int]:
+        """Retorna os contadores de acerto e falha do cache de cenários"""
+        return {
+            'acertos': self.acertos_cache,
+            'falhas': self.falhas_cache
+        }
+    
+    def obter_estado(self) -> EstadoAlavancas:
+        """Retorna uma fotografia imutável do estado das alavancas"""
+        premio = self.alavancas['premio']
+        tela = self.alavancas['tela']
+        dolar = self.alavancas['dolar']
+        return EstadoAlavancas(
+            premio=premio.valor_atual,
+            tela=tela.valor_atual,
+            dolar=dolar.valor_atual,
+            cenario_premio=premio.cenario,
+            variacao_premio=premio.variacao_percentual,
+            cenario_tela=tela.cenario,
+            variacao_tela=tela.variacao_percentual,
+            cenario_dolar=dolar.cenario,
+            variacao_dolar=dolar.variacao_percentual
+        )
     
     def definir_valor_alavanca(self, nome_alavanca: str, valor: float) -> bool:
         """Define o valor atual de uma alavanca"""
@@ -83,7 +1229,9 @@ class SimuladorSoja:
         
         alavanca = self.alavancas[nome_alavanca]
         if alavanca.valor_minimo <= valor <= alavanca.valor_maximo:
-            alavanca.valor_atual = valor
+            if valor != alavanca.valor_atual:
+                alavanca.valor_atual = valor
+                self._invalidar_cache()
             return True
         return False
     
@@ -93,110 +1241,213 @@ class SimuladorSoja:
             return False
         
         alavanca = self.alavancas[nome_alavanca]
-        alavanca.cenario = cenario
-        alavanca.variacao_percentual = variacao_percentual
+        if cenario != alavanca.cenario or variacao_percentual != alavanca.variacao_percentual:
+            alavanca.cenario = cenario
+            alavanca.variacao_percentual = variacao_percentual
+            self._invalidar_cache()
         return True
     
+    def _valores_cenario(self) -> Dict[str, float]:
+        """Valores de todas as alavancas no cenário, calculados uma vez por configuração
+        
+        O cache só é invalidado pelos métodos definir_*; alterações feitas
+        diretamente nos objetos Alavanca não são percebidas.
+        """
+        if self._cache_cenarios is not None:
+            self.acertos_cache += 1
+            return self._cache_cenarios
+        
+        self.falhas_cache += 1
+        contar('simulador.recalculo_cenarios')
+        cenarios = {}
+        for nome, alavanca in self.alavancas.items():
+            valor_base = alavanca.valor_atual
+            
+            if alavanca.cenario == TipoCenario.ALTA:
+                cenarios[nome] = valor_base * (1 + alavanca.variacao_percentual / 100)
+            elif alavanca.cenario == TipoCenario.BAIXA:
+                cenarios[nome] = valor_base * (1 - alavanca.variacao_percentual / 100)
+            else:  # NEUTRO
+                cenarios[nome] = valor_base
+        
+        self._cache_cenarios = cenarios
+        return cenarios
+    
     def calcular_valor_cenario(self, nome_alavanca: str) -> float:
         """Calcula o valor da alavanca considerando o cenário definido"""
-        alavanca = self.alavancas[nome_alavanca]
-        valor_base = alavanca.valor_atual
-        
-        if alavanca.cenario == TipoCenario.ALTA:
-            return valor_base * (1 + alavanca.variacao_percentual / 100)
-        elif alavanca.cenario == TipoCenario.BAIXA:
-            return valor_base * (1 - alavanca.variacao_percentual / 100)
-        else:  # NEUTRO
-            return valor_base
+        return self._valores_cenario()[nome_alavanca]
     
     def calcular_preco_base(self) -> Tuple[float, float]:
         """Calcula preço base em USD e BRL considerando os cenários"""
-        premio_cenario = self.calcular_valor_cenario('premio')
-        tela_cenario = self.calcular_valor_cenario('tela')
-        dolar_cenario = self.calcular_valor_cenario('dolar')
-        
-        preco_usd = tela_cenario + premio_cenario
-        preco_brl = preco_usd * dolar_cenario
+        if self._cache_preco_base is None:
+            cenarios = self._valores_cenario()
+            preco_usd = cenarios['tela'] + cenarios['premio']
+            preco_brl = preco_usd * cenarios['dolar']
+            self._cache_preco_base = (preco_usd, preco_brl)
         
-        return preco_usd, preco_brl
+        return self._cache_preco_base
     
-    def simular_estrategia(self, estrategia: TipoEstrategia, **kwargs) -> ResultadoSimulacao:
-        """Simula uma estratégia específica"""
-        preco_usd_base, preco_brl_base = self.calcular_preco_base()
-        
-        # Valores atuais (sem cenário) para comparação
-        preco_atual_usd = self.alavancas['tela'].valor_atual + self.alavancas['premio'].valor_atual
-        preco_atual_brl = preco_atual_usd * self.alavancas['dolar'].valor_atual
+    @cronometrado('simulador.simular_estrategia')
+    def simular_estrategia(self, estrategia: TipoEstrategia, registrar: bool = True, **kwargs) -> ResultadoSimulacao:
+        """Simula uma estratégia específica
         
-        exposicao_risco = {
-            'premio': True,
-            'tela': True,
-            'dolar': True
-        }
+        Com `registrar=False` o resultado não entra no histórico (útil para
+        avaliações descartáveis, como varreduras de sensibilidade). Para a
+        ESTRATEGIA_COMBINADA, `hedge_dolar`, `hedge_b3` e `hedge_chicago`
+        (entre 0 e 1) definem as frações travadas; omitidas, valem os
+        RAZOES_HEDGE_PADRAO. As estratégias com opções leem os
+        PARAMETROS_OPCOES_PADRAO. Só os parâmetros usados pela estratégia são
+        validados; os demais `kwargs` são ignorados, como sempre foram.
+        """
+        if estrategia == TipoEstrategia.ESTRATEGIA_COMBINADA:
+            usados = RAZOES_HEDGE_PADRAO
+        elif estrategia in ALAVANCA_OPCOES:
+            usados = PARAMETROS_OPCOES_PADRAO
+        else:
+            usados = {}
+        razoes = validar_razoes_hedge({nome: valor for nome, valor in kwargs.items() if nome in usados})
+        cenarios = self._valores_cenario()
+        premio_cenario = cenarios['premio']
+        tela_cenario = cenarios['tela']
+        dolar_cenario = cenarios['dolar']
         
-        preco_final_usd = preco_usd_base
-        preco_final_brl = preco_brl_base
+        premio_atual = self.alavancas['premio'].valor_atual
+        tela_atual = self.alavancas['tela'].valor_atual
+        dolar_atual = self.alavancas['dolar'].valor_atual
         
-        detalhes_calculo = {
-            'premio_cenario': self.calcular_valor_cenario('premio'),
-            'tela_cenario': self.calcular_valor_cenario('tela'),
-            'dolar_cenario': self.calcular_valor_cenario('dolar'),
-            'preco_usd_base': preco_usd_base,
-            'preco_brl_base': preco_brl_base
-        }
+        # Prêmio das opções calculado uma vez para o preço e os detalhes
+        termos = None
+        if estrategia in ALAVANCA_OPCOES:
+            termos = termos_opcoes(estrategia, tela_atual, dolar_atual,
+                                   **{nome: razoes[nome] for nome in PARAMETROS_OPCOES_PADRAO})
         
-        if estrategia == TipoEstrategia.TRAVAR_DOLAR:
-            # Trava o dólar no valor atual
-            preco_final_brl = preco_usd_base * self.alavancas['dolar'].valor_atual
-            exposicao_risco['dolar'] = False
-            detalhes_calculo['dolar_travado'] = self.alavancas['dolar'].valor_atual
-            
-        elif estrategia == TipoEstrategia.TRAVAR_SOJA_B3:
-            # Trava o preço em reais
-            preco_final_brl = preco_atual_brl
-            preco_final_usd = preco_final_brl / self.calcular_valor_cenario('dolar')
-            exposicao_risco['premio'] = False
-            exposicao_risco['tela'] = False
-            detalhes_calculo['preco_travado_brl'] = preco_atual_brl
-            
-        elif estrategia == TipoEstrategia.TRAVAR_SOJA_CHICAGO:
-            # Trava o preço em dólares
-            preco_final_usd = preco_atual_usd
-            preco_final_brl = preco_final_usd * self.calcular_valor_cenario('dolar')
-            exposicao_risco['premio'] = False
-            exposicao_risco['tela'] = False
-            detalhes_calculo['preco_travado_usd'] = preco_atual_usd
+        preco_final_usd, preco_final_brl, variacao_percentual = precificar_estrategia(
+            estrategia,
+            premio_cenario, tela_cenario, dolar_cenario,
+            premio_atual, tela_atual, dolar_atual,
+            razoes['hedge_dolar'], razoes['hedge_b3'], razoes['hedge_chicago'], termos
+        )
         
-        # Calcula variação percentual em relação ao preço atual
-        variacao_percentual = ((preco_final_brl - preco_atual_brl) / preco_atual_brl) * 100
+        detalhes = detalhes_estrategia(
+            estrategia,
+            premio_cenario, tela_cenario, dolar_cenario,
+            premio_atual, tela_atual, dolar_atual,
+            razoes, termos
+        )
         
+        if estrategia == TipoEstrategia.ESTRATEGIA_COMBINADA:
+            exposicao = mascara_combinada(razoes['hedge_dolar'], razoes['hedge_b3'], razoes['hedge_chicago'])
+        else:
+            exposicao = MASCARA_ESTRATEGIA[estrategia]
         resultado = ResultadoSimulacao(
-            estrategia=estrategia,
-            preco_final_brl=preco_final_brl,
-            preco_final_usd=preco_final_usd,
-            variacao_percentual=variacao_percentual,
-            exposicao_risco=exposicao_risco,
-            detalhes_calculo=detalhes_calculo
+            estrategia, preco_final_brl, preco_final_usd, variacao_percentual,
+            exposicao, detalhes
         )
         
-        self.historico_simulacoes.append(resultado)
+        if registrar:
+            self.historico_simulacoes.registrar(
+                estrategia, preco_final_brl, preco_final_usd, variacao_percentual, exposicao
+            )
         return resultado
     
-    def comparar_estrategias(self, estrategias: List[TipoEstrategia]) -> List[ResultadoSimulacao]:
+    def simular_lote(self,
+                     premio=None, tela=None, dolar=None,
+                     cenarios: Optional[Dict] = None,
+                     variacoes: Optional[Dict] = None,
+                     estrategias: Optional[List[TipoEstrategia]] = None,
+                     lote: Optional[np.ndarray] = None,
+                     razoes_hedge: Optional[Dict] = None) -> ResultadoLote:
+        """Simula todas as estratégias sobre arrays de alavancas em uma passada
+        
+        `premio`, `tela` e `dolar` são arrays (ou escalares) de valores atuais;
+        `cenarios` e `variacoes` são dicionários por alavanca com TipoCenario,
+        texto ou sinais -1/0/1 e percentuais. Tudo é combinado por broadcasting,
+        então grades podem ser passadas com formas (n, 1, 1), (1, m, 1) etc.
+        Alternativamente `lote` pode ser um array estruturado com campos
+        'premio', 'tela', 'dolar', 'cenario_<alavanca>' e 'variacao_<alavanca>'.
+        Alavancas omitidas usam o estado atual do simulador, que não é alterado
+        nem registrado no histórico. `razoes_hedge` (hedge_dolar, hedge_b3,
+        hedge_chicago e os parâmetros das opções) também aceita arrays.
+        """
+        valores = {'premio': premio, 'tela': tela, 'dolar': dolar}
+        cenarios = dict(cenarios or {})
+        variacoes = dict(variacoes or {})
+        
+        if lote is not None:
+            campos = lote.dtype.names or ()
+            for nome in self.alavancas:
+                if nome in campos:
+                    valores[nome] = lote[nome]
+                if f'cenario_{nome}' in campos:
+                    cenarios[nome] = lote[f'cenario_{nome}']
+                if f'variacao_{nome}' in campos:
+                    variacoes[nome] = lote[f'variacao_{nome}']
+        
+        sinais = {}
+        for nome, alavanca in self.alavancas.items():
+            if valores[nome] is None:
+                valores[nome] = alavanca.valor_atual
+            sinais[nome] = codificar_cenarios(cenarios.get(nome, alavanca.cenario))
+            if variacoes.get(nome) is None:
+                variacoes[nome] = alavanca.variacao_percentual
+        
+        if estrategias is None:
+            estrategias = list(TipoEstrategia)
+        
+        return calcular_lote(valores, sinais, variacoes, estrategias, razoes_hedge)
+    
+    def simular_grade_hedge(self, hedge_dolar=None, hedge_b3=None, hedge_chicago=None) -> 'ResultadoGradeHedge':
+        """Avalia a estratégia combinada sobre uma grade de razões de hedge
+        
+        Ver `calcular_grade_hedge`; usa o estado atual das alavancas.
+        """
+        return calcular_grade_hedge(self.obter_estado(), hedge_dolar, hedge_b3, hedge_chicago)
+    
+    def sensibilidades(self, estrategias: Optional[List[TipoEstrategia]] = None,
+                       **razoes_hedge) -> ResultadoDerivadas:
+        """Deltas e gamas analíticos no estado atual das alavancas
+        
+        Ver `sensibilidades`; os arrays têm apenas as dimensões de estratégia
+        e alavanca.
+        """
+        estado = self.obter_estado()
+        return sensibilidades(estado.valores(), estado.sinais(), estado.variacoes(),
+                              estrategias, razoes_hedge)
+    
+    def mapa_dominancia(self, alavanca_x: str = 'tela', alavanca_y: str = 'dolar',
+                        pontos: int = PONTOS_MAPA_PADRAO,
+                        estrategias: Optional[List[TipoEstrategia]] = None,
+                        **razoes_hedge) -> ResultadoMapaDominancia:
+        """Mapa de dominância de duas alavancas sobre as suas faixas
+        
+        Cada eixo tem `pontos` valores entre o mínimo e o máximo da alavanca;
+        ver `calcular_mapa_dominancia`.
+        """
+        import numpy as np
+        eixos = {
+            nome: np.linspace(self.alavancas[nome].valor_minimo, self.alavancas[nome].valor_maximo, pontos)
+            for nome in (alavanca_x, alavanca_y) if nome in self.alavancas
+        }
+        return calcular_mapa_dominancia(self.obter_estado(), alavanca_x, eixos.get(alavanca_x),
+                                        alavanca_y, eixos.get(alavanca_y), estrategias, razoes_hedge)
+    
+    @cronometrado('simulador.comparar_estrategias')
+    def comparar_estrategias(self, estrategias: List[TipoEstrategia], registrar: bool = True) -> List[ResultadoSimulacao]:
         """Compara múltiplas estratégias"""
         resultados = []
         for estrategia in estrategias:
-            resultado = self.simular_estrategia(estrategia)
+            resultado = self.simular_estrategia(estrategia, registrar=registrar)
             resultados.append(resultado)
         return resultados
     
     def obter_resumo_alavancas(self) -> Dict:
         """Retorna resumo atual das alavancas"""
+        cenarios = self._valores_cenario()
         resumo = {}
         for nome, alavanca in self.alavancas.items():
             resumo[nome] = {
                 'valor_atual': alavanca.valor_atual,
-                'valor_cenario': self.calcular_valor_cenario(nome),
+                'valor_cenario': cenarios[nome],
                 'cenario': alavanca.cenario.value,
                 'variacao_percentual': alavanca.variacao_percentual,
                 'unidade': alavanca.unidade
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Linha de comando não interativa do Simulador de Soja
+Recebe alavancas, cenários e estratégias por argumentos ou por arquivo
+(JSON, JSON Lines ou CSV) e imprime resultados legíveis por máquina.
+Importa apenas o núcleo (sem numpy, pandas, streamlit ou plotly), para
+ser barato em pipelines de shell e tarefas agendadas
+"""
+
+import argparse
+import csv
+import json
+import math
+import os
+import sys
+from typing import Dict, Iterator, List
+
+from simulador_soja import (NOMES_ALAVANCAS, PARAMETROS_ESTRATEGIA_PADRAO, PARAMETROS_OPCOES_PADRAO,
+                            RAZOES_HEDGE_PADRAO, SimuladorSoja, TipoCenario, TipoEstrategia)
+
+FORMATOS_ENTRADA = ('json', 'jsonl', 'csv')
+FORMATOS_SAIDA = ('jsonl', 'csv')
+
+METRICAS = ('preco_final_brl', 'preco_final_usd', 'variacao_percentual')
+
+def _estrategias(valor) -> List[TipoEstrategia]:
+    """Lista de estratégias a partir de uma lista ou texto separado por vírgulas"""
+    if isinstance(valor, str):
+        valor = [nome for nome in valor.replace(';', ',').split(',') if nome.strip()]
+    try:
+        return [TipoEstrategia(nome.strip()) for nome in valor]
+    except ValueError:
+        raise ValueError(f"Estratégias válidas: {', '.join(e.value for e in TipoEstrategia)}") from None
+
+def _variacao(texto: str) -> float:
+    """Tipo do argparse para --variacao-*: percentual finito e não negativo"""
+    try:
+        valor = float(texto)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"número inválido: {texto!r}") from None
+    if not math.isfinite(valor) or valor < 0:
+        raise argparse.ArgumentTypeError("a variação não pode ser negativa")
+    return valor
+
+def ler_entradas(caminho: str, formato: str) -> Iterator[Dict]:
+    """Lê as configurações de um arquivo ('-' para a entrada padrão)
+
+    Campos vazios de um CSV são tratados como ausentes.
+    """
+    arquivo = sys.stdin if caminho == '-' else open(caminho, encoding='utf-8', newline='')
+    try:
+        if formato == 'json':
+            dados = json.load(arquivo)
+            yield from (dados if isinstance(dados, list) else [dados])
+        elif formato == 'jsonl':
+            for linha in arquivo:
+                if linha.strip():
+                    yield json.loads(linha)
+        else:
+            for linha in csv.DictReader(arquivo):
+                yield {chave: valor for chave, valor in linha.items() if valor not in ('', None)}
+    finally:
+        if arquivo is not sys.stdin:
+            arquivo.close()
+
+def simular_entrada(simulador: SimuladorSoja, entrada: Dict, padrao: Dict) -> Dict:
+    """Aplica uma configuração (sobre `padrao`) e simula as estratégias pedidas"""
+    desconhecidas = set(entrada) - set(padrao)
+    if desconhecidas:
+        raise ValueError(f"Campos desconhecidos: {', '.join(sorted(desconhecidas))}")
+    entrada = {**padrao, **entrada}
+
+    for nome in NOMES_ALAVANCAS:
+        valor = float(entrada[nome])
+        if not simulador.definir_valor_alavanca(nome, valor):
+            alavanca = simulador.alavancas[nome]
+            raise ValueError(f"{nome} deve estar entre {alavanca.valor_minimo} e {alavanca.valor_maximo}")
+        try:
+            cenario = TipoCenario(entrada[f'cenario_{nome}'])
+        except ValueError:
+            raise ValueError(f"cenario_{nome} deve ser um de: "
+                             f"{', '.join(c.value for c in TipoCenario)}") from None
+        variacao = float(entrada[f'variacao_{nome}'])
+        if not math.isfinite(variacao) or variacao < 0:
+            raise ValueError(f"variacao_{nome} não pode ser negativa")
+        simulador.definir_cenario_alavanca(nome, cenario, variacao)
+
+    razoes = {nome: float(entrada[nome]) for nome in PARAMETROS_ESTRATEGIA_PADRAO}
+    return {
+        estrategia.value: simulador.simular_estrategia(estrategia, registrar=False, **razoes)
+        for estrategia in _estrategias(entrada['estrategias'])
+    }
+
+def escrever_jsonl(saida, indice: int, resultados: Dict):
+    saida.write(json.dumps({
+        'linha': indice,
+        'resultados': {
+            nome: {metrica: getattr(resultado, metrica) for metrica in METRICAS}
+            for nome, resultado in resultados.items()
+        }
+    }) + '\n')
+
+def criar_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='simular',
+        description="Simula estratégias de soja sem interação; uma linha de saída por configuração"
+    )
+    simulador = SimuladorSoja()
+    for nome in NOMES_ALAVANCAS:
+        alavanca = simulador.alavancas[nome]
+        parser.add_argument(f'--{nome}', type=float, default=alavanca.valor_atual,
+                            help=f"{alavanca.nome} em {alavanca.unidade} (padrão: %(default)s)")
+        parser.add_argument(f'--cenario-{nome}', choices=[c.value for c in TipoCenario],
+                            default=TipoCenario.NEUTRO.value)
+        parser.add_argument(f'--variacao-{nome}', type=_variacao, default=0.0, metavar='PCT')
+    for nome, razao in RAZOES_HEDGE_PADRAO.items():
+        parser.add_argument(f'--{nome.replace("_", "-")}', type=float, default=razao,
+                            help="razão da estratégia combinada (padrão: %(default)s)")
+    for nome, parametro in PARAMETROS_OPCOES_PADRAO.items():
+        parser.add_argument(f'--{nome.replace("_", "-")}', type=float, default=parametro,
+                            help="parâmetro das estratégias com opções (padrão: %(default)s)")
+    parser.add_argument('-e', '--estrategias', default=','.join(e.value for e in TipoEstrategia),
+                        help="estratégias separadas por vírgula (padrão: todas)")
+    parser.add_argument('-a', '--arquivo',
+                        help="arquivo de configurações ('-' lê da entrada padrão); "
+                             "os argumentos acima valem para os campos ausentes")
+    parser.add_argument('--formato-entrada', choices=FORMATOS_ENTRADA,
+                        help="padrão: pela extensão do arquivo (jsonl para '-')")
+    parser.add_argument('-f', '--formato', choices=FORMATOS_SAIDA, default='jsonl',
+                        help="formato de saída (padrão: %(default)s)")
+    return parser
+
+def main(argumentos=None) -> int:
+    """Ponto de entrada; retorna o código de saída"""
+    parser = criar_parser()
+    args = parser.parse_args(argumentos)
+
+    padrao = {'estrategias': args.estrategias}
+    for nome in NOMES_ALAVANCAS:
+        padrao[nome] = getattr(args, nome)
+        padrao[f'cenario_{nome}'] = getattr(args, f'cenario_{nome}')
+        padrao[f'variacao_{nome}'] = getattr(args, f'variacao_{nome}')
+    for nome in PARAMETROS_ESTRATEGIA_PADRAO:
+        padrao[nome] = getattr(args, nome)
+
+    if args.arquivo is None:
+        entradas = iter([{}])
+    else:
+        formato = args.formato_entrada
+        if formato is None:
+            extensao = os.path.splitext(args.arquivo)[1].lower().lstrip('.')
+            formato = extensao if extensao in FORMATOS_ENTRADA else 'jsonl'
+        entradas = ler_entradas(args.arquivo, formato)
+
+    simulador = SimuladorSoja(capacidade_historico=1)
+    saida = sys.stdout
+    escritor = None
+    if args.formato == 'csv':
+        escritor = csv.writer(saida, lineterminator='\n')
+        escritor.writerow(('linha', 'estrategia') + METRICAS)
+
+    try:
+        for indice, entrada in enumerate(entradas, start=1):
+            try:
+                if not isinstance(entrada, dict):
+                    raise ValueError("cada configuração deve ser um objeto")
+                resultados = simular_entrada(simulador, entrada, padrao)
+            except (TypeError, ValueError) as erro:
+                print(f"simular: configuração {indice}: {erro}", file=sys.stderr)
+                return 1
+            if escritor is None:
+                escrever_jsonl(saida, indice, resultados)
+            else:
+                for nome, resultado in resultados.items():
+                    escritor.writerow((indice, nome) + tuple(getattr(resultado, m) for m in METRICAS))
+    except BrokenPipeError:
+        # Consumidor encerrou antes (ex.: `| head`)
+        sys.stderr.close()
+    except (OSError, ValueError) as erro:
+        # Arquivo ausente ou JSON malformado
+        print(f"simular: {erro}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Superfície pré-calculada das estratégias sobre as faixas das alavancas
+Tabela os preços de cada estratégia em uma grade regular de seis eixos
+(valor e choque do cenário de prêmio, tela e dólar) e responde consultas
+por interpolação multilinear, com a célula localizada em O(1)
+"""
+
+import argparse
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from simulador_soja import (ESTRATEGIAS_TRAVAMENTO, MASCARA_ESTRATEGIA, NOMES_ALAVANCAS, EstadoAlavancas,
+                            ResultadoLote, ResultadoSimulacao, SimuladorSoja, TipoEstrategia, calcular_lote,
+                            detalhes_estrategia, mascara_combinada, validar_razoes_hedge)
+
+# Variação máxima dos cenários (%), a mesma dos sliders da interface
+VARIACAO_MAXIMA = 50.0
+
+# Pontos por eixo: 5^6 nós; com 4 estratégias a tabela ocupa 1 MB
+PONTOS_PADRAO = 5
+
+# Erro máximo (BRL) aceito na validação da superfície contra o simulador
+TOLERANCIA_BRL = 1e-6
+AMOSTRAS_VALIDACAO = 4096
+
+# Consultas interpoladas por vez (limita os arrays intermediários)
+TAMANHO_BLOCO = 4096
+
+EIXOS = NOMES_ALAVANCAS + tuple(f'choque_{nome}' for nome in NOMES_ALAVANCAS)
+
+def limites_alavancas(simulador: Optional[SimuladorSoja] = None,
+                      variacao_maxima: float = VARIACAO_MAXIMA) -> Tuple[Tuple[float, float], ...]:
+    """Faixas dos seis eixos: limites das alavancas e choques de ±variacao_maxima
+
+    Lidos de um SimuladorSoja novo (os limites definidos em __init__); o
+    resultado é hashable e serve de chave para invalidar superfícies.
+    """
+    simulador = simulador or SimuladorSoja(capacidade_historico=1)
+    valores = tuple((simulador.alavancas[nome].valor_minimo, simulador.alavancas[nome].valor_maximo)
+                    for nome in NOMES_ALAVANCAS)
+    return valores + ((-variacao_maxima / 100, variacao_maxima / 100),) * len(NOMES_ALAVANCAS)
+
+class SuperficieAlavancas:
+    """Preços de cada estratégia tabelados em uma grade regular
+
+    Guarda, por nó e estratégia, o preço final em BRL e o preço em USD
+    multiplicado pelo dólar no cenário. As duas grandezas são multilineares
+    nos seis eixos para as estratégias de travamento (inclusive a combinada,
+    com as razões fixadas na construção), então a interpolação multilinear
+    as reproduz a menos de arredondamento; o USD e a variação são
+    recuperados com o dólar no cenário e o preço atual, calculados
+    exatamente. A construção mede o erro em pontos sorteados e falha se
+    passar de `tolerancia`: as estratégias com opções (com quinas nos
+    strikes) só passam com uma tolerância maior.
+    """
+
+    def __init__(self, limites: Optional[Tuple[Tuple[float, float], ...]] = None,
+                 pontos: int = PONTOS_PADRAO,
+                 estrategias: Optional[List[TipoEstrategia]] = None,
+                 razoes_hedge: Optional[Dict[str, float]] = None,
+                 tolerancia: float = TOLERANCIA_BRL):
+        if pontos < 2:
+            raise ValueError("A superfície precisa de ao menos 2 pontos por eixo")
+        self.limites = tuple(limites or limites_alavancas())
+        self.pontos = pontos
+        self.estrategias = list(estrategias or ESTRATEGIAS_TRAVAMENTO)
+        self.razoes_hedge = validar_razoes_hedge(razoes_hedge or {})
+
+        self._minimos = np.array([minimo for minimo, _ in self.limites])
+        self._maximos = np.array([maximo for _, maximo in self.limites])
+        self._passos = (self._maximos - self._minimos) / (pontos - 1)
+        self.eixos = [np.linspace(minimo, maximo, pontos) for minimo, maximo in self.limites]
+
+        # Deslocamentos dos 2^6 vértices de uma célula no array achatado, com
+        # o primeiro eixo variando mais devagar (ordem de reshape em C)
+        dimensoes = len(EIXOS)
+        self._passos_indice = pontos ** np.arange(dimensoes - 1, -1, -1)
+        vertices = (np.arange(2 ** dimensoes)[:, None] >> np.arange(dimensoes - 1, -1, -1)) & 1
+        self._deslocamentos = vertices @ self._passos_indice
+        # (mínimo, máximo, passo, passo no índice, folga) por eixo, em float
+        # puro, para o caminho de uma consulta
+        self._faixas = list(zip(self._minimos.tolist(), self._maximos.tolist(), self._passos.tolist(),
+                                self._passos_indice.tolist(), (1e-9 * (self._maximos - self._minimos)).tolist()))
+
+        inicio = time.perf_counter()
+        grade = np.meshgrid(*self.eixos, indexing='ij', sparse=True)
+        brl, usd_x_dolar = self._calcular(*grade)
+        # (nós, estratégias x 2) contíguo: cada vértice é uma linha
+        self.tabela = np.stack([brl, usd_x_dolar], axis=-1).reshape(len(self.estrategias), -1, 2)
+        self.tabela = np.ascontiguousarray(self.tabela.transpose(1, 0, 2).reshape(pontos ** dimensoes, -1))
+        self.segundos_construcao = time.perf_counter() - inicio
+
+        self.erro_maximo = self._validar()
+        if self.erro_maximo['preco_final_brl'] > tolerancia:
+            raise ValueError(f"Erro de interpolação de R$ {self.erro_maximo['preco_final_brl']:.3g} "
+                             f"acima da tolerância de R$ {tolerancia:.3g}")
+
+    @property
+    def nbytes(self) -> int:
+        return self.tabela.nbytes
+
+    def corresponde(self, limites) -> bool:
+        """Indica se a superfície foi construída para estes limites"""
+        return tuple(limites) == self.limites
+
+    def _calcular(self, premio, tela, dolar, choque_premio, choque_tela, choque_dolar):
+        """Preço BRL e USD x dólar no cenário, forma (estratégias, *broadcast)"""
+        lote = calcular_lote(
+            {'premio': premio, 'tela': tela, 'dolar': dolar},
+            {nome: 1 for nome in NOMES_ALAVANCAS},
+            {'premio': choque_premio * 100, 'tela': choque_tela * 100, 'dolar': choque_dolar * 100},
+            self.estrategias, self.razoes_hedge
+        )
+        return lote.preco_final_brl, lote.preco_final_usd * (dolar * (1 + choque_dolar))
+
+    def _interpolar(self, coordenadas: np.ndarray) -> np.ndarray:
+        """Interpolação multilinear de (m, 6) coordenadas -> (m, estratégias x 2)
+
+        Monta os 64 pesos de cada consulta (produto externo de (1 - f, f)
+        por eixo, na ordem dos vértices) e os aplica aos vértices da célula
+        em um único produto matricial.
+        """
+        posicao = (coordenadas - self._minimos) / self._passos
+        celula = np.minimum(posicao.astype(np.intp), self.pontos - 2)
+        fracao = posicao - celula
+        indices = (celula @ self._passos_indice)[:, None] + self._deslocamentos
+        pesos = np.ones((len(coordenadas), 1))
+        for eixo in range(len(EIXOS)):
+            f = fracao[:, eixo, None]
+            pesos = np.stack([pesos * (1 - f), pesos * f], axis=2).reshape(len(coordenadas), -1)
+        return np.matmul(pesos[:, None, :], self.tabela[indices])[:, 0]
+
+    def avaliar(self, valores: Dict[str, np.ndarray], sinais: Dict[str, np.ndarray],
+                variacoes: Dict[str, np.ndarray]) -> ResultadoLote:
+        """Mesma interface e resultado de `calcular_lote`, lidos da superfície
+
+        Levanta ValueError para consultas fora das faixas tabeladas.
+        """
+        atuais = [np.asarray(valores[nome], dtype=np.float64) for nome in NOMES_ALAVANCAS]
+        choques = [np.multiply(sinais[nome], variacoes[nome], dtype=np.float64) / 100
+                   for nome in NOMES_ALAVANCAS]
+        forma = np.broadcast_shapes(*(eixo.shape for eixo in atuais + choques))
+        coordenadas = np.empty((int(np.prod(forma)), len(EIXOS)))
+        for i, eixo in enumerate(atuais + choques):
+            coordenadas[:, i] = np.broadcast_to(eixo, forma).ravel()
+        # Folga relativa para valores exatamente sobre os limites
+        folga = 1e-9 * (self._maximos - self._minimos)
+        if ((coordenadas < self._minimos - folga) | (coordenadas > self._maximos + folga)).any():
+            raise ValueError("Consulta fora das faixas da superfície")
+        np.clip(coordenadas, self._minimos, self._maximos, out=coordenadas)
+
+        campos = np.empty((len(coordenadas), self.tabela.shape[1]))
+        for inicio in range(0, len(coordenadas), TAMANHO_BLOCO):
+            campos[inicio:inicio + TAMANHO_BLOCO] = self._interpolar(coordenadas[inicio:inicio + TAMANHO_BLOCO])
+        campos = campos.reshape(len(coordenadas), len(self.estrategias), 2).transpose(1, 2, 0)
+
+        premio, tela, dolar, _, _, choque_dolar = coordenadas.T
+        preco_atual_brl = (tela + premio) * dolar
+        preco_final_brl = campos[:, 0]
+        return ResultadoLote(
+            estrategias=list(self.estrategias),
+            preco_final_brl=preco_final_brl.reshape((-1,) + forma),
+            preco_final_usd=(campos[:, 1] / (dolar * (1 + choque_dolar))).reshape((-1,) + forma),
+            variacao_percentual=((preco_final_brl - preco_atual_brl) / preco_atual_brl * 100).reshape((-1,) + forma)
+        )
+
+    def _interpolar_ponto(self, coordenadas: Tuple[float, ...]) -> np.ndarray:
+        """Interpolação de uma única consulta, com célula e pesos em Python
+
+        Caminho da interface: evita o custo fixo de montar arrays de consultas.
+        """
+        indice = 0
+        pesos = [1.0]
+        for valor, (minimo, maximo, passo, passo_indice, folga) in zip(coordenadas, self._faixas):
+            if not minimo - folga <= valor <= maximo + folga:
+                raise ValueError("Consulta fora das faixas da superfície")
+            posicao = (min(max(valor, minimo), maximo) - minimo) / passo
+            celula = min(int(posicao), self.pontos - 2)
+            indice += celula * passo_indice
+            fracao = posicao - celula
+            pesos = [peso * fator for peso in pesos for fator in (1 - fracao, fracao)]
+        return np.dot(pesos, self.tabela[indice + self._deslocamentos])
+
+    def avaliar_estado(self, estado: EstadoAlavancas) -> Dict[TipoEstrategia, Tuple[float, float, float]]:
+        """(BRL, USD, variação %) de cada estratégia para uma configuração"""
+        atuais = estado.valores()
+        sinais, variacoes = estado.sinais(), estado.variacoes()
+        choques = tuple(sinais[nome] * variacoes[nome] / 100 for nome in NOMES_ALAVANCAS)
+        campos = self._interpolar_ponto(tuple(atuais.values()) + choques).tolist()
+        preco_atual_brl = (atuais['tela'] + atuais['premio']) * atuais['dolar']
+        dolar_cenario = atuais['dolar'] * (1 + choques[2])
+        return {
+            estrategia: (campos[2 * i], campos[2 * i + 1] / dolar_cenario,
+                         (campos[2 * i] - preco_atual_brl) / preco_atual_brl * 100)
+            for i, estrategia in enumerate(self.estrategias)
+        }
+
+    def resultados(self, estado: EstadoAlavancas) -> List[ResultadoSimulacao]:
+        """Resultados como os de `SimuladorSoja.comparar_estrategias`, lidos da superfície"""
+        precos = self.avaliar_estado(estado)
+        atuais = estado.valores()
+        sinais, variacoes = estado.sinais(), estado.variacoes()
+        cenarios = [atuais[nome] * (1 + sinais[nome] * variacoes[nome] / 100) for nome in NOMES_ALAVANCAS]
+        resultados = []
+        for estrategia, (brl, usd, variacao) in precos.items():
+            if estrategia == TipoEstrategia.ESTRATEGIA_COMBINADA:
+                exposicao = mascara_combinada(self.razoes_hedge['hedge_dolar'], self.razoes_hedge['hedge_b3'],
+                                              self.razoes_hedge['hedge_chicago'])
+            else:
+                exposicao = MASCARA_ESTRATEGIA[estrategia]
+            resultados.append(ResultadoSimulacao(
+                estrategia, brl, usd, variacao, exposicao,
+                detalhes_estrategia(estrategia, *cenarios, *atuais.values(), self.razoes_hedge)
+            ))
+        return resultados
+
+    def _validar(self, n: int = AMOSTRAS_VALIDACAO, semente: int = 0) -> Dict[str, float]:
+        """Maior erro absoluto contra o simulador em pontos sorteados nas faixas"""
+        rng = np.random.default_rng(semente)
+        coordenadas = rng.uniform(self._minimos, self._maximos, (n, len(EIXOS)))
+        premio, tela, dolar, choque_premio, choque_tela, choque_dolar = coordenadas.T
+        um = np.ones(n)
+        superficie = self.avaliar(
+            {'premio': premio, 'tela': tela, 'dolar': dolar},
+            {nome: um for nome in NOMES_ALAVANCAS},
+            {'premio': choque_premio * 100, 'tela': choque_tela * 100, 'dolar': choque_dolar * 100}
+        )
+        exato = calcular_lote(
+            {'premio': premio, 'tela': tela, 'dolar': dolar},
+            {nome: um for nome in NOMES_ALAVANCAS},
+            {'premio': choque_premio * 100, 'tela': choque_tela * 100, 'dolar': choque_dolar * 100},
+            self.estrategias, self.razoes_hedge
+        )
+        return {
+            metrica: float(np.max(np.abs(getattr(superficie, metrica) - getattr(exato, metrica))))
+            for metrica in ('preco_final_brl', 'preco_final_usd', 'variacao_percentual')
+        }
+
+def main(argumentos=None):
+    """Constrói uma superfície e compara consultas com o simulador direto"""
+    parser = argparse.ArgumentParser(description="Superfície pré-calculada das estratégias")
+    parser.add_argument('--pontos', type=int, default=PONTOS_PADRAO, help="pontos por eixo")
+    parser.add_argument('-n', '--consultas', type=int, default=100_000)
+    args = parser.parse_args(argumentos)
+
+    superficie = SuperficieAlavancas(pontos=args.pontos)
+    print(f"Superfície {args.pontos}^{len(EIXOS)} nós x {len(superficie.estrategias)} estratégias: "
+          f"{superficie.nbytes / 1024 ** 2:.2f} MB em {superficie.segundos_construcao * 1000:.1f} ms")
+    for metrica, erro in superficie.erro_maximo.items():
+        print(f"  erro máximo {metrica}: {erro:.3g}")
+
+    simulador = SimuladorSoja()
+    estado = simulador.obter_estado()
+    inicio = time.perf_counter()
+    for _ in range(1000):
+        superficie.resultados(estado)
+    por_superficie = (time.perf_counter() - inicio) / 1000
+    inicio = time.perf_counter()
+    for _ in range(1000):
+        simulador.comparar_estrategias(superficie.estrategias, registrar=False)
+    direto = (time.perf_counter() - inicio) / 1000
+    print(f"Uma configuração: superfície {por_superficie * 1e6:.1f} µs, simulador {direto * 1e6:.1f} µs")
+
+    rng = np.random.default_rng(1)
+    minimos, maximos = np.array(superficie.limites).T
+    coordenadas = rng.uniform(minimos[:3], maximos[:3], (args.consultas, 3))
+    valores = dict(zip(NOMES_ALAVANCAS, coordenadas.T))
+    sinais = {nome: rng.integers(-1, 2, args.consultas) for nome in NOMES_ALAVANCAS}
+    variacoes = {nome: rng.uniform(0, VARIACAO_MAXIMA, args.consultas) for nome in NOMES_ALAVANCAS}
+    inicio = time.perf_counter()
+    superficie.avaliar(valores, sinais, variacoes)
+    por_superficie = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    calcular_lote(valores, sinais, variacoes, superficie.estrategias)
+    direto = time.perf_counter() - inicio
+    print(f"{args.consultas:,} configurações: superfície {por_superficie * 1000:.1f} ms, "
+          f"calcular_lote {direto * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,47 @@
 Script de teste para validar a lógica de simulação do Simulador de Soja
 """
 
-from simulador_soja import SimuladorSoja, TipoCenario, TipoEstrategia
+import asyncio
+import contextlib
+import dataclasses
+import io
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from simulador_soja import SimuladorSoja, TipoCenario, TipoEstrategia, analisar_sensibilidade
+from monte_carlo_soja import MonteCarloSoja
+from monte_carlo_paralelo import simular_metricas_paralelo, simular_paralelo
+import monte_carlo_paralelo
+from otimizador_hedge import OtimizadorHedge, conferir_base
+from carteira_soja import CarteiraSoja, converter_volume, mascara_travamento
+from processador_cenarios import EscritorTexto, gerar_arquivo_exemplo, processar_arquivo
+from armazem_resultados import ArmazemResultados, salvar_monte_carlo
+from backtest_soja import executar_backtest, gerar_series_sinteticas
+from servidor_api import ServidorSimulacao
+from gerador_carga import ClienteHTTP, gerar_requisicoes
+import simular
+from benchmark_simulador import comparar_execucoes, executar_benchmarks, selecionar
+from instrumentacao import coletar, contar, medir, registro_atual, secoes_mais_lentas
+from simulador_soja import NOMES_ALAVANCAS, precificar_estrategia, calcular_lote, sensibilidades
+from simulador_soja import CHAVES_DETALHES, CHAVES_DETALHES_ESTRATEGIA, ResultadoSimulacao, codificar_cenarios
+from simulador_soja import EstadoAlavancas, HistoricoSimulacoes
+from cache_simulador import CacheLRU, estimar_tamanho
+from simulador_soja import calcular_mapa_dominancia
+from superficie_alavancas import TOLERANCIA_BRL, SuperficieAlavancas, limites_alavancas
+from sequencias_sobol import SequenciaSobol, normal_inversa
+from benchmark_convergencia import convergencia
+from estatisticas_streaming import DigestoQuantis, MomentosStreaming
+from carteira_soja import carteira_exemplo
+from pontos_equilibrio import calcular_equilibrios
+from simulador_soja import ESTRATEGIAS_TRAVAMENTO, fator_cenario
+from simulador_soja import ALAVANCA_OPCOES, black76, garman_kohlhagen, normal_acumulada, termos_opcoes
 
 def teste_cenarios_basicos():
     """Testa cenários básicos de simulação"""
@@ -153,6 +193,1287 @@ def teste_validacao_ranges():
     print(f"  Tela 30.00 (>25.00): {simulador.definir_valor_alavanca('tela', 30.00)}")
     print(f"  Dólar 7.00 (>6.50): {simulador.definir_valor_alavanca('dolar', 7.00)}")
 
+def teste_simulacao_lote():
+    """Testa se a simulação em lote reproduz exatamente o caminho escalar"""
+    print("\n=== TESTE DE SIMULAÇÃO EM LOTE ===")
+    
+    simulador = SimuladorSoja()
+    rng = np.random.default_rng(42)
+    n = 200
+    
+    premio = rng.uniform(-0.50, 2.50, n)
+    tela = rng.uniform(10.00, 25.00, n)
+    dolar = rng.uniform(4.50, 6.50, n)
+    cenarios = {nome: rng.choice(list(TipoCenario), n) for nome in simulador.alavancas}
+    variacoes = {nome: rng.uniform(0.0, 50.0, n) for nome in simulador.alavancas}
+    
+    lote = simulador.simular_lote(premio, tela, dolar, cenarios=cenarios, variacoes=variacoes)
+    
+    divergencias = 0
+    for i in range(n):
+        simulador.definir_valor_alavanca('premio', premio[i])
+        simulador.definir_valor_alavanca('tela', tela[i])
+        simulador.definir_valor_alavanca('dolar', dolar[i])
+        for nome in simulador.alavancas:
+            simulador.definir_cenario_alavanca(nome, cenarios[nome][i], variacoes[nome][i])
+        
+        for j, estrategia in enumerate(lote.estrategias):
+            resultado = simulador.simular_estrategia(estrategia)
+            escalar = (resultado.preco_final_brl, resultado.preco_final_usd, resultado.variacao_percentual)
+            em_lote = (lote.preco_final_brl[j, i], lote.preco_final_usd[j, i], lote.variacao_percentual[j, i])
+            # Nas opções, o escalar usa math.erfc e o lote a aproximação vetorizada
+            if estrategia in ALAVANCA_OPCOES:
+                iguais = np.allclose(escalar, em_lote, rtol=1e-12, atol=1e-10)
+            else:
+                iguais = escalar == em_lote
+            if not iguais:
+                divergencias += 1
+    
+    print(f"  {n} combinações x {len(lote.estrategias)} estratégias")
+    print(f"  Divergências em relação ao caminho escalar: {divergencias}")
+    assert divergencias == 0
+    
+    # Rótulos desconhecidos e sinais fora de -1/0/1 são rejeitados
+    assert codificar_cenarios(['alta', TipoCenario.BAIXA, 'neutro']).tolist() == [1, -1, 0]
+    assert codificar_cenarios(np.array([1.0, 0.0, -1.0])).tolist() == [1, 0, -1]
+    for invalidos in (['alta', 'otimista'], [1, 5], [0.5], [np.nan]):
+        try:
+            codificar_cenarios(invalidos)
+            assert False, f"{invalidos} deveria ser rejeitado"
+        except ValueError:
+            pass
+    try:
+        simulador.simular_lote(premio, tela, dolar, cenarios={'premio': np.full(n, 2)})
+        assert False, "sinal 2 deveria ser rejeitado"
+    except ValueError:
+        pass
+
+def teste_resultado_compacto():
+    """Testa as visões, a igualdade e a construção do ResultadoSimulacao compacto"""
+    print("\n=== TESTE DE RESULTADO COMPACTO ===")
+    
+    simulador = SimuladorSoja()
+    simulador.definir_valor_alavanca('premio', 0.85)
+    simulador.definir_cenario_alavanca('tela', TipoCenario.BAIXA, 12.5)
+    simulador.definir_cenario_alavanca('dolar', TipoCenario.ALTA, 7.25)
+    
+    for estrategia in TipoEstrategia:
+        resultado = simulador.simular_estrategia(estrategia)
+        detalhes = resultado.detalhes_calculo
+        chaves = CHAVES_DETALHES + CHAVES_DETALHES_ESTRATEGIA.get(estrategia, ())
+        assert tuple(detalhes) == chaves
+        assert len(resultado.detalhes) == 8 * len(chaves)
+        assert resultado.exposicao_risco == {nome: bool(resultado.exposicao & bit)
+                                             for nome, bit in (('premio', 1), ('tela', 2), ('dolar', 4))}
+        
+        # Os dicionários da versão anterior reconstroem o mesmo resultado, bit a bit
+        campos = (estrategia, resultado.preco_final_brl, resultado.preco_final_usd, resultado.variacao_percentual)
+        por_nome = ResultadoSimulacao(*campos, exposicao_risco=resultado.exposicao_risco,
+                                      detalhes_calculo=dict(reversed(detalhes.items())))
+        por_posicao = ResultadoSimulacao(*campos, resultado.exposicao_risco, detalhes)
+        compacto = ResultadoSimulacao(*campos, resultado.exposicao, tuple(detalhes.values()))
+        assert resultado == por_nome == por_posicao == compacto
+        assert por_nome.detalhes == resultado.detalhes and por_nome.detalhes_calculo == detalhes
+        
+        diferente = ResultadoSimulacao(*campos, resultado.exposicao ^ 1, tuple(detalhes.values()))
+        assert resultado != diferente and resultado != resultado.preco_final_brl
+    print(f"  {len(TipoEstrategia)} estratégias: visões e construções antigas equivalentes")
+    
+    try:
+        ResultadoSimulacao(TipoEstrategia.TRAVAR_DOLAR, 1.0, 1.0, 0.0, 7, {'premio_cenario': 1.0})
+        assert False, "detalhes incompletos deveriam ser rejeitados"
+    except ValueError:
+        pass
+    try:
+        ResultadoSimulacao(TipoEstrategia.SEM_TRAVAMENTO, 1.0, 1.0, 0.0)
+        assert False, "resultado sem exposição deveria ser rejeitado"
+    except TypeError:
+        pass
+
+def teste_historico_circular():
+    """Testa o limite do histórico e o registro opcional"""
+    print("\n=== TESTE DE HISTÓRICO CIRCULAR ===")
+    
+    simulador = SimuladorSoja(capacidade_historico=10)
+    for _ in range(5):
+        simulador.comparar_estrategias(list(TipoEstrategia))
+    simulador.simular_estrategia(TipoEstrategia.TRAVAR_DOLAR, registrar=False)
+    
+    historico = simulador.historico_simulacoes
+    print(f"  Simulações registradas: {historico.total_registrado}")
+    print(f"  Entradas em memória: {len(historico)} (capacidade {historico.capacidade})")
+    print(f"  Última entrada: {historico[-1].estrategia.value}")
+    assert historico.total_registrado == 5 * len(TipoEstrategia)
+    assert len(historico) == 10
+    assert historico[-1].estrategia == list(TipoEstrategia)[-1]
+    
+    # O arquivo de registros é fechado pelo simulador, pelo bloco with e na coleta
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, 'historico.bin')
+        with SimuladorSoja(capacidade_historico=4, arquivo_historico=caminho) as simulador:
+            simulador.comparar_estrategias(list(TipoEstrategia))
+            arquivo = simulador.historico_simulacoes._arquivo
+        assert arquivo.closed and simulador.historico_simulacoes._arquivo is None
+        simulador.fechar()
+        registros = HistoricoSimulacoes.ler_arquivo(caminho)
+        assert len(registros) == len(TipoEstrategia)
+        assert registros['preco_final_brl'][-1] == simulador.historico_simulacoes[-1].preco_final_brl
+        
+        historico = HistoricoSimulacoes(arquivo=caminho)
+        arquivo = historico._arquivo
+        del historico
+        assert arquivo.closed
+
+def teste_cache_cenarios():
+    """Testa o cache dos valores no cenário e sua invalidação"""
+    print("\n=== TESTE DE CACHE DE CENÁRIOS ===")
+    
+    simulador = SimuladorSoja()
+    simulador.definir_cenario_alavanca('tela', TipoCenario.ALTA, 10.0)
+    
+    simulador.comparar_estrategias(list(TipoEstrategia))
+    simulador.obter_resumo_alavancas()
+    estatisticas = simulador.estatisticas_cache()
+    print(f"  Após comparar e resumir: {estatisticas}")
+    assert estatisticas['falhas'] == 1
+    
+    # Redefinir o mesmo valor não invalida; mudar o valor invalida
+    simulador.definir_valor_alavanca('tela', 15.00)
+    simulador.definir_cenario_alavanca('tela', TipoCenario.ALTA, 10.0)
+    simulador.calcular_preco_base()
+    assert simulador.estatisticas_cache()['falhas'] == 1
+    
+    simulador.definir_valor_alavanca('tela', 16.00)
+    tela_cenario = simulador.calcular_valor_cenario('tela')
+    print(f"  Após mudar a tela: {simulador.estatisticas_cache()}")
+    assert simulador.estatisticas_cache()['falhas'] == 2
+    assert tela_cenario == 16.00 * (1 + 10.0 / 100)
+
+def teste_cache_lru():
+    """Testa a remoção por entradas e por memória do CacheLRU e a impressão digital"""
+    print("\n=== TESTE DE CACHE LRU ===")
+    
+    # Por número de entradas: um acerto move a chave para o fim da fila
+    cache = CacheLRU(max_entradas=3)
+    for chave in 'abc':
+        cache.obter(chave, lambda chave=chave: chave.upper())
+    assert cache.obter('a', lambda: 'recalculado') == 'A'
+    cache.obter('d', lambda: 'D')
+    assert list(cache._entradas) == ['c', 'a', 'd'] and len(cache) == 3
+    assert cache.obter('b', lambda: 'novo') == 'novo'
+    estatisticas = cache.estatisticas()
+    print(f"  Por entradas: {estatisticas}")
+    assert (estatisticas['acertos'], estatisticas['falhas'], estatisticas['remocoes']) == (1, 5, 2)
+    
+    # Por memória estimada: cabem três valores; maiores que o limite não são guardados
+    tamanho = estimar_tamanho(b'x' * 1000)
+    cache = CacheLRU(max_entradas=100, max_bytes=3 * tamanho + tamanho // 2)
+    for i in range(3):
+        cache.obter(i, lambda i=i: bytes([i]) * 1000)
+    cache.obter(0, lambda: b'')
+    cache.obter(3, lambda: b'3' * 1000)
+    assert list(cache._entradas) == [2, 0, 3] and cache.bytes_usados == 3 * tamanho
+    grande = cache.obter('grande', lambda: b'g' * 10_000)
+    assert len(grande) == 10_000 and 'grande' not in cache._entradas and len(cache) == 3
+    print(f"  Por memória: {len(cache)} entradas, {cache.bytes_usados} bytes de {cache.max_bytes}")
+    
+    # Estimativa sem serializar: arrays e DataFrames pelo buffer, contêineres e objetos percorridos
+    matriz = np.zeros((500, 400))
+    tabela = pd.DataFrame(matriz)
+    assert estimar_tamanho(matriz) == matriz.nbytes
+    assert estimar_tamanho(tabela) == tabela.memory_usage(deep=False).sum()
+    assert matriz.nbytes <= estimar_tamanho([matriz, matriz, {'z': matriz}]) < 2 * matriz.nbytes
+    mapa = SimuladorSoja().mapa_dominancia('tela', 'dolar', 300)
+    arrays = sum(campo.nbytes for campo in vars(mapa).values() if isinstance(campo, np.ndarray))
+    assert arrays <= estimar_tamanho(mapa) < 2 * arrays
+    # Objetos que o pickle não serializa também recebem uma estimativa
+    assert estimar_tamanho(lambda: None) == 0 and estimar_tamanho(io.StringIO()) > 0
+    
+    # Impressão digital: muda com qualquer valor, cenário ou variação relevante
+    estado = EstadoAlavancas(1.0, 15.0, 5.2, TipoCenario.ALTA, 10.0, TipoCenario.BAIXA, 5.0,
+                             TipoCenario.ALTA, 2.5)
+    mudancas = {
+        'premio': 1.01, 'tela': 15.5, 'dolar': 5.3,
+        'cenario_premio': TipoCenario.BAIXA, 'cenario_tela': TipoCenario.NEUTRO,
+        'cenario_dolar': TipoCenario.BAIXA,
+        'variacao_premio': 11.0, 'variacao_tela': 6.0, 'variacao_dolar': 3.0
+    }
+    impressoes = {estado.impressao_digital()}
+    for campo, valor in mudancas.items():
+        impressoes.add(dataclasses.replace(estado, **{campo: valor}).impressao_digital())
+    assert len(impressoes) == 1 + len(mudancas)
+    
+    # Estados equivalentes: números inteiros e variação de cenário neutro
+    assert EstadoAlavancas(1, 15, 5).impressao_digital() == EstadoAlavancas(1.0, 15.0, 5.0).impressao_digital()
+    neutro = EstadoAlavancas(1.0, 15.0, 5.2, variacao_tela=30.0)
+    assert neutro.impressao_digital() == EstadoAlavancas(1.0, 15.0, 5.2).impressao_digital()
+
+def teste_analise_sensibilidade():
+    """Testa se a sensibilidade vetorizada reproduz o laço de simulações"""
+    print("\n=== TESTE DE ANÁLISE DE SENSIBILIDADE ===")
+    
+    simulador = SimuladorSoja()
+    simulador.definir_valor_alavanca('premio', 0.80)
+    simulador.definir_cenario_alavanca('tela', TipoCenario.BAIXA, 10.0)
+    simulador.definir_cenario_alavanca('dolar', TipoCenario.ALTA, 5.0)
+    estado = simulador.obter_estado()
+    
+    variacoes = np.arange(-20, 21, 5)
+    sensibilidade = analisar_sensibilidade(estado, variacoes)
+    assert simulador.obter_estado() == estado
+    
+    divergencias = 0
+    for nome in simulador.alavancas:
+        alavanca = simulador.alavancas[nome]
+        original = (alavanca.cenario, alavanca.variacao_percentual)
+        for j, var in enumerate(variacoes):
+            simulador.definir_cenario_alavanca(nome, TipoCenario.ALTA if var >= 0 else TipoCenario.BAIXA, abs(var))
+            for estrategia in sensibilidade.estrategias:
+                resultado = simulador.simular_estrategia(estrategia, registrar=False)
+                if resultado.preco_final_brl != sensibilidade.curva(nome, estrategia)[j]:
+                    divergencias += 1
+        simulador.definir_cenario_alavanca(nome, *original)
+    
+    ranking = sensibilidade.ranking_tornado(TipoEstrategia.SEM_TRAVAMENTO)
+    print(f"  Divergências em relação ao laço escalar: {divergencias}")
+    print(f"  Ranking tornado: {', '.join(nome for nome, *_ in ranking)}")
+    assert divergencias == 0
+
+def teste_sensibilidades_analiticas():
+    """Testa deltas e gamas analíticos contra curvas e diferenças finitas"""
+    print("\n=== TESTE DE SENSIBILIDADES ANALÍTICAS ===")
+    
+    simulador = SimuladorSoja()
+    simulador.definir_valor_alavanca('premio', 0.80)
+    simulador.definir_cenario_alavanca('tela', TipoCenario.BAIXA, 10.0)
+    simulador.definir_cenario_alavanca('dolar', TipoCenario.ALTA, 5.0)
+    razoes = {'hedge_dolar': 0.3, 'hedge_b3': 0.2, 'hedge_chicago': 0.6}
+    derivadas = simulador.sensibilidades(list(ESTRATEGIAS_TRAVAMENTO), **razoes).por_choque()
+    
+    # O preço das travas é linear em cada alavanca: a inclinação da curva é o delta
+    estado = simulador.obter_estado()
+    curvas = calcular_lote(
+        estado.valores(),
+        {nome: np.where(np.arange(3)[:, None] == i, 1, estado.sinais()[nome]) for i, nome in enumerate(NOMES_ALAVANCAS)},
+        {nome: np.where(np.arange(3)[:, None] == i, [[-10.0, 10.0]], estado.variacoes()[nome])
+         for i, nome in enumerate(NOMES_ALAVANCAS)},
+        derivadas.estrategias, razoes
+    ).preco_final_brl
+    inclinacoes = (curvas[..., 1] - curvas[..., 0]) / 20
+    print(f"  Deltas por 1% (sem travamento): {derivadas.delta[0].round(4).tolist()}")
+    assert np.allclose(inclinacoes, derivadas.delta)
+    
+    # Lote com razões variando por linha: diferenças finitas centrais
+    rng = np.random.default_rng(3)
+    n = 200
+    valores = {'premio': rng.uniform(0.1, 2, n), 'tela': rng.uniform(12, 20, n), 'dolar': rng.uniform(4.6, 6.2, n)}
+    sinais = {nome: rng.integers(-1, 2, n) for nome in valores}
+    variacoes = {nome: rng.uniform(0, 30, n) for nome in valores}
+    razoes_lote = {nome: rng.uniform(0, 1, n) for nome in razoes}
+    lote = sensibilidades(valores, sinais, variacoes, list(ESTRATEGIAS_TRAVAMENTO), razoes_lote).por_choque()
+    
+    def preco(choques):
+        deslocadas = {nome: sinais[nome] * variacoes[nome] + choques[i] for i, nome in enumerate(NOMES_ALAVANCAS)}
+        return calcular_lote(valores, {nome: np.ones(n) for nome in NOMES_ALAVANCAS}, deslocadas,
+                             lote.estrategias, razoes_lote).preco_final_brl
+    
+    h = 0.5
+    for i in range(3):
+        e = np.eye(3)[i] * h
+        assert np.allclose((preco(e) - preco(-e)) / (2 * h), lote.delta[:, i], atol=1e-8)
+        for j in range(3):
+            f = np.eye(3)[j] * h
+            cruzada = (preco(e + f) - preco(e - f) - preco(f - e) + preco(-e - f)) / (4 * h * h)
+            assert np.allclose(cruzada, lote.gama[:, i, j], atol=1e-8)
+    
+    # Estratégias travadas: B3 não tem risco; Chicago só no dólar
+    assert np.all(lote.delta[list(TipoEstrategia).index(TipoEstrategia.TRAVAR_SOJA_B3)] == 0)
+    assert np.all(lote.delta[list(TipoEstrategia).index(TipoEstrategia.TRAVAR_SOJA_CHICAGO), :2] == 0)
+    
+    # Delta da carteira: soma dos lotes ponderada pelo volume
+    carteira = CarteiraSoja(capacidade=2)
+    carteira.adicionar_lotes([1000, 500], 'saca', 202603, 'Cargill', premio_contratado=[1.20, np.nan])
+    travas = list(ESTRATEGIAS_TRAVAMENTO)
+    por_lote = carteira.sensibilidades(estado, travas).por_choque()
+    valor = lambda choque: carteira.avaliar(
+        dataclasses.replace(estado, cenario_tela=TipoCenario.ALTA, variacao_tela=choque), travas
+    ).valor_brl.sum(axis=1)
+    print(f"  Delta tela da carteira por 1%: {por_lote.delta[0, 1].sum():,.2f}")
+    assert np.allclose((valor(1.0) - valor(-1.0)) / 2, por_lote.delta[:, 1].sum(axis=-1))
+
+def teste_mapa_dominancia():
+    """Testa o mapa de dominância contra o cálculo em lote célula a célula"""
+    print("\n=== TESTE DE MAPA DE DOMINÂNCIA ===")
+    
+    simulador = SimuladorSoja()
+    simulador.definir_valor_alavanca('premio', 1.0)
+    simulador.definir_cenario_alavanca('premio', TipoCenario.BAIXA, 20)
+    simulador.definir_cenario_alavanca('tela', TipoCenario.ALTA, 30)
+    estado = simulador.obter_estado()
+    razoes = {'hedge_dolar': 0.3, 'hedge_b3': 0.2, 'hedge_chicago': 0.6}
+    
+    eixo_tela = np.linspace(10, 25, 61)
+    eixo_dolar = np.linspace(4.5, 6.5, 41)
+    mapa = calcular_mapa_dominancia(estado, 'tela', eixo_tela, 'dolar', eixo_dolar, razoes_hedge=razoes)
+    
+    # Referência: todas as estratégias em lote, com o prêmio no cenário de `estado`
+    valores = {'premio': 1.0, 'tela': estado.tela * np.ones((1, 61)), 'dolar': estado.dolar * np.ones((41, 1))}
+    lote = calcular_lote(
+        valores,
+        {'premio': -1, 'tela': 1, 'dolar': 1},
+        {'premio': 20.0, 'tela': (eixo_tela / estado.tela - 1) * 100,
+         'dolar': (eixo_dolar[:, None] / estado.dolar - 1) * 100},
+        mapa.estrategias, razoes
+    )
+    ordenados = np.sort(lote.preco_final_brl, axis=0)
+    assert mapa.vencedora.shape == (41, 61) and mapa.alavanca_fixa == 'premio' and np.isclose(mapa.valor_fixo, 0.8)
+    vencedoras = np.take_along_axis(lote.preco_final_brl, mapa.vencedora[None].astype(np.intp), axis=0)[0]
+    assert np.allclose(vencedoras, ordenados[-1])
+    assert np.allclose(mapa.margem, ordenados[-1] - ordenados[-2])
+    
+    estrategia, margem = mapa.estrategia_em(25, 4.5)
+    print(f"  Tela 25 / Dólar 4,50: {estrategia.value} por R$ {margem:.2f}")
+    print("  Área por estratégia: " + ", ".join(f"{e.value} {f:.0%}" for e, f in mapa.fracoes().items()))
+    assert np.isclose(sum(mapa.fracoes().values()), 1.0)
+    
+    # Redução para exibição: bordas preservadas e valores exatos dos pontos amostrados
+    reduzido = mapa.reduzir(20, 10)
+    assert reduzido.vencedora.shape == (10, 20)
+    assert reduzido.eixo_x[0] == 10 and reduzido.eixo_x[-1] == 25 and reduzido.eixo_y[-1] == 6.5
+    j = int(np.searchsorted(eixo_tela, reduzido.eixo_x[7]))
+    assert reduzido.margem[0, 7] == mapa.margem[0, j]
+    
+    grande = simulador.mapa_dominancia('premio', 'dolar', pontos=1000)
+    print(f"  Grade 1000 x 1000: {grande.vencedora.nbytes + grande.margem.nbytes:,} bytes")
+    assert grande.vencedora.shape == (1000, 1000) and grande.eixo_x[0] == -0.5
+    
+    try:
+        calcular_mapa_dominancia(estado, 'tela', eixo_tela, 'tela', eixo_dolar)
+        assert False, "Deveria rejeitar eixos iguais"
+    except ValueError:
+        pass
+
+def teste_pontos_equilibrio():
+    """Testa os pontos de equilíbrio repreficando cada par no próprio ponto"""
+    print("\n=== TESTE DE PONTOS DE EQUILÍBRIO ===")
+    
+    simulador = SimuladorSoja()
+    simulador.definir_valor_alavanca('premio', 1.0)
+    simulador.definir_cenario_alavanca('tela', TipoCenario.BAIXA, 10.0)
+    simulador.definir_cenario_alavanca('dolar', TipoCenario.ALTA, 5.0)
+    estado = simulador.obter_estado()
+    valores, sinais, variacoes = estado.valores(), estado.sinais(), estado.variacoes()
+    razoes = {'hedge_dolar': 0.3, 'hedge_b3': 0.2, 'hedge_chicago': 0.6}
+    
+    def precos_no_choque(pesos, choque, estrategias):
+        """Preços com cada alavanca em cenário * (1 + peso * choque / 100)"""
+        fatores = {nome: fator_cenario(sinais[nome], variacoes[nome]) * (1 + pesos.get(nome, 0) * choque / 100)
+                   for nome in NOMES_ALAVANCAS}
+        novas = {nome: (fator - 1) * 100 for nome, fator in fatores.items()}
+        return calcular_lote(valores, {nome: 1 for nome in NOMES_ALAVANCAS}, novas, estrategias,
+                             razoes).preco_final_brl
+    
+    # Forma fechada: o par empata no ponto e `vencedora_acima` vale logo acima dele
+    analitico = calcular_equilibrios(valores, sinais, variacoes, 'dolar', razoes_hedge=razoes)
+    assert analitico.metodo == 'analitico'
+    for p, (a, b) in enumerate(analitico.pares):
+        ponto = float(analitico.valores[p])
+        if np.isnan(ponto):
+            continue
+        choque = (ponto / float(analitico.referencia) - 1) * 100
+        empate = precos_no_choque({'dolar': 1}, choque, [a, b])
+        acima = precos_no_choque({'dolar': 1}, choque + 1, [a, b])
+        assert np.isclose(empate[0], empate[1], rtol=1e-9, atol=1e-9)
+        assert (acima[0] > acima[1]) == analitico.vencedora_acima(a, b)
+        assert analitico.vencedora_acima(b, a) != analitico.vencedora_acima(a, b)
+    linhas = analitico.linhas()
+    print(f"  {len(linhas)} equilíbrios em dólar; mais próximo: "
+          f"{linhas[0]['par'][0].value} x {linhas[0]['par'][1].value} "
+          f"em {linhas[0]['valor']:.4f} ({linhas[0]['distancia_percentual']:+.2f}%)")
+    
+    # A busca por intervalos na direção de uma só alavanca reproduz a forma fechada
+    intervalo = calcular_equilibrios(valores, sinais, variacoes, {'dolar': 1.0}, razoes_hedge=razoes)
+    assert intervalo.metodo == 'intervalo'
+    assert np.allclose(intervalo.valores, analitico.distancia_percentual(), atol=1e-8, equal_nan=True)
+    
+    # Choque conjunto (preço quadrático): a raiz mais próxima do cenário empata o par
+    conjunto = calcular_equilibrios(valores, sinais, variacoes, {'tela': 1.0, 'dolar': -1.0},
+                                    razoes_hedge=razoes)
+    resolvidos = 0
+    for p, (a, b) in enumerate(conjunto.pares):
+        choque = float(conjunto.valores[p])
+        if not np.isnan(choque):
+            empate = precos_no_choque({'tela': 1.0, 'dolar': -1.0}, choque, [a, b])
+            assert np.isclose(empate[0], empate[1], rtol=1e-9, atol=1e-9) and abs(choque) <= 50
+            resolvidos += 1
+    print(f"  Choque conjunto tela+ / dólar-: {resolvidos} de {len(conjunto.pares)} pares com equilíbrio")
+    assert resolvidos > 0
+    
+    # Sem cenário de dólar, travar o dólar e não travar coincidem em qualquer tela
+    neutro = SimuladorSoja().obter_estado()
+    coincidem = calcular_equilibrios(neutro.valores(), neutro.sinais(), neutro.variacoes(), 'tela',
+                                     [TipoEstrategia.SEM_TRAVAMENTO, TipoEstrategia.TRAVAR_DOLAR])
+    assert coincidem.coincidentes[0] and np.isnan(coincidem.valores[0]) and not coincidem.linhas()
+    
+    # Carteira: cada lote resolvido com o seu prêmio contratado
+    carteira = carteira_exemplo(500)
+    por_lote = carteira.pontos_equilibrio(estado, 'dolar')
+    assert por_lote.valores.shape == (len(TipoEstrategia) * (len(TipoEstrategia) - 1) // 2, 500)
+    i = int(np.flatnonzero(~np.isnan(carteira.premio_contratado))[0])
+    contratado = {**valores, 'premio': carteira.premio_contratado[i]}
+    sozinho = calcular_equilibrios(contratado, sinais, variacoes, 'dolar')
+    assert np.allclose(por_lote.valores[:, i], sozinho.valores, equal_nan=True)
+    
+    for alavanca in ('soja', {'soja': 1.0}, {'tela': 0.0}):
+        try:
+            calcular_equilibrios(valores, sinais, variacoes, alavanca)
+            assert False, "Deveria rejeitar alavanca inválida"
+        except ValueError:
+            pass
+
+def teste_estrategias_opcoes():
+    """Testa o Black-76, o Garman-Kohlhagen e as estratégias com opções"""
+    print("\n=== TESTE DE ESTRATÉGIAS COM OPÇÕES ===")
+    
+    # Exemplos do Hull: put sobre futuro (Black-76) e call de moeda (Garman-Kohlhagen)
+    put_hull = float(black76(20.0, 20.0, 0.25, 4 / 12, 0.09, 'put'))
+    call_gk = float(garman_kohlhagen(1.6, 1.6, 0.141, 1 / 3, 0.08, 0.11, 'call'))
+    print(f"  Black-76 put: {put_hull:.4f}; Garman-Kohlhagen call: {call_gk:.5f}")
+    assert abs(put_hull - 1.1166) < 1e-4 and abs(call_gk - 0.04296) < 1e-5
+    
+    # Paridade put-call e distribuição normal contra a erfc da biblioteca padrão
+    rng = np.random.default_rng(0)
+    futuro, strike = rng.uniform(5, 30, 1000), rng.uniform(5, 30, 1000)
+    volatilidade, vencimento, juros = rng.uniform(0.05, 1, 1000), rng.uniform(0.01, 3, 1000), 0.05
+    paridade = (black76(futuro, strike, volatilidade, vencimento, juros, 'call')
+                - black76(futuro, strike, volatilidade, vencimento, juros, 'put'))
+    assert np.allclose(paridade, np.exp(-juros * vencimento) * (futuro - strike), rtol=1e-12, atol=1e-12)
+    pontos = np.linspace(-12, 12, 2401)
+    referencia = np.array([0.5 * math.erfc(-x / math.sqrt(2)) for x in pontos])
+    assert np.allclose(normal_acumulada(pontos), referencia, rtol=1e-8, atol=1e-16)
+    assert float(normal_acumulada(0.0)) == 0.5
+    
+    # Pisos e tetos no vencimento, do lado da alavanca das opções
+    valores = {'premio': 1.0, 'tela': 15.0, 'dolar': 5.2}
+    choques = np.linspace(-40, 40, 161)
+    neutros = {'premio': 0.0, 'tela': 0.0, 'dolar': 0.0}
+    uns = {nome: 1 for nome in NOMES_ALAVANCAS}
+    tela = calcular_lote(valores, uns, {**neutros, 'tela': choques},
+                         [TipoEstrategia.PUT_SOJA_CHICAGO, TipoEstrategia.COLAR_SOJA_CHICAGO])
+    (strike_put,), custo_put = termos_opcoes(TipoEstrategia.PUT_SOJA_CHICAGO, 15.0, 5.2)
+    (_, strike_call), custo_colar = termos_opcoes(TipoEstrategia.COLAR_SOJA_CHICAGO, 15.0, 5.2)
+    assert np.all(tela.preco_final_usd[0] >= 1.0 + strike_put - custo_put - 1e-12)
+    assert np.all(tela.preco_final_usd[1] >= 1.0 + strike_put - custo_colar - 1e-12)
+    assert np.all(tela.preco_final_usd[1] <= 1.0 + strike_call - custo_colar + 1e-12)
+    assert abs(custo_colar) < custo_put
+    dolar = calcular_lote(valores, uns, {**neutros, 'dolar': choques},
+                          [TipoEstrategia.PUT_DOLAR, TipoEstrategia.CALL_DOLAR])
+    (strike_dolar,), custo_dolar = termos_opcoes(TipoEstrategia.PUT_DOLAR, 15.0, 5.2)
+    assert np.all(dolar.preco_final_brl[0] >= 16.0 * (strike_dolar - custo_dolar) - 1e-9)
+    print(f"  Piso da put de tela: US$ {1.0 + strike_put - custo_put:.4f}/bu; "
+          f"piso da put de dólar: R$ {16.0 * (strike_dolar - custo_dolar):.4f}")
+    
+    # Grade strike x vencimento x cenário em uma chamada
+    grade = calcular_lote(valores, uns, {**neutros, 'tela': choques[None, None, :]},
+                          list(ALAVANCA_OPCOES),
+                          {'strike_put': np.linspace(0.8, 1.0, 21)[:, None, None],
+                           'vencimento': np.linspace(0.1, 2, 30)[None, :, None]})
+    assert grade.preco_final_brl.shape == (len(ALAVANCA_OPCOES), 21, 30, len(choques))
+    assert np.all(np.isfinite(grade.preco_final_brl))
+    
+    # Deltas analíticos contra diferenças centrais longe dos strikes
+    for alavanca, pontos_choque in (('tela', [-20.0, -2.0, 15.0]), ('dolar', [-10.0, 3.0, 12.0])):
+        variacoes = {**neutros, alavanca: np.array(pontos_choque)}
+        derivadas = sensibilidades(valores, uns, variacoes, list(ALAVANCA_OPCOES))
+        passo = 1e-4
+        mais = calcular_lote(valores, uns, {**variacoes, alavanca: variacoes[alavanca] + passo},
+                             list(ALAVANCA_OPCOES)).preco_final_brl
+        menos = calcular_lote(valores, uns, {**variacoes, alavanca: variacoes[alavanca] - passo},
+                              list(ALAVANCA_OPCOES)).preco_final_brl
+        numerico = (mais - menos) / (2 * passo * valores[alavanca] / 100)
+        assert np.allclose(derivadas.delta[:, NOMES_ALAVANCAS.index(alavanca)], numerico, rtol=1e-6, atol=1e-6)
+    
+    # Pontos de equilíbrio trecho a trecho: cada par empata no próprio ponto
+    sinais = {'premio': 0, 'tela': -1, 'dolar': 1}
+    cenario = {'premio': 0.0, 'tela': 8.0, 'dolar': 4.0}
+    for alavanca in ('tela', 'dolar'):
+        resultado = calcular_equilibrios(valores, sinais, cenario, alavanca,
+                                         [TipoEstrategia.SEM_TRAVAMENTO, *ALAVANCA_OPCOES])
+        assert resultado.metodo == 'analitico'
+        resolvidos = 0
+        for p, (a, b) in enumerate(resultado.pares):
+            ponto = float(resultado.valores[p])
+            if np.isnan(ponto):
+                continue
+            fatores = {nome: fator_cenario(sinais[nome], cenario[nome]) for nome in NOMES_ALAVANCAS}
+            fatores[alavanca] = ponto / valores[alavanca]
+            empate = calcular_lote(valores, uns, {nome: (fator - 1) * 100 for nome, fator in fatores.items()},
+                                   [a, b]).preco_final_brl
+            assert np.isclose(empate[0], empate[1], rtol=1e-9, atol=1e-9)
+            resolvidos += 1
+        print(f"  Equilíbrios em {alavanca}: {resolvidos} de {len(resultado.pares)} pares")
+        assert resolvidos > 0
+    
+    # No Monte Carlo, as opções vencem no horizonte da simulação
+    motor = MonteCarloSoja(SimuladorSoja(), semente=2, horizonte_anos=1 / 12, tamanho_bloco=500)
+    cenarios = motor.gerar_cenarios(0, 500)
+    precos = motor.precificar_cenarios(cenarios, [TipoEstrategia.PUT_SOJA_CHICAGO])
+    premio, tela, dolar = motor.valores_iniciais
+    esperado = precificar_estrategia(TipoEstrategia.PUT_SOJA_CHICAGO, cenarios['premio'], cenarios['tela'],
+                                     cenarios['dolar'], premio, tela, dolar, vencimento=1 / 12)[1]
+    assert np.array_equal(precos[0], esperado)
+    
+    # Parâmetros fora da faixa e tipo de opção inválido
+    simulador = SimuladorSoja()
+    for parametros in ({'vol_tela': -0.1}, {'strike_put': 0.0}, {'vencimento': 0.0}):
+        try:
+            simulador.simular_estrategia(TipoEstrategia.PUT_SOJA_CHICAGO, registrar=False, **parametros)
+            assert False, f"Deveria rejeitar {parametros}"
+        except ValueError:
+            pass
+    try:
+        black76(20.0, 20.0, 0.25, 1.0, 0.05, 'binaria')
+        assert False, "Deveria rejeitar o tipo da opção"
+    except ValueError:
+        pass
+
+def teste_estrategia_combinada():
+    """Testa se os hedges extremos da combinada reproduzem as estratégias puras"""
+    print("\n=== TESTE DE ESTRATÉGIA COMBINADA ===")
+    
+    simulador = SimuladorSoja()
+    simulador.definir_valor_alavanca('premio', 1.10)
+    simulador.definir_cenario_alavanca('tela', TipoCenario.BAIXA, 12.0)
+    simulador.definir_cenario_alavanca('dolar', TipoCenario.ALTA, 6.0)
+    
+    extremos = {
+        TipoEstrategia.SEM_TRAVAMENTO: (0.0, 0.0, 0.0),
+        TipoEstrategia.TRAVAR_DOLAR: (1.0, 0.0, 0.0),
+        TipoEstrategia.TRAVAR_SOJA_B3: (0.0, 1.0, 0.0),
+        TipoEstrategia.TRAVAR_SOJA_CHICAGO: (0.0, 0.0, 1.0)
+    }
+    for estrategia, (dolar, b3, chicago) in extremos.items():
+        pura = simulador.simular_estrategia(estrategia, registrar=False)
+        combinada = simulador.simular_estrategia(
+            TipoEstrategia.ESTRATEGIA_COMBINADA, registrar=False,
+            hedge_dolar=dolar, hedge_b3=b3, hedge_chicago=chicago
+        )
+        print(f"  {estrategia.value}: R$ {pura.preco_final_brl:.2f} / R$ {combinada.preco_final_brl:.2f}")
+        assert abs(pura.preco_final_brl - combinada.preco_final_brl) < 1e-9
+        assert pura.exposicao_risco == combinada.exposicao_risco
+    
+    grade = simulador.simular_grade_hedge(np.linspace(0, 1, 11), np.linspace(0, 1, 6), np.linspace(0, 1, 21))
+    pontual = simulador.simular_estrategia(
+        TipoEstrategia.ESTRATEGIA_COMBINADA, registrar=False,
+        hedge_dolar=0.3, hedge_b3=0.4, hedge_chicago=0.75
+    )
+    print(f"  Grade {grade.preco_final_brl.shape}, melhor: {grade.melhor()}")
+    assert grade.preco_final_brl.shape == (11, 6, 21)
+    assert abs(grade.preco_final_brl[3, 2, 15] - pontual.preco_final_brl) < 1e-9
+    
+    try:
+        simulador.simular_estrategia(TipoEstrategia.ESTRATEGIA_COMBINADA, hedge_b3=1.5)
+        assert False, "razão de hedge fora de [0, 1] deveria ser rejeitada"
+    except ValueError:
+        pass
+    
+    # Parâmetros que a estratégia não usa continuam ignorados, como na versão original
+    base = simulador.simular_estrategia(TipoEstrategia.TRAVAR_DOLAR, registrar=False)
+    for parametros in ({'hedge_b3': 1.5}, {'vol_tela': -1.0}, {'desconhecido': 'x'}):
+        ignorado = simulador.simular_estrategia(TipoEstrategia.TRAVAR_DOLAR, registrar=False, **parametros)
+        assert ignorado.preco_final_brl == base.preco_final_brl
+    padrao = simulador.simular_estrategia(TipoEstrategia.ESTRATEGIA_COMBINADA, registrar=False)
+    ignorado = simulador.simular_estrategia(TipoEstrategia.ESTRATEGIA_COMBINADA, registrar=False, vol_tela=-1.0)
+    assert ignorado.preco_final_brl == padrao.preco_final_brl
+
+def teste_otimizador_hedge():
+    """Testa o otimizador de hedge contra uma busca exaustiva em grade"""
+    print("\n=== TESTE DE OTIMIZADOR DE HEDGE ===")
+    
+    simulador = SimuladorSoja()
+    motor = MonteCarloSoja(simulador, semente=7, derivas={'tela': 0.10, 'dolar': 0.03})
+    otimizador = OtimizadorHedge(motor, 50_000)
+    assert conferir_base(otimizador, motor, 0.3, 0.2, 0.7) < 1e-9
+    
+    preco_minimo = otimizador.preco_atual_brl * 1.02
+    eixo = np.linspace(0, 1, 21)
+    grade = np.array(np.meshgrid(eixo, eixo, eixo, indexing='ij')).reshape(3, -1)
+    viavel = otimizador.media(*grade) >= preco_minimo
+    
+    variancia = otimizador.otimizar('variancia', preco_minimo=preco_minimo)
+    cvar = otimizador.otimizar('cvar', nivel_confianca=0.95, preco_minimo=preco_minimo)
+    menor_desvio = np.sqrt(otimizador.variancia(*grade)[viavel].min())
+    menor_cvar = otimizador.cvar(*grade[:, viavel]).min()
+    
+    print(f"  Variância mínima: {variancia.razoes()} (desvio {variancia.desvio_padrao:.3f}, grade {menor_desvio:.3f})")
+    print(f"  CVaR mínimo: {cvar.razoes()} (CVaR {cvar.cvar:.3f}, grade {menor_cvar:.3f})")
+    assert variancia.media >= preco_minimo - 1e-9 and cvar.media >= preco_minimo - 1e-9
+    assert variancia.desvio_padrao <= menor_desvio + 1e-9
+    assert cvar.cvar <= menor_cvar + 1e-9
+    
+    sem_restricao = otimizador.otimizar('variancia')
+    assert sem_restricao.razoes() == {'hedge_dolar': 0.0, 'hedge_b3': 1.0, 'hedge_chicago': 0.0}
+
+def teste_carteira():
+    """Testa a avaliação colunar da carteira contra a simulação de cada lote"""
+    print("\n=== TESTE DE CARTEIRA ===")
+    
+    assert abs(converter_volume(1.0, 'tonelada', 'saca') - 1000 / 60) < 1e-12
+    assert abs(converter_volume(1.0, 'tonelada', 'bushel') - 1000 / 27.2155) < 1e-12
+    
+    carteira = CarteiraSoja(capacidade=2)
+    carteira.adicionar_lotes(1000, 'saca', '2026-03', 'Cargill', premio_contratado=1.20)
+    carteira.adicionar_lotes([50, 80], 'tonelada', [202605, 202607], ['Bunge', 'Cargill'],
+                             travado=mascara_travamento(dolar=True))
+    carteira.adicionar_lotes(2000, 'bushel', 202605, 'ADM', travado=mascara_travamento(True, True, True))
+    assert len(carteira) == 4 and carteira.contrapartes == ['Cargill', 'Bunge', 'ADM']
+    
+    simulador = SimuladorSoja()
+    simulador.definir_cenario_alavanca('tela', TipoCenario.BAIXA, 10.0)
+    simulador.definir_cenario_alavanca('dolar', TipoCenario.ALTA, 5.0)
+    resultado = carteira.avaliar(simulador.obter_estado())
+    
+    bushels = carteira.volume_bushels
+    for i, estrategia in enumerate(resultado.estrategias):
+        esperado = simulador.simular_estrategia(estrategia, registrar=False).preco_final_brl
+        assert np.allclose(resultado.valor_brl[i, 1:], esperado * bushels[1:])
+    
+    # Lote com dólar travado equivale a TRAVAR_DOLAR; tudo travado, ao preço atual
+    travar_dolar = resultado.estrategias.index(TipoEstrategia.TRAVAR_DOLAR)
+    assert np.isclose(resultado.valor_situacao_brl[1], resultado.valor_brl[travar_dolar, 1])
+    assert np.isclose(resultado.valor_situacao_brl[3], resultado.valor_atual_brl[3])
+    
+    rotulos, colunas = resultado.agrupar('contraparte')
+    print(f"  Valor por contraparte: {dict(zip(rotulos, colunas['situacao'].round(2).tolist()))}")
+    assert rotulos == ['Cargill', 'Bunge', 'ADM']
+    assert np.isclose(colunas['situacao'].sum(), resultado.total()['situacao'])
+    rotulos, colunas = resultado.agrupar('mes')
+    assert rotulos == [202603, 202605, 202607]
+    assert np.allclose(colunas['sem_travamento'].sum(), resultado.total()['sem_travamento'])
+    
+    # Choque só no prêmio: lote todo travado e lotes com prêmio contratado não se movem
+    carteira.adicionar_lotes(500, 'saca', 202609, 'ADM', premio_contratado=0.9,
+                             travado=mascara_travamento(True, True, True))
+    simulador = SimuladorSoja()
+    simulador.definir_valor_alavanca('premio', 1.0)
+    neutro = carteira.avaliar(simulador.obter_estado())
+    simulador.definir_cenario_alavanca('premio', TipoCenario.ALTA, 30.0)
+    estado = simulador.obter_estado()
+    resultado = carteira.avaliar(estado)
+    fixos = [0, 3, 4]
+    assert np.allclose(resultado.valor_situacao_brl[fixos], resultado.valor_atual_brl[fixos])
+    assert np.allclose(resultado.valor_brl[:, fixos], neutro.valor_brl[:, fixos])
+    assert resultado.valor_situacao_brl[1] > resultado.valor_atual_brl[1]
+    derivadas = carteira.sensibilidades(estado)
+    premio = derivadas.alavancas.index('premio')
+    assert not derivadas.delta[:, premio, fixos].any() and derivadas.delta[0, premio, 1] > 0
+
+def teste_processador_cenarios():
+    """Testa o processamento em blocos de um arquivo de cenários"""
+    print("\n=== TESTE DE PROCESSADOR DE CENÁRIOS ===")
+    
+    with tempfile.TemporaryDirectory() as pasta:
+        entrada = os.path.join(pasta, 'cenarios.jsonl')
+        gerar_arquivo_exemplo(entrada, 1000, semente=3, tamanho_bloco=300)
+        
+        saidas = {formato: os.path.join(pasta, f'resultado.{formato}') for formato in ('npy', 'csv', 'jsonl')}
+        for formato, saida in saidas.items():
+            resultado = processar_arquivo(entrada, saida, tamanho_bloco=128)
+            print(f"  {formato}: {resultado.linhas} linhas, {resultado.linhas_por_segundo:,.0f} linhas/s")
+            assert resultado.linhas == 1000
+        
+        npy = np.load(saidas['npy'])
+        with open(saidas['csv'], encoding='utf-8') as f:
+            csv = np.loadtxt(f, delimiter=',', skiprows=1)
+        with open(saidas['jsonl'], encoding='utf-8') as f:
+            jsonl = [json.loads(linha) for linha in f]
+        assert npy.shape == (1000,) and csv.shape == (1000, len(npy.dtype.names)) and len(jsonl) == 1000
+        
+        with open(entrada, encoding='utf-8') as f:
+            linhas = [json.loads(linha) for _, linha in zip(range(3), f)]
+        for i, linha in enumerate(linhas):
+            simulador = SimuladorSoja()
+            for nome in ('premio', 'tela', 'dolar'):
+                simulador.definir_valor_alavanca(nome, linha[nome])
+                simulador.definir_cenario_alavanca(nome, TipoCenario(linha[f'cenario_{nome}']),
+                                                   linha[f'variacao_{nome}'])
+            for j, estrategia in enumerate(TipoEstrategia):
+                esperado = simulador.simular_estrategia(estrategia).preco_final_brl
+                coluna = f'{estrategia.value}_brl'
+                if estrategia in ALAVANCA_OPCOES:
+                    assert np.isclose(npy[coluna][i], esperado, rtol=1e-12, atol=1e-10)
+                else:
+                    assert npy[coluna][i] == esperado
+                assert abs(csv[i, npy.dtype.names.index(coluna)] - esperado) < 1e-6
+                assert abs(jsonl[i][coluna] - esperado) < 1e-6
+        
+        # Linhas fora das faixas são rejeitadas e citadas pelo número no arquivo
+        invalida = os.path.join(pasta, 'invalida.csv')
+        pd.DataFrame({'tela': [15.0] * 7 + [40.0], 'variacao_dolar': [0.0] * 5 + [-1.0, 0.0, 0.0]}).to_csv(
+            invalida, index=False)
+        try:
+            processar_arquivo(invalida, saidas['csv'], tamanho_bloco=4)
+            assert False, "linhas fora das faixas deveriam ser rejeitadas"
+        except ValueError as erro:
+            print(f"  {erro}")
+            assert 'linha 6: variacao_dolar' in str(erro) and 'linha 8: tela' in str(erro)
+        try:
+            processar_arquivo(invalida, saidas['csv'], tamanho_bloco=3)
+            assert False, "linhas fora das faixas deveriam ser rejeitadas"
+        except ValueError as erro:
+            assert 'linha 6: variacao_dolar' in str(erro) and 'linha 8' not in str(erro)
+        
+        # No JSONL, resultados não finitos viram null (o arquivo continua JSON válido)
+        escritor = EscritorTexto(saidas['jsonl'], ['a', 'b'], 'jsonl')
+        escritor.escrever(np.array([[1.5, np.nan], [np.inf, -2.0]]))
+        escritor.fechar()
+        with open(saidas['jsonl'], encoding='utf-8') as f:
+            assert [json.loads(linha) for linha in f] == [{'a': 1.5, 'b': None}, {'a': None, 'b': -2.0}]
+
+def teste_armazem_resultados():
+    """Testa a gravação, leitura via memmap e acréscimo de resultados"""
+    print("\n=== TESTE DE ARMAZÉM DE RESULTADOS ===")
+    
+    motor = MonteCarloSoja(SimuladorSoja(), semente=11, tamanho_bloco=1000)
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, 'resultados.soja')
+        salvar_monte_carlo(caminho, motor, 3000)
+        salvar_monte_carlo(caminho, motor, 2500, anexar=True)
+        
+        armazem = ArmazemResultados(caminho)
+        referencia = motor.gerar_precos(5500, armazem.estrategias)
+        print(f"  {len(armazem)} linhas, colunas: {', '.join(armazem.colunas)}")
+        assert isinstance(armazem.dados, np.memmap)
+        assert armazem.cabecalho['semente'] == '11'
+        assert np.array_equal(armazem.dados[:, 3:].T, referencia)
+        assert np.array_equal(armazem.coluna('travar_dolar')[4000:4010], referencia[1, 4000:4010])
+        
+        
+        # Acréscimos sobre um último bloco incompleto continuam a mesma execução
+        salvar_monte_carlo(caminho, motor, 100, anexar=True)
+        armazem = salvar_monte_carlo(caminho, motor, 1700, anexar=True)
+        assert len(armazem) == 7300
+        assert np.array_equal(armazem.dados[:, 3:].T, motor.gerar_precos(7300, armazem.estrategias))
+        
+        armazem.truncar(10)
+        assert len(armazem) == 10
+        assert os.path.getsize(caminho) == 4096 + 10 * len(armazem.colunas) * 8
+        del armazem
+
+def teste_backtest():
+    """Testa o backtest vetorizado contra a precificação janela a janela"""
+    print("\n=== TESTE DE BACKTEST ===")
+    
+    series = gerar_series_sinteticas(anos=2, semente=5)
+    horizontes = [1, 5, 21, 63]
+    resultado = executar_backtest(series, horizontes)
+    
+    n = len(series)
+    assert resultado.preco_final_brl.shape[1] == sum(n - h for h in horizontes)
+    
+    for h in horizontes:
+        for estrategia in resultado.estrategias:
+            precos = resultado.distribuicao(estrategia, h)
+            assert len(precos) == n - h
+            for decisao in (0, (n - h) // 2, n - h - 1):
+                entrega = decisao + h
+                esperado = precificar_estrategia(
+                    estrategia,
+                    series.premio[entrega], series.tela[entrega], series.dolar[entrega],
+                    series.premio[decisao], series.tela[decisao], series.dolar[decisao],
+                    vencimento=h / 252
+                )[1]
+                if estrategia in ALAVANCA_OPCOES:
+                    assert np.isclose(precos[decisao], esperado, rtol=1e-12, atol=1e-10)
+                else:
+                    assert precos[decisao] == esperado
+    
+    resumo = resultado.resumo()
+    sem_travamento = resumo[TipoEstrategia.SEM_TRAVAMENTO]
+    b3 = resumo[TipoEstrategia.TRAVAR_SOJA_B3]
+    print(f"  {resultado.preco_final_brl.shape[1]} janelas, horizontes {horizontes}")
+    print(f"  Média sem travamento: {np.round(sem_travamento['media'], 2).tolist()}")
+    print(f"  B3 melhor que sem travamento: {np.round(b3['frequencia_melhor'], 2).tolist()}")
+    assert np.allclose(sem_travamento['media'][2],
+                       resultado.distribuicao(TipoEstrategia.SEM_TRAVAMENTO, 21).mean())
+    assert np.all(sem_travamento['diferenca_media'] == 0)
+
+def teste_servidor_api():
+    """Testa o servidor HTTP: agrupamento em lotes, resultados e erros"""
+    print("\n=== TESTE DO SERVIDOR HTTP ===")
+    
+    requisicoes = gerar_requisicoes(40, semente=3)
+    requisicoes[0]['estrategias'] = ['travar_dolar']
+    
+    async def cenario():
+        servidor = ServidorSimulacao(janela_ms=5.0)
+        await servidor.iniciar('127.0.0.1', 0)
+        clientes = [ClienteHTTP('127.0.0.1', servidor.porta) for _ in requisicoes]
+        try:
+            await asyncio.gather(*(cliente.conectar() for cliente in clientes))
+            respostas = await asyncio.gather(*(
+                cliente.requisitar('POST', '/simular', dados)
+                for cliente, dados in zip(clientes, requisicoes)
+            ))
+            erros = [
+                await clientes[0].requisitar('POST', '/simular', {'tela': 99.0}),
+                await clientes[0].requisitar('POST', '/simular', {'cenario_dolar': 'lateral'}),
+                await clientes[0].requisitar('GET', '/inexistente')
+            ]
+            
+            # Content-Length negativo: 400 e a conexão é encerrada sem ler corpo
+            leitor, escritor = await asyncio.open_connection('127.0.0.1', servidor.porta)
+            escritor.write(b"POST /simular HTTP/1.1\r\nContent-Length: -5\r\n\r\n{}")
+            await escritor.drain()
+            bruta = await leitor.read()
+            escritor.close()
+            
+            # Cabeçalhos demais: 431 sem esperar o fim deles
+            leitor, escritor = await asyncio.open_connection('127.0.0.1', servidor.porta)
+            escritor.write(b"GET /saude HTTP/1.1\r\n" + b"X-Extra: 1\r\n" * 150)
+            await escritor.drain()
+            excesso = await leitor.read()
+            escritor.close()
+            
+            # Resultado não finito: 500 com JSON válido em vez de NaN no corpo
+            simular_original = servidor.simular
+            async def simular_nan(dados):
+                return {'resultados': {'sem_travamento': {'preco_final_brl': float('nan')}}}
+            servidor.simular = simular_nan
+            nao_finito = await clientes[1].requisitar('POST', '/simular', {})
+            servidor.simular = simular_original
+            metricas = (await clientes[0].requisitar('GET', '/metricas'))[1]
+        finally:
+            await asyncio.gather(*(cliente.fechar() for cliente in clientes))
+            await servidor.fechar()
+        return respostas, erros, (bruta, excesso, nao_finito), metricas
+    
+    respostas, erros, (bruta, excesso, nao_finito), metricas = asyncio.run(cenario())
+    
+    assert all(status == 200 for status, _ in respostas)
+    assert list(respostas[0][1]['resultados']) == ['travar_dolar']
+    simulador = SimuladorSoja()
+    for dados, (_, resposta) in zip(requisicoes, respostas):
+        for nome in ('premio', 'tela', 'dolar'):
+            simulador.definir_valor_alavanca(nome, dados[nome])
+            simulador.definir_cenario_alavanca(nome, TipoCenario(dados[f'cenario_{nome}']),
+                                               dados[f'variacao_{nome}'])
+        for valor, obtido in resposta['resultados'].items():
+            esperado = simulador.simular_estrategia(
+                TipoEstrategia(valor), registrar=False,
+                hedge_dolar=dados['hedge_dolar'], hedge_chicago=dados['hedge_chicago']
+            )
+            assert np.isclose(obtido['preco_final_brl'], esperado.preco_final_brl)
+            assert np.isclose(obtido['variacao_percentual'], esperado.variacao_percentual)
+    
+    assert [status for status, _ in erros] == [400, 400, 404]
+    assert bruta.startswith(b"HTTP/1.1 400") and "Content-Length inválido".encode() in bruta
+    assert excesso.startswith(b"HTTP/1.1 431")
+    assert nao_finito[0] == 500 and 'não finito' in nao_finito[1]['erro']
+    print(f"  {metricas['requisicoes']} requisições em {metricas['lotes']} lotes "
+          f"(p50 {metricas['latencia_p50_ms']:.1f} ms, p99 {metricas['latencia_p99_ms']:.1f} ms)")
+    assert metricas['requisicoes'] == len(requisicoes)
+    assert metricas['lotes'] < len(requisicoes)
+    assert metricas['erros'] == 6
+
+def teste_linha_comando():
+    """Testa a linha de comando não interativa e seu tempo de importação"""
+    print("\n=== TESTE DA LINHA DE COMANDO ===")
+    
+    def executar(*argumentos):
+        saida = io.StringIO()
+        with contextlib.redirect_stdout(saida):
+            codigo = simular.main(list(argumentos))
+        return codigo, saida.getvalue()
+    
+    codigo, saida = executar('--premio', '1.0', '--cenario-tela', 'baixa', '--variacao-tela', '10',
+                             '-e', 'travar_dolar,estrategia_combinada', '--hedge-dolar', '0.8')
+    assert codigo == 0
+    resultados = json.loads(saida)['resultados']
+    simulador = SimuladorSoja()
+    simulador.definir_valor_alavanca('premio', 1.0)
+    simulador.definir_cenario_alavanca('tela', TipoCenario.BAIXA, 10)
+    assert list(resultados) == ['travar_dolar', 'estrategia_combinada']
+    combinada = simulador.simular_estrategia(TipoEstrategia.ESTRATEGIA_COMBINADA, hedge_dolar=0.8)
+    assert resultados['estrategia_combinada']['preco_final_brl'] == combinada.preco_final_brl
+    
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, 'entradas.csv')
+        with open(caminho, 'w') as f:
+            f.write("tela,cenario_dolar,variacao_dolar,estrategias\n"
+                    "16.0,alta,5,sem_travamento\n"
+                    ",baixa,10,travar_dolar;travar_soja_b3\n")
+        codigo, saida = executar('--premio', '1.0', '-a', caminho, '-f', 'csv')
+        assert codigo == 0
+        linhas = saida.splitlines()
+        assert linhas[0] == 'linha,estrategia,preco_final_brl,preco_final_usd,variacao_percentual'
+        assert [linha.split(',')[:2] for linha in linhas[1:]] == [
+            ['1', 'sem_travamento'], ['2', 'travar_dolar'], ['2', 'travar_soja_b3']
+        ]
+        assert np.isclose(float(linhas[1].split(',')[2]), (16.0 + 1.0) * 5.20 * 1.05)
+        
+        with open(caminho, 'w') as f:
+            f.write("tela\n99\n")
+        with contextlib.redirect_stderr(io.StringIO()):
+            assert executar('-a', caminho)[0] == 1
+        
+        # Variações negativas: rejeitadas no arquivo e nos argumentos, como no servidor
+        with open(caminho, 'w') as f:
+            f.write("variacao_tela\n-5\n")
+        erros = io.StringIO()
+        with contextlib.redirect_stderr(erros):
+            assert executar('-a', caminho)[0] == 1
+            try:
+                executar('--variacao-dolar', '-3')
+                assert False, "variação negativa deveria ser um erro de uso"
+            except SystemExit as saida:
+                assert saida.code == 2
+        assert 'variacao_tela não pode ser negativa' in erros.getvalue()
+    
+    # Importação a frio em um processo novo: só o núcleo, sem numpy
+    processo = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c',
+         "import sys, simular; print(','.join(m for m in ('numpy', 'pandas', 'streamlit', "
+         "'plotly') if m in sys.modules))"],
+        capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    linha = next(l for l in processo.stderr.splitlines() if l.endswith('| simular'))
+    milissegundos = int(linha.split('|')[1]) / 1000
+    print(f"  Importação de simular: {milissegundos:.1f} ms "
+          f"(módulos pesados: {processo.stdout.strip() or 'nenhum'})")
+    assert processo.stdout.strip() == ''
+    assert milissegundos < 100
+    
+    # Execução padrão (todas as estratégias, inclusive as com opções) também sem numpy
+    processo = subprocess.run(
+        [sys.executable, '-c',
+         "import sys, simular; codigo = simular.main([]); print(codigo, ','.join(m for m in ('numpy', "
+         "'pandas', 'streamlit', 'plotly') if m in sys.modules), file=sys.stderr)"],
+        capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    assert list(json.loads(processo.stdout)['resultados']) == [e.value for e in TipoEstrategia]
+    assert processo.stderr.split() == ['0']
+
+def teste_benchmark():
+    """Testa a execução dos benchmarks e a detecção de regressões"""
+    print("\n=== TESTE DE BENCHMARKS ===")
+    
+    selecionados = selecionar(['simulador.obter_resumo_alavancas', 'lote.calcular_lote'], rapido=True)
+    nomes = [benchmark.nome_completo(tamanho) for benchmark, tamanho in selecionados]
+    assert nomes == ['simulador.obter_resumo_alavancas[chamadas=1]', 'lote.calcular_lote[linhas=1000]']
+    
+    base = json.loads(json.dumps(executar_benchmarks(selecionados, repeticoes=2, tempo_minimo=0.001)))
+    assert list(base['resultados']) == nomes
+    for medicao in base['resultados'].values():
+        assert 0 < medicao['minimo_s'] <= medicao['mediana_s']
+        assert medicao['repeticoes'] == 2
+    
+    nova = json.loads(json.dumps(base))
+    nova['resultados'][nomes[0]]['mediana_s'] *= 1.5
+    nova['resultados'][nomes[1]]['mediana_s'] *= 1.05
+    comparacoes = {c['nome']: c for c in comparar_execucoes(base, nova, limite=0.10)}
+    print(f"  {nomes[0]}: {comparacoes[nomes[0]]['razao']:.2f}x -> {comparacoes[nomes[0]]['situacao']}")
+    assert comparacoes[nomes[0]]['situacao'] == 'regressao'
+    assert comparacoes[nomes[1]]['situacao'] == 'estavel'
+    invertidas = {c['nome']: c['situacao'] for c in comparar_execucoes(nova, base)}
+    assert invertidas[nomes[0]] == 'melhora'
+
+def teste_instrumentacao():
+    """Testa cronômetros, contadores e perfil da instrumentação"""
+    print("\n=== TESTE DE INSTRUMENTAÇÃO ===")
+    
+    simulador = SimuladorSoja()
+    
+    # Sem coleta ativa nada é registrado
+    assert registro_atual() is None
+    with medir('fora'):
+        contar('fora')
+    simulador.simular_estrategia(TipoEstrategia.TRAVAR_DOLAR)
+    
+    registros = []
+    for i in range(3):
+        with coletar(perfilar=(i == 2)) as registro:
+            with medir('externa'):
+                simulador.definir_valor_alavanca('tela', 15.0 + i)
+                simulador.comparar_estrategias(list(TipoEstrategia))
+                contar('iteracoes')
+        registros.append(registro)
+    assert registro_atual() is None
+    
+    secoes = registro.secoes
+    print(f"  Seções: {sorted(secoes)}")
+    assert secoes['simulador.simular_estrategia'][2] == len(TipoEstrategia)
+    assert secoes['simulador.comparar_estrategias'][2] == 1
+    total, proprio, _ = secoes['externa']
+    assert np.isclose(proprio, total - secoes['simulador.comparar_estrategias'][0])
+    assert registro.contadores == {'iteracoes': 1, 'simulador.recalculo_cenarios': 1}
+    
+    detalhamento = registro.detalhamento()
+    assert np.isclose(sum(linha['proprio_ms'] for linha in detalhamento), registro.duracao * 1000)
+    assert 'comparar_estrategias' in registro.perfil and registros[0].perfil is None
+    
+    lentas = secoes_mais_lentas(registros)
+    assert {linha['secao'] for linha in lentas} == set(secoes)
+    assert all(linha['execucoes'] == 3 for linha in lentas)
+
+def teste_superficie_alavancas():
+    """Testa a superfície pré-calculada contra o simulador direto"""
+    print("\n=== TESTE DE SUPERFÍCIE DE ALAVANCAS ===")
+    
+    superficie = SuperficieAlavancas()
+    print(f"  Erro máximo na validação: {superficie.erro_maximo['preco_final_brl']:.2e}")
+    assert superficie.erro_maximo['preco_final_brl'] < 1e-6
+    assert superficie.corresponde(limites_alavancas())
+    assert not superficie.corresponde(limites_alavancas(variacao_maxima=30.0))
+    
+    # Estado fora dos nós da grade, com choques nos dois sentidos
+    simulador = SimuladorSoja()
+    simulador.definir_valor_alavanca('premio', 0.83)
+    simulador.definir_valor_alavanca('tela', 17.21)
+    simulador.definir_valor_alavanca('dolar', 5.37)
+    simulador.definir_cenario_alavanca('premio', TipoCenario.ALTA, 12.5)
+    simulador.definir_cenario_alavanca('tela', TipoCenario.BAIXA, 33.0)
+    simulador.definir_cenario_alavanca('dolar', TipoCenario.ALTA, 7.0)
+    
+    diretos = simulador.comparar_estrategias(list(TipoEstrategia), registrar=False)
+    for direto, lido in zip(diretos, superficie.resultados(simulador.obter_estado())):
+        assert direto.estrategia == lido.estrategia and direto.exposicao == lido.exposicao
+        for campo in ('preco_final_brl', 'preco_final_usd', 'variacao_percentual'):
+            assert np.isclose(getattr(direto, campo), getattr(lido, campo), rtol=0, atol=1e-9)
+        assert np.allclose(list(direto.detalhes_calculo.values()), list(lido.detalhes_calculo.values()))
+    
+    # Lote com cenários sorteados, incluindo os extremos das faixas
+    rng = np.random.default_rng(7)
+    n = 2000
+    valores = {'premio': rng.uniform(-0.5, 2.5, n), 'tela': rng.choice([10.0, 25.0, 14.3], n),
+               'dolar': rng.uniform(4.5, 6.5, n)}
+    sinais = {nome: rng.integers(-1, 2, n) for nome in valores}
+    variacoes = {nome: rng.uniform(0, 50, n) for nome in valores}
+    lote = superficie.avaliar(valores, sinais, variacoes)
+    exato = calcular_lote(valores, sinais, variacoes, superficie.estrategias)
+    assert lote.preco_final_brl.shape == exato.preco_final_brl.shape
+    assert np.allclose(lote.preco_final_brl, exato.preco_final_brl, rtol=0, atol=1e-9)
+    assert np.allclose(lote.preco_final_usd, exato.preco_final_usd, rtol=0, atol=1e-9)
+    
+    # Limite de erro declarado (TOLERANCIA_BRL) contra a fórmula de precificar_estrategia
+    minimos, maximos = np.array(superficie.limites).T
+    premio, tela, dolar, *choques = rng.uniform(minimos, maximos, (5000, 6)).T
+    lote = superficie.avaliar({'premio': premio, 'tela': tela, 'dolar': dolar},
+                              {nome: 1 for nome in valores},
+                              {nome: choque * 100 for nome, choque in zip(valores, choques)})
+    cenarios = [atual * (1 + choque) for atual, choque in zip((premio, tela, dolar), choques)]
+    erro = max(float(np.max(np.abs(lote.preco_final_brl[i]
+                                   - precificar_estrategia(estrategia, *cenarios, premio, tela, dolar)[1])))
+               for i, estrategia in enumerate(superficie.estrategias))
+    print(f"  Erro máximo contra precificar_estrategia: {erro:.2e} (limite {TOLERANCIA_BRL:g})")
+    assert erro < TOLERANCIA_BRL
+    
+    # Consultas fora das faixas tabeladas são recusadas
+    simulador.definir_cenario_alavanca('dolar', TipoCenario.ALTA, 60.0)
+    for consulta in (lambda: superficie.resultados(simulador.obter_estado()),
+                     lambda: superficie.avaliar({'premio': 3.0, 'tela': 15.0, 'dolar': 5.2},
+                                                sinais={n: 0 for n in valores},
+                                                variacoes={n: 0 for n in valores})):
+        try:
+            consulta()
+            assert False, "consulta fora das faixas deveria falhar"
+        except ValueError:
+            pass
+
+def teste_monte_carlo():
+    """Testa reprodutibilidade, correlação dos sorteios e VaR/CVaR do Monte Carlo"""
+    print("\n=== TESTE DE MONTE CARLO ===")
+    
+    simulador = SimuladorSoja()
+    simulador.definir_valor_alavanca('premio', 1.0)
+    
+    # Mesma semente: mesmos sorteios e mesmas métricas; outra semente muda os sorteios
+    motor = MonteCarloSoja(simulador, semente=7, tamanho_bloco=5000)
+    repetido = MonteCarloSoja(simulador, semente=7, tamanho_bloco=5000)
+    assert np.array_equal(motor.gerar_precos(12000), repetido.gerar_precos(12000))
+    assert motor.simular(12000) == repetido.simular(12000)
+    assert not np.array_equal(motor.gerar_precos(1000), MonteCarloSoja(simulador, semente=8).gerar_precos(1000))
+    
+    # Choques sorteados (variação do prêmio, log-retornos de tela e dólar) reproduzem correlação e volatilidades
+    cenarios = motor.gerar_cenarios(0, 200_000)
+    retornos = np.column_stack([cenarios['premio'] - motor.valores_iniciais[0],
+                                np.log(cenarios['tela'] / motor.valores_iniciais[1]),
+                                np.log(cenarios['dolar'] / motor.valores_iniciais[2])])
+    correlacao = np.corrcoef(retornos, rowvar=False)
+    volatilidades = retornos.std(axis=0) / np.sqrt(motor.horizonte_anos)
+    print(f"  Correlação sorteada: {np.round(correlacao[np.triu_indices(3, 1)], 3).tolist()}")
+    assert np.allclose(correlacao, motor.correlacao, atol=0.01)
+    assert np.allclose(volatilidades, motor.volatilidades, rtol=0.01)
+    
+    # Prêmio zero ou negativo: choques aditivos, com os dois sinais e a mesma volatilidade
+    for premio in (0.0, -0.4):
+        assert simulador.definir_valor_alavanca('premio', premio)
+        motor = MonteCarloSoja(simulador, semente=7, derivas={'premio': 0.1, 'dolar': 0.05})
+        sorteados = motor.gerar_cenarios(0, 200_000)['premio']
+        assert (sorteados > 0).any() and (sorteados < 0).any()
+        volatilidade = sorteados.std() / np.sqrt(motor.horizonte_anos)
+        assert abs(volatilidade - motor.volatilidades[0]) < 0.01 * motor.volatilidades[0]
+        assert abs(sorteados.mean() - (premio + 0.1 * motor.horizonte_anos)) < 0.002
+        metricas = motor.simular(1 << 16, [TipoEstrategia.SEM_TRAVAMENTO])[TipoEstrategia.SEM_TRAVAMENTO]
+        assert abs(metricas.media - motor.valor_esperado_controle()) < 4 * metricas.meia_largura_media
+    simulador.definir_valor_alavanca('premio', 1.0)
+    
+    # Só o dólar varia: o preço sem travamento é lognormal e VaR/CVaR têm forma fechada
+    from statistics import NormalDist
+    normal = NormalDist()
+    motor = MonteCarloSoja(simulador, volatilidades={'premio': 0.0, 'tela': 0.0, 'dolar': 0.2},
+                           semente=3, amostragem='sobol')
+    metricas = motor.simular(1 << 18, [TipoEstrategia.SEM_TRAVAMENTO],
+                             nivel_confianca=0.95)[TipoEstrategia.SEM_TRAVAMENTO]
+    preco, s = motor.preco_atual_brl, 0.2 * np.sqrt(motor.horizonte_anos)
+    z = normal.inv_cdf(0.05)
+    var = preco * (1 - np.exp(-0.5 * s ** 2 + s * z))
+    cvar = preco * (1 - normal.cdf(z - s) / 0.05)
+    print(f"  VaR 95%: {metricas.var:.4f} (exato {var:.4f}), CVaR: {metricas.cvar:.4f} (exato {cvar:.4f})")
+    assert abs(metricas.var - var) < 0.005 * var
+    assert abs(metricas.cvar - cvar) < 0.005 * cvar
+    assert abs(metricas.media - preco) < 1e-3 * preco
+
+def teste_amostragem_monte_carlo():
+    """Testa Sobol, variáveis antitéticas e variável de controle do Monte Carlo"""
+    print("\n=== TESTE DE AMOSTRAGEM DO MONTE CARLO ===")
+    
+    # Sobol sem embaralhar: primeiros pontos conhecidos da sequência
+    pontos = SequenciaSobol(3, embaralhar=False).uniformes(0, 4)
+    assert np.allclose(pontos, [[0, 0, 0], [0.5, 0.5, 0.5], [0.75, 0.25, 0.25], [0.25, 0.75, 0.75]], atol=1e-9)
+    
+    # Embaralhado: cada coordenada dos 2^10 primeiros pontos ocupa um intervalo de 2^-10
+    sequencia = SequenciaSobol(3, semente=4)
+    uniformes = sequencia.uniformes(0, 1024)
+    assert all(len(np.unique((uniformes[:, d] * 1024).astype(int))) == 1024 for d in range(3))
+    assert np.array_equal(sequencia.inteiros(0, 1024)[700:], sequencia.inteiros(700, 324))
+    
+    from statistics import NormalDist
+    u = np.concatenate([np.linspace(1e-12, 1 - 1e-12, 1001), [1e-300, 0.075, 0.925]])
+    assert np.allclose(normal_inversa(u), [NormalDist().inv_cdf(x) for x in u], rtol=1e-14, atol=1e-14)
+    
+    simulador = SimuladorSoja()
+    simulador.definir_valor_alavanca('premio', 1.0)
+    n = 1 << 14
+    erros = {}
+    for amostragem in ('pseudo', 'antitetica', 'sobol'):
+        motor = MonteCarloSoja(simulador, semente=5, tamanho_bloco=4096, amostragem=amostragem,
+                               derivas={'tela': 0.05})
+        esperado = motor.valor_esperado_controle()
+        metricas = motor.simular(n, [TipoEstrategia.SEM_TRAVAMENTO])[TipoEstrategia.SEM_TRAVAMENTO]
+        erros[amostragem] = abs(metricas.media - esperado)
+    print(f"  Erro da média ({n:,} sorteios): "
+          + ", ".join(f"{nome} {erro:.4f}" for nome, erro in erros.items()))
+    assert erros['sobol'] < erros['pseudo'] and erros['sobol'] < 0.01
+    
+    # Antitéticas: cada choque tem o espelho no mesmo bloco
+    motor = MonteCarloSoja(simulador, semente=5, tamanho_bloco=1001, amostragem='antitetica')
+    normais = motor._normais_bloco(0, 1001)
+    assert np.allclose(normais[:500], -normais[501:1001])
+    
+    # Controle: média do próprio controle sai exata; das demais, corrigida pelo beta
+    motor = MonteCarloSoja(simulador, semente=5, tamanho_bloco=4096, variavel_controle=True)
+    metricas = motor.simular(n)
+    assert np.isclose(metricas[TipoEstrategia.SEM_TRAVAMENTO].media, motor.valor_esperado_controle())
+    assert np.isclose(metricas[TipoEstrategia.SEM_TRAVAMENTO].coeficiente_controle, 1.0)
+    assert abs(metricas[TipoEstrategia.TRAVAR_SOJA_B3].coeficiente_controle) < 1e-12
+    
+    resultado = convergencia(simulador, ('pseudo', 'sobol'), {'media': 1e-9, 'cvar': 1e-9},
+                             replicas=4, sorteios_iniciais=256, sorteios_maximos=1024)
+    sobol = resultado['tecnicas']['sobol']
+    print(f"  Sorteios para o alvo (sobol x pseudo): {sobol['razao']['media']:.1f}x na média")
+    assert [p['sorteios'] for p in sobol['curva']] == [1024, 2048, 4096]
+    assert sobol['obtencao']['media'] == 'extrapolado' and sobol['razao']['media'] > 1
+
+def teste_estatisticas_streaming():
+    """Testa os acumuladores em fluxo e a parada antecipada do Monte Carlo"""
+    print("\n=== TESTE DE ESTATÍSTICAS EM FLUXO ===")
+    
+    rng = np.random.default_rng(21)
+    valores = rng.lognormal(0, 0.5, (3, 300_000))
+    momentos, outros = MomentosStreaming(3, controle=True), MomentosStreaming(3, controle=True)
+    digesto, outro = DigestoQuantis(), DigestoQuantis()
+    for inicio in range(0, 120_000, 7_000):
+        momentos.adicionar(valores[:, inicio:min(inicio + 7_000, 120_000)])
+        digesto.adicionar(valores[0, inicio:min(inicio + 7_000, 120_000)])
+    outros.adicionar(valores[:, 120_000:])
+    outro.adicionar(valores[0, 120_000:])
+    momentos.combinar(outros)
+    digesto.combinar(outro)
+    
+    centrados = valores - valores.mean(axis=1, keepdims=True)
+    assert np.allclose(momentos.medias, valores.mean(axis=1))
+    assert np.allclose(momentos.variancias(), valores.var(axis=1, ddof=1))
+    assert np.allclose(momentos.comomentos, centrados @ centrados[-1])
+    
+    # Erro em posição (rank) dos quantis bem abaixo do erro amostral de ~4e-4
+    ordenados = np.sort(valores[0])
+    niveis = np.array([0.001, 0.01, 0.05, 0.5, 0.95, 0.99])
+    erro_rank = np.abs(np.searchsorted(ordenados, digesto.quantil(niveis)) / ordenados.size - niveis).max()
+    cauda = ordenados[:int(0.05 * ordenados.size)].mean()
+    print(f"  t-digest: {len(digesto.medias)} centroides ({digesto.nbytes()} bytes) para {digesto.n:,} valores")
+    print(f"  Erro máximo de rank: {erro_rank:.1e}  Erro da média da cauda 5%: {digesto.media_cauda(0.05) - cauda:.1e}")
+    assert digesto.n == ordenados.size and erro_rank < 1e-4
+    assert abs(digesto.media_cauda(0.05) - cauda) < 1e-3 * cauda
+    assert digesto.quantil(0.0) == ordenados[0] and digesto.quantil(1.0) == ordenados[-1]
+    
+    simulador = SimuladorSoja()
+    simulador.definir_valor_alavanca('premio', 1.0)
+    motor = MonteCarloSoja(simulador, semente=8, tamanho_bloco=10_000)
+    metricas = motor.simular(200_000)
+    precos = motor.gerar_precos(200_000)
+    for i, (estrategia, m) in enumerate(metricas.items()):
+        var_exato = motor.preco_atual_brl - np.quantile(precos[i], 0.05)
+        assert np.isclose(m.media, precos[i].mean()) and np.isclose(m.desvio_padrao, precos[i].std(ddof=1))
+        assert abs(m.var - var_exato) <= max(m.meia_largura_var / 4, 1e-9)
+    
+    paralelo = simular_metricas_paralelo(motor, 200_000, n_processos=2, blocos_por_tarefa=4)
+    for estrategia, m in metricas.items():
+        assert np.isclose(paralelo[estrategia].media, m.media)
+        assert abs(paralelo[estrategia].var - m.var) <= max(m.meia_largura_var / 4, 1e-9)
+    
+    # Parada antecipada: para no primeiro bloco em que todas atingem a precisão
+    adaptativo = motor.simular(5_000_000, precisao_media=0.05, precisao_var=0.1)
+    usados = {m.n_cenarios for m in adaptativo.values()}
+    print(f"  Parada antecipada: {usados.pop():,} de 5,000,000 cenários")
+    assert all(m.n_cenarios < 5_000_000 and m.meia_largura_media <= 0.05 and m.meia_largura_var <= 0.1
+               for m in adaptativo.values())
+    anterior = motor.simular(adaptativo[TipoEstrategia.SEM_TRAVAMENTO].n_cenarios - 10_000)
+    assert any(m.meia_largura_media > 0.05 or m.meia_largura_var > 0.1 for m in anterior.values())
+
+def teste_monte_carlo_paralelo():
+    """Testa se o Monte Carlo multiprocesso reproduz a execução serial"""
+    print("\n=== TESTE DE MONTE CARLO PARALELO ===")
+    
+    simulador = SimuladorSoja()
+    motor = MonteCarloSoja(simulador, semente=123, tamanho_bloco=10_000)
+    n_cenarios = 55_555
+    
+    serial = motor.gerar_precos(n_cenarios)
+    with simular_paralelo(motor, n_cenarios, n_processos=2, blocos_por_tarefa=2) as resultado:
+        identico = np.array_equal(resultado.precos, serial)
+    
+    print(f"  {n_cenarios} cenários em 2 processos")
+    print(f"  Idêntico à execução serial: {identico}")
+    assert identico
+    
+    # Métricas: um ou dois processos dão o mesmo resultado, e o autoajuste só
+    # roda quando falta algum parâmetro
+    autoajustar = monte_carlo_paralelo.autoajustar
+    chamadas = []
+    monte_carlo_paralelo.autoajustar = lambda *args: chamadas.append(args) or autoajustar(*args)
+    try:
+        um = simular_metricas_paralelo(motor, n_cenarios, n_processos=1, blocos_por_tarefa=2)
+        dois = simular_metricas_paralelo(motor, n_cenarios, n_processos=2, blocos_por_tarefa=2)
+        assert not chamadas
+        simular_metricas_paralelo(motor, 20_000, n_processos=1)
+        assert len(chamadas) == 1
+    finally:
+        monte_carlo_paralelo.autoajustar = autoajustar
+    assert um == dois
+
 def main():
     """Executa todos os testes"""
     print("SIMULADOR DE ESTRATÉGIA PARA SOJA - TESTES DE VALIDAÇÃO")
@@ -163,6 +1484,31 @@ def main():
         teste_cenario_otimista()
         teste_cenario_pessimista()
         teste_cenario_misto()
+        teste_simulacao_lote()
+        teste_resultado_compacto()
+        teste_historico_circular()
+        teste_cache_cenarios()
+        teste_cache_lru()
+        teste_analise_sensibilidade()
+        teste_sensibilidades_analiticas()
+        teste_mapa_dominancia()
+        teste_pontos_equilibrio()
+        teste_estrategias_opcoes()
+        teste_estrategia_combinada()
+        teste_otimizador_hedge()
+        teste_carteira()
+        teste_processador_cenarios()
+        teste_armazem_resultados()
+        teste_backtest()
+        teste_servidor_api()
+        teste_linha_comando()
+        teste_benchmark()
+        teste_instrumentacao()
+        teste_superficie_alavancas()
+        teste_monte_carlo()
+        teste_amostragem_monte_carlo()
+        teste_estatisticas_streaming()
+        teste_monte_carlo_paralelo()
         
         print("\n" + "=" * 60)
         print("TODOS OS TESTES EXECUTADOS COM SUCESSO!")